@@ -0,0 +1,91 @@
+import os
+import stat
+import struct
+from typing import List, Tuple
+
+# Lote de arquivos: um contêiner em fluxo com um registro por arquivo,
+# cabeçalho + nome (UTF-8) + dados, colados uns nos outros; o envio em fluxo
+# os reagrupa em segmentos cheios, então vários arquivos pequenos dividem o
+# mesmo segmento
+BATCH_HEADER = struct.Struct('!HIQ')  # tamanho do nome(2) + modo(4) + tamanho(8); nome vazio encerra
+BATCH_END = BATCH_HEADER.pack(0, 0, 0)
+BATCH_READ_CHUNK = 1 << 20
+# Arquivos até este tamanho são montados em memória e gravados pelo pool de
+# escrita; os maiores vão direto ao disco na thread de recepção
+BATCH_INLINE_LIMIT = 1 << 20
+# Bytes recebidos aguardando gravação antes de a recepção esperar o pool
+BATCH_PENDING_LIMIT = 16 << 20
+BATCH_WRITERS = 4
+# Resposta final do destinatário: todos os arquivos gravados
+BATCH_OK = b'\x01'
+BATCH_FAILED = b'\x00'
+
+
+def collect_files(paths) -> List[Tuple[str, str]]:
+    # (caminho local, nome no lote): diretórios entram recursivamente com
+    # nomes relativos a eles, arquivos avulsos pelo nome base
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    full = os.path.join(root, name)
+                    if os.path.isfile(full):
+                        files.append((full, os.path.relpath(full, path).replace(os.sep, '/')))
+        else:
+            files.append((path, os.path.basename(path)))
+    return files
+
+
+def batch_records(files, stats: dict):
+    # Gera o contêiner (bytes do cabeçalho e blocos de dados); stats recebe
+    # arquivos e bytes de dados enviados
+    for path, name in files:
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            encoded = name.encode('utf-8')
+            yield BATCH_HEADER.pack(len(encoded), stat.S_IMODE(st.st_mode), st.st_size) + encoded
+            remaining = st.st_size
+            while remaining:
+                chunk = f.read(min(remaining, BATCH_READ_CHUNK))
+                if not chunk:
+                    raise OSError(f"{path} encolheu durante o envio")
+                remaining -= len(chunk)
+                yield chunk
+        stats['files'] += 1
+        stats['bytes'] += st.st_size
+    yield BATCH_END
+
+
+def batch_target(directory: str, raw_name: bytes) -> str:
+    # Caminho de destino dentro de directory; nomes absolutos ou com '..'
+    # são recusados, assim como os que saem de directory por um link
+    # simbólico já existente nele
+    name = raw_name.decode('utf-8')
+    parts = name.split('/')
+    if not name or '\0' in name or name.startswith('/') or any(p in ('', '.', '..') for p in parts):
+        raise ValueError(f"nome inválido no lote: {name!r}")
+    path = os.path.join(directory, *parts)
+    root = os.path.realpath(directory)
+    if os.path.commonpath([root, os.path.realpath(path)]) != root:
+        raise ValueError(f"nome fora do diretório de destino: {name!r}")
+    return path
+
+
+def open_target(path: str, mode: int) -> int:
+    # O_NOFOLLOW: um link simbólico no lugar do arquivo é erro, não destino
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+    os.fchmod(fd, mode & 0o777)
+    return fd
+
+
+def write_file(path: str, data: bytes, mode: int):
+    fd = open_target(path, mode)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
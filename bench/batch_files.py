@@ -0,0 +1,82 @@
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import common
+from utils import EmulatedLink
+
+# Muitos arquivos pequenos: send_files (um lote numa conexão) x uma conexão
+# por arquivo (handshake, send_data e close com FIN) com RTT emulado
+
+
+def make_files(directory: str, count: int, rng: random.Random) -> int:
+    total = 0
+    for i in range(count):
+        data = rng.randbytes(rng.randint(100, 8 << 10))
+        with open(os.path.join(directory, f"arquivo{i:05d}.dat"), 'wb') as f:
+            f.write(data)
+        total += len(data)
+    return total
+
+
+def batch(source: str, rtt: float) -> float:
+    link = EmulatedLink(rtt / 2) if rtt else None
+    with tempfile.TemporaryDirectory() as dest, common.quiet():
+        srv, cli = common.connect_pair(link=link)
+        result = {}
+        receiver = threading.Thread(target=lambda: result.update(ok=srv.recv_files(dest, timeout=60)))
+        receiver.start()
+        start = time.perf_counter()
+        ok = cli.send_files([source], timeout=60)
+        receiver.join()
+        elapsed = time.perf_counter() - start
+        common.shutdown(cli, srv)
+    if not (ok and result.get('ok')):
+        raise RuntimeError('lote falhou')
+    return elapsed
+
+
+def per_file(source: str, rtt: float, count: int) -> float:
+    names = sorted(os.listdir(source))[:count]
+    start = time.perf_counter()
+    for name in names:
+        with open(os.path.join(source, name), 'rb') as f:
+            data = f.read()
+        link = EmulatedLink(rtt / 2) if rtt else None
+        with common.quiet():
+            srv, cli = common.connect_pair(link=link)
+            out = {}
+            receiver = threading.Thread(target=common.receive, args=(srv, len(data), out))
+            receiver.start()
+            cli.send_data(data)
+            receiver.join()
+            cli.close()
+            common.shutdown(cli, srv)
+        if out['data'] != data:
+            raise RuntimeError('transferência corrompida')
+    return time.perf_counter() - start
+
+
+def main():
+    p = argparse.ArgumentParser(description='Lote de arquivos pequenos x uma conexão por arquivo')
+    p.add_argument('--files', type=int, default=1000, help='Arquivos no lote (100 B a 8 KiB)')
+    p.add_argument('--per-file', type=int, default=50, help='Arquivos enviados um por conexão')
+    p.add_argument('--rtts', default='0,0.02', help='RTTs emulados (s), separados por vírgula')
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as source:
+        total = make_files(source, args.files, random.Random(1))
+        print(f"{args.files} arquivos, {total / 1e6:.2f} MB")
+        for rtt in map(float, args.rtts.split(',')):
+            elapsed = batch(source, rtt)
+            single = per_file(source, rtt, args.per_file)
+            print(f"RTT {rtt * 1000:3g} ms  lote {elapsed:6.2f}s {args.files / elapsed:6.0f} arquivos/s   "
+                  f"por conexão {args.per_file / single:6.1f} arquivos/s ({args.per_file} arquivos, {single:.1f}s)",
+                  flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import contextlib
+import os
+import socket
+import sys
+import threading
+import time
+
+# Benchmarks em loopback: módulos do projeto ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+from tru_protocol import TRUProtocol
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def quiet():
+    # Os logs [TAG] do protocolo vão para /dev/null; os resultados, para stderr ou depois do bloco
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def connect_pair(server_kw=None, link=None, loss=0.0, **client_kw):
+    # (servidor, cliente) conectados e com chaves trocadas; link (utils.EmulatedLink)
+    # atrasa os dois sentidos, loss descarta na recepção de ambos
+    utils.loss_probability = loss
+    kw = {'use_path_cache': False, 'loss_callback': utils.loss_filter}
+    port = free_port()
+    srv = TRUProtocol(port=port, is_server=True, **{**kw, **(server_kw or {})})
+    cli = TRUProtocol(is_server=False, **{**kw, **client_kw})
+    if link:
+        link.attach(srv)
+        link.attach(cli)
+    accepted = threading.Event()
+
+    def accept():
+        if srv.accept() and srv.do_key_exchange_as_server():
+            accepted.set()
+
+    threading.Thread(target=accept, daemon=True).start()
+    cli.start()
+    if not (cli.connect('127.0.0.1', port) and cli.do_key_exchange_as_client() and accepted.wait(10)):
+        raise RuntimeError('conexão de benchmark falhou')
+    return srv, cli
+
+
+def shutdown(*conns):
+    # Sem FIN: para as threads e fecha o socket, liberando a porta na hora
+    for conn in conns:
+        conn.running = False
+    for conn in conns:
+        if conn.receiver_thread:
+            conn.receiver_thread.join(2)
+        try:
+            conn.sock.close()
+        except OSError:
+            pass
+
+
+def receive(conn, size: int, out: dict, timeout: float = 30.0):
+    # Lê size bytes do fluxo; out['data'] e out['done'] (instante do último byte)
+    buf = bytearray(size)
+    view = memoryview(buf)
+    got = 0
+    while got < size:
+        n = conn.readinto(view[got:], timeout)
+        if not n:
+            break
+        got += n
+    out['done'] = time.perf_counter()
+    out['data'] = bytes(buf[:got])
+
+
+def udp_rcvbuf_errors():
+    # Datagramas descartados pelo kernel com o buffer de recepção cheio (Linux)
+    try:
+        with open('/proc/net/snmp') as f:
+            header, values = [line.split() for line in f if line.startswith('Udp:')][:2]
+        return int(values[header.index('RcvbufErrors')])
+    except (OSError, ValueError):
+        return None
+
+
+def percentile(values, point: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(point / 100 * len(values)))] if values else 0.0
@@ -0,0 +1,89 @@
+import argparse
+import glob
+import os
+import random
+import threading
+import time
+
+import common
+from compression import lzma
+from utils import EmulatedLink
+
+# Goodput de send_data com e sem compressão num enlace emulado (atraso e
+# taxa de serialização), para corpora de compressibilidade diferente; entre
+# parênteses a razão bytes no fio / bytes crus informada pelo compressor
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def corpus(name: str, size: int) -> bytes:
+    rng = random.Random(1)
+    if name == 'logs':
+        levels = ('INFO', 'INFO', 'INFO', 'WARN', 'DEBUG', 'ERROR')
+        lines = (f"2026-10-19 {rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}."
+                 f"{rng.randrange(1000):03d} {rng.choice(levels):5s} [worker-{rng.randrange(16)}] "
+                 f"requisição {rng.randrange(10**6)} de 10.0.{rng.randrange(256)}.{rng.randrange(256)} "
+                 f"concluída em {rng.random() * 200:.2f} ms\n" for _ in iter(int, 1))
+    elif name == 'csv':
+        lines = (f"{rng.randrange(10**9)},{rng.choice(('SP', 'RJ', 'MG', 'RS'))},"
+                 f"{rng.gauss(100, 30):.4f},{rng.gauss(0, 1):.6f},{rng.randrange(2)}\n" for _ in iter(int, 1))
+    elif name == 'python src':
+        sources = b''.join(open(path, 'rb').read() for path in sorted(glob.glob(os.path.join(ROOT, '*.py'))))
+        return (sources * (size // len(sources) + 1))[:size]
+    elif name == 'random':
+        return os.urandom(size)
+    else:  # i%256: repete a cada 256 bytes
+        return (bytes(range(256)) * (size // 256 + 1))[:size]
+
+    out = bytearray()
+    for line in lines:
+        out += line.encode()
+        if len(out) >= size:
+            return bytes(out[:size])
+
+
+def goodput(data: bytes, rate: float, delay: float, compression) -> tuple:
+    link = EmulatedLink(delay, rate=rate)
+    kw = {'compression': compression} if compression else {}
+    with common.quiet():
+        srv, cli = common.connect_pair(link=link, **kw)
+        out = {}
+        reader = threading.Thread(target=common.receive, args=(srv, len(data), out, 60))
+        reader.start()
+        start = time.perf_counter()
+        cli.send_data(data)
+        reader.join()
+        stats = cli.get_compression_stats()
+        common.shutdown(cli, srv)
+    if out['data'] != data:
+        raise RuntimeError('transferência corrompida')
+    return len(data) / (out['done'] - start) / 1e6, stats
+
+
+def main():
+    p = argparse.ArgumentParser(description='Goodput com compressão adaptativa')
+    p.add_argument('--links', default='5:4,1:3', help='Pares taxa_MBps:tamanho_MB, separados por vírgula')
+    p.add_argument('--delay', type=float, default=0.01, help='Atraso emulado em cada sentido (s)')
+    p.add_argument('--corpora', default='logs,csv,python src,random,i%256', help='Corpora, separados por vírgula')
+    args = p.parse_args()
+
+    algorithms = ['zlib'] + (['lzma'] if lzma else [])
+    for link in args.links.split(','):
+        rate, size = map(float, link.split(':'))
+        print(f"enlace {rate:g} MB/s, {size:g} MB, atraso {args.delay * 1000:g} ms; goodput em MB/s (razão no fio)")
+        for name in args.corpora.split(','):
+            data = corpus(name, int(size * 1e6))
+            cells = [f"nenhuma {goodput(data, rate * 1e6, args.delay, None)[0]:6.2f}"]
+            for algorithm in algorithms:
+                if name == 'random' and algorithm != 'zlib':
+                    continue
+                rate_mb, stats = goodput(data, rate * 1e6, args.delay, algorithm)
+                cells.append(f"{algorithm} {rate_mb:6.2f} ({stats.get('ratio', 1.0):.3f})")
+                if name == 'random':
+                    cells.append(f"blocos comprimidos {stats['blocks_compressed']}/"
+                                 f"{stats['blocks_compressed'] + stats['blocks_raw']}, "
+                                 f"CPU {stats['cpu_time']:.3f} s")
+            print(f"  {name:10s} " + '   '.join(cells), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import os
+import threading
+import time
+
+import common
+import utils
+from utils import EmulatedLink
+
+# Controladores de congestionamento num caminho com perda aleatória (não
+# causada por congestionamento): Reno e CUBIC reduzem a janela a cada perda,
+# o BBR segue a banda e o RTT mínimo estimados e mantém a vazão
+
+
+def run(algorithm: str, payload: bytes, args) -> dict:
+    link = EmulatedLink(args.delay, rate=args.rate * 1e6)
+    with common.quiet():
+        srv, cli = common.connect_pair(link=link, congestion_algorithm=algorithm,
+                                       server_kw={'congestion_algorithm': algorithm})
+        utils.loss_probability = args.loss  # depois do handshake
+        out = {}
+        reader = threading.Thread(target=common.receive, args=(srv, len(payload), out, 120))
+        reader.start()
+        start = time.perf_counter()
+        ok = cli.send_data(payload)
+        reader.join()
+        utils.loss_probability = 0.0
+        common.shutdown(cli, srv)
+    elapsed = out['done'] - start
+    return {'ok': ok and out['data'] == payload, 'seconds': elapsed,
+            'mbps': len(payload) / elapsed / 1e6}
+
+
+def main():
+    p = argparse.ArgumentParser(description='Reno x CUBIC x BBR num caminho emulado com perda')
+    p.add_argument('--segments', type=int, default=2000, help='Segmentos de 1400 B por rodada')
+    p.add_argument('--delay', type=float, default=0.01, help='Atraso emulado em cada sentido (s)')
+    p.add_argument('--rate', type=float, default=0.0, help='Banda do gargalo em MB/s (0 = sem limite)')
+    p.add_argument('--loss', default='0,0.01,0.02', help='Probabilidades de perda, separadas por vírgula')
+    p.add_argument('--cc', default='reno,cubic,bbr', help='Controladores, separados por vírgula')
+    args = p.parse_args()
+
+    payload = os.urandom(args.segments * 1400)
+    print(f"{args.segments} x 1400 B, RTT emulado {2 * args.delay * 1000:.0f} ms")
+    print(f"{'perda':>6} {'cc':>6} {'s':>7} {'MB/s':>7}  ok")
+    for loss in map(float, args.loss.split(',')):
+        args.loss = loss
+        for algorithm in args.cc.split(','):
+            r = run(algorithm, payload, args)
+            print(f"{loss:6.0%} {algorithm:>6} {r['seconds']:7.2f} {r['mbps']:7.2f}  {r['ok']}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import argparse
+
+import common  # noqa: F401 (caminho do repositório)
+import congestion
+from congestion import create_congestion_control
+
+# Modelo por RTT dirigido pelos próprios controladores, com relógio
+# simulado: gargalo de --rate Mbit/s com fila de --queue x BDP. Uma janela
+# acima de BDP + fila perde um segmento (três ACKs duplicados); abaixo, cada
+# segmento confirmado é um ACK com o RTT base mais a espera na fila.
+# utilização = entregue / (BDP x rodadas)
+MSS = 1400
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.now
+
+
+def simulate(algorithm: str, rtt: float, args) -> float:
+    clock = SimulatedClock()
+    real_time, congestion.time = congestion.time, clock
+    try:
+        cc = create_congestion_control(algorithm)
+        bdp = args.rate * 1e6 / 8 * rtt / MSS
+        queue = args.queue * bdp
+        rounds = int(args.seconds / rtt)
+        delivered = 0.0
+        for _ in range(rounds):
+            window = cc.get_window_size()
+            if window > bdp + queue:
+                cc.on_three_duplicate_acks()
+                delivered += bdp
+                clock.now += rtt
+                continue
+            delivered += min(window, bdp)
+            sample = rtt + max(window - bdp, 0) / bdp * rtt
+            for _ in range(max(window, 1)):
+                clock.now += rtt / max(window, 1)
+                cc.on_ack_received(rtt_sample=sample)
+        return delivered / (bdp * rounds)
+    finally:
+        congestion.time = real_time
+
+
+def main():
+    p = argparse.ArgumentParser(description='Utilização do enlace por controlador (modelo por RTT)')
+    p.add_argument('--rate', type=float, default=100, help='Banda do gargalo (Mbit/s)')
+    p.add_argument('--queue', type=float, default=0.2, help='Fila do gargalo, em fração do BDP')
+    p.add_argument('--seconds', type=float, default=60, help='Duração simulada (s)')
+    p.add_argument('--rtt', default='0.01,0.05,0.2', help='RTTs base (s), separados por vírgula')
+    p.add_argument('--cc', default='reno,cubic', help='Controladores, separados por vírgula')
+    args = p.parse_args()
+
+    algorithms = args.cc.split(',')
+    print(f"gargalo {args.rate:g} Mbit/s, fila {args.queue:.0%} do BDP, {args.seconds:g} s simulados; utilização")
+    print(f"{'RTT ms':>7} " + ' '.join(f"{a:>7}" for a in algorithms))
+    for rtt in map(float, args.rtt.split(',')):
+        cells = ' '.join(f"{simulate(a, rtt, args):7.2f}" for a in algorithms)
+        print(f"{rtt * 1000:7.0f} {cells}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import os
+import threading
+import time
+
+import common
+from crypto import CryptoPipeline, TRUCrypto
+
+# Vazão da cifra por segmento (keystream HMAC-SHA256 + XOR e tag AEAD) e,
+# com --transfer, de uma transferência em loopback com e sem criptografia
+# e com os logs por pacote (--debug) ligados
+
+
+def measure(fn, size: int, seconds: float, rounds: int = 3) -> float:
+    # MB/s de fn() processando segmentos de size bytes: melhor de rounds
+    # rodadas que somam ~seconds (menos ruído de frequência/agendamento)
+    best = 0.0
+    for _ in range(rounds):
+        count = 0
+        start = time.perf_counter()
+        deadline = start + seconds / rounds
+        while time.perf_counter() < deadline:
+            for _ in range(16):
+                fn()
+            count += 16
+        best = max(best, count * size / (time.perf_counter() - start) / 1e6)
+    return best
+
+
+def pipeline_rate(workers: int, processes: bool, size: int, seconds: float, key, iv) -> float:
+    # Vários segmentos em voo no pool, como o protocolo com --crypto-workers
+    pipeline = CryptoPipeline(workers, processes)
+    data = os.urandom(size)
+    try:
+        pipeline.encrypt(data, key, iv).result()  # aquece os workers
+        batch = workers * 4
+        done = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            for future in [pipeline.encrypt(data, key, iv) for _ in range(batch)]:
+                future.result()
+            done += batch
+        return done * size / (time.perf_counter() - start) / 1e6
+    finally:
+        pipeline.shutdown()
+
+
+def transfer_rate(size: int, **kw) -> float:
+    payload = os.urandom(size)
+    with common.quiet():
+        srv, cli = common.connect_pair(server_kw=kw, **kw)
+        out = {}
+        reader = threading.Thread(target=common.receive, args=(srv, size, out))
+        reader.start()
+        start = time.perf_counter()
+        cli.send_data(payload)
+        reader.join()
+        common.shutdown(cli, srv)
+    if out['data'] != payload:
+        raise RuntimeError('transferência corrompida')
+    return size / (out['done'] - start) / 1e6
+
+
+def main():
+    p = argparse.ArgumentParser(description='Vazão da criptografia TRUDP')
+    p.add_argument('--sizes', default='1400,8000,65000', help='Tamanhos de segmento, separados por vírgula')
+    p.add_argument('--seconds', type=float, default=1.0, help='Duração de cada medida')
+    p.add_argument('--workers', default='2,4', help='Workers do CryptoPipeline, separados por vírgula')
+    p.add_argument('--transfer', type=float, default=0, metavar='MIB',
+                   help='Também transferir MIB em loopback com e sem criptografia')
+    args = p.parse_args()
+
+    key, iv = os.urandom(32), os.urandom(16)
+    mac_key = TRUCrypto.derive_mac_key(key)
+    print(f"{'segmento':>8} {'cifra':>8} {'decifra':>8} {'tag':>8} {'selo':>8}  MB/s")
+    for size in map(int, args.sizes.split(',')):
+        data = os.urandom(size)
+        nonce = TRUCrypto.packet_nonce(iv, 1)
+        encrypt = measure(lambda: TRUCrypto.encrypt_data(data, key, nonce), size, args.seconds)
+        decrypt = measure(lambda: TRUCrypto.decrypt_data(data, key, nonce), size, args.seconds)
+        tag = measure(lambda: TRUCrypto.compute_tag(mac_key, data), size, args.seconds)
+        seal = measure(lambda: TRUCrypto.compute_tag(mac_key, TRUCrypto.encrypt_data(data, key, nonce)[0]),
+                       size, args.seconds)
+        print(f"{size:8d} {encrypt:8.2f} {decrypt:8.2f} {tag:8.2f} {seal:8.2f}", flush=True)
+
+    size = max(map(int, args.sizes.split(',')))
+    for workers in map(int, args.workers.split(',')):
+        for processes in (False, True):
+            rate = pipeline_rate(workers, processes, size, args.seconds, key, iv)
+            kind = 'processos' if processes else 'threads'
+            print(f"CryptoPipeline {workers} {kind:9s} ({size} B): {rate:8.2f} MB/s", flush=True)
+
+    if args.transfer:
+        size = int(args.transfer * (1 << 20))
+        for label, kw in (('sem criptografia', {'enable_encryption': False}),
+                          ('cifrado (AEAD)', {}),
+                          ('cifrado, --debug', {'debug': True})):
+            print(f"transferência {args.transfer:g} MiB {label:17s}: {transfer_rate(size, **kw):8.2f} MB/s", flush=True)
+
+
+if __name__ == '__main__':
+    main()
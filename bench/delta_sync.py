@@ -0,0 +1,96 @@
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import common
+from utils import EmulatedLink
+
+# Arquivo já existente no destino com uma versão antiga: send_file completo
+# x send_file_delta, com edições espalhadas (trechos pequenos em posições
+# aleatórias) ou em regiões contíguas. Bytes enviados pelo remetente (no
+# fio), bytes que voltaram (assinaturas) e tempo total
+
+
+class CountingSocket:
+    def __init__(self, sock):
+        self._sock = sock
+        self.bytes = 0
+
+    def sendto(self, data, addr):
+        self.bytes += len(data)
+        return self._sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def edit(old: bytes, model: str, fraction: float, rng: random.Random) -> bytes:
+    new = bytearray(old)
+    changed = int(len(old) * fraction)
+    if model == 'espalhadas':
+        for _ in range(changed // 64):
+            at = rng.randrange(len(new) - 64)
+            new[at:at + 64] = rng.randbytes(64)
+    else:
+        regions = 4
+        for n in range(regions):
+            at = n * len(new) // regions
+            new[at:at + changed // regions] = rng.randbytes(changed // regions)
+    return bytes(new)
+
+
+def transfer(args, old: bytes, new: bytes, delta: bool) -> tuple:
+    link = EmulatedLink(args.delay, rate=args.rate * 1e6)
+    with tempfile.TemporaryDirectory() as tmp, common.quiet():
+        source, dest = os.path.join(tmp, 'novo'), os.path.join(tmp, 'destino')
+        with open(source, 'wb') as f:
+            f.write(new)
+        with open(dest, 'wb') as f:
+            f.write(old)
+        srv, cli = common.connect_pair(link=link)
+        cli.sock = sent = CountingSocket(cli.sock)
+        srv.sock = returned = CountingSocket(srv.sock)
+        out = {}
+        if delta:
+            receiver = threading.Thread(target=lambda: out.update(ok=srv.recv_file_delta(dest, timeout=60)))
+        else:
+            receiver = threading.Thread(target=common.receive, args=(srv, len(new), out, 60))
+        receiver.start()
+        start = time.perf_counter()
+        ok = cli.send_file_delta(source, timeout=60) if delta else cli.send_file(source)
+        receiver.join()
+        elapsed = time.perf_counter() - start
+        with open(dest, 'rb') as f:
+            intact = f.read() == new if delta else out['data'] == new
+        common.shutdown(cli, srv)
+    if not (ok and intact):
+        raise RuntimeError('transferência corrompida')
+    return sent.bytes / 1e6, returned.bytes / 1e6, elapsed
+
+
+def main():
+    p = argparse.ArgumentParser(description='Sincronização por delta x envio completo')
+    p.add_argument('--size', type=float, default=8, help='Tamanho do arquivo (MiB)')
+    p.add_argument('--rate', type=float, default=5, help='Taxa do enlace emulado (MB/s)')
+    p.add_argument('--delay', type=float, default=0.01, help='Atraso emulado em cada sentido (s)')
+    p.add_argument('--fractions', default='0.01,0.1,0.5', help='Frações modificadas, separadas por vírgula')
+    args = p.parse_args()
+
+    rng = random.Random(1)
+    old = rng.randbytes(int(args.size * (1 << 20)))
+    print(f"arquivo de {args.size:g} MiB, enlace {args.rate:g} MB/s, atraso {args.delay * 1000:g} ms; "
+          f"MB enviados / MB de volta / segundos")
+    for model in ('espalhadas', 'regiões'):
+        for fraction in map(float, args.fractions.split(',')):
+            new = edit(old, model, fraction, rng)
+            full = transfer(args, old, new, delta=False)
+            delta = transfer(args, old, new, delta=True)
+            print(f"{model:10s} {fraction:4.0%}  completo {full[0]:6.2f} / {full[1]:5.3f} / {full[2]:5.2f}s   "
+                  f"delta {delta[0]:6.2f} / {delta[1]:5.3f} / {delta[2]:5.2f}s", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import statistics
+import threading
+import time
+
+import common
+import session_ticket
+from tru_protocol import TRUProtocol
+from utils import EmulatedLink
+
+# Conexões por segundo e tempo até o primeiro byte (TTFB) em loopback com
+# atraso emulado: handshake completo (DH), retomada por ticket e retomada
+# com dados 0-RTT no SYN. Conexões em série, cada uma com servidor novo
+MESSAGE = b'hello' * 20
+MODES = ('completo', 'retomada', '0-rtt')
+
+
+def connection(mode: str, link: EmulatedLink, port: int) -> dict:
+    # Mesma porta em todas: os tickets ficam guardados por host:porta
+    tickets = mode != 'completo'
+    srv = TRUProtocol(port=port, is_server=True, use_path_cache=False, session_tickets=tickets)
+    cli = TRUProtocol(is_server=False, use_path_cache=False, session_tickets=tickets)
+    link.attach(srv)
+    link.attach(cli)
+    first = {}
+
+    def serve():
+        # Sonda app_queue: com 0-RTT o byte chega antes de a conexão estar
+        # estabelecida, quando readinto ainda daria fim de fluxo
+        srv.start()
+        deadline = time.perf_counter() + 10
+        while not srv.app_queue and time.perf_counter() < deadline:
+            time.sleep(0.0002)
+        if srv.app_queue:
+            first['at'] = time.perf_counter()
+
+    reader = threading.Thread(target=serve, daemon=True)
+    reader.start()
+    start = time.perf_counter()
+    if mode == '0-rtt':
+        ok = cli.connect('127.0.0.1', port, early_data=MESSAGE)
+        ready = time.perf_counter()
+    else:
+        ok = cli.connect('127.0.0.1', port) and cli.do_key_exchange_as_client()
+        ready = time.perf_counter()
+        cli.send_data(MESSAGE)
+    reader.join(10)
+    common.shutdown(cli, srv)
+    if not ok or 'at' not in first:
+        raise RuntimeError(f'conexão {mode} falhou')
+    return {'setup': ready - start, 'ttfb': first['at'] - start,
+            'busy': max(ready, first['at']) - start, 'early': cli.early_data_accepted}
+
+
+def main():
+    p = argparse.ArgumentParser(description='Conexões/s e TTFB do handshake TRUDP')
+    p.add_argument('--connections', type=int, default=30, help='Conexões medidas por modo')
+    p.add_argument('--delay', type=float, default=0.010, help='Atraso emulado em cada sentido (s)')
+    args = p.parse_args()
+
+    link = EmulatedLink(args.delay)
+    port = common.free_port()
+    print(f"RTT emulado {2 * args.delay * 1000:.0f} ms, {args.connections} conexões por modo (medianas)")
+    for mode in MODES:
+        results = []
+        with common.quiet():
+            if mode != 'completo':
+                connection(mode, link, port)  # primeira conexão: obtém o ticket
+            redeemed = len(session_ticket.get_ticket_keeper().used)
+            cpu = time.process_time()
+            for _ in range(args.connections):
+                results.append(connection(mode, link, port))
+            cpu = (time.process_time() - cpu) / args.connections * 1000
+        setup = statistics.median(r['setup'] for r in results) * 1000
+        ttfb = statistics.median(r['ttfb'] for r in results) * 1000
+        busy = statistics.median(r['busy'] for r in results)
+        # Tickets resgatados no servidor (cache anti-replay) e 0-RTT aceitos
+        resumed = len(session_ticket.get_ticket_keeper().used) - redeemed
+        early = sum(r['early'] for r in results)
+        print(f"{mode:9s} handshake {setup:6.1f} ms  TTFB {ttfb:6.1f} ms  {1 / busy:6.1f} conexões/s  "
+              f"CPU {cpu:5.1f} ms/conexão  "
+              f"retomadas {resumed}, 0-RTT {early}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import struct
+import threading
+import time
+
+import common
+import utils
+from utils import EmulatedLink
+
+# Bloqueio de cabeça de fila: produtores independentes enviam mensagens
+# pequenas com o instante de envio; num fluxo único, um segmento perdido
+# segura as mensagens de todos até a retransmissão, com streams só as do
+# próprio stream. Mede a latência de entrega de cada mensagem
+MESSAGE = 1000
+STAMP = struct.Struct('!Bd')  # produtor + instante de envio
+
+
+def _consume(chunks, latencies, lock):
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        now = time.time()
+        while len(buf) >= MESSAGE:
+            _, sent = STAMP.unpack_from(buf)
+            with lock:
+                latencies.append(now - sent)
+            del buf[:MESSAGE]
+
+
+def run(mode: str, args) -> list:
+    link = EmulatedLink(args.delay)
+    latencies, lock = [], threading.Lock()
+    with common.quiet():
+        srv, cli = common.connect_pair(link=link, nodelay=True)
+        utils.loss_probability = args.loss  # depois do handshake
+        if mode == 'streams':
+            def serve():
+                consumers = []
+                for _ in range(args.producers):
+                    stream = srv.accept_stream(timeout=10)
+                    consumer = threading.Thread(target=_consume, args=(iter(stream), latencies, lock))
+                    consumer.start()
+                    consumers.append(consumer)
+                for consumer in consumers:
+                    consumer.join()
+        else:
+            def serve():
+                _consume(srv.recv_stream(), latencies, lock)
+        server = threading.Thread(target=serve, daemon=True)
+        server.start()
+
+        send_lock = threading.Lock()
+
+        def produce(index: int):
+            stream = cli.open_stream() if mode == 'streams' else None
+            for _ in range(args.messages):
+                message = STAMP.pack(index, time.time()).ljust(MESSAGE, b'.')
+                if stream:
+                    stream.send(message, wait=False)
+                else:
+                    with send_lock:
+                        cli.sendall(message)
+                time.sleep(args.interval)
+            if stream:
+                stream.close()
+
+        producers = [threading.Thread(target=produce, args=(i,)) for i in range(args.producers)]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        if mode != 'streams':
+            cli.flush(60)
+        cli.close()
+        server.join(60)
+        utils.loss_probability = 0.0
+        common.shutdown(cli, srv)
+    return latencies
+
+
+def main():
+    p = argparse.ArgumentParser(description='Bloqueio de cabeça de fila: fluxo único x streams')
+    p.add_argument('--producers', type=int, default=4, help='Produtores independentes')
+    p.add_argument('--messages', type=int, default=300, help='Mensagens por produtor')
+    p.add_argument('--interval', type=float, default=0.005, help='Intervalo entre mensagens de um produtor (s)')
+    p.add_argument('--delay', type=float, default=0.005, help='Atraso emulado em cada sentido (s)')
+    p.add_argument('--loss', default='0,0.02,0.05', help='Probabilidades de perda, separadas por vírgula')
+    args = p.parse_args()
+
+    expected = args.producers * args.messages
+    print(f"{args.producers} produtores x {args.messages} mensagens de {MESSAGE} B, "
+          f"RTT emulado {2 * args.delay * 1000:.0f} ms; latência de entrega em ms")
+    for loss in map(float, args.loss.split(',')):
+        args.loss = loss
+        for mode in ('fluxo único', 'streams'):
+            latencies = run(mode, args)
+            cells = '  '.join(f"p{p:g} {common.percentile(latencies, p) * 1000:6.1f}" for p in (50, 90, 99))
+            worst = max(latencies, default=0.0) * 1000
+            print(f"perda {loss:4.0%} {mode:11s} {cells}  máx {worst:6.1f}  "
+                  f"entregues {len(latencies)}/{expected}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import math
+import os
+import random
+import threading
+import time
+
+import common
+import utils
+from histogram import LatencyHistogram, merge_histograms
+
+# Histograma de latência: custo de record() e percentiles(), erro contra as
+# estatísticas de ordem exatas e merge de metades; depois uma transferência
+# com perda, comparando os percentis com o mín/máx das últimas 10 amostras
+
+
+def synthetic(samples: int):
+    rng = random.Random(1)
+    values = [rng.lognormvariate(math.log(0.005), 1.5) for _ in range(samples)]
+    histogram = LatencyHistogram()
+    start = time.perf_counter()
+    for value in values:
+        histogram.record(value)
+    record_us = (time.perf_counter() - start) / samples * 1e6
+    start = time.perf_counter()
+    result = histogram.percentiles()
+    percentiles_us = (time.perf_counter() - start) * 1e6
+    print(f"{samples} amostras log-normais: record {record_us:.2f} µs, percentiles() {percentiles_us:.0f} µs")
+
+    ordered = sorted(values)
+    for name, value in result.items():
+        point = float(name[1:])
+        exact = ordered[max(1, math.ceil(point / 100 * samples)) - 1]
+        print(f"  {name:>6}: {value * 1000:9.3f} ms  exato {exact * 1000:9.3f} ms  "
+              f"erro {abs(value - exact) / exact:6.2%}")
+
+    halves = [LatencyHistogram(), LatencyHistogram()]
+    for index, value in enumerate(values):
+        halves[index % 2].record(value)
+    same = merge_histograms(halves).percentiles() == result
+    print(f"  merge de duas metades igual ao histograma inteiro: {'sim' if same else 'NÃO'}")
+
+
+def transfer(size: int, loss: float, rtt: float):
+    last = []
+    with common.quiet():
+        srv, cli = common.connect_pair(link=utils.EmulatedLink(rtt / 2) if rtt else None)
+        utils.loss_probability = loss
+        # Guarda as amostras para comparar com o que get_rtt_stats mostrava antes
+        update_rtt = cli._update_rtt
+
+        def keep(sample):
+            last.append(sample)
+            return update_rtt(sample)
+
+        cli._update_rtt = keep
+        payload = os.urandom(size)
+        out = {}
+        reader = threading.Thread(target=common.receive, args=(srv, size, out, 60))
+        reader.start()
+        cli.send_data(payload)
+        reader.join()
+        utils.loss_probability = 0.0
+        stats = cli.get_rtt_stats()
+        common.shutdown(cli, srv)
+    if out['data'] != payload:
+        raise RuntimeError('transferência corrompida')
+
+    tail = last[-10:]
+    print(f"{size >> 20} MiB, perda {loss:.0%}, RTT {rtt * 1000:g} ms: {stats['samples']} amostras de RTT")
+    print(f"  últimas 10: mín {min(tail) * 1000:.1f} ms, máx {max(tail) * 1000:.1f} ms")
+    print(f"  todas:      mín {stats['min'] * 1000:.1f} ms, máx {stats['max'] * 1000:.1f} ms, "
+          + ', '.join(f"{key} {stats[key] * 1000:.1f} ms" for key in ('p50', 'p90', 'p99', 'p99.9')))
+    delivery = stats['delivery']
+    print(f"  entrega ({delivery['count']} segmentos): p50 {delivery['p50'] * 1000:.1f} ms, "
+          f"p99 {delivery['p99'] * 1000:.1f} ms, p99.9 {delivery['p99.9'] * 1000:.1f} ms")
+
+
+def main():
+    p = argparse.ArgumentParser(description='Histograma de latência: custo, erro e percentis numa transferência')
+    p.add_argument('--samples', type=int, default=200000, help='Amostras sintéticas')
+    p.add_argument('--size', type=float, default=4, help='MiB transferidos')
+    p.add_argument('--loss', type=float, default=0.01, help='Probabilidade de perda')
+    p.add_argument('--rtt', type=float, default=0.0, help='RTT emulado em segundos')
+    args = p.parse_args()
+
+    synthetic(args.samples)
+    transfer(int(args.size * (1 << 20)), args.loss, args.rtt)
+
+
+if __name__ == '__main__':
+    main()
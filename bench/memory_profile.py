@@ -0,0 +1,81 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import common
+
+# Memória do remetente ao enviar um arquivo: send_file (mmap, páginas
+# confirmadas devolvidas ao kernel) x read() do arquivo inteiro + send_data.
+# Cada modo roda num processo próprio; pico = ru_maxrss do processo, que
+# inclui o destinatário (lê em blocos de 1 MiB e descarta)
+
+
+def _rss_kib() -> int:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def child(mode: str, path: str, mss: int):
+    size = os.path.getsize(path)
+    with common.quiet():
+        srv, cli = common.connect_pair(max_segment_size=mss, server_kw={'max_segment_size': mss})
+        cli.set_segment_size(mss)
+        received = [0]
+
+        def drain():
+            buf = memoryview(bytearray(1 << 20))
+            while received[0] < size:
+                n = srv.readinto(buf, 30)
+                if not n:
+                    break
+                received[0] += n
+
+        reader = threading.Thread(target=drain)
+        reader.start()
+        before = _rss_kib()
+        start = time.perf_counter()
+        if mode == 'send_file':
+            ok = cli.send_file(path)
+        else:
+            with open(path, 'rb') as f:
+                ok = cli.send_data(f.read())
+        reader.join()
+        elapsed = time.perf_counter() - start
+        common.shutdown(cli, srv)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(before, peak, f"{elapsed:.2f}", ok and received[0] == size)
+
+
+def main():
+    p = argparse.ArgumentParser(description='RSS do remetente: send_file x read() + send_data')
+    p.add_argument('--size', type=int, default=200, help='Tamanho do arquivo (MiB)')
+    p.add_argument('--mss', type=int, default=64000, help='Tamanho de segmento (bytes)')
+    p.add_argument('--child', nargs=2, metavar=('MODO', 'ARQUIVO'), help=argparse.SUPPRESS)
+    args = p.parse_args()
+    if args.child:
+        child(args.child[0], args.child[1], args.mss)
+        return
+
+    with tempfile.NamedTemporaryFile(prefix='trudp-mem-') as f:
+        for _ in range(args.size):
+            f.write(os.urandom(1 << 20))
+        f.flush()
+        print(f"arquivo de {args.size} MiB, segmentos de {args.mss} B")
+        print(f"{'modo':>16} {'RSS antes MiB':>13} {'pico MiB':>9} {'s':>7}  ok")
+        for mode in ('send_file', 'read+send_data'):
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--mss', str(args.mss),
+                                  '--child', mode, f.name], capture_output=True, text=True, check=True)
+            before, peak, seconds, ok = out.stdout.split()[-4:]
+            print(f"{mode:>16} {int(before) / 1024:13.1f} {int(peak) / 1024:9.1f} {float(seconds):7.2f}  {ok}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import struct
+import threading
+import time
+
+import common
+import utils
+from utils import EmulatedLink
+
+# Quadros periódicos (um a cada --interval) num caminho com perda: fluxo
+# confiável x mensagens parcialmente confiáveis (prazo ou limite de
+# retransmissões). Mede a latência de entrega de cada quadro
+FRAME = 1000
+STAMP = struct.Struct('!d')  # instante de envio
+
+
+def run(mode: str, args) -> list:
+    link = EmulatedLink(args.delay)
+    latencies = []
+    with common.quiet():
+        srv, cli = common.connect_pair(link=link, nodelay=True)
+        utils.loss_probability = args.loss  # depois do handshake
+
+        if mode == 'confiável':
+            def serve():
+                buf = bytearray()
+                for chunk in srv.recv_stream():
+                    buf += chunk
+                    now = time.time()
+                    while len(buf) >= FRAME:
+                        latencies.append(now - STAMP.unpack_from(buf)[0])
+                        del buf[:FRAME]
+        else:
+            def serve():
+                while len(latencies) < args.frames:
+                    message = srv.recv_message(timeout=2)
+                    if message is None:
+                        break
+                    latencies.append(time.time() - STAMP.unpack_from(message)[0])
+        server = threading.Thread(target=serve, daemon=True)
+        server.start()
+
+        for _ in range(args.frames):
+            frame = STAMP.pack(time.time()).ljust(FRAME, b'.')
+            if mode == 'confiável':
+                cli.sendall(frame)
+            elif mode == 'prazo':
+                cli.send_message(frame, deadline=args.deadline)
+            else:
+                cli.send_message(frame, max_retransmissions=1)
+            time.sleep(args.interval)
+        if mode == 'confiável':
+            cli.flush(60)
+            cli.close()
+        server.join(60)
+        utils.loss_probability = 0.0
+        common.shutdown(cli, srv)
+    return latencies
+
+
+def main():
+    p = argparse.ArgumentParser(description='Latência de quadros: fluxo confiável x mensagens com prazo')
+    p.add_argument('--frames', type=int, default=500, help='Quadros de 1000 B por rodada')
+    p.add_argument('--interval', type=float, default=0.01, help='Intervalo entre quadros (s)')
+    p.add_argument('--delay', type=float, default=0.01, help='Atraso emulado em cada sentido (s)')
+    p.add_argument('--deadline', type=float, default=0.1, help='Prazo das mensagens no modo prazo (s)')
+    p.add_argument('--loss', default='0,0.02,0.05', help='Probabilidades de perda, separadas por vírgula')
+    args = p.parse_args()
+
+    print(f"{args.frames} quadros de {FRAME} B a cada {args.interval * 1000:.0f} ms, "
+          f"RTT emulado {2 * args.delay * 1000:.0f} ms; prazo {args.deadline * 1000:.0f} ms; latência em ms")
+    for loss in map(float, args.loss.split(',')):
+        args.loss = loss
+        for mode in ('confiável', 'prazo', 'max_retx=1'):
+            latencies = run(mode, args)
+            cells = '  '.join(f"p{p:g} {common.percentile(latencies, p) * 1000:6.1f}" for p in (50, 90, 99))
+            late = sum(1 for latency in latencies if latency > args.deadline)
+            print(f"perda {loss:4.0%} {mode:10s} entregues {len(latencies):4d}/{args.frames}  {cells}  "
+                  f"> prazo {late}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
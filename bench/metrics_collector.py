@@ -0,0 +1,77 @@
+import argparse
+import threading
+import time
+
+import common  # noqa: F401  (coloca a raiz do repositório no sys.path)
+from metrics_collector import ColumnarMetricsCollector, MetricsCollector
+
+# Custo do coletor de métricas por pacote (registro do envio + do ACK), com
+# os ACKs atrasados de lag pacotes em relação ao envio (janela em voo), numa
+# thread só e com envio, ACKs e amostragem em threads concorrentes
+COLLECTORS = (('MetricsCollector', MetricsCollector), ('Colunar', ColumnarMetricsCollector))
+
+
+def single_thread(cls, packets: int, lag: int) -> float:
+    collector = cls()
+    start = time.perf_counter()
+    for seq in range(packets):
+        collector.record_packet_sent(seq, 1400, False, 10.0, 64.0, 'slow_start')
+        if seq >= lag:
+            collector.record_ack_received(seq - lag, 0.02)
+    return (time.perf_counter() - start) / packets * 1e6
+
+
+def concurrent(cls, packets: int, lag: int) -> float:
+    # ACKs numa thread própria, sempre lag pacotes atrás do envio
+    collector = cls()
+    sent = [0]
+    done = threading.Event()
+
+    def sender():
+        for seq in range(packets):
+            collector.record_packet_sent(seq, 1400, False, 10.0, 64.0, 'slow_start')
+            sent[0] = seq + 1
+
+    def acker():
+        for seq in range(packets):
+            while sent[0] - seq <= lag and sent[0] < packets:
+                time.sleep(0)
+            collector.record_ack_received(seq, 0.02)
+        done.set()
+
+    def sampler():
+        while not done.is_set():
+            collector.sample_throughput(lag)
+            collector.get_summary_stats()
+            done.wait(0.1)
+
+    threads = [threading.Thread(target=fn) for fn in (sender, acker, sampler)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main():
+    p = argparse.ArgumentParser(description='Custo por pacote dos coletores de métricas')
+    p.add_argument('--cases', default='10000:32,10000:256,10000:1024,100000:256,100000:1024',
+                   help='Pares pacotes:atraso_dos_ACKs, separados por vírgula')
+    p.add_argument('--concurrent', default='20000:1024', help='pacotes:atraso no teste com threads')
+    args = p.parse_args()
+
+    print(f"{'pacotes':>8} {'atraso':>7}  " + '  '.join(f"{name:>16}" for name, _ in COLLECTORS) + "  (µs/pacote)")
+    for case in args.cases.split(','):
+        packets, lag = map(int, case.split(':'))
+        cells = [single_thread(cls, packets, lag) for _, cls in COLLECTORS]
+        print(f"{packets:8d} {lag:7d}  " + '  '.join(f"{cell:16.1f}" for cell in cells), flush=True)
+
+    packets, lag = map(int, args.concurrent.split(':'))
+    for name, cls in COLLECTORS:
+        print(f"threads concorrentes, {packets} pacotes, atraso {lag}: {name} {concurrent(cls, packets, lag):7.2f}s",
+              flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import common  # noqa: F401  (coloca a raiz do repositório no sys.path)
+from metrics_collector import ColumnarMetricsCollector, MetricsCollector
+from metrics_log import MetricsLog, StreamingMetricsCollector
+
+# Memória dos coletores numa transferência longa sintética (envio + ACK por
+# pacote, ACKs atrasados de LAG pacotes): pico medido com tracemalloc, tempo
+# por pacote, tempo de save_to_file e, no modo em fluxo, de ler o log de volta
+LAG = 256
+
+
+def record(collector, packets: int, checkpoints: int = 5) -> list:
+    # Pico de memória a cada packets/checkpoints pacotes (MiB)
+    peaks = []
+    step = max(1, packets // checkpoints)
+    for seq in range(packets):
+        collector.record_packet_sent(seq, 1400, False, 10.0, 64.0, 'congestion_avoidance')
+        if seq >= LAG:
+            collector.record_ack_received(seq - LAG, 0.02)
+        if seq % step == step - 1:
+            peaks.append(tracemalloc.get_traced_memory()[1] / (1 << 20))
+    return peaks
+
+
+def run(name: str, packets: int, tmp: str) -> str:
+    path = os.path.join(tmp, f"{name}.bin")
+    tracemalloc.start()
+    start = time.perf_counter()
+    if name == 'MetricsCollector':
+        collector = MetricsCollector()
+    elif name == 'Colunar':
+        collector = ColumnarMetricsCollector()
+    else:
+        collector = StreamingMetricsCollector(path)
+    peaks = record(collector, packets)
+    per_packet = (time.perf_counter() - start) / packets * 1e6
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    if name == 'Em fluxo':
+        collector.close()
+    collector.save_to_file(os.path.join(tmp, f"{name}.json"))
+    saved = time.perf_counter() - start
+    line = (f"{name:16s} {packets:8d} pacotes  pico {' / '.join(f'{p:.0f}' for p in peaks)} MiB  "
+            f"{per_packet:5.1f} µs/pacote  save {saved:6.2f}s")
+    if name == 'Em fluxo':
+        start = time.perf_counter()
+        with MetricsLog(path) as log:
+            records = len(log)
+            log.summary()
+        line += f"  leitura+resumo de {records} registros {time.perf_counter() - start:5.2f}s"
+    return line
+
+
+def main():
+    p = argparse.ArgumentParser(description='Memória dos coletores de métricas: em memória x em fluxo')
+    p.add_argument('--packets', default='200000,500000,1000000',
+                   help='Pacotes para MetricsCollector, Colunar e Em fluxo, separados por vírgula')
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, common.quiet():
+        lines = [run(name, int(packets), tmp)
+                 for name, packets in zip(('MetricsCollector', 'Colunar', 'Em fluxo'), args.packets.split(','))]
+    print('\n'.join(lines))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+import common
+from multicast import MulticastReceiver, MulticastSender
+from tru_protocol import TRUProtocol
+
+# Um arquivo para N receptores: uma sessão multicast (receptores em processos
+# próprios, perda aleatória na recepção) x N send_file unicast em sequência.
+# Tempo, CPU do remetente (este processo), bytes enviados e reparos
+GROUP = '239.255.42.98'
+
+
+class CountingSocket:
+    def __init__(self, sock):
+        self._sock = sock
+        self.bytes = 0
+
+    def sendto(self, data, addr):
+        self.bytes += len(data)
+        return self._sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def mcast_receiver(port: int, path: str, loss: float, seed: int, results):
+    rng = random.Random(seed)
+    with common.quiet():
+        receiver = MulticastReceiver(GROUP, port, interface='127.0.0.1',
+                                     loss_callback=lambda seq: rng.random() < loss)
+        try:
+            ok = receiver.receive(path, timeout=30)
+        finally:
+            receiver.close()
+    results.put(ok)
+
+
+def unicast_receiver(port: int, size: int, digest: bytes, results):
+    with common.quiet():
+        srv = TRUProtocol(port=port, is_server=True, use_path_cache=False)
+        ok = srv.accept() and srv.do_key_exchange_as_server()
+        out = {}
+        if ok:
+            common.receive(srv, size, out)
+        common.shutdown(srv)
+    results.put(ok and hashlib.sha256(out['data']).digest() == digest)
+
+
+def multicast(path: str, receivers: int, args) -> dict:
+    port = common.free_port()
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    with tempfile.TemporaryDirectory() as tmp:
+        procs = [ctx.Process(target=mcast_receiver, args=(port, os.path.join(tmp, str(i)), args.loss, i, results))
+                 for i in range(receivers)]
+        for proc in procs:
+            proc.start()
+        sender = MulticastSender(GROUP, port, interface='127.0.0.1', rate=args.rate * 1e6 / 8)
+        with common.quiet():
+            ok = sender.send_file(path, receivers=receivers, join_timeout=30)
+        sender.close()
+        for proc in procs:
+            proc.join(60)
+        received = [results.get() for _ in procs]
+    if not (ok and all(received)):
+        raise RuntimeError('sessão multicast incompleta')
+    return sender.stats
+
+
+def unicast(path: str, receivers: int) -> tuple:
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).digest()
+    size = os.path.getsize(path)
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    sent = 0
+    cpu = time.process_time()
+    for _ in range(receivers):
+        port = common.free_port()
+        proc = ctx.Process(target=unicast_receiver, args=(port, size, digest, results))
+        proc.start()
+        time.sleep(0.5)  # receptor escutando
+        with common.quiet():
+            cli = TRUProtocol(is_server=False, use_path_cache=False)
+            cli.sock = counter = CountingSocket(cli.sock)
+            cli.start()
+            if not (cli.connect('127.0.0.1', port) and cli.do_key_exchange_as_client() and cli.send_file(path)):
+                raise RuntimeError('send_file falhou')
+            sent += counter.bytes
+            common.shutdown(cli)
+        proc.join(60)
+        if not results.get():
+            raise RuntimeError('cópia unicast corrompida')
+    return time.process_time() - cpu, sent
+
+
+def main():
+    p = argparse.ArgumentParser(description='Multicast x unicast sequencial para N receptores')
+    p.add_argument('--size', type=float, default=4, help='Tamanho do arquivo (MiB)')
+    p.add_argument('--receivers', default='1,2,4,8,16', help='Números de receptores, separados por vírgula')
+    p.add_argument('--unicast', default='1,2,4', help='Números de receptores no modo unicast')
+    p.add_argument('--loss', type=float, default=0.01, help='Perda aleatória em cada receptor multicast')
+    p.add_argument('--rate', type=float, default=160, help='Taxa fixa do remetente multicast (Mbps)')
+    args = p.parse_args()
+
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(os.urandom(int(args.size * (1 << 20))))
+        f.flush()
+        print(f"{args.size:g} MiB, perda {args.loss:.0%} por receptor, {args.rate:g} Mbps")
+        for receivers in map(int, args.receivers.split(',')):
+            cpu = time.process_time()
+            stats = multicast(f.name, receivers, args)
+            cpu = time.process_time() - cpu
+            print(f"multicast {receivers:2d} receptores: {stats['elapsed']:5.2f}s  CPU {cpu:5.2f}s  "
+                  f"{stats['bytes'] / 1e6:5.2f} MB  reparos {stats['repair_packets']} / paridades "
+                  f"{stats['parity_packets']}  {stats['rounds']} rodadas", flush=True)
+        for receivers in map(int, args.unicast.split(',')):
+            cpu, sent = unicast(f.name, receivers)
+            print(f"unicast   {receivers:2d} receptores: CPU {cpu:5.2f}s  {sent / 1e6:5.2f} MB", flush=True)
+
+
+if __name__ == '__main__':
+    main()
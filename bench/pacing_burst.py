@@ -0,0 +1,62 @@
+import argparse
+import os
+import threading
+import time
+
+import common
+from utils import EmulatedLink
+
+# Gargalo raso: enlace de --rate pacotes/s com fila de --queue pacotes. Sem
+# pacing, cada janela sai de uma vez e estoura a fila; com pacing, os
+# envios se espalham pelo RTT. descartes: datagramas perdidos na fila.
+# Com --mss acima de 1400 a rajada permitida acompanha o segmento
+
+
+def run(algorithm: str, pacing: bool, payload: bytes, args) -> dict:
+    bottleneck = EmulatedLink(args.delay, rate=args.rate * args.mss, queue_bytes=args.queue * args.mss)
+    with common.quiet():
+        srv, cli = common.connect_pair(congestion_algorithm=algorithm, enable_pacing=pacing,
+                                       mss=args.mss, server_kw={'congestion_algorithm': algorithm})
+        cli.set_segment_size(args.mss)
+        # Só os dados passam pelo gargalo; os ACKs voltam com o mesmo atraso
+        bottleneck.attach(cli)
+        EmulatedLink(args.delay).attach(srv)
+        out = {}
+        reader = threading.Thread(target=common.receive, args=(srv, len(payload), out, 30))
+        reader.start()
+        start = time.perf_counter()
+        ok = cli.send_data(payload)
+        reader.join()
+        paced = cli.pacer.paced_packets
+        common.shutdown(cli, srv)
+    return {'ok': ok and out['data'] == payload, 'seconds': out['done'] - start,
+            'drops': bottleneck.dropped, 'paced': paced}
+
+
+def main():
+    p = argparse.ArgumentParser(description='Descartes num gargalo raso com e sem pacing')
+    p.add_argument('--segments', type=int, default=400, help='Segmentos por rodada')
+    p.add_argument('--mss', type=int, default=1400, help='Tamanho de segmento (bytes)')
+    p.add_argument('--rate', type=float, default=2000, help='Banda do gargalo (pacotes/s)')
+    p.add_argument('--queue', type=int, default=16, help='Fila do gargalo (pacotes)')
+    p.add_argument('--delay', type=float, default=0.01, help='Atraso emulado em cada sentido (s)')
+    p.add_argument('--runs', type=int, default=3, help='Rodadas por configuração (média)')
+    p.add_argument('--cc', default='reno,cubic', help='Controladores, separados por vírgula')
+    args = p.parse_args()
+
+    payload = os.urandom(args.segments * args.mss)
+    print(f"{args.segments} x {args.mss} B, gargalo {args.rate:.0f} pacotes/s, fila {args.queue} pacotes, "
+          f"RTT emulado {2 * args.delay * 1000:.0f} ms; média de {args.runs} rodadas")
+    print(f"{'cc':>6} {'pacing':>7} {'s':>7} {'descartes':>9} {'espaçados':>9}  ok")
+    for algorithm in args.cc.split(','):
+        for pacing in (False, True):
+            results = [run(algorithm, pacing, payload, args) for _ in range(args.runs)]
+            seconds = sum(r['seconds'] for r in results) / args.runs
+            drops = sum(r['drops'] for r in results) / args.runs
+            paced = sum(r['paced'] for r in results) / args.runs
+            ok = all(r['ok'] for r in results)
+            print(f"{algorithm:>6} {'sim' if pacing else 'não':>7} {seconds:7.2f} {drops:9.0f} {paced:9.0f}  {ok}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import statistics
+import threading
+import time
+
+import common
+import path_cache
+from tru_protocol import TRUProtocol
+from utils import EmulatedLink
+
+# Transferências curtas repetidas para o mesmo servidor: sem o cache cada
+# conexão começa com RTO de 1 s e cwnd 1; com ele, do SRTT e da janela da
+# conexão anterior. Conexões em série, cada uma com servidor novo na mesma
+# porta (o cache é por host:porta)
+
+
+def transfer(use_cache: bool, link: EmulatedLink, port: int, payload: bytes) -> float:
+    srv = TRUProtocol(port=port, is_server=True, use_path_cache=use_cache)
+    cli = TRUProtocol(is_server=False, use_path_cache=use_cache)
+    link.attach(srv)
+    link.attach(cli)
+    out = {}
+
+    def serve():
+        if srv.accept() and srv.do_key_exchange_as_server():
+            common.receive(srv, len(payload), out, 10)
+
+    server = threading.Thread(target=serve, daemon=True)
+    server.start()
+    cli.start()
+    if not (cli.connect('127.0.0.1', port) and cli.do_key_exchange_as_client()):
+        raise RuntimeError('conexão falhou')
+    start = time.perf_counter()
+    ok = cli.send_data(payload)
+    elapsed = time.perf_counter() - start
+    server.join(10)
+    cli.close()  # grava o estado do caminho no cache
+    common.shutdown(cli, srv)
+    if not ok or out.get('data') != payload:
+        raise RuntimeError('transferência incompleta')
+    return elapsed
+
+
+def main():
+    p = argparse.ArgumentParser(description='Transferências repetidas com e sem cache de caminho')
+    p.add_argument('--segments', type=int, default=30, help='Segmentos de 1400 B por transferência')
+    p.add_argument('--repeats', type=int, default=7, help='Transferências medidas por modo (após uma de aquecimento)')
+    p.add_argument('--delay', type=float, default=0.01, help='Atraso emulado em cada sentido (s)')
+    args = p.parse_args()
+
+    payload = os.urandom(args.segments * 1400)
+    link = EmulatedLink(args.delay)
+    port = common.free_port()
+    print(f"{args.segments} x 1400 B, RTT emulado {2 * args.delay * 1000:.0f} ms, "
+          f"{args.repeats} transferências por modo (mediana)")
+    for use_cache in (False, True):
+        path_cache.configure_path_cache()
+        with common.quiet():
+            transfer(use_cache, link, port, payload)  # aquecimento: primeira entrada no cache
+            times = [transfer(use_cache, link, port, payload) for _ in range(args.repeats)]
+        label = 'com cache' if use_cache else 'sem cache'
+        print(f"{label:9s} {statistics.median(times) * 1000:7.1f} ms por transferência", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import os
+import statistics
+import threading
+import time
+
+import common
+import utils
+from utils import EmulatedLink
+
+# ACKs no DATA do sentido inverso (piggyback) ligado x desligado: tráfego
+# simétrico na mesma conexão, envio num sentido só e pedido/resposta.
+# Pacotes DATA e ACK somados nos dois sentidos (receive_stats)
+
+
+def exchange(srv, cli, size: int, both: bool) -> float:
+    senders = (srv, cli) if both else (cli,)
+    payloads = {conn: os.urandom(size) for conn in senders}
+    outs = {conn: {} for conn in senders}
+    peer = {srv: cli, cli: srv}
+    threads = [threading.Thread(target=common.receive, args=(peer[conn], size, outs[conn], 60)) for conn in senders]
+    threads += [threading.Thread(target=conn.send_data, args=(payloads[conn],)) for conn in senders]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if any(outs[conn]['data'] != payloads[conn] for conn in senders):
+        raise RuntimeError('transferência corrompida')
+    return size * len(senders) / (max(out['done'] for out in outs.values()) - start) / 1e6
+
+
+def request_response(srv, cli, rounds: int, size: int) -> float:
+    def serve():
+        buf = bytearray(size)
+        for _ in range(rounds):
+            got = 0
+            while got < size:
+                got += srv.readinto(memoryview(buf)[got:], 10)
+            srv.sendall(buf)
+
+    server = threading.Thread(target=serve)
+    server.start()
+    latencies = []
+    buf = bytearray(size)
+    for _ in range(rounds):
+        start = time.perf_counter()
+        cli.sendall(os.urandom(size))
+        got = 0
+        while got < size:
+            got += cli.readinto(memoryview(buf)[got:], 10)
+        latencies.append(time.perf_counter() - start)
+    server.join()
+    return statistics.median(latencies)
+
+
+def run(args, piggyback: bool, rtt: float, loss: float, workload: str) -> str:
+    link = EmulatedLink(rtt / 2) if rtt else None
+    kw = {'piggyback_acks': piggyback, 'nodelay': True}
+    with common.quiet():
+        srv, cli = common.connect_pair(server_kw=kw, link=link, **kw)
+        utils.loss_probability = loss
+        if workload == 'pedido/resposta':
+            result = f"mediana {request_response(srv, cli, args.requests, 1024) * 1000:5.1f} ms"
+        else:
+            size = int((args.lossy_size if loss else args.size) * (1 << 20))
+            result = f"{exchange(srv, cli, size, workload == 'simétrico'):5.2f} MB/s"
+        utils.loss_probability = 0.0
+        data = srv.receive_stats['received'] + cli.receive_stats['received']
+        acks = srv.receive_stats['acks_sent'] + cli.receive_stats['acks_sent']
+        common.shutdown(cli, srv)
+    return f"{result}  {data:5d} DATA {acks:5d} ACK"
+
+
+def main():
+    p = argparse.ArgumentParser(description='ACKs piggyback: pacotes e vazão')
+    p.add_argument('--size', type=float, default=4, help='MiB em cada sentido')
+    p.add_argument('--lossy-size', type=float, default=2, help='MiB em cada sentido no caso com perda')
+    p.add_argument('--requests', type=int, default=200, help='Pedidos de 1 KiB no teste pedido/resposta')
+    args = p.parse_args()
+
+    cases = [('simétrico', 0.0, 0.0), ('simétrico', 0.02, 0.0), ('simétrico', 0.02, 0.01),
+             ('um sentido', 0.02, 0.0), ('pedido/resposta', 0.02, 0.0)]
+    for workload, rtt, loss in cases:
+        cells = [run(args, piggyback, rtt, loss, workload) for piggyback in (False, True)]
+        print(f"{workload:15s} RTT {rtt * 1000:2g} ms perda {loss:3.0%}   sem: {cells[0]}   com: {cells[1]}",
+              flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import struct
+import threading
+import time
+
+import common
+from packet import PacketType, TRUPacket
+from utils import EmulatedLink
+
+# Muitas mensagens pequenas: send_data por mensagem x send() com Nagle, com
+# nodelay e com cork/sendall/flush. Pacotes DATA no fio, bytes por pacote,
+# mensagens/s e, com --delay, latência de cada mensagem (relógio do receptor)
+STAMP = struct.Struct('!d')  # instante de envio
+
+
+class CountingSocket:
+    def __init__(self, sock):
+        self._sock = sock
+        self.packets = 0
+        self.payload = 0
+
+    def sendto(self, data, addr):
+        if data[8] & ~TRUPacket.AEAD_FLAG == PacketType.DATA:
+            self.packets += 1
+        return self._sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def send_all(cli, mode: str, messages, interval: float):
+    if mode == 'cork':
+        cli.cork()
+    for message in messages:
+        if mode == 'send_data':
+            cli.send_data(message)
+        else:
+            cli.sendall(message)
+        if interval:
+            time.sleep(interval)
+    if mode != 'send_data':
+        cli.flush(60)
+
+
+def run(mode: str, count: int, size: int, delay: float, interval: float) -> dict:
+    link = EmulatedLink(delay) if delay else None
+    latencies = []
+    total = count * size
+    with common.quiet():
+        srv, cli = common.connect_pair(link=link, nodelay=(mode == 'nodelay'))
+        cli.sock = counter = CountingSocket(cli.sock)
+
+        def serve():
+            buf = bytearray(size)
+            got = 0
+            while got < total:
+                n = srv.readinto(memoryview(buf)[got % size:], 30)
+                if not n:
+                    break
+                got += n
+                if got % size == 0:
+                    latencies.append(time.time() - STAMP.unpack_from(buf)[0])
+
+        server = threading.Thread(target=serve, daemon=True)
+        server.start()
+        start = time.perf_counter()
+        send_all(cli, mode, (STAMP.pack(time.time()).ljust(size, b'.') if interval else bytes(size)
+                             for _ in range(count)), interval)
+        server.join(60)
+        elapsed = time.perf_counter() - start
+        common.shutdown(cli, srv)
+    return {'packets': counter.packets, 'per_packet': total / max(counter.packets, 1),
+            'rate': len(latencies) / elapsed, 'latencies': latencies}
+
+
+def main():
+    p = argparse.ArgumentParser(description='Mensagens pequenas: send_data x send() com coalescência')
+    p.add_argument('--messages', type=int, default=5000, help='Mensagens por modo')
+    p.add_argument('--data-messages', type=int, default=100,
+                   help='Mensagens no modo send_data (uma chamada bloqueante por mensagem)')
+    p.add_argument('--size', type=int, default=64, help='Tamanho de cada mensagem (B)')
+    p.add_argument('--delay', type=float, default=0.005, help='Atraso emulado no teste de latência (s)')
+    p.add_argument('--interval', type=float, default=0.001, help='Intervalo entre mensagens no teste de latência (s)')
+    p.add_argument('--latency-messages', type=int, default=1000, help='Mensagens no teste de latência')
+    args = p.parse_args()
+
+    print(f"vazão em loopback, mensagens de {args.size} B")
+    for mode in ('send_data', 'nagle', 'nodelay', 'cork'):
+        count = args.data_messages if mode == 'send_data' else args.messages
+        r = run(mode, count, args.size, 0.0, 0.0)
+        print(f"{mode:9s} {count:5d} msgs: {r['packets']:5d} pacotes, {r['per_packet']:6.0f} B/pacote, "
+              f"{r['rate']:9.0f} msg/s", flush=True)
+
+    print(f"latência: uma mensagem a cada {args.interval * 1000:g} ms, atraso {args.delay * 1000:g} ms por sentido")
+    for mode in ('nagle', 'nodelay'):
+        r = run(mode, args.latency_messages, args.size, args.delay, args.interval)
+        print(f"{mode:9s} {r['packets']:5d} pacotes  p50 {common.percentile(r['latencies'], 50) * 1000:5.1f} ms  "
+              f"p99 {common.percentile(r['latencies'], 99) * 1000:5.1f} ms", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import os
+import tempfile
+import threading
+
+import common
+import striping
+from tru_protocol import TRUProtocol
+from utils import EmulatedLink
+
+# Vazão agregada de send_file_striped com 1, 2, 4... listras num caminho de
+# RTT alto (uma conexão só fica limitada por janela/RTT) e roubo de trabalho
+# com uma listra num caminho mais lento. O atraso fica nos ACKs de cada
+# listra do receptor (porta base + índice); listras em threads
+
+
+def linked_protocol(port: int, rtt: float, slow: int, slow_rtt: float):
+    class LinkedProtocol(TRUProtocol):
+        def __init__(self, *args, **kw):
+            super().__init__(*args, **kw)
+            if self.is_server:
+                index = self.port - port
+                EmulatedLink(slow_rtt if index == slow else rtt).attach(self)
+    return LinkedProtocol
+
+
+def run(args, size: float, stripes: int, slow: int = -1, steal: bool = True) -> dict:
+    port = common.free_port()
+    striping.TRUProtocol = linked_protocol(port, args.rtt, slow, args.slow_rtt)
+    min_steal = striping.STRIPE_MIN_STEAL
+    if not steal:
+        striping.STRIPE_MIN_STEAL = 1 << 62
+    with tempfile.TemporaryDirectory() as tmp, common.quiet():
+        source, dest = os.path.join(tmp, 'origem'), os.path.join(tmp, 'destino')
+        payload = os.urandom(int(size * (1 << 20)))
+        with open(source, 'wb') as f:
+            f.write(payload)
+        received = {}
+        receiver = threading.Thread(target=lambda: received.update(striping.recv_file_striped(
+            dest, '127.0.0.1', port, stripes, timeout=60, use_path_cache=False)))
+        receiver.start()
+        stats = striping.send_file_striped('127.0.0.1', port, source, stripes, use_path_cache=False)
+        receiver.join()
+        with open(dest, 'rb') as f:
+            intact = f.read() == payload
+    striping.TRUProtocol = TRUProtocol
+    striping.STRIPE_MIN_STEAL = min_steal
+    if not (stats['ok'] and received.get('ok') and intact):
+        raise RuntimeError('transferência listrada falhou')
+    return stats
+
+
+def main():
+    p = argparse.ArgumentParser(description='Transferência listrada: vazão agregada e roubo de trabalho')
+    p.add_argument('--size', type=float, default=8, help='Tamanho do arquivo (MiB)')
+    p.add_argument('--stripes', default='1,2,4,8', help='Números de listras, separados por vírgula')
+    p.add_argument('--rtt', type=float, default=0.4, help='RTT emulado (s)')
+    p.add_argument('--steal-size', type=float, default=16, help='Tamanho do arquivo no teste de roubo (MiB)')
+    p.add_argument('--steal-rtt', type=float, default=0.1, help='RTT das listras rápidas no teste de roubo (s)')
+    p.add_argument('--slow-rtt', type=float, default=0.25, help='RTT da listra lenta no teste de roubo (s)')
+    args = p.parse_args()
+
+    print(f"{args.size:g} MiB, RTT {args.rtt * 1000:g} ms")
+    for stripes in map(int, args.stripes.split(',')):
+        stats = run(args, args.size, stripes)
+        print(f"{stripes:2d} listras: {stats['elapsed']:6.2f}s  {stats['throughput'] / 1e6:5.2f} MB/s", flush=True)
+
+    args.rtt = args.steal_rtt
+    print(f"{args.steal_size:g} MiB, 4 listras, RTT {args.rtt * 1000:g} ms, listra 0 a {args.slow_rtt * 1000:g} ms")
+    for steal in (False, True):
+        stats = run(args, args.steal_size, 4, slow=0, steal=steal)
+        label = 'com roubo' if steal else 'faixas fixas'
+        print(f"{label:12s}: {stats['elapsed']:6.2f}s  {stats['throughput'] / 1e6:5.2f} MB/s  "
+              f"listra lenta {stats['stripe_bytes'][0] / 1e6:.1f} MB, {stats['steals']} roubos", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import os
+import threading
+import time
+
+import common
+from utils import EmulatedLink
+
+# Vazão em loopback por tamanho de segmento (--mss): segmentos maiores
+# dividem o custo por pacote (cabeçalho, cifra, ACK, chamadas de sistema).
+# descartes: datagramas perdidos no buffer de recepção do kernel (Linux),
+# que crescem com o segmento
+
+
+def run(mss: int, payload: bytes, args) -> dict:
+    link = EmulatedLink(args.delay) if args.delay else None
+    with common.quiet():
+        srv, cli = common.connect_pair(link=link, loss=args.loss, mss=mss, enable_aead=not args.no_aead)
+        cli.set_segment_size(mss)
+        out = {}
+        reader = threading.Thread(target=common.receive, args=(srv, len(payload), out))
+        reader.start()
+        drops = common.udp_rcvbuf_errors()
+        start, cpu = time.perf_counter(), time.process_time()
+        ok = cli.send_data(payload)
+        reader.join()
+        cpu = time.process_time() - cpu
+        summary = cli.metrics_collector.get_summary_stats()
+        if drops is not None:
+            drops = common.udp_rcvbuf_errors() - drops
+        common.shutdown(cli, srv)
+    elapsed = out['done'] - start
+    return {'mss': cli.mss, 'ok': ok and out['data'] == payload, 'seconds': elapsed,
+            'mbps': len(payload) / elapsed / 1e6, 'cpu': cpu,
+            'packets': summary['total_packets_sent'], 'drops': drops}
+
+
+def main():
+    p = argparse.ArgumentParser(description='Vazão TRUDP em loopback por tamanho de segmento')
+    p.add_argument('--size', type=float, default=16, help='MiB transferidos por rodada')
+    p.add_argument('--mss', default='1400,4000,8000,16000,32000,65000', help='Tamanhos de segmento, separados por vírgula')
+    p.add_argument('--delay', type=float, default=0.0, help='Atraso emulado em cada sentido (s)')
+    p.add_argument('--loss', type=float, default=0.0, help='Probabilidade de perda na recepção')
+    p.add_argument('--no-aead', action='store_true', help='Modo antigo (IV fixo + checksum)')
+    args = p.parse_args()
+
+    payload = os.urandom(int(args.size * (1 << 20)))
+    print(f"{'mss':>6} {'s':>7} {'MB/s':>7} {'cpu s':>7} {'pacotes':>8} {'descartes':>9}  ok")
+    for mss in map(int, args.mss.split(',')):
+        r = run(mss, payload, args)
+        print(f"{r['mss']:6d} {r['seconds']:7.2f} {r['mbps']:7.2f} {r['cpu']:7.2f} {r['packets']:8d} {'-' if r['drops'] is None else r['drops']:>9}  {r['ok']}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
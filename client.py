@@ -1,9 +1,16 @@
 import argparse
+import os
 import sys
 import threading
 import time
 from tru_protocol import TRUProtocol, MSS
 from utils import set_global_loss_probability
+from path_cache import configure_path_cache
+from session_ticket import configure_ticket_store
+from striping import send_file_striped
+from batch import collect_files
+from multicast import MulticastSender, MCAST_DEFAULT_RATE, MCAST_FEC_GROUP, parse_group
+from metrics_log import StreamingMetricsCollector, log_files
 
 def monitor_rtt(conn, interval=5.0):
     import time
@@ -18,6 +25,11 @@ def monitor_rtt(conn, interval=5.0):
                 print(f"\n[RTT STATS {time.strftime('%H:%M:%S')}]")
                 print(f"  Média: {stats['avg']:.6f}s")
                 print(f"  Min/Max: {stats['min']:.6f}s / {stats['max']:.6f}s")
+                print(f"  p50/p90/p99/p99.9: {stats['p50']:.6f}s / {stats['p90']:.6f}s / "
+                      f"{stats['p99']:.6f}s / {stats['p99.9']:.6f}s")
+                delivery = stats['delivery']
+                print(f"  Entrega de segmentos p50/p99: {delivery['p50']:.6f}s / {delivery['p99']:.6f}s "
+                      f"({delivery['count']} segmentos)")
                 print(f"  Desvio: {stats['dev']:.6f}s")
                 print(f"  Timeout: {stats['timeout']:.3f}s")
                 print(f"  Amostras: {stats['samples']}")
@@ -26,6 +38,7 @@ def monitor_rtt(conn, interval=5.0):
                 if hasattr(conn, 'get_congestion_stats'):
                     cstats = conn.get_congestion_stats()
                     print(f"\n[CONGESTION STATS]")
+                    print(f"  Algoritmo: {cstats.get('algorithm', 'N/A')}")
                     print(f"  Estado: {cstats.get('state', 'N/A')}")
                     print(f"  cwnd: {cstats.get('cwnd', 0):.2f}")
                     print(f"  ssthresh: {cstats.get('ssthresh', 0):.2f}")
@@ -131,29 +144,111 @@ def main():
                    help='Intervalo em segundos para monitoramento de RTT. Default: 5.0')
     p.add_argument('--no-congestion', action='store_true',
                help='Desativar controle de congestionamento')
+    p.add_argument('--cc', default='reno', choices=['reno', 'cubic', 'bbr', 'ledbat'],
+                   help='Algoritmo de controle de congestionamento. Default: reno')
+    p.add_argument('--no-pacing', action='store_true',
+                   help='Desativar o pacing (envia rajadas conforme a janela abre)')
+    p.add_argument('--pacing-burst', type=int, default=4, metavar='N',
+                   help='Rajada máxima do pacing, em segmentos. Default: 4')
+    p.add_argument('--mss', type=int, default=MSS, metavar='BYTES',
+                   help=f'Tamanho inicial de segmento (até ~64KB em loopback). Default: {MSS}')
+    p.add_argument('--pmtud', action='store_true',
+                   help='Descobrir o MTU do caminho e aumentar o segmento automaticamente')
+    p.add_argument('--path-cache', metavar='ARQUIVO',
+                   help='Persistir o cache de RTT/congestionamento por destino neste arquivo')
+    p.add_argument('--ticket-file', metavar='ARQUIVO',
+                   help='Guardar tickets de retomada neste arquivo (handshake 0-RTT na próxima execução)')
+    p.add_argument('--crypto-workers', type=int, default=0, metavar='N',
+                   help='Workers para cifrar/decifrar segmentos em paralelo (0 = inline). Default: 0')
+    p.add_argument('--crypto-processes', action='store_true',
+                   help='Usar processos em vez de threads para os workers de criptografia')
+    p.add_argument('--no-aead', action='store_true',
+                   help='Desativar o modo AEAD (IV fixo no pacote + checksum, formato antigo)')
+    p.add_argument('--debug', action='store_true',
+                   help='Logs por pacote ([SEND_DATA], [HANDLE_ACK], [SEND_RAW]...); reduzem muito a vazão')
+    p.add_argument('--no-piggyback', action='store_true',
+                   help='Não levar ACKs no cabeçalho dos DATA (um ACK isolado por segmento)')
+    p.add_argument('--compression', choices=['zlib', 'lzma'],
+                   help='Comprimir o fluxo se o servidor aceitar (desligada por bloco quando não compensa)')
+    p.add_argument('--metrics-log', metavar='CAMINHO',
+                   help='Gravar as métricas em fluxo num log binário com rotação (memória constante); '
+                        'ler depois com metrics_log.MetricsLog; recusa um log já existente')
+    p.add_argument('--resume', action='store_true',
+                   help='Com --file: enviar só os pedaços que o servidor (também com --resume) ainda não tem')
+    p.add_argument('--delta', action='store_true',
+                   help='Com --file: enviar só as diferenças para a cópia que o servidor (com --delta) já tem')
+    p.add_argument('--stripes', type=int, default=1, metavar='N',
+                   help='Com --file: dividir o arquivo entre N conexões paralelas (portas PORT..PORT+N-1; '
+                        'o servidor também com --stripes N). Default: 1')
+    p.add_argument('--stripe-processes', action='store_true',
+                   help='Com --stripes: um processo por conexão em vez de uma thread')
+    p.add_argument('--multicast', metavar='GRUPO:PORTA',
+                   help='Com --file: enviar uma vez ao grupo multicast; receptores (server.py --multicast) '
+                        'reportam perdas por NACK')
+    p.add_argument('--mcast-receivers', type=int, default=0, metavar='N',
+                   help='Com --multicast: começar assim que N receptores entrarem (0 = esperar --mcast-join). Default: 0')
+    p.add_argument('--mcast-join', type=float, default=5.0, metavar='S',
+                   help='Com --multicast: espera máxima pela entrada dos receptores. Default: 5.0')
+    p.add_argument('--mcast-rate', type=float, default=MCAST_DEFAULT_RATE * 8 / 1e6, metavar='MBPS',
+                   help=f'Com --multicast: taxa fixa de envio ao grupo. Default: {MCAST_DEFAULT_RATE * 8 / 1e6:.0f}')
+    p.add_argument('--mcast-fec', type=int, default=MCAST_FEC_GROUP, metavar='K',
+                   help=f'Com --multicast: segmentos por paridade XOR nos reparos (0 = sem FEC). Default: {MCAST_FEC_GROUP}')
+    p.add_argument('--mcast-interface', default='0.0.0.0', metavar='IP',
+                   help='Com --multicast: interface de saída (127.0.0.1 para testes em loopback)')
     g = p.add_mutually_exclusive_group()
-    g.add_argument('--file', metavar='CAMINHO', help='Arquivo a enviar (tamanho define nº de pacotes)')
+    g.add_argument('--file', metavar='CAMINHO',
+                   help='Arquivo a enviar em fluxo (mmap, sem preenchimento); o tamanho substitui --packets')
+    g.add_argument('--batch', nargs='+', metavar='CAMINHO',
+                   help='Enviar vários arquivos (diretórios entram recursivamente) em lote pela mesma '
+                        'conexão; o servidor precisa de --batch DIRETÓRIO')
     g.add_argument('--synthetic', action='store_true',
                    help='Gerar dados sintéticos para preencher o payload')
     args = p.parse_args()
+    if (args.resume or args.delta) and not args.file:
+        p.error('--resume e --delta exigem --file')
+    if args.resume and args.delta:
+        p.error('--resume e --delta são exclusivos')
+    if args.metrics_log and log_files(args.metrics_log):
+        p.error(f'--metrics-log: {args.metrics_log} já existe (apague ou escolha outro caminho)')
+    if args.stripes < 1:
+        p.error('--stripes deve ser pelo menos 1')
+    if args.stripes > 1 and (not args.file or args.resume or args.delta):
+        p.error('--stripes exige --file e não combina com --resume ou --delta')
+    if args.multicast:
+        if not args.file or args.resume or args.delta or args.stripes > 1:
+            p.error('--multicast exige --file e não combina com --resume, --delta ou --stripes')
+        try:
+            mcast_group = parse_group(args.multicast)
+        except ValueError as e:
+            p.error(str(e))
 
     if args.loss > 0:
         set_global_loss_probability(args.loss)
         print(f"Perda de pacotes configurada: {args.loss*100:.1f}%")
 
+    if args.path_cache:
+        configure_path_cache(persist_file=args.path_cache)
+    if args.ticket_file:
+        configure_ticket_store(persist_file=args.ticket_file)
+
     total_packets = args.packets
     total_bytes = total_packets * MSS
 
-    if args.file:
+    if args.batch:
+        missing = [path for path in args.batch if not os.path.exists(path)]
+        if missing:
+            print(f'Não encontrado: {", ".join(missing)}', file=sys.stderr)
+            sys.exit(1)
+        files = collect_files(args.batch)
+        total_bytes = sum(os.path.getsize(path) for path, _ in files)
+        total_packets = (total_bytes + MSS - 1) // MSS
+        print(f"Lote: {len(files)} arquivos, {total_bytes} bytes")
+    elif args.file:
         try:
-            with open(args.file, 'rb') as f:
-                payload = f.read()
-            if len(payload) < total_bytes:
-                payload = payload + (b'\x00' * (total_bytes - len(payload)))
-            else:
-                payload = payload[:total_bytes]
-            total_packets = (len(payload) + MSS - 1) // MSS
-            print(f"Lendo arquivo: {len(payload)} bytes, {total_packets} pacotes")
+            # Só o tamanho: o conteúdo é mapeado e enviado em fluxo por send_file
+            total_bytes = os.path.getsize(args.file)
+            total_packets = (total_bytes + MSS - 1) // MSS
+            print(f"Arquivo: {total_bytes} bytes, ~{total_packets} pacotes")
         except Exception as e:
             print(f'Erro ao abrir arquivo: {e}', file=sys.stderr)
             sys.exit(1)
@@ -162,8 +257,66 @@ def main():
         payload = bytes((i % 256) for i in range(total_bytes))
         print(f"Gerando {total_packets} pacotes ({total_bytes} bytes)")
 
-    conn = TRUProtocol(is_server=False, 
-                   enable_congestion_control=not args.no_congestion)
+    options = dict(enable_congestion_control=not args.no_congestion,
+                   congestion_algorithm=args.cc,
+                   enable_pacing=not args.no_pacing,
+                   pacing_burst=args.pacing_burst,
+                   mss=args.mss,
+                   enable_pmtud=args.pmtud,
+                   crypto_workers=args.crypto_workers,
+                   crypto_processes=args.crypto_processes,
+                   enable_aead=not args.no_aead,
+                   piggyback_acks=not args.no_piggyback,
+                   debug=args.debug,
+                   compression=args.compression)
+
+    if args.multicast:
+        sender = MulticastSender(*mcast_group, interface=args.mcast_interface,
+                                 rate=args.mcast_rate * 1e6 / 8, fec_group=args.mcast_fec)
+        try:
+            ok = sender.send_file(args.file, receivers=args.mcast_receivers, join_timeout=args.mcast_join)
+        finally:
+            sender.close()
+        stats = sender.stats
+        if 'elapsed' in stats:
+            print(f"Multicast: {stats['completed']}/{stats['receivers']} receptores concluíram, "
+                  f"{stats['bytes']} bytes enviados ({stats['data_packets']} segmentos, "
+                  f"{stats['repair_packets']} reparos, {stats['parity_packets']} paridades, "
+                  f"{stats['nacks']} NACKs em {stats['rounds']} rodadas)")
+        if ok:
+            print('Transferência concluída com sucesso.')
+        else:
+            print('Transferência incompleta ou timeout.', file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.stripes > 1:
+        # Uma conexão por listra, cada uma com seu handshake e sua janela
+        next_report = [0]
+
+        def striped_progress(sent, total):
+            if sent >= next_report[0]:
+                print(f'  Enviados {sent}/{total} bytes ({100*sent/max(total, 1):.1f}%)')
+                next_report[0] = sent + max(1, total // 20)
+
+        stats = send_file_striped(args.host, args.port, args.file, args.stripes,
+                                  processes=args.stripe_processes, progress_cb=striped_progress,
+                                  **options)
+        print(f"Listras: {stats['bytes']} bytes em {stats['elapsed']:.2f}s "
+              f"({stats['throughput']*8/1e6:.2f} Mbps), por listra {stats['stripe_bytes']}, "
+              f"{stats['steals']} faixas redistribuídas")
+        rtt, delivery = stats['latency']['rtt'], stats['latency']['delivery']
+        print(f"Latência nas listras: RTT p50/p99 {rtt['p50']:.4f}s / {rtt['p99']:.4f}s, "
+              f"entrega p50/p99/p99.9 {delivery['p50']:.4f}s / {delivery['p99']:.4f}s / {delivery['p99.9']:.4f}s")
+        if stats['ok']:
+            print('Transferência concluída com sucesso.')
+        else:
+            print('Transferência incompleta ou timeout.', file=sys.stderr)
+            sys.exit(1)
+        return
+
+    metrics = StreamingMetricsCollector(args.metrics_log) if args.metrics_log else None
+    conn = TRUProtocol(is_server=False, metrics_collector=metrics, **options)
     conn.start()
 
     print(f'Conectando a {args.host}:{args.port}...')
@@ -198,13 +351,37 @@ def main():
         if total > 0 and sent % max(1, total // 20) == 0 or sent == total:
             print(f'  Enviados {sent}/{total} pacotes ({100*sent/total:.1f}%)')
 
-    print(f'Enviando {total_packets} pacotes ({len(payload)} bytes)...')
+    next_report = [0]
+
+    def progress_bytes(sent, total):
+        if sent >= next_report[0] or sent == total:
+            print(f'  Enviados {sent}/{total} bytes ({100*sent/max(total, 1):.1f}%)')
+            next_report[0] = sent + max(1, total // 20)
+
+    print(f'Enviando {total_packets} pacotes ({total_bytes} bytes)...')
 
     try:
         # Adicionar um pequeno delay para garantir que tudo está inicializado
         time.sleep(0.1)
         
-        ok = conn.send_data(payload, progress_cb=progress)
+        if args.resume:
+            ok = conn.send_file_resumable(args.file, progress_cb=progress_bytes)
+            if conn.resume_stats:
+                print(f"Retomada: {conn.resume_stats['reused_chunks']}/{conn.resume_stats['chunks']} pedaços "
+                      f"já no servidor, {conn.resume_stats['sent_bytes']} bytes enviados")
+        elif args.delta:
+            ok = conn.send_file_delta(args.file, progress_cb=progress_bytes)
+            if conn.delta_stats:
+                print(f"Delta: {conn.delta_stats['literal_bytes']} bytes literais, "
+                      f"{conn.delta_stats['copied_bytes']} bytes copiados da cópia do servidor")
+        elif args.batch:
+            ok = conn.send_files(args.batch, progress_cb=progress_bytes)
+            if conn.batch_stats:
+                print(f"Lote: {conn.batch_stats['files']} arquivos, {conn.batch_stats['bytes']} bytes de dados")
+        elif args.file:
+            ok = conn.send_file(args.file, progress_cb=progress_bytes)
+        else:
+            ok = conn.send_data(payload, progress_cb=progress)
         
         if ok:
             # Esperar um pouco para garantir que todos os ACKs cheguem
@@ -218,8 +395,22 @@ def main():
             print(f"RTT mínimo: {final_stats['min']:.3f}s")
             print(f"RTT máximo: {final_stats['max']:.3f}s")
             print(f"Desvio padrão: {final_stats['dev']:.3f}s")
+            print(f"Percentis p50/p90/p99/p99.9: {final_stats['p50']:.4f}s / {final_stats['p90']:.4f}s / "
+                  f"{final_stats['p99']:.4f}s / {final_stats['p99.9']:.4f}s")
+            delivery, completion = final_stats['delivery'], final_stats['completion']
+            print(f"Entrega de segmentos p50/p99/p99.9: {delivery['p50']:.4f}s / {delivery['p99']:.4f}s / "
+                  f"{delivery['p99.9']:.4f}s ({delivery['count']} segmentos)")
+            if completion['count']:
+                print(f"Envios concluídos: {completion['count']}, duração p50/máx: "
+                      f"{completion['p50']:.3f}s / {completion['max']:.3f}s")
             print(f"Timeout final: {final_stats['timeout']:.3f}s")
             print(f"Amostras coletadas: {final_stats['samples']}")
+            compression = conn.get_compression_stats()
+            if compression['algorithm']:
+                print(f"Compressão ({compression['algorithm']}): {compression['raw_bytes']} -> "
+                      f"{compression['compressed_bytes']} bytes (razão {compression['ratio']:.2f}, "
+                      f"{compression['blocks_compressed']}/{compression['blocks_compressed'] + compression['blocks_raw']} "
+                      f"blocos comprimidos, CPU {compression['cpu_time']:.2f}s)")
             print("="*80)
             
     except KeyboardInterrupt:
@@ -237,10 +428,13 @@ def main():
             monitor_thread.join(timeout=2.0)
 
         loss_str = f"_loss{args.loss}" if args.loss > 0 else ""
-        cong_str = "_nocong" if args.no_congestion else ""
+        cong_str = "_nocong" if args.no_congestion else (f"_{args.cc}" if args.cc != 'reno' else "")
         save_final_graphs(conn, f"graficos_trudp{loss_str}{cong_str}.png")
 
         conn.close()
+        if metrics:
+            metrics.close()
+            print(f"Log de métricas: {metrics.log.stats['records']} registros em {args.metrics_log}")
 
         if ok:
             print('Transferência concluída com sucesso.')
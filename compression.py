@@ -0,0 +1,129 @@
+import time
+import zlib
+from typing import NamedTuple, Optional
+
+try:
+    import lzma
+except ImportError:  # Python compilado sem liblzma: só zlib
+    lzma = None
+
+# Byte de opções do SYN/SYN_ACK: nibble baixo = algoritmos que o lado
+# descomprime, nibble alto = algoritmo com que ele pretende comprimir
+COMPRESS_ZLIB = 0x01
+COMPRESS_LZMA = 0x02
+ALGORITHMS = {'zlib': COMPRESS_ZLIB, 'lzma': COMPRESS_LZMA}
+DEFAULT_LEVELS = {COMPRESS_ZLIB: 6, COMPRESS_LZMA: 1}
+
+# Entrada comprimida de uma vez; cada bloco termina em fronteira decodificável
+COMPRESSION_BLOCK = 64 << 10
+# Blocos que não encolhem ao menos para esta fração seguem sem compressão
+COMPRESSION_MAX_RATIO = 0.9
+# Depois de um bloco recusado pula 1, 2, 4... blocos antes de tentar de novo
+COMPRESSION_MAX_BACKOFF = 64
+# Maior bloco devolvido por chamada do descompressor (limita bombas de compressão)
+DECOMPRESS_CHUNK = 1 << 20
+
+
+def supported_algorithms() -> int:
+    return COMPRESS_ZLIB | (COMPRESS_LZMA if lzma else 0)
+
+
+class CompressedChunk(NamedTuple):
+    data: object  # bytes ou Future de decifragem
+
+
+class StreamCompressor:
+    """Compressão adaptativa do fluxo de envio, bloco a bloco.
+
+    zlib mantém o dicionário entre blocos (flush de sincronização no fim de
+    cada um); lzma não tem flush parcial, então cada bloco é um stream xz
+    completo. Blocos em que a compressão não compensa seguem crus.
+    """
+
+    def __init__(self, algorithm: int, level: int = None):
+        self.algorithm = algorithm
+        self.level = DEFAULT_LEVELS[algorithm] if level is None else level
+        self._zlib = zlib.compressobj(self.level) if algorithm == COMPRESS_ZLIB else None
+        self._skip = 0
+        self._backoff = 1
+        self.stats = {'raw_bytes': 0, 'compressed_bytes': 0, 'blocks_compressed': 0,
+                      'blocks_raw': 0, 'blocks_tried': 0, 'cpu_time': 0.0}
+
+    def compress(self, block: bytes, link_rate: float = 0.0) -> Optional[bytes]:
+        # Bloco comprimido, ou None para enviá-lo cru. Com link_rate (bytes/s)
+        # a compressão também precisa ser mais rápida que enviar o bloco cru:
+        # a janela em voo mantém o enlace ocupado enquanto o próximo bloco é
+        # comprimido, mas a CPU passa a limitar a vazão se for mais lenta
+        if self._skip:
+            self._skip -= 1
+            self._sent_raw(len(block))
+            return None
+
+        start = time.perf_counter()
+        if self._zlib:
+            # Tentativa numa cópia: bloco recusado não entra no dicionário,
+            # que precisa continuar igual ao do destinatário
+            trial = self._zlib.copy()
+            out = trial.compress(block) + trial.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            out = lzma.compress(block, format=lzma.FORMAT_XZ, check=lzma.CHECK_NONE, preset=self.level)
+        elapsed = time.perf_counter() - start
+        self.stats['cpu_time'] += elapsed
+        self.stats['blocks_tried'] += 1
+
+        if len(out) > len(block) * COMPRESSION_MAX_RATIO or (link_rate and elapsed * link_rate > len(block)):
+            self._skip = self._backoff
+            self._backoff = min(self._backoff * 2, COMPRESSION_MAX_BACKOFF)
+            self._sent_raw(len(block))
+            return None
+
+        if self._zlib:
+            self._zlib = trial
+        self._backoff = 1
+        self.stats['raw_bytes'] += len(block)
+        self.stats['compressed_bytes'] += len(out)
+        self.stats['blocks_compressed'] += 1
+        return out
+
+    def _sent_raw(self, size: int):
+        self.stats['raw_bytes'] += size
+        self.stats['compressed_bytes'] += size
+        self.stats['blocks_raw'] += 1
+
+
+class StreamDecompressor:
+    """Descompressão em ordem do fluxo recebido, em blocos de até DECOMPRESS_CHUNK."""
+
+    def __init__(self, algorithm: int):
+        self.algorithm = algorithm
+        self._obj = self._new()
+
+    def _new(self):
+        if self.algorithm == COMPRESS_ZLIB:
+            return zlib.decompressobj()
+        return lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+
+    @property
+    def pending(self) -> bool:
+        # Há saída retida pelo limite de tamanho: chamar feed() sem dados
+        if self.algorithm == COMPRESS_ZLIB:
+            return bool(self._obj.unconsumed_tail)
+        if self._obj.eof:
+            return bool(self._obj.unused_data)
+        return not self._obj.needs_input
+
+    def feed(self, data: bytes = b'') -> bytes:
+        if self.algorithm == COMPRESS_ZLIB:
+            return self._obj.decompress(self._obj.unconsumed_tail + data, DECOMPRESS_CHUNK)
+
+        # lzma: um stream xz por bloco; o que sobra após o fim abre o próximo
+        out = bytearray()
+        while len(out) < DECOMPRESS_CHUNK:
+            if self._obj.eof:
+                data = self._obj.unused_data + data
+                self._obj = self._new()
+            if not data and self._obj.needs_input:
+                break
+            out += self._obj.decompress(data, DECOMPRESS_CHUNK - len(out))
+            data = b''
+        return bytes(out)
@@ -1,4 +1,5 @@
 import time
+from collections import deque
 
 class CongestionControl:
     def __init__(self):
@@ -16,7 +17,17 @@ class CongestionControl:
 
         self.timeout_interval = 1.0
 
-    def on_packet_sent(self, seq_num: int = None):
+    def on_packet_sent(self, seq_num: int = None, size: int = 0):
+        pass
+
+    def on_packet_acked(self, seq_num: int):
+        pass
+
+    def on_packet_abandoned(self, seq_num: int):
+        # Segmento que saiu do voo sem ACK (mensagem vencida): não conta como entrega
+        pass
+
+    def on_delay_sample(self, one_way_delay: float):
         pass
 
     def on_ack_received(self, ack_num: int = None, rtt_sample: float = None):
@@ -83,3 +94,425 @@ class CongestionControl:
         timeout = min(timeout, 30.0)  # Máximo 30s
         
         return timeout
+
+
+class CubicCongestionControl(CongestionControl):
+    """Controle CUBIC (RFC 8312) com saída de slow start via HyStart."""
+
+    C = 0.4
+    BETA = 0.7
+
+    # HyStart: limites do aumento de RTT que encerra o slow start
+    HYSTART_MIN_SAMPLES = 8
+    HYSTART_DELAY_MIN = 0.004
+    HYSTART_DELAY_MAX = 0.016
+
+    def __init__(self):
+        super().__init__()
+        self.w_max = 0.0
+        self.w_last_max = 0.0
+        self.epoch_start = None
+        self.origin_point = 0.0
+        self.k = 0.0
+        self.w_est = 0.0
+
+        # Estado do HyStart (rodadas aproximadas por contagem de ACKs)
+        self.round_acks = 0
+        self.round_target = self.cwnd
+        self.round_min_rtt = None
+        self.last_round_min_rtt = None
+        self.round_samples = 0
+
+    def on_ack_received(self, ack_num: int = None, rtt_sample: float = None):
+        if rtt_sample is not None:
+            self.update_rtt(rtt_sample)
+
+        if ack_num is not None and ack_num <= self.last_ack:
+            self.dup_ack_count += 1
+            if self.dup_ack_count >= 3:
+                self.on_three_duplicate_acks()
+                return
+        elif ack_num is not None:
+            self.dup_ack_count = 0
+            self.last_ack = ack_num
+
+        if self.state == "SLOW_START":
+            self.cwnd += 1
+            if self._hystart_exit(rtt_sample) or self.cwnd >= self.ssthresh:
+                self.ssthresh = self.cwnd
+                self.state = "CONGESTION_AVOIDANCE"
+        elif self.state == "CONGESTION_AVOIDANCE":
+            self._cubic_update()
+        elif self.state == "FAST_RECOVERY":
+            self.cwnd = self.ssthresh
+            self.state = "CONGESTION_AVOIDANCE"
+
+    def _hystart_exit(self, rtt_sample: float = None) -> bool:
+        if rtt_sample is not None:
+            self.round_samples += 1
+            if self.round_min_rtt is None or rtt_sample < self.round_min_rtt:
+                self.round_min_rtt = rtt_sample
+
+        # Fim de rodada: uma janela inteira confirmada
+        self.round_acks += 1
+        if self.round_acks >= self.round_target:
+            self.last_round_min_rtt = self.round_min_rtt
+            self.round_min_rtt = None
+            self.round_samples = 0
+            self.round_acks = 0
+            self.round_target = self.cwnd
+            return False
+
+        if (self.last_round_min_rtt is None or self.round_min_rtt is None
+                or self.round_samples < self.HYSTART_MIN_SAMPLES):
+            return False
+
+        threshold = min(max(self.last_round_min_rtt / 8, self.HYSTART_DELAY_MIN),
+                        self.HYSTART_DELAY_MAX)
+        return self.round_min_rtt >= self.last_round_min_rtt + threshold
+
+    def _cubic_update(self):
+        now = time.time()
+        if self.epoch_start is None:
+            self.epoch_start = now
+            if self.cwnd < self.w_max:
+                self.k = ((self.w_max - self.cwnd) / self.C) ** (1 / 3)
+                self.origin_point = self.w_max
+            else:
+                self.k = 0.0
+                self.origin_point = self.cwnd
+            self.w_est = self.cwnd
+
+        t = now - self.epoch_start + self.rtt_min
+        target = self.origin_point + self.C * (t - self.k) ** 3
+
+        # Região amigável ao TCP: não crescer mais devagar que o Reno
+        self.w_est += 3 * (1 - self.BETA) / (1 + self.BETA) / self.cwnd
+        target = max(target, self.w_est)
+
+        if target > self.cwnd:
+            self.cwnd += (target - self.cwnd) / self.cwnd
+        else:
+            self.cwnd += 0.01 / self.cwnd
+
+    def _reduce_window(self):
+        # Convergência rápida: liberar banda se o w_max está caindo
+        if self.cwnd < self.w_last_max:
+            self.w_last_max = self.cwnd
+            self.w_max = self.cwnd * (1 + self.BETA) / 2
+        else:
+            self.w_last_max = self.cwnd
+            self.w_max = self.cwnd
+        self.ssthresh = max(self.cwnd * self.BETA, 2.0)
+        self.epoch_start = None
+
+    def on_timeout(self):
+        self._reduce_window()
+        self.cwnd = 1.0
+        self.state = "SLOW_START"
+        self.dup_ack_count = 0
+        self.round_acks = 0
+        self.round_target = self.cwnd
+        self.timeout_interval = min(self.timeout_interval * 2, 60.0)
+
+    def on_three_duplicate_acks(self):
+        self._reduce_window()
+        self.cwnd = self.ssthresh
+        self.state = "FAST_RECOVERY"
+
+
+class BBRCongestionControl(CongestionControl):
+    """Controle baseado em modelo (estilo BBR): banda de gargalo x RTT mínimo."""
+
+    STARTUP_GAIN = 2.885
+    DRAIN_GAIN = 1 / 2.885
+    PROBE_BW_GAINS = [1.25, 0.75, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0]
+    CWND_GAIN = 2.0
+    MIN_CWND = 4.0
+
+    BTL_BW_ROUNDS = 10        # janela do filtro de máximo (rodadas)
+    MIN_RTT_WINDOW = 10.0     # validade do RTT mínimo (s)
+    PROBE_RTT_DURATION = 0.2  # tempo em PROBE_RTT (s)
+    FULL_BW_GROWTH = 1.25
+    FULL_BW_ROUNDS = 3
+
+    def __init__(self, mss: int = 1400):
+        super().__init__()
+        self.mss = mss
+        self.state = "STARTUP"
+        self.cwnd = self.MIN_CWND
+        self.ssthresh = 0.0
+        self.pacing_gain = self.STARTUP_GAIN
+        self.pacing_rate = 0.0  # bytes/s, 0 = sem modelo ainda
+
+        # Amostragem de taxa de entrega
+        self.delivered = 0
+        self.delivered_time = time.time()
+        self.packet_state = {}  # seq -> (delivered, delivered_time, size)
+
+        # Rodadas de ida e volta
+        self.round_count = 0
+        self.next_round_delivered = 0
+
+        # Modelo do caminho
+        self.bw_samples = deque()  # (rodada, bytes/s)
+        self.btl_bw = 0.0
+        self.min_rtt = None
+        self.min_rtt_stamp = time.time()
+
+        # Detecção de pipe cheio
+        self.full_bw = 0.0
+        self.full_bw_count = 0
+        self.filled_pipe = False
+
+        self.cycle_index = 0
+        self.cycle_stamp = time.time()
+        self.probe_rtt_done_stamp = None
+        self.prior_state = None
+
+        # Recuperação após RTO: janela mínima por uma rodada, depois a anterior
+        self.prior_cwnd = 0.0
+        self.recovery_round = None
+
+    def on_packet_sent(self, seq_num: int = None, size: int = 0):
+        if seq_num is None:
+            return
+        if not self.packet_state:
+            # Reinicia o relógio de entrega após período ocioso
+            self.delivered_time = time.time()
+        self.packet_state[seq_num] = (self.delivered, self.delivered_time, size)
+
+    def on_packet_abandoned(self, seq_num: int):
+        self.packet_state.pop(seq_num, None)
+
+    def on_packet_acked(self, seq_num: int):
+        state = self.packet_state.pop(seq_num, None)
+        if state is None:
+            return
+        prior_delivered, prior_time, size = state
+
+        now = time.time()
+        self.delivered += size
+        self.delivered_time = now
+
+        if prior_delivered >= self.next_round_delivered:
+            self.next_round_delivered = self.delivered
+            self.round_count += 1
+            self._check_full_pipe()
+
+        interval = now - prior_time
+        if interval > 0:
+            self._update_btl_bw((self.delivered - prior_delivered) / interval)
+
+    def _update_btl_bw(self, rate: float):
+        self.bw_samples.append((self.round_count, rate))
+        while self.bw_samples and self.bw_samples[0][0] <= self.round_count - self.BTL_BW_ROUNDS:
+            self.bw_samples.popleft()
+        self.btl_bw = max(r for _, r in self.bw_samples)
+
+    def _check_full_pipe(self):
+        if self.filled_pipe or not self.btl_bw:
+            return
+        if self.btl_bw >= self.full_bw * self.FULL_BW_GROWTH:
+            self.full_bw = self.btl_bw
+            self.full_bw_count = 0
+            return
+        self.full_bw_count += 1
+        if self.full_bw_count >= self.FULL_BW_ROUNDS:
+            self.filled_pipe = True
+
+    def bdp_packets(self) -> float:
+        if not self.btl_bw or self.min_rtt is None:
+            return 0.0
+        return self.btl_bw * self.min_rtt / self.mss
+
+    def inflight(self) -> int:
+        return len(self.packet_state)
+
+    def on_ack_received(self, ack_num: int = None, rtt_sample: float = None):
+        now = time.time()
+        if rtt_sample is not None:
+            self.update_rtt(rtt_sample)
+            expired = now - self.min_rtt_stamp > self.MIN_RTT_WINDOW
+            if expired and self.min_rtt is not None and self.state != "PROBE_RTT":
+                self._enter_probe_rtt(now)
+            if self.min_rtt is None or rtt_sample <= self.min_rtt or expired:
+                self.min_rtt = rtt_sample
+                self.min_rtt_stamp = now
+
+        self._update_state(now)
+        self._update_cwnd()
+        if self.btl_bw:
+            self.pacing_rate = self.pacing_gain * self.btl_bw
+
+    def _update_state(self, now: float):
+        bdp = self.bdp_packets()
+        if self.state == "STARTUP" and self.filled_pipe:
+            self.state = "DRAIN"
+            self.pacing_gain = self.DRAIN_GAIN
+        if self.state == "DRAIN" and self.inflight() <= bdp:
+            self._enter_probe_bw(now)
+        elif self.state == "PROBE_BW" and self.min_rtt is not None:
+            if now - self.cycle_stamp > self.min_rtt:
+                self.cycle_index = (self.cycle_index + 1) % len(self.PROBE_BW_GAINS)
+                self.cycle_stamp = now
+                self.pacing_gain = self.PROBE_BW_GAINS[self.cycle_index]
+        elif self.state == "PROBE_RTT" and now >= self.probe_rtt_done_stamp:
+            self.min_rtt_stamp = now
+            if self.filled_pipe:
+                self._enter_probe_bw(now)
+            else:
+                self.state = "STARTUP"
+                self.pacing_gain = self.STARTUP_GAIN
+
+    def _enter_probe_bw(self, now: float):
+        self.state = "PROBE_BW"
+        self.cycle_index = 1  # começa drenando a fila residual
+        self.cycle_stamp = now
+        self.pacing_gain = self.PROBE_BW_GAINS[self.cycle_index]
+
+    def _enter_probe_rtt(self, now: float):
+        self.state = "PROBE_RTT"
+        self.pacing_gain = 1.0
+        self.probe_rtt_done_stamp = now + self.PROBE_RTT_DURATION
+
+    def _update_cwnd(self):
+        if self.state == "PROBE_RTT":
+            self.cwnd = self.MIN_CWND
+            return
+        target = self.CWND_GAIN * self.bdp_packets()
+        if self.recovery_round is not None:
+            # Conservação de pacotes: cresce um segmento por ACK até fechar a
+            # rodada iniciada no RTO, então volta à janela de antes da perda
+            if self.round_count > self.recovery_round:
+                self.cwnd = max(self.cwnd, self.prior_cwnd)
+                self.recovery_round = None
+            else:
+                self.cwnd += 1
+                return
+        if not self.filled_pipe:
+            # STARTUP: cresce um segmento por ACK, limitado pelo ganho de
+            # STARTUP sobre o BDP assim que houver modelo
+            self.cwnd += 1
+            if target:
+                self.cwnd = min(self.cwnd, self.STARTUP_GAIN * self.bdp_packets())
+        elif self.cwnd < target:
+            self.cwnd = min(self.cwnd + 1, target)
+        else:
+            self.cwnd = target
+        self.cwnd = max(self.cwnd, self.MIN_CWND)
+
+    def on_timeout(self):
+        # Perda não altera o modelo, mas um RTO indica que o que estava em voo
+        # se perdeu: janela de 1 segmento até a rodada seguinte ser entregue
+        if self.recovery_round is None:
+            self.prior_cwnd = self.cwnd
+        self.recovery_round = self.round_count
+        self.cwnd = 1.0
+        self.dup_ack_count = 0
+        self.timeout_interval = min(self.timeout_interval * 2, 60.0)
+
+    def on_three_duplicate_acks(self):
+        self.dup_ack_count = 0
+
+
+class LedbatCongestionControl(CongestionControl):
+    """Controle de baixa prioridade (LEDBAT, RFC 6817) guiado pelo atraso de fila."""
+
+    TARGET = 0.025          # atraso de fila alvo (s)
+    GAIN = 1.0
+    MIN_CWND = 2.0
+    ALLOWED_INCREASE = 1.0
+    BASE_HISTORY = 10       # minutos de histórico do atraso base
+    CURRENT_FILTER = 4      # amostras no filtro do atraso atual
+
+    def __init__(self):
+        super().__init__()
+        self.current_delays = deque(maxlen=self.CURRENT_FILTER)
+        self.base_delays = deque(maxlen=self.BASE_HISTORY)
+        self.base_minute = None
+        self.queuing_delay = 0.0
+        self.flight_size = 0
+        self.newly_acked = 0
+        self.last_reduction = 0.0
+
+    def on_packet_sent(self, seq_num: int = None, size: int = 0):
+        self.flight_size += 1
+
+    def on_packet_acked(self, seq_num: int):
+        self.flight_size = max(self.flight_size - 1, 0)
+        self.newly_acked += 1
+
+    def on_packet_abandoned(self, seq_num: int):
+        self.flight_size = max(self.flight_size - 1, 0)
+
+    def on_delay_sample(self, one_way_delay: float):
+        # Relógios não sincronizados: só a diferença para o atraso base importa
+        minute = int(time.time() // 60)
+        if minute != self.base_minute:
+            self.base_minute = minute
+            self.base_delays.append(one_way_delay)
+        elif one_way_delay < self.base_delays[-1]:
+            self.base_delays[-1] = one_way_delay
+
+        self.current_delays.append(one_way_delay)
+        self.queuing_delay = min(self.current_delays) - min(self.base_delays)
+
+    def on_ack_received(self, ack_num: int = None, rtt_sample: float = None):
+        if rtt_sample is not None:
+            self.update_rtt(rtt_sample)
+
+        off_target = (self.TARGET - self.queuing_delay) / self.TARGET
+        prior_cwnd = self.cwnd
+
+        if self.state == "SLOW_START":
+            if self.queuing_delay > self.TARGET / 2 or self.cwnd >= self.ssthresh:
+                self.ssthresh = self.cwnd
+                self.state = "CONGESTION_AVOIDANCE"
+            else:
+                self.cwnd += 1
+        elif self.state == "FAST_RECOVERY":
+            self.state = "CONGESTION_AVOIDANCE"
+        else:
+            self.cwnd += self.GAIN * off_target / self.cwnd
+
+        # Não crescer além do que está de fato em voo (antes deste ACK)
+        max_allowed = self.flight_size + self.newly_acked + self.ALLOWED_INCREASE
+        self.newly_acked = 0
+        self.cwnd = max(min(self.cwnd, max(max_allowed, prior_cwnd)), self.MIN_CWND)
+
+    def _halve_once_per_rtt(self) -> bool:
+        now = time.time()
+        if now - self.last_reduction < self.rtt_avg:
+            return False
+        self.last_reduction = now
+        self.ssthresh = max(self.cwnd / 2, self.MIN_CWND)
+        return True
+
+    def on_timeout(self):
+        self._halve_once_per_rtt()
+        self.cwnd = 1.0
+        self.state = "CONGESTION_AVOIDANCE"
+        self.dup_ack_count = 0
+        self.timeout_interval = min(self.timeout_interval * 2, 60.0)
+
+    def on_three_duplicate_acks(self):
+        if self._halve_once_per_rtt():
+            self.cwnd = self.ssthresh
+            self.state = "FAST_RECOVERY"
+
+
+CONGESTION_ALGORITHMS = {
+    "reno": CongestionControl,
+    "cubic": CubicCongestionControl,
+    "bbr": BBRCongestionControl,
+    "ledbat": LedbatCongestionControl,
+}
+
+
+def create_congestion_control(algorithm: str = "reno") -> CongestionControl:
+    try:
+        return CONGESTION_ALGORITHMS[algorithm.lower()]()
+    except KeyError:
+        raise ValueError(f"Algoritmo de congestionamento desconhecido: {algorithm} "
+                         f"(opções: {', '.join(CONGESTION_ALGORITHMS)})")
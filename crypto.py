@@ -3,8 +3,31 @@ import random
 import hashlib
 import hmac
 import random
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from typing import Tuple, Optional
 
+KEYSTREAM_BLOCK_SIZE = 32  # saída do HMAC-SHA256
+PACKET_TAG_SIZE = 8        # MAC truncado por pacote no modo AEAD
+
+
+@lru_cache(maxsize=16)
+def _hmac_pads(key: bytes):
+    # HMAC-SHA256 decomposto (RFC 2104): estados SHA-256 com ipad/opad já
+    # processados, copiados a cada bloco em vez de recriar o HMAC
+    if len(key) > 64:
+        key = hashlib.sha256(key).digest()
+    key = key.ljust(64, b'\0')
+    inner = hashlib.sha256(bytes(b ^ 0x36 for b in key))
+    outer = hashlib.sha256(bytes(b ^ 0x5c for b in key))
+    return inner, outer
+
+
+def xor_bytes(data: bytes, keystream: bytes) -> bytes:
+    # XOR do segmento inteiro de uma vez via inteiros grandes
+    n = len(data)
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(keystream[:n], 'big')).to_bytes(n, 'big')
+
 class TRUCrypto:
 
     def __init__(self):
@@ -56,41 +79,59 @@ class TRUCrypto:
         if iv is None:
             iv = os.urandom(16)
         
-        print(f"[ENCRYPT_DATA] Criptografando {len(data)} bytes com chave de {len(key)} bytes, IV: {iv.hex()[:8]}...")
-        
         # Usar modo CTR simples para stream cipher
         keystream = TRUCrypto._generate_keystream(key, iv, len(data))
-        
-        encrypted = bytes(a ^ b for a, b in zip(data, keystream))
-        
-        print(f"[ENCRYPT_DATA] Criptografia concluída: {len(encrypted)} bytes")
-        return encrypted, iv
+        return xor_bytes(data, keystream), iv
 
     @staticmethod
     def decrypt_data(encrypted: bytes, key: bytes, iv: bytes) -> bytes:
         # A descriptografia é igual à criptografia em modo XOR
         keystream = TRUCrypto._generate_keystream(key, iv, len(encrypted))
-        return bytes(a ^ b for a, b in zip(encrypted, keystream))
+        return xor_bytes(encrypted, keystream)
 
     @staticmethod
     def _generate_keystream(key: bytes, iv: bytes, length: int) -> bytes:
-        keystream = b""
-        counter = 0
-        
-        while len(keystream) < length:
-            # Combinar IV e contador
-            block_data = iv + counter.to_bytes(8, 'big')
-            # Gerar bloco de keystream
-            block = hmac.new(key, block_data, hashlib.sha256).digest()
-            keystream += block
-            counter += 1
-        
-        return keystream[:length]
+        # Blocos HMAC-SHA256(key, iv || contador) gravados num buffer pré-alocado
+        blocks = (length + KEYSTREAM_BLOCK_SIZE - 1) // KEYSTREAM_BLOCK_SIZE
+        keystream = bytearray(blocks * KEYSTREAM_BLOCK_SIZE)
+        inner, outer = _hmac_pads(key)
+        inner_iv = inner.copy()
+        inner_iv.update(iv)
+        
+        for counter in range(blocks):
+            h = inner_iv.copy()
+            h.update(counter.to_bytes(8, 'big'))
+            mac = outer.copy()
+            mac.update(h.digest())
+            offset = counter * KEYSTREAM_BLOCK_SIZE
+            keystream[offset:offset + KEYSTREAM_BLOCK_SIZE] = mac.digest()
+        
+        return bytes(keystream[:length])
 
     @staticmethod
     def compute_hmac(data: bytes, key: bytes) -> bytes:
         return hmac.new(key, data, hashlib.sha256).digest()[:16]
 
+    @staticmethod
+    def derive_mac_key(key: bytes) -> bytes:
+        # Chave de autenticação separada da chave do keystream
+        return hmac.digest(key, b"TRUDP packet MAC", 'sha256')
+
+    @staticmethod
+    def packet_nonce(iv: bytes, seq_num: int) -> bytes:
+        # Nonce por pacote: IV da sessão com os últimos 64 bits XOR seq (offset
+        # de 64 bits, único mesmo quando o seq de 32 bits do cabeçalho dá a volta)
+        counter = int.from_bytes(iv[-8:], 'big') ^ (seq_num & 0xFFFFFFFFFFFFFFFF)
+        return iv[:-8] + counter.to_bytes(8, 'big')
+
+    @staticmethod
+    def compute_tag(mac_key: bytes, data: bytes) -> bytes:
+        return hmac.digest(mac_key, data, 'sha256')[:PACKET_TAG_SIZE]
+
+    @staticmethod
+    def verify_tag(mac_key: bytes, data: bytes, tag: bytes) -> bool:
+        return hmac.compare_digest(TRUCrypto.compute_tag(mac_key, data), tag)
+
     def test_encryption(self, key: bytes) -> bool:
         test_data = b"Teste de criptografia TRUDP"
         
@@ -110,4 +151,34 @@ class TRUCrypto:
         else:
             print(f"[CRYPTO-TEST] Falha! Original: {test_data}, Decriptado: {decrypted}")
         
-        return success
\ No newline at end of file
+        return success
+
+
+def _encrypt_segment(data: bytes, key: bytes, iv: bytes) -> bytes:
+    return TRUCrypto.encrypt_data(data, key, iv)[0]
+
+
+def _decrypt_segment(data: bytes, key: bytes, iv: bytes) -> bytes:
+    return TRUCrypto.decrypt_data(data, key, iv)
+
+
+class CryptoPipeline:
+    """Pool de workers que cifra/decifra segmentos fora das threads do protocolo."""
+
+    def __init__(self, workers: int, use_processes: bool = False):
+        self.workers = workers
+        self.use_processes = use_processes
+        if use_processes:
+            # Keystream é Python puro por bloco: só processos escalam além do GIL
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="trudp-crypto")
+
+    def encrypt(self, data: bytes, key: bytes, iv: bytes) -> Future:
+        return self.executor.submit(_encrypt_segment, data, key, iv)
+
+    def decrypt(self, data: bytes, key: bytes, iv: bytes) -> Future:
+        return self.executor.submit(_decrypt_segment, data, key, iv)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,171 @@
+import hashlib
+import math
+import os
+import struct
+import zlib
+from typing import Dict, List, Tuple
+
+# Sincronização por delta (estilo rsync): o destinatário envia assinaturas
+# (checksum rolante + hash forte) dos blocos da cópia que já tem e o remetente
+# responde com instruções de cópia desses blocos e dados literais do resto
+
+DELTA_MIN_BLOCK = 1024
+DELTA_MAX_BLOCK = 64 << 10
+# Literais são emitidos em pedaços deste tamanho para o envio não esperar a varredura
+DELTA_LITERAL_FLUSH = 64 << 10
+STRONG_SIZE = 16
+ADLER_MOD = 65521
+
+# Pedido do remetente: tamanho(8) + SHA-256 do arquivo novo(32)
+DELTA_REQUEST = struct.Struct('!Q32s')
+# Assinaturas: tamanho do bloco(4), depois por bloco checksum fraco(4) + hash forte(16)
+SIGNATURE_HEADER = struct.Struct('!I')
+BLOCK_SIGNATURE = struct.Struct(f'!I{STRONG_SIZE}s')
+# Instruções no fluxo de bytes: operação(1) + campos
+OP_COPY = b'C'      # primeiro bloco(4) + quantidade de blocos(4)
+OP_LITERAL = b'L'   # tamanho(4) + dados
+OP_END = b'E'
+COPY_ARGS = struct.Struct('!II')
+LITERAL_ARGS = struct.Struct('!I')
+# Resposta final do destinatário
+DELTA_OK = b'\x01'
+DELTA_FAILED = b'\x00'
+
+
+def block_size_for(size: int) -> int:
+    # Como no rsync: ~raiz do tamanho, menos assinaturas para arquivos grandes
+    return max(DELTA_MIN_BLOCK, min(DELTA_MAX_BLOCK, math.isqrt(size) & ~7))
+
+
+def strong_hash(data) -> bytes:
+    return hashlib.blake2b(data, digest_size=STRONG_SIZE).digest()
+
+
+def file_digest(buf) -> bytes:
+    return hashlib.sha256(buf).digest()
+
+
+class Signatures:
+    """Assinaturas dos blocos da cópia antiga, indexadas pelo checksum fraco."""
+
+    def __init__(self, block_size: int, blocks: List[Tuple[int, bytes]]):
+        self.block_size = block_size
+        self.blocks = blocks
+        self.table: Dict[int, List[int]] = {}
+        for index, (weak, _) in enumerate(blocks):
+            self.table.setdefault(weak, []).append(index)
+
+    @classmethod
+    def from_file(cls, fd: int, size: int) -> 'Signatures':
+        block_size = block_size_for(size)
+        blocks = []
+        # Só blocos completos: o resto do arquivo antigo vai como literal
+        for offset in range(0, size - block_size + 1, block_size):
+            block = os.pread(fd, block_size, offset)
+            blocks.append((zlib.adler32(block), strong_hash(block)))
+        return cls(block_size, blocks)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> 'Signatures':
+        block_size = SIGNATURE_HEADER.unpack_from(data)[0]
+        body = memoryview(data)[SIGNATURE_HEADER.size:]
+        if not block_size or len(body) % BLOCK_SIGNATURE.size:
+            raise ValueError(f"assinaturas inválidas: {len(body)} bytes")
+        return cls(block_size, [BLOCK_SIGNATURE.unpack_from(body, offset)
+                                for offset in range(0, len(body), BLOCK_SIGNATURE.size)])
+
+    def pack(self) -> bytes:
+        return SIGNATURE_HEADER.pack(self.block_size) + b''.join(
+            BLOCK_SIGNATURE.pack(weak, strong) for weak, strong in self.blocks)
+
+    def match(self, weak: int, data, preferred: int) -> int:
+        # Índice do bloco com o mesmo conteúdo (preferindo o que continua a
+        # sequência de cópia atual) ou -1
+        candidates = self.table.get(weak)
+        if not candidates:
+            return -1
+        strong = strong_hash(data)
+        found = -1
+        for index in candidates:
+            if self.blocks[index][1] == strong:
+                if index == preferred:
+                    return index
+                if found < 0:
+                    found = index
+        return found
+
+
+def delta_instructions(view: memoryview, signatures: Signatures, stats: dict):
+    # Gera o fluxo de instruções (bytes ou fatias de view) que reconstrói view
+    # a partir da cópia antiga; stats recebe bytes copiados e literais
+    size = len(view)
+    block = signatures.block_size
+    stats.update(copied_bytes=0, literal_bytes=0, copy_runs=0)
+    run_start, run_count = -1, 0
+    literal_start = 0
+    i = 0
+
+    def literal(end):
+        for start in range(literal_start, end, DELTA_LITERAL_FLUSH):
+            piece = view[start:min(end, start + DELTA_LITERAL_FLUSH)]
+            stats['literal_bytes'] += len(piece)
+            yield OP_LITERAL + LITERAL_ARGS.pack(len(piece))
+            yield piece
+
+    def copy_run():
+        stats['copy_runs'] += 1
+        stats['copied_bytes'] += run_count * block
+        return OP_COPY + COPY_ARGS.pack(run_start, run_count)
+
+    if signatures.blocks and size >= block:
+        table = signatures.table
+        last = size - block
+        weak = zlib.adler32(view[0:block])
+        a, b = weak & 0xFFFF, weak >> 16
+        while i <= last:
+            key = (b << 16) | a
+            index = signatures.match(key, view[i:i + block], run_start + run_count) if key in table else -1
+            if index >= 0:
+                if i > literal_start:
+                    if run_count:
+                        yield copy_run()
+                        run_count = 0
+                    yield from literal(i)
+                if run_count and index == run_start + run_count:
+                    run_count += 1
+                else:
+                    if run_count:
+                        yield copy_run()
+                    run_start, run_count = index, 1
+                i += block
+                literal_start = i
+                if i <= last:
+                    weak = zlib.adler32(view[i:i + block])
+                    a, b = weak & 0xFFFF, weak >> 16
+                continue
+
+            stop = min(last, literal_start + DELTA_LITERAL_FLUSH)
+            if i >= stop:
+                if i >= last:
+                    break
+                # Literal pendente grande: envia antes de continuar a varredura
+                if run_count:
+                    yield copy_run()
+                    run_count = 0
+                yield from literal(i)
+                literal_start = i
+                continue
+            # Desliza a janela byte a byte (checksum de Adler rolante) até o
+            # próximo checksum fraco conhecido
+            for out, inn in zip(view[i:stop], view[i + block:stop + block]):
+                a = (a - out + inn) % ADLER_MOD
+                b = (b - block * out + a - 1) % ADLER_MOD
+                i += 1
+                if (b << 16) | a in table:
+                    break
+
+    if run_count:
+        yield copy_run()
+    if literal_start < size:
+        yield from literal(size)
+    yield OP_END
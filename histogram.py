@@ -0,0 +1,132 @@
+import math
+from array import array
+from typing import Dict, Iterable
+
+# Histograma de latência em faixas logarítmicas (estilo HDR): valores em
+# unidades inteiras (µs); abaixo de 2^HIST_SUB_BITS cada unidade tem sua
+# faixa, acima disso cada potência de 2 é dividida em 2^(HIST_SUB_BITS-1)
+# faixas iguais, com erro relativo de no máximo 1/64. Registrar é O(1) e
+# dois histogramas se combinam somando as contagens
+HIST_UNIT = 1e-6
+HIST_SUB_BITS = 7
+HIST_HALF = 1 << (HIST_SUB_BITS - 1)
+HIST_MAX_BITS = 40  # 2^40 µs, ~12 dias; acima disso vai para a última faixa
+HIST_BUCKETS = (HIST_MAX_BITS - HIST_SUB_BITS + 2) * HIST_HALF
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def _bucket(units: int) -> int:
+    if units < 2 * HIST_HALF:
+        return units
+    shift = units.bit_length() - HIST_SUB_BITS
+    return min(((shift + 1) << (HIST_SUB_BITS - 1)) + (units >> shift) - HIST_HALF, HIST_BUCKETS - 1)
+
+
+def _bucket_range(index: int):
+    # Menor valor da faixa e sua largura, em unidades
+    if index < 2 * HIST_HALF:
+        return index, 1
+    shift = (index >> (HIST_SUB_BITS - 1)) - 1
+    return ((index & (HIST_HALF - 1)) + HIST_HALF) << shift, 1 << shift
+
+
+class LatencyHistogram:
+    """Contagens por faixa logarítmica mais contagem, soma, mínimo e máximo exatos.
+
+    Cada histograma deve ter um só escritor (a thread que o alimenta);
+    para agregar conexões, threads ou processos use merge/merge_histograms.
+    """
+
+    def __init__(self, unit: float = HIST_UNIT):
+        self.unit = unit
+        self.counts = array('q', bytes(8 * HIST_BUCKETS))
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float):
+        if value < 0:
+            value = 0.0
+        self.counts[_bucket(int(value / self.unit))] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        if other.unit != self.unit:
+            raise ValueError("histogramas com unidades diferentes")
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentiles(self, points: Iterable[float] = PERCENTILES) -> Dict[str, float]:
+        # Valor no meio da faixa que contém cada percentil, limitado ao
+        # mínimo e ao máximo observados; uma única passada pelas faixas
+        points = sorted(points)
+        result = {}
+        if not self.count:
+            return {f"p{p:g}": 0.0 for p in points}
+        targets = [(p, max(1, math.ceil(p / 100 * self.count))) for p in points]
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while targets and seen >= targets[0][1]:
+                lowest, width = _bucket_range(index)
+                value = (lowest + width / 2) * self.unit
+                result[f"p{targets.pop(0)[0]:g}"] = min(max(value, self.min), self.max)
+            if not targets:
+                break
+        return result
+
+    def percentile(self, point: float) -> float:
+        return self.percentiles((point,))[f"p{point:g}"]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            **self.percentiles()
+        }
+
+    def to_dict(self) -> Dict:
+        # Forma JSON: só as faixas não vazias
+        return {
+            'unit': self.unit,
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'buckets': {str(index): count for index, count in enumerate(self.counts) if count}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyHistogram':
+        histogram = cls(data['unit'])
+        for index, count in data['buckets'].items():
+            histogram.counts[int(index)] = count
+        histogram.count = data['count']
+        histogram.total = data['sum']
+        histogram.min = data['min'] if histogram.count else math.inf
+        histogram.max = data['max']
+        return histogram
+
+
+def merge_histograms(histograms: Iterable[LatencyHistogram]) -> LatencyHistogram:
+    merged = LatencyHistogram()
+    for histogram in histograms:
+        merged.merge(histogram)
+    return merged
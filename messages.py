@@ -0,0 +1,33 @@
+import struct
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional, Set
+
+# Cabeçalho em claro no início do payload de MESSAGE: offset do fragmento na
+# mensagem(4) + tamanho total da mensagem(4)
+MESSAGE_HEADER = struct.Struct('!II')
+MESSAGE_HEADER_SIZE = MESSAGE_HEADER.size
+# Payload de FORWARD: quantos bytes de seq, a partir do seq do pacote, pular
+FORWARD_FORMAT = struct.Struct('!I')
+
+
+class MessageFragment(NamedTuple):
+    offset: int
+    size: int
+    total: int
+    data: object  # bytes ou Future de decifragem
+
+
+# Marca no buffer de recepção para faixas de seq abandonadas pelo remetente
+SKIPPED = object()
+
+
+@dataclass
+class OutgoingMessage:
+    first_seq: int
+    end_seq: int
+    deadline: Optional[float]              # tempo absoluto; None = sem prazo
+    max_retransmissions: Optional[int]     # None = sem limite próprio
+    pending: Set[int] = field(default_factory=set)  # seqs ainda sem ACK
+
+    def expired(self, now: float) -> bool:
+        return self.deadline is not None and now >= self.deadline
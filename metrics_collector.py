@@ -1,10 +1,15 @@
 import time
 import json
+import math
 import threading
+import itertools
+from array import array
 from dataclasses import dataclass, asdict
 from typing import Dict, List, Optional
 import statistics
 
+from histogram import LatencyHistogram
+
 @dataclass
 class PacketMetric:
     timestamp: float
@@ -24,16 +29,59 @@ class ThroughputSample:
     packets_in_flight: int
     estimated_throughput: float = 0  # bytes/segundo
 
+def summarize(experiment_name: str, rtts: List[float], total_packets: int, retransmissions: int,
+              bytes_sent: int, bytes_acked: int, samples: List[ThroughputSample],
+              start_time: float, rtt_histogram: Optional[LatencyHistogram] = None) -> Dict:
+    # Resumo comum aos coletores: rtts na ordem de envio dos pacotes; os
+    # percentis vêm de rtt_histogram ou, sem ele, de um montado com rtts
+    if rtt_histogram is None:
+        rtt_histogram = LatencyHistogram()
+        for rtt in rtts:
+            rtt_histogram.record(rtt)
+    if rtts:
+        avg_rtt = statistics.mean(rtts)
+        min_rtt = min(rtts)
+        max_rtt = max(rtts)
+        std_rtt = statistics.stdev(rtts) if len(rtts) > 1 else 0
+    else:
+        avg_rtt = min_rtt = max_rtt = std_rtt = 0
+    
+    # Calcular perda de pacotes
+    loss_rate = retransmissions / total_packets if total_packets > 0 else 0
+    
+    # Calcular throughput médio
+    throughputs = [s.estimated_throughput for s in samples if s.estimated_throughput > 0]
+    avg_throughput = statistics.mean(throughputs) if throughputs else 0
+    max_throughput = max(throughputs) if throughputs else 0
+    
+    return {
+        "experiment_name": experiment_name,
+        "total_packets_sent": total_packets,
+        "total_retransmissions": retransmissions,
+        "loss_rate": loss_rate,
+        "total_bytes_sent": bytes_sent,
+        "total_bytes_acked": bytes_acked,
+        "avg_rtt_seconds": avg_rtt,
+        "min_rtt_seconds": min_rtt,
+        "max_rtt_seconds": max_rtt,
+        "std_rtt_seconds": std_rtt,
+        "rtt_percentiles_seconds": rtt_histogram.percentiles(),
+        "avg_throughput_bps": avg_throughput * 8,  # Converter para bits/segundo
+        "max_throughput_bps": max_throughput * 8,
+        "duration_seconds": time.time() - start_time
+    }
+
 class MetricsCollector:
     def __init__(self, experiment_name: str = "experiment"):
         self.experiment_name = experiment_name
         self.packet_metrics: List[PacketMetric] = []
         self.throughput_samples: List[ThroughputSample] = []
         self.start_time = time.time()
-        self.last_sample_time = self.start_time
+        self.last_sample_time = 0.0  # relativo a start_time, como os timestamps
         self.bytes_sent_since_last = 0
         self.bytes_acked_since_last = 0
         self.lock = threading.Lock()
+        self.rtt_histogram = LatencyHistogram()
         
         # Estatísticas acumuladas
         self.total_packets_sent = 0
@@ -68,6 +116,7 @@ class MetricsCollector:
             for metric in reversed(self.packet_metrics):
                 if metric.seq_num == seq_num and metric.rtt is None:
                     metric.rtt = rtt
+                    self.rtt_histogram.record(rtt)
                     self.total_bytes_acked += metric.size
                     self.bytes_acked_since_last += metric.size
                     break
@@ -77,69 +126,231 @@ class MetricsCollector:
         time_delta = current_time - self.last_sample_time
         
         if time_delta > 0.1:  # Amostrar a cada 100ms
-            throughput = self.bytes_acked_since_last / time_delta if time_delta > 0 else 0
-            
+            with self.lock:
+                throughput = self.bytes_acked_since_last / time_delta if time_delta > 0 else 0
+                
+                sample = ThroughputSample(
+                    timestamp=current_time,
+                    bytes_sent=self.bytes_sent_since_last,
+                    bytes_acked=self.bytes_acked_since_last,
+                    packets_in_flight=packets_in_flight,
+                    estimated_throughput=throughput
+                )
+                self.throughput_samples.append(sample)
+                
+                # Resetar contadores
+                self.bytes_sent_since_last = 0
+                self.bytes_acked_since_last = 0
+                self.last_sample_time = current_time
+    
+    def get_summary_stats(self) -> Dict:
+        with self.lock:
+            rtts = [m.rtt for m in self.packet_metrics if m.rtt is not None]
+            return summarize(self.experiment_name, rtts, len(self.packet_metrics),
+                             self.total_retransmissions, self.total_bytes_sent,
+                             self.total_bytes_acked, self.throughput_samples, self.start_time,
+                             self.rtt_histogram)
+    
+    def save_to_file(self, filename: str = None):
+        if filename is None:
+            filename = f"{self.experiment_name}_metrics.json"
+        
+        data = {
+            "summary": self.get_summary_stats(),
+            "rtt_histogram": self.rtt_histogram.to_dict(),
+            "packet_metrics": [asdict(m) for m in self.packet_metrics],
+            "throughput_samples": [asdict(s) for s in self.throughput_samples]
+        }
+        
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=2)
+        
+        print(f"Métricas salvas em {filename}")
+        return filename
+
+class _SenderCounters:
+    # Contadores de uma thread: só ela escreve, a amostragem apenas soma
+    __slots__ = ('packets', 'retransmissions', 'bytes_sent', 'bytes_acked')
+
+    def __init__(self):
+        self.packets = self.retransmissions = self.bytes_sent = self.bytes_acked = 0
+
+
+class ColumnarMetricsCollector:
+    """Coletor com uma coluna (array) por campo em vez de um objeto por pacote.
+
+    As colunas são pré-alocadas e dobram de tamanho quando enchem; um índice
+    seq -> linha acha o pacote de um ACK em O(1). Os contadores ficam em uma
+    instância por thread e são somados na amostragem; no envio o lock só
+    protege o crescimento e a publicação do número de linhas.
+    Mesma interface de MetricsCollector; packet_metrics monta os PacketMetric
+    sob demanda.
+    """
+
+    INITIAL_ROWS = 4096
+    # Nome, typecode e valor das linhas ainda não escritas (NaN = sem RTT)
+    COLUMNS = (('timestamp', 'd', 0.0), ('seq_num', 'q', 0), ('size', 'l', 0),
+               ('is_retransmission', 'b', 0), ('rtt', 'd', math.nan),
+               ('congestion_window', 'd', 0.0), ('ssthresh', 'd', 0.0),
+               ('congestion_state', 'B', 0))
+
+    def __init__(self, experiment_name: str = "experiment", initial_rows: int = INITIAL_ROWS):
+        self.experiment_name = experiment_name
+        self.throughput_samples: List[ThroughputSample] = []
+        self.start_time = time.time()
+        self.last_sample_time = 0.0  # relativo a start_time, como os timestamps
+        self.lock = threading.Lock()  # crescimento das colunas, registro de threads e amostras
+        self.rtt_histogram = LatencyHistogram()  # só a thread de ACKs escreve
+
+        self._capacity = 0
+        self._columns = {name: array(code) for name, code, _ in self.COLUMNS}
+        self._grow(max(1, initial_rows))
+        self._next_row = itertools.count()  # next() é atômico: threads de envio não colidem
+        self._length = 0
+        self._index: Dict[int, int] = {}    # seq ainda sem ACK -> última linha com ele
+        self._states = {}                   # congestion_state -> código da coluna
+        self._state_names: List[str] = []
+
+        self._local = threading.local()
+        self._counters: List[_SenderCounters] = []
+        self._sampled_sent = 0
+        self._sampled_acked = 0
+
+    def _grow(self, rows: int):
+        # Sob self.lock; extend cresce cada array no lugar, então escritas
+        # concorrentes em linhas já alocadas continuam valendo
+        for name, code, fill in self.COLUMNS:
+            self._columns[name].extend(array(code, [fill]) * rows)
+        self._capacity += rows
+
+    def _thread_counters(self) -> _SenderCounters:
+        counters = getattr(self._local, 'counters', None)
+        if counters is None:
+            counters = self._local.counters = _SenderCounters()
+            with self.lock:
+                self._counters.append(counters)
+        return counters
+
+    def _state_code(self, state: str) -> int:
+        code = self._states.get(state)
+        if code is None:
+            with self.lock:
+                code = self._states.get(state)
+                if code is None:
+                    code = self._states[state] = len(self._state_names)
+                    self._state_names.append(state)
+        return code
+
+    def record_packet_sent(self, seq_num: int, size: int, is_retransmission: bool,
+                          congestion_window: float, ssthresh: float, congestion_state: str):
+        row = next(self._next_row)
+        if row >= self._capacity:
+            with self.lock:
+                while row >= self._capacity:
+                    self._grow(self._capacity)
+        columns = self._columns
+        columns['timestamp'][row] = time.time() - self.start_time
+        columns['seq_num'][row] = seq_num
+        columns['size'][row] = size
+        columns['is_retransmission'][row] = is_retransmission
+        columns['congestion_window'][row] = congestion_window
+        columns['ssthresh'][row] = ssthresh
+        columns['congestion_state'][row] = self._state_code(congestion_state)
+        self._index[seq_num] = row
+        with self.lock:
+            # max: outra thread pode já ter publicado uma linha maior
+            self._length = max(self._length, row + 1)
+
+        counters = self._thread_counters()
+        counters.packets += 1
+        counters.bytes_sent += size
+        if is_retransmission:
+            counters.retransmissions += 1
+
+    def record_ack_received(self, seq_num: int, rtt: float):
+        row = self._index.pop(seq_num, None)
+        if row is None:
+            return
+        self._columns['rtt'][row] = rtt
+        self.rtt_histogram.record(rtt)
+        self._thread_counters().bytes_acked += self._columns['size'][row]
+
+    def _totals(self):
+        with self.lock:
+            counters = list(self._counters)
+        return (sum(c.packets for c in counters), sum(c.retransmissions for c in counters),
+                sum(c.bytes_sent for c in counters), sum(c.bytes_acked for c in counters))
+
+    @property
+    def total_packets_sent(self) -> int:
+        return self._totals()[0]
+
+    @property
+    def total_retransmissions(self) -> int:
+        return self._totals()[1]
+
+    @property
+    def total_bytes_sent(self) -> int:
+        return self._totals()[2]
+
+    @property
+    def total_bytes_acked(self) -> int:
+        return self._totals()[3]
+
+    def sample_throughput(self, packets_in_flight: int):
+        current_time = time.time() - self.start_time
+        time_delta = current_time - self.last_sample_time
+        
+        if time_delta > 0.1:  # Amostrar a cada 100ms
+            _, _, bytes_sent, bytes_acked = self._totals()
             sample = ThroughputSample(
                 timestamp=current_time,
-                bytes_sent=self.bytes_sent_since_last,
-                bytes_acked=self.bytes_acked_since_last,
+                bytes_sent=bytes_sent - self._sampled_sent,
+                bytes_acked=bytes_acked - self._sampled_acked,
                 packets_in_flight=packets_in_flight,
-                estimated_throughput=throughput
+                estimated_throughput=(bytes_acked - self._sampled_acked) / time_delta
             )
             self.throughput_samples.append(sample)
-            
-            # Resetar contadores
-            self.bytes_sent_since_last = 0
-            self.bytes_acked_since_last = 0
+            self._sampled_sent, self._sampled_acked = bytes_sent, bytes_acked
             self.last_sample_time = current_time
-    
+
+    def columns(self) -> Dict[str, array]:
+        # Cópia das linhas escritas, coluna a coluna (numpy.frombuffer aceita
+        # cada uma sem conversão); congestion_state vem como código, ver state_names
+        with self.lock:
+            n = self._length
+            return {name: column[:n] for name, column in self._columns.items()}
+
+    @property
+    def state_names(self) -> List[str]:
+        return list(self._state_names)
+
+    @property
+    def packet_metrics(self) -> List[PacketMetric]:
+        columns = self.columns()
+        states = self.state_names
+        return [PacketMetric(timestamp, seq, size, bool(retx), None if rtt != rtt else rtt,
+                             cwnd, ssthresh, states[state])
+                for timestamp, seq, size, retx, rtt, cwnd, ssthresh, state in zip(
+                    *(columns[name] for name, _, _ in self.COLUMNS))]
+
     def get_summary_stats(self) -> Dict:
         with self.lock:
-            # Calcular estatísticas de RTT
-            rtts = [m.rtt for m in self.packet_metrics if m.rtt is not None]
-            
-            if rtts:
-                avg_rtt = statistics.mean(rtts)
-                min_rtt = min(rtts)
-                max_rtt = max(rtts)
-                std_rtt = statistics.stdev(rtts) if len(rtts) > 1 else 0
-            else:
-                avg_rtt = min_rtt = max_rtt = std_rtt = 0
-            
-            # Calcular perda de pacotes
-            total_packets = len(self.packet_metrics)
-            loss_rate = self.total_retransmissions / total_packets if total_packets > 0 else 0
-            
-            # Calcular throughput médio
-            if self.throughput_samples:
-                throughputs = [s.estimated_throughput for s in self.throughput_samples if s.estimated_throughput > 0]
-                avg_throughput = statistics.mean(throughputs) if throughputs else 0
-                max_throughput = max(throughputs) if throughputs else 0
-            else:
-                avg_throughput = max_throughput = 0
-            
-            return {
-                "experiment_name": self.experiment_name,
-                "total_packets_sent": total_packets,
-                "total_retransmissions": self.total_retransmissions,
-                "loss_rate": loss_rate,
-                "total_bytes_sent": self.total_bytes_sent,
-                "total_bytes_acked": self.total_bytes_acked,
-                "avg_rtt_seconds": avg_rtt,
-                "min_rtt_seconds": min_rtt,
-                "max_rtt_seconds": max_rtt,
-                "std_rtt_seconds": std_rtt,
-                "avg_throughput_bps": avg_throughput * 8,  # Converter para bits/segundo
-                "max_throughput_bps": max_throughput * 8,
-                "duration_seconds": time.time() - self.start_time
-            }
-    
+            n = self._length
+            rtts = self._columns['rtt'][:n]
+        rtts = [rtt for rtt in rtts if rtt == rtt]
+        _, retransmissions, bytes_sent, bytes_acked = self._totals()
+        return summarize(self.experiment_name, rtts, n, retransmissions,
+                         bytes_sent, bytes_acked, self.throughput_samples, self.start_time,
+                         self.rtt_histogram)
+
     def save_to_file(self, filename: str = None):
         if filename is None:
             filename = f"{self.experiment_name}_metrics.json"
         
         data = {
             "summary": self.get_summary_stats(),
+            "rtt_histogram": self.rtt_histogram.to_dict(),
             "packet_metrics": [asdict(m) for m in self.packet_metrics],
             "throughput_samples": [asdict(s) for s in self.throughput_samples]
         }
@@ -148,4 +359,4 @@ class MetricsCollector:
             json.dump(data, f, indent=2)
         
         print(f"Métricas salvas em {filename}")
-        return filename
\ No newline at end of file
+        return filename
@@ -0,0 +1,529 @@
+import atexit
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Dict, List, Optional
+
+from histogram import LatencyHistogram
+from metrics_collector import PacketMetric, ThroughputSample, summarize
+
+# Exportação em fluxo das métricas: cada evento (pacote enviado, ACK, amostra
+# de throughput) vira um registro binário de tamanho fixo num anel em memória;
+# uma thread o descarrega periodicamente num log só de acréscimo, com rotação.
+# A memória fica limitada ao anel, qualquer que seja a duração da transferência
+
+# Registro: tipo(1) + estado(1) + flags(2) + tamanho(4) + timestamp(8) + seq(8) + a, b, c(8 cada)
+RECORD = struct.Struct('<BBHIdqddd')
+KIND_SENT = 1     # a = cwnd, b = ssthresh; flags = retransmissão
+KIND_ACK = 2      # seq confirmado, tamanho do pacote, a = RTT
+KIND_SAMPLE = 3   # seq = pacotes em voo, a = bytes enviados, b = bytes confirmados, c = throughput
+KIND_STATE = 4    # estado = código, nome (UTF-8, tamanho bytes) a partir de STATE_NAME_OFFSET
+STATE_NAME_OFFSET = 16
+STATE_NAME_MAX = RECORD.size - STATE_NAME_OFFSET
+# Cabeçalho de cada arquivo, do tamanho de um registro: assinatura + start_time
+LOG_MAGIC = b'TRUMLOG1'
+LOG_HEADER = struct.Struct(f'<8sd{RECORD.size - 16}x')
+
+METRICS_RING_RECORDS = 1 << 16          # 3 MiB de anel
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_ROTATE_BYTES = 64 << 20
+METRICS_KEEP_FILES = 4                  # arquivos rotacionados mantidos além do atual
+METRICS_RECENT_SAMPLES = 600            # amostras de throughput em memória (monitor/gráficos)
+METRICS_RETRY_MAX = 30.0                # espera máxima entre tentativas após erro de escrita (s)
+
+
+def log_files(path: str) -> List[str]:
+    # Arquivos do log em ordem cronológica: path.N, ..., path.1, path
+    rotated = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        rotated.append(f"{path}.{index}")
+        index += 1
+    files = rotated[::-1]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+class MetricsLogWriter:
+    """Anel de registros descarregado em segundo plano num log com rotação.
+
+    append deve ser chamado com self.lock; se o anel encher antes da thread
+    de descarga, quem escreve descarrega na hora em vez de sobrescrever.
+    Com o arquivo falhando, a thread tenta de novo com espera crescente e o
+    anel cheio descarta os registros mais antigos (stats['dropped']): o
+    envio nunca faz E/S nem vê a exceção.
+    """
+
+    def __init__(self, path: str, start_time: float, ring_records: int = METRICS_RING_RECORDS,
+                 flush_interval: float = METRICS_FLUSH_INTERVAL,
+                 rotate_bytes: int = METRICS_ROTATE_BYTES, keep_files: int = METRICS_KEEP_FILES):
+        self.path = path
+        self.start_time = start_time
+        self.ring_records = ring_records
+        self.ring = bytearray(ring_records * RECORD.size)
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.keep_files = keep_files
+        self.lock = threading.Lock()        # anel e contadores head/flushed
+        self._io_lock = threading.Lock()    # arquivo e rotação
+        self.head = 0       # registros já escritos no anel
+        self.flushed = 0    # registros já copiados para o arquivo
+        self.states = {}    # nome -> código, repetidos no início de cada arquivo
+        self.stats = {'records': 0, 'bytes': 0, 'flushes': 0, 'inline_flushes': 0, 'rotations': 0,
+                      'errors': 0, 'dropped': 0}
+        self.error: Optional[OSError] = None   # última falha de escrita, até a próxima bem-sucedida
+
+        existing = log_files(path)
+        if existing:
+            # Nunca apagar nem misturar o log de outra execução
+            raise FileExistsError(f"log de métricas já existe: {', '.join(existing)}")
+        self._file = self._open()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _open(self, append: bool = False):
+        # append: reabertura após erro, mantendo o que já foi gravado
+        f = open(self.path, 'ab' if append else 'wb')
+        if f.tell() == 0:
+            f.write(LOG_HEADER.pack(LOG_MAGIC, self.start_time))
+            for name, code in self.states.items():
+                f.write(self._state_record(code, name))
+        self._file_bytes = f.tell()
+        return f
+
+    @staticmethod
+    def _state_record(code: int, name: str) -> bytes:
+        encoded = name.encode('utf-8')[:STATE_NAME_MAX]
+        record = bytearray(RECORD.pack(KIND_STATE, code, 0, len(encoded), 0.0, 0, 0.0, 0.0, 0.0))
+        record[STATE_NAME_OFFSET:STATE_NAME_OFFSET + len(encoded)] = encoded
+        return bytes(record)
+
+    def state_code(self, name: str) -> int:
+        # Sob self.lock: código do estado, registrando o nome na primeira vez
+        code = self.states.get(name)
+        if code is None:
+            code = self.states[name] = len(self.states) & 0xFF
+            self._append_raw(self._state_record(code, name))
+        return code
+
+    def _reserve(self) -> int:
+        # Sob self.lock: offset do próximo registro no anel
+        while self.head - self.flushed >= self.ring_records:
+            if self.error is not None:
+                # Arquivo falhando: perder o registro mais antigo, sem E/S aqui
+                self.flushed += 1
+                self.stats['dropped'] += 1
+                break
+            # Anel cheio: descarregar aqui mesmo (o lock é liberado durante a escrita)
+            self.stats['inline_flushes'] += 1
+            self.lock.release()
+            try:
+                self.flush()
+            finally:
+                self.lock.acquire()
+        offset = (self.head % self.ring_records) * RECORD.size
+        self.head += 1
+        if self.head - self.flushed >= self.ring_records // 2:
+            self._wake.set()
+        return offset
+
+    def _append_raw(self, record: bytes):
+        offset = self._reserve()
+        self.ring[offset:offset + RECORD.size] = record
+
+    def append(self, kind: int, state: int, flags: int, size: int, timestamp: float,
+               seq: int, a: float, b: float, c: float):
+        head = self.head
+        if head - self.flushed >= self.ring_records // 2:
+            offset = self._reserve()
+        else:
+            # Caminho comum, sem a checagem de anel cheio nem o aviso à thread
+            self.head = head + 1
+            offset = (head % self.ring_records) * RECORD.size
+        RECORD.pack_into(self.ring, offset, kind, state, flags, size, timestamp, seq, a, b, c)
+
+    def recent(self) -> bytes:
+        # Registros ainda no anel (os últimos ring_records), em ordem
+        with self.lock:
+            first = max(0, self.head - self.ring_records)
+            return self._copy(first, self.head)
+
+    def _copy(self, first: int, end: int) -> bytes:
+        start = (first % self.ring_records) * RECORD.size
+        length = (end - first) * RECORD.size
+        if start + length <= len(self.ring):
+            return bytes(self.ring[start:start + length])
+        return bytes(self.ring[start:]) + bytes(self.ring[:start + length - len(self.ring)])
+
+    def flush(self) -> bool:
+        # Grava o que está no anel; False (sem exceção) se o arquivo falhou
+        with self._io_lock:
+            if self._file is None and self._closed and self._thread is None:
+                return True  # já fechado
+            with self.lock:
+                end = self.head
+                chunk = self._copy(self.flushed, end)
+            if not chunk:
+                return True
+            try:
+                if self._file is None:
+                    # Reabrir após erro, descartando um registro gravado pela metade
+                    if os.path.exists(self.path) and os.path.getsize(self.path) > self._file_bytes:
+                        os.truncate(self.path, self._file_bytes)
+                    self._file = self._open(append=True)
+                self._file.write(chunk)
+                self._file.flush()
+            except OSError as e:
+                self._fail(e)
+                return False
+            with self.lock:
+                # Registros descartados enquanto isto corria já avançaram flushed
+                self.flushed = max(self.flushed, end)
+            self._file_bytes += len(chunk)
+            self.stats['records'] += len(chunk) // RECORD.size
+            self.stats['bytes'] += len(chunk)
+            self.stats['flushes'] += 1
+            if self.error is not None:
+                print(f"[METRICS] Log de métricas voltou a gravar ({self.stats['dropped']} registros perdidos)")
+                self.error = None
+            if self._file_bytes >= self.rotate_bytes:
+                try:
+                    self._rotate()
+                except OSError as e:
+                    self._fail(e)
+            return True
+
+    def _fail(self, error: OSError):
+        # Sob _io_lock: fecha o arquivo; a próxima descarga o reabre
+        if self.error is None:
+            print(f"[METRICS] Erro ao gravar o log de métricas: {error}")
+        self.error = error
+        self.stats['errors'] += 1
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _rotate(self):
+        # Sob _io_lock: path -> path.1 -> path.2 ..., descartando além de keep_files
+        self._file.close()
+        rotated = log_files(self.path)[:-1][::-1]  # path.1, path.2, ...
+        for index in range(len(rotated), 0, -1):
+            name = f"{self.path}.{index}"
+            if index >= self.keep_files:
+                os.remove(name)
+            else:
+                os.replace(name, f"{self.path}.{index + 1}")
+        if self.keep_files > 0:
+            os.replace(self.path, f"{self.path}.1")
+        with self.lock:
+            self._file = self._open()
+        self.stats['rotations'] += 1
+
+    def _flush_loop(self):
+        delay = self.flush_interval
+        while not self._closed:
+            self._wake.wait(delay)
+            self._wake.clear()
+            # Após erro, tentativas com espera dobrando até METRICS_RETRY_MAX
+            delay = self.flush_interval if self.flush() else min(delay * 2, METRICS_RETRY_MAX)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5.0)
+        self.flush()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread = None
+        atexit.unregister(self.close)
+
+
+def _decode(view, states: dict, packets: Optional[dict], samples: Optional[list], columns=None,
+            pending=None):
+    # Percorre registros de view: nomes de estado vão para states, amostras
+    # para samples e pacotes (com o RTT do ACK) para columns
+    for index, (kind, state, flags, size, timestamp, seq, a, b, c) in enumerate(RECORD.iter_unpack(view)):
+        if kind == KIND_SENT:
+            if columns is not None:
+                row = len(columns['seq_num'])
+                for name, value in (('timestamp', timestamp), ('seq_num', seq), ('size', size),
+                                    ('is_retransmission', flags & 1), ('rtt', math.nan),
+                                    ('congestion_window', a), ('ssthresh', b), ('congestion_state', state)):
+                    columns[name].append(value)
+                pending[seq] = row
+        elif kind == KIND_ACK:
+            if columns is not None:
+                row = pending.pop(seq, None)
+                if row is not None:
+                    columns['rtt'][row] = a
+        elif kind == KIND_SAMPLE:
+            if samples is not None:
+                samples.append(ThroughputSample(timestamp, int(a), int(b), seq, c))
+        elif kind == KIND_STATE:
+            offset = index * RECORD.size + STATE_NAME_OFFSET
+            states[state] = bytes(view[offset:offset + size]).decode('utf-8', 'replace')
+
+
+def _empty_columns() -> Dict[str, array]:
+    return {'timestamp': array('d'), 'seq_num': array('q'), 'size': array('l'),
+            'is_retransmission': array('b'), 'rtt': array('d'), 'congestion_window': array('d'),
+            'ssthresh': array('d'), 'congestion_state': array('B')}
+
+
+class MetricsLog:
+    """Leitura de um log de métricas (com os arquivos rotacionados) via mmap.
+
+    records() percorre os registros direto do mapeamento; columns() monta as
+    colunas dos pacotes com o RTT de cada ACK, como ColumnarMetricsCollector.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files = log_files(path)
+        if not self.files:
+            raise FileNotFoundError(path)
+        self._maps = []
+        self.start_time = None
+        for name in self.files:
+            with open(name, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < LOG_HEADER.size:
+                    continue
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, start_time = LOG_HEADER.unpack_from(mapped)
+            if magic != LOG_MAGIC:
+                mapped.close()
+                raise ValueError(f"{name} não é um log de métricas")
+            if self.start_time is None:
+                self.start_time = start_time
+            self._maps.append(mapped)
+        self.state_names = {}
+
+    def _views(self):
+        for mapped in self._maps:
+            usable = (len(mapped) - LOG_HEADER.size) // RECORD.size * RECORD.size
+            yield memoryview(mapped)[LOG_HEADER.size:LOG_HEADER.size + usable]
+
+    def __len__(self) -> int:
+        return sum(len(view) // RECORD.size for view in self._views())
+
+    def records(self):
+        # Tuplas (tipo, estado, flags, tamanho, timestamp, seq, a, b, c)
+        for view in self._views():
+            yield from RECORD.iter_unpack(view)
+            view.release()
+
+    def columns(self) -> Dict[str, array]:
+        columns, pending = _empty_columns(), {}
+        for view in self._views():
+            _decode(view, self.state_names, None, None, columns, pending)
+            view.release()
+        return columns
+
+    def throughput_samples(self) -> List[ThroughputSample]:
+        samples = []
+        for view in self._views():
+            _decode(view, self.state_names, None, samples)
+            view.release()
+        return samples
+
+    def packet_metrics(self) -> List[PacketMetric]:
+        return _packet_metrics(self.columns(), self.state_names)
+
+    def summary(self, experiment_name: str = "experiment") -> Dict:
+        # Mesmo resumo de get_summary_stats, recalculado a partir do log
+        columns = self.columns()
+        rtts = [rtt for rtt in columns['rtt'] if rtt == rtt]
+        sizes = columns['size']
+        acked = sum(size for size, rtt in zip(sizes, columns['rtt']) if rtt == rtt)
+        summary = summarize(experiment_name, rtts, len(sizes), sum(columns['is_retransmission']),
+                            sum(sizes), acked, self.throughput_samples(), self.start_time or 0.0)
+        summary['duration_seconds'] = max(columns['timestamp'], default=0.0)
+        return summary
+
+    def close(self):
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _packet_metrics(columns: Dict[str, array], state_names: dict) -> List[PacketMetric]:
+    return [PacketMetric(timestamp, seq, size, bool(retx), None if rtt != rtt else rtt,
+                         cwnd, ssthresh, state_names.get(state, ''))
+            for timestamp, seq, size, retx, rtt, cwnd, ssthresh, state in zip(
+                columns['timestamp'], columns['seq_num'], columns['size'],
+                columns['is_retransmission'], columns['rtt'], columns['congestion_window'],
+                columns['ssthresh'], columns['congestion_state'])]
+
+
+class StreamingMetricsCollector:
+    """Coletor de memória constante: eventos vão para um MetricsLogWriter.
+
+    O resumo usa agregados corridos (média e desvio de Welford); em memória
+    ficam só os pacotes sem ACK, o anel e as últimas amostras de throughput.
+    packet_metrics devolve os pacotes ainda no anel; o histórico completo
+    se lê com MetricsLog(path).
+    """
+
+    def __init__(self, path: str, experiment_name: str = "experiment",
+                 ring_records: int = METRICS_RING_RECORDS,
+                 flush_interval: float = METRICS_FLUSH_INTERVAL,
+                 rotate_bytes: int = METRICS_ROTATE_BYTES, keep_files: int = METRICS_KEEP_FILES):
+        self.experiment_name = experiment_name
+        self.path = path
+        self.start_time = time.time()
+        self.last_sample_time = 0.0  # relativo a start_time, como os timestamps
+        self.log = MetricsLogWriter(path, self.start_time, ring_records, flush_interval,
+                                    rotate_bytes, keep_files)
+        self.lock = self.log.lock
+        self.throughput_samples = deque(maxlen=METRICS_RECENT_SAMPLES)
+        self._in_flight: Dict[int, int] = {}   # seq sem ACK -> tamanho
+
+        self.total_packets_sent = 0
+        self.total_retransmissions = 0
+        self.total_bytes_sent = 0
+        self.total_bytes_acked = 0
+        self.bytes_sent_since_last = 0
+        self.bytes_acked_since_last = 0
+        # RTT: contagem, média, soma dos quadrados dos desvios, mínimo, máximo
+        self._rtt_count = 0
+        self._rtt_mean = 0.0
+        self._rtt_m2 = 0.0
+        self._rtt_min = math.inf
+        self._rtt_max = -math.inf
+        self.rtt_histogram = LatencyHistogram()
+        # Throughput positivo: contagem, soma, máximo
+        self._tp_count = 0
+        self._tp_sum = 0.0
+        self._tp_max = 0.0
+
+    def record_packet_sent(self, seq_num: int, size: int, is_retransmission: bool,
+                          congestion_window: float, ssthresh: float, congestion_state: str):
+        timestamp = time.time() - self.start_time
+        with self.lock:
+            state = self.log.states.get(congestion_state)
+            if state is None:
+                state = self.log.state_code(congestion_state)
+            self.log.append(KIND_SENT, state, int(is_retransmission), size, timestamp, seq_num,
+                            congestion_window, ssthresh, 0.0)
+            self._in_flight[seq_num] = size
+            self.total_packets_sent += 1
+            self.total_bytes_sent += size
+            self.bytes_sent_since_last += size
+            if is_retransmission:
+                self.total_retransmissions += 1
+
+    def record_ack_received(self, seq_num: int, rtt: float):
+        timestamp = time.time() - self.start_time
+        with self.lock:
+            size = self._in_flight.pop(seq_num, None)
+            if size is None:
+                return
+            self.log.append(KIND_ACK, 0, 0, size, timestamp, seq_num, rtt, 0.0, 0.0)
+            self.total_bytes_acked += size
+            self.bytes_acked_since_last += size
+            self._rtt_count += 1
+            delta = rtt - self._rtt_mean
+            self._rtt_mean += delta / self._rtt_count
+            self._rtt_m2 += delta * (rtt - self._rtt_mean)
+            if rtt < self._rtt_min:
+                self._rtt_min = rtt
+            if rtt > self._rtt_max:
+                self._rtt_max = rtt
+            self.rtt_histogram.record(rtt)
+
+    def sample_throughput(self, packets_in_flight: int):
+        current_time = time.time() - self.start_time
+        time_delta = current_time - self.last_sample_time
+
+        if time_delta > 0.1:  # Amostrar a cada 100ms
+            with self.lock:
+                throughput = self.bytes_acked_since_last / time_delta
+                sample = ThroughputSample(current_time, self.bytes_sent_since_last,
+                                          self.bytes_acked_since_last, packets_in_flight, throughput)
+                self.log.append(KIND_SAMPLE, 0, 0, 0, current_time, packets_in_flight,
+                                sample.bytes_sent, sample.bytes_acked, throughput)
+                self.throughput_samples.append(sample)
+                if throughput > 0:
+                    self._tp_count += 1
+                    self._tp_sum += throughput
+                    self._tp_max = max(self._tp_max, throughput)
+                self.bytes_sent_since_last = 0
+                self.bytes_acked_since_last = 0
+                self.last_sample_time = current_time
+
+    def get_summary_stats(self) -> Dict:
+        with self.lock:
+            count = self._rtt_count
+            avg_throughput = self._tp_sum / self._tp_count if self._tp_count else 0
+            return {
+                "experiment_name": self.experiment_name,
+                "total_packets_sent": self.total_packets_sent,
+                "total_retransmissions": self.total_retransmissions,
+                "loss_rate": self.total_retransmissions / self.total_packets_sent if self.total_packets_sent else 0,
+                "total_bytes_sent": self.total_bytes_sent,
+                "total_bytes_acked": self.total_bytes_acked,
+                "avg_rtt_seconds": self._rtt_mean if count else 0,
+                "min_rtt_seconds": self._rtt_min if count else 0,
+                "max_rtt_seconds": self._rtt_max if count else 0,
+                "std_rtt_seconds": math.sqrt(self._rtt_m2 / (count - 1)) if count > 1 else 0,
+                "rtt_percentiles_seconds": self.rtt_histogram.percentiles(),
+                "avg_throughput_bps": avg_throughput * 8,  # Converter para bits/segundo
+                "max_throughput_bps": self._tp_max * 8,
+                "duration_seconds": time.time() - self.start_time
+            }
+
+    @property
+    def packet_metrics(self) -> List[PacketMetric]:
+        states = {code: name for name, code in self.log.states.items()}
+        columns = _empty_columns()
+        _decode(self.log.recent(), {}, None, None, columns, {})
+        return _packet_metrics(columns, states)
+
+    def flush(self):
+        self.log.flush()
+
+    def close(self):
+        self.log.close()
+
+    def save_to_file(self, filename: str = None):
+        # O histórico já está no log: o JSON leva o resumo e onde encontrá-lo
+        if filename is None:
+            filename = f"{self.experiment_name}_metrics.json"
+        self.flush()
+        data = {
+            "summary": self.get_summary_stats(),
+            "log_files": log_files(self.path),
+            "log_stats": dict(self.log.stats),
+            "rtt_histogram": self.rtt_histogram.to_dict(),
+            "throughput_samples": [vars(s) for s in self.throughput_samples]
+        }
+
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=2)
+
+        print(f"Métricas salvas em {filename}")
+        return filename
@@ -0,0 +1,490 @@
+import hashlib
+import mmap
+import os
+import random
+import socket
+import struct
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+from packet import TRUPacket, PacketType
+from pacing import Pacer
+
+# Distribuição multicast (no estilo do NORM): o remetente envia cada segmento
+# uma vez ao grupo e depois, em rodadas, pede relatórios aos receptores, junta
+# os NACKs de todos e repete cada segmento perdido uma única vez, ou a paridade
+# XOR do grupo de segmentos quando ela sozinha repara todos os receptores.
+# Não há troca de chaves com o grupo, então os dados vão em claro: a
+# integridade vem do CRC-32 de cada pacote e do SHA-256 do objeto
+MCAST_SEGMENT_SIZE = 1400
+# Sem controle de congestionamento no grupo: a taxa de envio é fixa (bytes/s)
+MCAST_DEFAULT_RATE = 10e6
+# Segmentos cobertos por uma paridade (0 = sem FEC)
+MCAST_FEC_GROUP = 16
+MCAST_ANNOUNCE_INTERVAL = 0.2
+# Espera máxima por relatórios em cada rodada de reparo (s)
+MCAST_NACK_WINDOW = 0.2
+# Atraso aleatório dos relatórios, para não chegarem todos juntos ao remetente
+MCAST_REPORT_JITTER = 0.02
+# Rodadas seguidas sem relatório antes de o receptor ser dado como perdido
+MCAST_MAX_SILENT_ROUNDS = 10
+MCAST_FINISH_REPEATS = 3
+# Receptor concluído sai depois deste tempo sem pacotes se o fim da sessão se perder
+MCAST_LINGER = 5.0
+MCAST_RECV_BUFFER = 4 << 20
+MCAST_TTL = 1
+# Limites aceitos num MCAST_ANNOUNCE: o anúncio não é autenticado, e sem eles
+# um pacote forjado faria o receptor alocar o mapa de segmentos, criar o
+# arquivo e recuperar paridades de tamanho arbitrário
+MCAST_MAX_SEGMENT_SIZE = 65507 - TRUPacket.HEADER_SIZE  # maior payload UDP
+MCAST_MAX_FEC_GROUP = 256
+MCAST_MAX_SEGMENTS = 1 << 26
+
+# Payload de MCAST_ANNOUNCE: tamanho(8) + segmento(4) + grupo FEC(2) + flags(1) + rodada(4) + SHA-256(32)
+ANNOUNCE = struct.Struct('!QIHBI32s')
+ANNOUNCE_POLL = 0x01      # receptores devem responder com NACK ou conclusão
+ANNOUNCE_FINISHED = 0x02  # sessão encerrada
+# Payload de MCAST_REPORT: tipo(1) + corpo; seq do pacote = rodada respondida
+REPORT_JOIN = 1
+REPORT_NACK = 2           # faixas (primeiro segmento, quantidade) que faltam
+REPORT_DONE = 3           # 1 byte: SHA-256 conferido
+NACK_RANGE = struct.Struct('!II')
+MAX_NACK_RANGES = (MCAST_SEGMENT_SIZE - 1) // NACK_RANGE.size
+
+
+def parse_group(spec: str) -> Tuple[str, int]:
+    # 'GRUPO:PORTA' -> (grupo, porta)
+    group, _, port = spec.rpartition(':')
+    try:
+        first_octet = socket.inet_aton(group)[0]
+    except OSError:
+        first_octet = 0
+    if not port.isdigit() or not 224 <= first_octet <= 239:
+        raise ValueError(f"grupo multicast inválido: {spec!r} (esperado GRUPO:PORTA, 224.0.0.0/4)")
+    return group, int(port)
+
+
+def _packet(packet_type: int, seq: int, session: int, data) -> bytes:
+    # Campo checksum leva o CRC-32 do payload
+    return TRUPacket(seq_num=seq, ack_num=session, packet_type=packet_type, window=0,
+                     checksum=zlib.crc32(data), timestamp=time.time(), iv=b'',
+                     data=data).serialize()
+
+
+def _parse(data: bytes):
+    try:
+        packet = TRUPacket.deserialize(data)
+    except ValueError:
+        return None
+    if packet.aead or packet.checksum != zlib.crc32(packet.data):
+        return None
+    return packet
+
+
+def xor_blocks(blocks, size: int) -> bytes:
+    # Blocos menores que size contam como completados com zeros
+    acc = 0
+    for block in blocks:
+        acc ^= int.from_bytes(block, 'little')
+    return acc.to_bytes(size, 'little')
+
+
+def nack_ranges(missing) -> List[Tuple[int, int]]:
+    ranges = []
+    for index in missing:
+        if ranges and ranges[-1][0] + ranges[-1][1] == index:
+            ranges[-1] = (ranges[-1][0], ranges[-1][1] + 1)
+        else:
+            ranges.append((index, 1))
+    return ranges
+
+
+@dataclass
+class Member:
+    addr: Tuple[str, int]
+    last_round: int = -1
+    silent_rounds: int = 0
+    missing: Set[int] = field(default_factory=set)
+    done: bool = False
+    ok: bool = False
+    dropped: bool = False
+
+
+class MulticastSender:
+    """Envia um arquivo uma vez a um grupo multicast e repara as perdas por rodadas de NACK."""
+
+    def __init__(self, group: str, port: int, interface: str = '0.0.0.0',
+                 rate: float = MCAST_DEFAULT_RATE, fec_group: int = MCAST_FEC_GROUP,
+                 segment_size: int = MCAST_SEGMENT_SIZE, ttl: int = MCAST_TTL,
+                 nack_window: float = MCAST_NACK_WINDOW):
+        self.group = (group, port)
+        self.fec_group = fec_group
+        self.segment_size = segment_size
+        self.nack_window = nack_window
+        self.session = random.getrandbits(32)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+        self.sock.bind(('', 0))
+        self.pacer = Pacer(mss=segment_size)
+        self.pacer.rate = rate
+        self.members: Dict[Tuple[str, int], Member] = {}
+        self.stats = {}
+
+    def _send(self, packet: bytes):
+        self.pacer.wait(len(packet))
+        self.sock.sendto(packet, self.group)
+        self.stats['packets'] += 1
+        self.stats['bytes'] += len(packet)
+
+    def _announce(self, flags: int, round_: int):
+        self._send(_packet(PacketType.MCAST_ANNOUNCE, 0, self.session,
+                           ANNOUNCE.pack(self.size, self.segment_size, self.fec_group, flags,
+                                         round_, self.digest)))
+
+    def _segment(self, index: int):
+        return self.view[index * self.segment_size:(index + 1) * self.segment_size]
+
+    def _send_segment(self, index: int):
+        self._send(_packet(PacketType.MCAST_DATA, index, self.session, self._segment(index)))
+
+    def _send_parity(self, group: int):
+        first = group * self.fec_group
+        last = min(self.count, first + self.fec_group)
+        parity = xor_blocks((self._segment(i) for i in range(first, last)), self.segment_size)
+        self._send(_packet(PacketType.MCAST_PARITY, group, self.session, parity))
+
+    def _handle_report(self, data: bytes, addr):
+        packet = _parse(data)
+        if not packet or packet.packet_type != PacketType.MCAST_REPORT or packet.ack_num != self.session:
+            return
+        if not packet.data:
+            return
+        member = self.members.get(addr)
+        if member is None:
+            member = self.members[addr] = Member(addr)
+            print(f"[MCAST] Receptor {addr[0]}:{addr[1]} entrou ({len(self.members)} no grupo)")
+        kind = packet.data[0]
+        self.stats['reports'] += 1
+        if kind == REPORT_NACK:
+            self.stats['nacks'] += 1
+            member.missing = set()
+            body = packet.data[1:]
+            for offset in range(0, len(body) - NACK_RANGE.size + 1, NACK_RANGE.size):
+                first, count = NACK_RANGE.unpack_from(body, offset)
+                member.missing.update(range(first, min(first + count, self.count)))
+        elif kind == REPORT_DONE:
+            if not member.done:
+                member.ok = packet.data[1:2] == b'\x01'
+                print(f"[MCAST] Receptor {addr[0]}:{addr[1]} concluiu "
+                      f"({'SHA-256 conferido' if member.ok else 'SHA-256 NÃO confere'})")
+            member.done = True
+            member.missing = set()
+        if kind != REPORT_JOIN:
+            member.last_round = max(member.last_round, packet.seq_num)
+            member.silent_rounds = 0
+
+    def _collect(self, duration: float, round_: int = None):
+        # Lê relatórios por até duration segundos (0 = só os já recebidos); com
+        # round_, volta assim que todos os receptores ativos responderam a ela
+        deadline = time.time() + duration
+        while True:
+            remaining = deadline - time.time()
+            try:
+                if remaining <= 0:
+                    self.sock.setblocking(False)
+                else:
+                    self.sock.settimeout(remaining)
+                data, addr = self.sock.recvfrom(65535)
+            except (BlockingIOError, socket.timeout):
+                return
+            self._handle_report(data, addr)
+            if round_ is not None and all(m.done or m.last_round >= round_
+                                          for m in self.members.values() if not m.dropped):
+                return
+
+    def _plan_repairs(self, pending: List[Member]):
+        # União dos segmentos perdidos; num grupo em que cada receptor perdeu no
+        # máximo um segmento (e não todos o mesmo), uma paridade repara todos
+        union = set()
+        for member in pending:
+            union |= member.missing
+        if not self.fec_group:
+            return [(PacketType.MCAST_DATA, i) for i in sorted(union)]
+
+        worst = Counter()
+        for member in pending:
+            for group, lost in Counter(i // self.fec_group for i in member.missing).items():
+                worst[group] = max(worst[group], lost)
+        by_group = Counter(i // self.fec_group for i in union)
+        repairs = []
+        parity_groups = set()
+        for index in sorted(union):
+            group = index // self.fec_group
+            if worst[group] == 1 and by_group[group] > 1:
+                if group not in parity_groups:
+                    parity_groups.add(group)
+                    repairs.append((PacketType.MCAST_PARITY, group))
+            else:
+                repairs.append((PacketType.MCAST_DATA, index))
+        return repairs
+
+    def send_file(self, path: str, receivers: int = 0, join_timeout: float = 5.0) -> bool:
+        # Espera receivers receptores (ou join_timeout), transmite o arquivo e
+        # repara até todos concluírem ou serem descartados por silêncio
+        self.stats = {'packets': 0, 'bytes': 0, 'data_packets': 0, 'repair_packets': 0,
+                      'parity_packets': 0, 'reports': 0, 'nacks': 0, 'rounds': 0}
+        with open(path, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+            self.view = memoryview(mapped)
+            try:
+                return self._transfer(path, receivers, join_timeout)
+            finally:
+                self.view.release()
+                if self.size:
+                    mapped.close()
+
+    def _transfer(self, path: str, receivers: int, join_timeout: float) -> bool:
+        self.count = -(-self.size // self.segment_size)
+        self.digest = hashlib.sha256(self.view).digest()
+        print(f"[MCAST] Sessão {self.session:08x}: {path}, {self.size} bytes em {self.count} segmentos "
+              f"para {self.group[0]}:{self.group[1]}")
+
+        deadline = time.time() + join_timeout
+        while time.time() < deadline and (not receivers or len(self.members) < receivers):
+            self._announce(0, 0)
+            self._collect(min(MCAST_ANNOUNCE_INTERVAL, max(0.0, deadline - time.time())))
+        if not self.members:
+            print("[MCAST] Nenhum receptor entrou na sessão")
+            return False
+        print(f"[MCAST] {len(self.members)} receptores; transmitindo")
+
+        start = time.time()
+        for index in range(self.count):
+            self._send_segment(index)
+            if index % 64 == 63:
+                self._collect(0)
+        self.stats['data_packets'] = self.count
+
+        round_ = 0
+        while True:
+            active = [m for m in self.members.values() if not m.dropped]
+            pending = [m for m in active if not m.done]
+            if not pending:
+                break
+            round_ += 1
+            self._announce(ANNOUNCE_POLL, round_)
+            self._collect(self.nack_window, round_)
+            for member in pending:
+                if member.done or member.last_round >= round_:
+                    continue
+                member.silent_rounds += 1
+                if member.silent_rounds >= MCAST_MAX_SILENT_ROUNDS:
+                    member.dropped = True
+                    print(f"[MCAST] Receptor {member.addr[0]}:{member.addr[1]} sem resposta, descartado")
+            for packet_type, index in self._plan_repairs([m for m in pending if not m.done and not m.dropped]):
+                if packet_type == PacketType.MCAST_PARITY:
+                    self._send_parity(index)
+                    self.stats['parity_packets'] += 1
+                else:
+                    self._send_segment(index)
+                    self.stats['repair_packets'] += 1
+
+        for _ in range(MCAST_FINISH_REPEATS):
+            self._announce(ANNOUNCE_FINISHED, round_)
+        elapsed = time.time() - start
+        completed = sum(1 for m in self.members.values() if m.done and m.ok)
+        self.stats.update(rounds=round_, elapsed=elapsed, receivers=len(self.members), completed=completed,
+                          dropped=sum(1 for m in self.members.values() if m.dropped))
+        print(f"[MCAST] {completed}/{len(self.members)} receptores concluíram em {elapsed:.2f}s; "
+              f"{self.stats['repair_packets']} reparos, {self.stats['parity_packets']} paridades, "
+              f"{round_} rodadas")
+        return completed == len(self.members)
+
+    def close(self):
+        self.sock.close()
+
+
+class MulticastReceiver:
+    """Recebe um arquivo de uma sessão multicast e reporta as perdas ao remetente."""
+
+    def __init__(self, group: str, port: int, interface: str = '0.0.0.0', loss_callback=None,
+                 sender: str = None, max_size: int = None):
+        # sender: só aceita pacotes vindos deste IP; max_size: recusa sessões maiores
+        self.loss_callback = loss_callback
+        self.expected_sender = sender
+        self.max_size = max_size
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, MCAST_RECV_BUFFER)
+        # Ligado ao endereço do grupo: só recebe o tráfego dele nesta porta
+        self.sock.bind((group, port))
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                             socket.inet_aton(group) + socket.inet_aton(interface))
+        # Relatórios saem de um socket unicast próprio: ele identifica o receptor
+        self.report_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.stats = {}
+
+    def _report(self, kind: int, round_: int, body: bytes = b''):
+        self.report_sock.sendto(_packet(PacketType.MCAST_REPORT, round_, self.session,
+                                        bytes([kind]) + body), self.sender)
+        self.stats['reports'] += 1
+
+    def _status_report(self, round_: int):
+        if self.complete:
+            self._report(REPORT_DONE, round_, b'\x01' if self.ok else b'\x00')
+        else:
+            missing = (i for i in range(self.count) if not self.have[i])
+            ranges = nack_ranges(missing)[:MAX_NACK_RANGES]
+            self._report(REPORT_NACK, round_, b''.join(NACK_RANGE.pack(*r) for r in ranges))
+
+    def _segment_length(self, index: int) -> int:
+        return min(self.segment_size, self.size - index * self.segment_size)
+
+    def _store(self, index: int, data):
+        os.pwrite(self.fd, data, index * self.segment_size)
+        self.have[index] = 1
+        self.missing -= 1
+
+    def _recover(self, group: int):
+        # Um único segmento faltando no grupo: é o XOR da paridade com os demais
+        first = group * self.fec_group
+        last = min(self.count, first + self.fec_group)
+        absent = [i for i in range(first, last) if not self.have[i]]
+        if not absent:
+            self.parities.pop(group, None)
+            return
+        if len(absent) != 1 or group not in self.parities:
+            return
+        others = [os.pread(self.fd, self._segment_length(i), i * self.segment_size)
+                  for i in range(first, last) if i != absent[0]]
+        block = xor_blocks(others + [self.parities.pop(group)], self.segment_size)
+        self._store(absent[0], block[:self._segment_length(absent[0])])
+        self.stats['recovered'] += 1
+
+    def _start(self, packet, addr, path: str) -> bool:
+        try:
+            self.size, self.segment_size, self.fec_group, _, _, self.digest = ANNOUNCE.unpack(packet.data)
+        except struct.error:
+            return False
+        count = -(-self.size // self.segment_size) if self.segment_size else 0
+        if (not 0 < self.segment_size <= MCAST_MAX_SEGMENT_SIZE or self.fec_group > MCAST_MAX_FEC_GROUP
+                or count > MCAST_MAX_SEGMENTS or (self.max_size is not None and self.size > self.max_size)):
+            print(f"[MCAST] Anúncio de {addr[0]}:{addr[1]} recusado: {self.size} bytes, segmento "
+                  f"{self.segment_size}, grupo FEC {self.fec_group}")
+            return False
+        self.session = packet.ack_num
+        self.sender = addr
+        self.count = -(-self.size // self.segment_size)
+        self.have = bytearray(self.count)
+        self.missing = self.count
+        self.parities = {}
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.ftruncate(self.fd, self.size)
+        print(f"[MCAST] Sessão {self.session:08x} de {addr[0]}:{addr[1]}: {self.size} bytes em "
+              f"{self.count} segmentos")
+        self._report(REPORT_JOIN, 0)
+        return True
+
+    def _verify(self):
+        os.fsync(self.fd)
+        digest = hashlib.sha256()
+        for offset in range(0, self.size, 1 << 20):
+            digest.update(os.pread(self.fd, 1 << 20, offset))
+        self.ok = digest.digest() == self.digest
+        self.complete = True
+        print(f"[MCAST] Arquivo completo, SHA-256 {'conferido' if self.ok else 'NÃO confere'}")
+
+    def receive(self, path: str, progress_cb=None, timeout: float = 30.0) -> bool:
+        # Entra na primeira sessão anunciada e grava o objeto em path;
+        # progress_cb(segmentos_recebidos, total)
+        self.stats = {'packets': 0, 'duplicates': 0, 'recovered': 0, 'reports': 0}
+        self.session = None
+        self.complete = self.ok = False
+        self.fd = None
+        report_due = None  # (instante, rodada)
+        last_packet = time.time()
+        try:
+            while True:
+                now = time.time()
+                if report_due and now >= report_due[0]:
+                    self._status_report(report_due[1])
+                    report_due = None
+                idle = now - last_packet
+                if idle >= (MCAST_LINGER if self.complete else timeout):
+                    if not self.complete:
+                        print(f"[MCAST] Nada recebido em {timeout}s, desistindo")
+                    return self.ok
+                wait = 0.1 if report_due is None else max(0.001, report_due[0] - now)
+                self.sock.settimeout(wait)
+                try:
+                    data, addr = self.sock.recvfrom(65535)
+                except socket.timeout:
+                    continue
+                if self.expected_sender and addr[0] != self.expected_sender:
+                    continue
+                packet = _parse(data)
+                if packet is None:
+                    continue
+                if self.loss_callback and self.loss_callback(packet.seq_num):
+                    continue
+                last_packet = time.time()
+
+                if self.session is None:
+                    if packet.packet_type != PacketType.MCAST_ANNOUNCE or not self._start(packet, addr, path):
+                        continue
+                    if not self.count:
+                        self._verify()
+                if packet.ack_num != self.session:
+                    continue
+                self.stats['packets'] += 1
+
+                if packet.packet_type == PacketType.MCAST_ANNOUNCE:
+                    flags, round_ = ANNOUNCE.unpack(packet.data)[3:5]
+                    if flags & ANNOUNCE_FINISHED:
+                        if not self.complete:
+                            print(f"[MCAST] Sessão encerrada com {self.missing} segmentos faltando")
+                        return self.ok
+                    if flags & ANNOUNCE_POLL and report_due is None:
+                        report_due = (time.time() + random.uniform(0, MCAST_REPORT_JITTER), round_)
+                    continue
+
+                if self.complete:
+                    self.stats['duplicates'] += 1
+                    continue
+                index = packet.seq_num
+                if packet.packet_type == PacketType.MCAST_DATA and index < self.count:
+                    if self.have[index] or len(packet.data) != self._segment_length(index):
+                        self.stats['duplicates'] += 1
+                        continue
+                    self._store(index, packet.data)
+                    if self.fec_group and index // self.fec_group in self.parities:
+                        self._recover(index // self.fec_group)
+                elif packet.packet_type == PacketType.MCAST_PARITY and self.fec_group:
+                    if index * self.fec_group >= self.count or len(packet.data) != self.segment_size:
+                        continue
+                    self.parities[index] = packet.data
+                    self._recover(index)
+                else:
+                    continue
+
+                if progress_cb:
+                    progress_cb(self.count - self.missing, self.count)
+                if not self.missing:
+                    self._verify()
+                    # Conclusão avisada já, sem esperar a próxima rodada
+                    self._status_report(0)
+        finally:
+            if self.fd is not None:
+                os.close(self.fd)
+
+    def close(self):
+        self.sock.close()
+        self.report_sock.close()
@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class Pacer:
+    """Token bucket de alta resolução que espaça os envios de dados."""
+
+    # Ganhos sobre cwnd/SRTT quando o controlador não define taxa própria
+    SLOW_START_GAIN = 2.0
+    CONGESTION_AVOIDANCE_GAIN = 1.2
+
+    def __init__(self, burst_packets: int = 4, mss: int = 1400):
+        self.burst_packets = max(burst_packets, 1)
+        self.mss = mss
+        self.burst_bytes = self.burst_packets * mss
+        self.rate = 0.0  # bytes/s, 0 = sem pacing
+        self.tokens = float(self.burst_bytes)
+        self.last_refill = time.perf_counter()
+        self.lock = threading.Lock()  # envio e retransmissão usam o mesmo bucket; nunca se dorme com ele
+
+        self.paced_packets = 0
+        self.total_wait = 0.0
+
+    def set_mss(self, mss: int):
+        # A rajada é em segmentos: com o MSS novo (PMTUD, negociação) o
+        # limite em bytes muda junto, e o saldo não passa do limite novo
+        with self.lock:
+            self.mss = mss
+            self.burst_bytes = self.burst_packets * mss
+            self.tokens = min(self.tokens, self.burst_bytes)
+
+    def update_rate(self, congestion, window: float, srtt: float):
+        rate = getattr(congestion, 'pacing_rate', 0) if congestion else 0
+        if not rate and srtt > 0:
+            gain = self.SLOW_START_GAIN
+            if congestion and congestion.state != "SLOW_START":
+                gain = self.CONGESTION_AVOIDANCE_GAIN
+            rate = gain * window * self.mss / srtt
+        self.rate = rate
+
+    def _refill(self, now: float):
+        self.tokens = min(self.tokens + (now - self.last_refill) * self.rate,
+                          self.burst_bytes)
+        self.last_refill = now
+
+    def wait(self, size: int):
+        # Debita os tokens sob o lock e dorme fora dele: o saldo negativo faz
+        # o próximo envio esperar também, na ordem em que chegou
+        delay = self._debit(size)
+        if delay > 0:
+            time.sleep(delay)
+
+    def consume(self, size: int):
+        # Retransmissões da thread do timer: contam no bucket, mas sem dormir
+        self._debit(size, paced=False)
+
+    def _debit(self, size: int, paced: bool = True) -> float:
+        with self.lock:
+            now = time.perf_counter()
+            if not self.rate:
+                self.tokens = float(self.burst_bytes)
+                self.last_refill = now
+                return 0.0
+
+            self._refill(now)
+            self.tokens -= size
+            if self.tokens >= 0 or not paced:
+                return 0.0
+            delay = -self.tokens / self.rate
+            self.paced_packets += 1
+            self.total_wait += delay
+            return delay
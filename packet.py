@@ -2,6 +2,12 @@ import struct
 import time
 from dataclasses import dataclass
 from enum import IntEnum
+from crypto import PACKET_TAG_SIZE
+
+# seq/ack trafegam com 32 bits; internamente são offsets de 64 bits
+SEQ_MASK = 0xFFFFFFFF
+# Janela anunciada: campo de 16 bits; janelas maiores saem saturadas
+WINDOW_MAX = 0xFFFF
 
 class PacketType(IntEnum):
     SYN = 1
@@ -12,6 +18,16 @@ class PacketType(IntEnum):
     FIN_ACK = 6
     KEY_EXCHANGE = 7
     KEY_RESPONSE = 8
+    PMTU_PROBE = 9
+    PMTU_PROBE_ACK = 10
+    STREAM_DATA = 11  # DATA com cabeçalho de stream (streams multiplexados)
+    MESSAGE = 12      # fragmento de mensagem parcialmente confiável
+    FORWARD = 13      # remetente abandonou uma faixa de seq: o destinatário pula
+    COMPRESSED_DATA = 14  # DATA cujo conteúdo é parte do fluxo comprimido
+    MCAST_ANNOUNCE = 15   # multicast: descrição da sessão / pedido de relatório / fim
+    MCAST_DATA = 16       # multicast: segmento do objeto (seq = índice do segmento)
+    MCAST_PARITY = 17     # multicast: XOR de um grupo de segmentos (seq = índice do grupo)
+    MCAST_REPORT = 18     # multicast: relatório unicast do receptor (entrada, NACK, conclusão)
 
 @dataclass
 class TRUPacket:
@@ -23,10 +39,36 @@ class TRUPacket:
     timestamp: float = 0.0
     iv: bytes = b''
     data: bytes = b''
+    aead: bool = False
+    tag: bytes = b''
 
     HEADER_SIZE = 23 + 16   # seq(4) + ack(4) + type(1) + window(2) + checksum(4) + timestamp(8)
 
+    # Modo AEAD: bit alto do tipo; sem campo IV (nonce derivado do seq) e
+    # com tag de autenticação truncada no lugar do checksum
+    AEAD_FLAG = 0x80
+    AEAD_TAG_SIZE = PACKET_TAG_SIZE
+    AEAD_HEADER_SIZE = 23 + AEAD_TAG_SIZE
+
+    def _pack_header(self, checksum: int) -> bytes:
+        packet_type = self.packet_type | self.AEAD_FLAG if self.aead else self.packet_type
+        return struct.pack('!IIBHIQ',
+                           self.seq_num & SEQ_MASK,
+                           self.ack_num & SEQ_MASK,
+                           packet_type,
+                           min(int(self.window), WINDOW_MAX),
+                           checksum,
+                           int(self.timestamp * 1000000))
+
+    def authenticated_bytes(self) -> bytes:
+        # Cabeçalho (checksum zerado) + payload cifrado: entrada do MAC
+        return self._pack_header(0) + self.data
+
     def serialize(self) -> bytes:
+        if self.aead:
+            tag = self.tag[:self.AEAD_TAG_SIZE].ljust(self.AEAD_TAG_SIZE, b'\x00')
+            return self._pack_header(0) + tag + self.data
+
         timestamp_micro = int(self.timestamp * 1000000)
         
         iv_bytes = self.iv if self.iv else bytes(16)
@@ -36,10 +78,10 @@ class TRUPacket:
             iv_bytes = iv_bytes[:16]
         
         header = struct.pack('!IIBHIQ',
-                        self.seq_num,
-                        self.ack_num,
+                        self.seq_num & SEQ_MASK,
+                        self.ack_num & SEQ_MASK,
                         self.packet_type,
-                        self.window,
+                        min(int(self.window), WINDOW_MAX),
                         self.checksum,
                         timestamp_micro)
         return header + iv_bytes + self.data
@@ -48,6 +90,15 @@ class TRUPacket:
     @staticmethod
     def deserialize(data: bytes) -> 'TRUPacket':
         try:
+            if len(data) >= 23 and data[8] & TRUPacket.AEAD_FLAG:
+                if len(data) < TRUPacket.AEAD_HEADER_SIZE:
+                    raise ValueError(f"Pacote AEAD muito pequeno: {len(data)} bytes")
+                (seq_num, ack_num, packet_type, window, _, timestamp_micro) = struct.unpack('!IIBHIQ', data[:23])
+                return TRUPacket(seq_num, ack_num, packet_type & ~TRUPacket.AEAD_FLAG, window, 0,
+                                 timestamp_micro / 1000000.0, b'',
+                                 data[TRUPacket.AEAD_HEADER_SIZE:], True,
+                                 data[23:TRUPacket.AEAD_HEADER_SIZE])
+
             if len(data) < 39:
                 raise ValueError(f"Pacote muito pequeno: {len(data)} bytes (mínimo 39)")
             
@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional, Tuple
+
+
+@dataclass
+class PathEntry:
+    srtt: float
+    rttvar: float
+    ssthresh: float
+    cwnd: float
+    updated: float
+
+
+class PathCache:
+    """Cache LRU, por destino, do estado de RTT e congestionamento."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600.0, persist_file: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_file = persist_file
+        self.entries: "OrderedDict[str, PathEntry]" = OrderedDict()
+        self.lock = threading.Lock()
+
+        if persist_file:
+            self.load()
+
+    @staticmethod
+    def _key(addr: Tuple[str, int]) -> str:
+        return f"{addr[0]}:{addr[1]}"
+
+    def lookup(self, addr: Tuple[str, int]) -> Optional[PathEntry]:
+        key = self._key(addr)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.updated > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def store(self, addr: Tuple[str, int], srtt: float, rttvar: float,
+              ssthresh: float, cwnd: float):
+        key = self._key(addr)
+        with self.lock:
+            self.entries[key] = PathEntry(srtt, rttvar, ssthresh, cwnd, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        if self.persist_file:
+            self.save()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def load(self):
+        try:
+            with open(self.persist_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        now = time.time()
+        with self.lock:
+            for key, fields in data.items():
+                try:
+                    entry = PathEntry(**fields)
+                except TypeError:
+                    continue
+                if now - entry.updated <= self.ttl:
+                    self.entries[key] = entry
+            # Mais recentes por último (ordem LRU)
+            self.entries = OrderedDict(sorted(self.entries.items(), key=lambda kv: kv[1].updated))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def save(self):
+        with self.lock:
+            data = {key: asdict(entry) for key, entry in self.entries.items()}
+        tmp = f"{self.persist_file}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.persist_file)
+        except OSError as e:
+            print(f"[PATH_CACHE] Erro ao salvar {self.persist_file}: {e}")
+
+
+_path_cache = PathCache()
+
+
+def get_path_cache() -> PathCache:
+    return _path_cache
+
+
+def configure_path_cache(max_entries: int = 256, ttl: float = 600.0,
+                         persist_file: str = None) -> PathCache:
+    global _path_cache
+    _path_cache = PathCache(max_entries, ttl, persist_file)
+    return _path_cache
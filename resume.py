@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import struct
+from typing import List, Set
+
+# Transferência retomável: o arquivo é dividido em pedaços de tamanho fixo e
+# o remetente anuncia o SHA-256 de cada um (manifesto); o destinatário guarda
+# em um checkpoint os pedaços já verificados e gravados em disco
+RESUME_CHUNK_SIZE = 1 << 20
+# Intervalo mínimo entre checkpoints (fsync do arquivo + gravação do estado)
+CHECKPOINT_INTERVAL = 1.0
+DIGEST_SIZE = 32
+
+# Manifesto: tamanho do arquivo(8) + tamanho do pedaço(4) + digests(32 cada)
+MANIFEST_HEADER = struct.Struct('!QI')
+
+
+class Manifest:
+    """Tamanho, tamanho de pedaço e digests dos pedaços de um arquivo."""
+
+    def __init__(self, size: int, chunk_size: int, digests: List[bytes]):
+        self.size = size
+        self.chunk_size = chunk_size
+        self.digests = digests
+
+    @classmethod
+    def from_buffer(cls, buf, chunk_size: int = RESUME_CHUNK_SIZE) -> 'Manifest':
+        view = memoryview(buf)
+        digests = [hashlib.sha256(view[offset:offset + chunk_size]).digest()
+                   for offset in range(0, len(view), chunk_size)]
+        view.release()
+        return cls(len(buf), chunk_size, digests)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> 'Manifest':
+        size, chunk_size = MANIFEST_HEADER.unpack_from(data)
+        count = (size + chunk_size - 1) // chunk_size if chunk_size else 0
+        body = data[MANIFEST_HEADER.size:]
+        if not chunk_size or len(body) != count * DIGEST_SIZE:
+            raise ValueError(f"manifesto inválido: {count} pedaços, {len(body)} bytes de digests")
+        digests = [body[i:i + DIGEST_SIZE] for i in range(0, len(body), DIGEST_SIZE)]
+        return cls(size, chunk_size, digests)
+
+    def pack(self) -> bytes:
+        return MANIFEST_HEADER.pack(self.size, self.chunk_size) + b''.join(self.digests)
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    def chunk_range(self, index: int):
+        start = index * self.chunk_size
+        return start, min(start + self.chunk_size, self.size)
+
+    def pack_have(self, have: Set[int]) -> bytes:
+        # Resposta do destinatário: bitmap dos pedaços que ele já tem
+        bitmap = bytearray((len(self) + 7) // 8)
+        for index in have:
+            bitmap[index // 8] |= 0x80 >> (index % 8)
+        return bytes(bitmap)
+
+    def unpack_have(self, bitmap: bytes) -> Set[int]:
+        return {index for index in range(min(len(self), len(bitmap) * 8))
+                if bitmap[index // 8] & (0x80 >> (index % 8))}
+
+
+class Checkpoint:
+    """Pedaços já verificados e em disco, ao lado do arquivo de destino."""
+
+    def __init__(self, path: str):
+        self.path = f"{path}.resume"
+        self.chunk_size = 0
+        self.chunks = {}  # índice -> digest hex
+
+    def load(self, manifest: Manifest) -> Set[int]:
+        # Pedaços reaproveitáveis: mesmo tamanho de pedaço e mesmo digest no
+        # mesmo índice (vale também se o arquivo mudou só em parte)
+        self.chunk_size = manifest.chunk_size
+        self.chunks = {}
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        # Checkpoint corrompido ou editado à mão: transferência completa
+        try:
+            if data.get('chunk_size') != manifest.chunk_size:
+                return set()
+            for key, digest in data.get('chunks', {}).items():
+                index = int(key)
+                if 0 <= index < len(manifest) and manifest.digests[index].hex() == digest:
+                    self.chunks[index] = digest
+        except (AttributeError, TypeError, ValueError):
+            self.chunks = {}
+            return set()
+        return set(self.chunks)
+
+    def mark(self, index: int, digest: bytes):
+        self.chunks[index] = digest.hex()
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'chunk_size': self.chunk_size,
+                           'chunks': {str(i): d for i, d in self.chunks.items()}}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"[RESUME] Erro ao salvar checkpoint {self.path}: {e}")
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
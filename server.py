@@ -3,8 +3,11 @@ import random
 import sys
 import threading
 import time
-from tru_protocol import TRUProtocol
+from tru_protocol import TRUProtocol, MSS
 from utils import set_global_loss_probability, loss_filter
+from session_ticket import configure_ticket_keeper
+from striping import recv_file_striped
+from multicast import MulticastReceiver, parse_group
 
 def monitor_rtt(conn, interval=5.0):
     import time
@@ -22,6 +25,7 @@ def monitor_rtt(conn, interval=5.0):
                           f"Mín: {stats['min']:.3f}s | "
                           f"Máx: {stats['max']:.3f}s | "
                           f"Desvio: {stats['dev']:.3f}s | "
+                          f"p50/p99: {stats['p50']:.3f}s / {stats['p99']:.3f}s | "
                           f"Timeout: {stats['timeout']:.3f}s | "
                           f"Amostras: {stats['samples']}")
                 else:
@@ -55,7 +59,7 @@ def main():
     p.add_argument('--host', default='0.0.0.0', help='Interface de escuta')
     p.add_argument('--port', type=int, default=5000, help='Porta de escuta')
     p.add_argument('--packets', type=int, default=10,
-                   help='Número de pacotes a receber (deve bater com o cliente). Default: 10000')
+                   help='Pacotes esperados, só para o progresso: a recepção termina no FIN do cliente. Default: 10')
     p.add_argument('--loss', type=float, default=0.0, metavar='P',
                    help='Probabilidade de descartar cada pacote recebido (0.0 a 1.0). '
                         'Usado para avaliar o controle de congestionamento. Default: 0.0')
@@ -67,15 +71,118 @@ def main():
                    help='Arquivo de saída para os dados recebidos. Default: received.bin')
     p.add_argument('--no-congestion', action='store_true',
                help='Desativar controle de congestionamento')
+    p.add_argument('--crypto-workers', type=int, default=0, metavar='N',
+                   help='Workers para cifrar/decifrar segmentos em paralelo (0 = inline). Default: 0')
+    p.add_argument('--crypto-processes', action='store_true',
+                   help='Usar processos em vez de threads para os workers de criptografia')
+    p.add_argument('--no-aead', action='store_true',
+                   help='Desativar o modo AEAD (IV fixo no pacote + checksum, formato antigo)')
+    p.add_argument('--debug', action='store_true',
+                   help='Logs por pacote ([PROCESS], [HANDLE_DATA], [SEND_RAW]...); reduzem muito a vazão')
+    p.add_argument('--no-piggyback', action='store_true',
+                   help='Não levar ACKs no cabeçalho dos DATA (um ACK isolado por segmento)')
+    p.add_argument('--ticket-key', metavar='ARQUIVO',
+                   help='Chave dos tickets de retomada (criada se não existir); '
+                        'sem ela, tickets só valem até o servidor reiniciar')
+    p.add_argument('--resume', action='store_true',
+                   help='Transferência retomável: o cliente (com --resume) envia só os pedaços que faltam '
+                        'em ARQUIVO; o progresso fica em ARQUIVO.resume')
+    p.add_argument('--delta', action='store_true',
+                   help='Sincronização por delta: a versão atual de ARQUIVO é a base e o cliente '
+                        '(com --delta) envia só as diferenças')
+    p.add_argument('--stripes', type=int, default=1, metavar='N',
+                   help='Receber ARQUIVO por N conexões paralelas nas portas PORT..PORT+N-1 '
+                        '(cliente com --stripes N). Default: 1')
+    p.add_argument('--stripe-processes', action='store_true',
+                   help='Com --stripes: um processo por conexão em vez de uma thread')
+    p.add_argument('--batch', metavar='DIRETÓRIO',
+                   help='Receber um lote de arquivos (cliente com --batch) e gravá-los em DIRETÓRIO')
+    p.add_argument('--multicast', metavar='GRUPO:PORTA',
+                   help='Entrar no grupo multicast e receber em --output o arquivo da primeira sessão anunciada')
+    p.add_argument('--mcast-interface', default='0.0.0.0', metavar='IP',
+                   help='Com --multicast: interface em que entrar no grupo (127.0.0.1 para testes em loopback)')
+    p.add_argument('--mcast-sender', metavar='IP',
+                   help='Com --multicast: aceitar só pacotes vindos deste IP (os anúncios não são autenticados)')
     args = p.parse_args()
+    if args.resume and args.delta:
+        p.error('--resume e --delta são exclusivos')
+    if args.stripes < 1:
+        p.error('--stripes deve ser pelo menos 1')
+    if args.stripes > 1 and (args.resume or args.delta):
+        p.error('--stripes não combina com --resume ou --delta')
+    if args.batch and (args.resume or args.delta or args.stripes > 1):
+        p.error('--batch não combina com --resume, --delta ou --stripes')
+    if args.multicast:
+        if args.resume or args.delta or args.stripes > 1 or args.batch:
+            p.error('--multicast não combina com --resume, --delta, --stripes ou --batch')
+        try:
+            mcast_group = parse_group(args.multicast)
+        except ValueError as e:
+            p.error(str(e))
 
     set_global_loss_probability(args.loss)
     loss_p = args.loss
+    if args.ticket_key:
+        configure_ticket_keeper(key_file=args.ticket_key)
     total_segments = args.packets
 
+    if args.multicast:
+        receiver = MulticastReceiver(*mcast_group, interface=args.mcast_interface, loss_callback=loss_filter,
+                                     sender=args.mcast_sender)
+        print(f'Aguardando sessão multicast em {args.multicast}')
+        step = [0]
+
+        def mcast_progress(received, total):
+            if received >= step[0] or received == total:
+                print(f'  Recebidos {received}/{total} segmentos')
+                step[0] = received + max(1, total // 20)
+
+        try:
+            ok = receiver.receive(args.output, progress_cb=mcast_progress)
+        finally:
+            receiver.close()
+        if not ok:
+            print(f'Recepção multicast incompleta em {args.output}', file=sys.stderr)
+            sys.exit(1)
+        print(f"Dados salvos em {args.output} ({receiver.stats['recovered']} segmentos recuperados por FEC, "
+              f"{receiver.stats['reports']} relatórios enviados).")
+        return
+
+    if args.stripes > 1:
+        print(f'Servidor ouvindo em {args.host}:{args.port}-{args.port + args.stripes - 1} '
+              f'({args.stripes} listras)')
+
+        last_report = [0]
+
+        def striped_progress(received, total):
+            if received > last_report[0]:
+                last_report[0] = received
+                print(f'  Recebidos {received} bytes')
+
+        stats = recv_file_striped(args.output, args.host, args.port, args.stripes,
+                                  processes=args.stripe_processes, progress_cb=striped_progress,
+                                  loss_callback=loss_filter,
+                                  enable_congestion_control=not args.no_congestion,
+                                  crypto_workers=args.crypto_workers,
+                                  crypto_processes=args.crypto_processes,
+                                  enable_aead=not args.no_aead,
+                                  piggyback_acks=not args.no_piggyback,
+                                  debug=args.debug)
+        if not stats['ok']:
+            print(f'Transferência listrada incompleta ({stats["bytes"]} bytes)', file=sys.stderr)
+            sys.exit(1)
+        print(f"Dados salvos em {args.output} ({stats['bytes']} bytes em {stats['elapsed']:.2f}s, "
+              f"por listra {stats['stripe_bytes']}).")
+        return
+
     conn = TRUProtocol(host=args.host, port=args.port, is_server=True, 
                    loss_callback=loss_filter,
-                   enable_congestion_control=not args.no_congestion)
+                   enable_congestion_control=not args.no_congestion,
+                   crypto_workers=args.crypto_workers,
+                   crypto_processes=args.crypto_processes,
+                   enable_aead=not args.no_aead,
+                   piggyback_acks=not args.no_piggyback,
+                   debug=args.debug)
 
     conn.receive_stats = {
         'received': 0,
@@ -110,14 +217,50 @@ def main():
         monitor_thread.start()
         print(f"Monitoramento de RTT ativado (intervalo: {args.monitor_interval}s)")
 
+    expected_bytes = total_segments * MSS
+    step = max(MSS, expected_bytes // 20) if expected_bytes else 1 << 20
+    next_report = [step]
+
     def progress(received, total):
-        if total > 0 and (received % max(1, total // 20) == 0 or received == total):
-            print(f'  Recebidos {received}/{total} pacotes ({100*received/total:.1f}%)')
+        if received >= next_report[0]:
+            next_report[0] = received + step
+            pct = f' ({min(100.0, 100*received/total):.1f}%)' if total else ''
+            print(f'  Recebidos {received}/~{total} bytes{pct}')
 
-    print(f'Aguardando {total_segments} pacotes...')
+    print(f'Aguardando ~{total_segments} pacotes (até o FIN do cliente)...')
 
+    save_failed = False
     try:
-        data = conn.recv_data(total_segments, progress_cb=progress)
+        if args.batch:
+            def batch_progress(files, received):
+                if files % 100 == 0:
+                    print(f'  Recebidos {files} arquivos ({received} bytes)')
+
+            if conn.recv_files(args.batch, progress_cb=batch_progress):
+                print(f"Lote salvo em {args.batch} ({conn.batch_stats['files']} arquivos, "
+                      f"{conn.batch_stats['bytes']} bytes).")
+            else:
+                print(f'Lote incompleto em {args.batch}', file=sys.stderr)
+                save_failed = True
+        elif args.delta:
+            # Arquivo novo montado em ARQUIVO.delta; substitui ARQUIVO só se o SHA-256 conferir
+            if conn.recv_file_delta(args.output, progress_cb=progress):
+                print(f'Dados salvos em {args.output}.')
+            else:
+                print(f'Sincronização por delta falhou; {args.output} não foi alterado', file=sys.stderr)
+                save_failed = True
+        elif args.resume:
+            # Pedaços verificados entram no checkpoint: uma nova execução continua daqui
+            if conn.recv_file_resumable(args.output, progress_cb=progress):
+                print(f'Dados salvos em {args.output}.')
+            else:
+                print(f'Transferência incompleta; o progresso está em {args.output}.resume', file=sys.stderr)
+                save_failed = True
+        else:
+            # Grava direto no arquivo conforme os dados chegam em ordem
+            received = conn.recv_into_file(args.output, progress_cb=progress,
+                                           expected_bytes=expected_bytes)
+            print(f'Dados salvos em {args.output} ({received} bytes).')
 
         if hasattr(conn, 'get_rtt_stats'):
             final_stats = conn.get_rtt_stats()
@@ -127,12 +270,16 @@ def main():
             print(f"RTT mínimo: {final_stats['min']:.3f}s")
             print(f"RTT máximo: {final_stats['max']:.3f}s")
             print(f"Desvio padrão: {final_stats['dev']:.3f}s")
+            print(f"Percentis p50/p90/p99/p99.9: {final_stats['p50']:.4f}s / {final_stats['p90']:.4f}s / "
+                  f"{final_stats['p99']:.4f}s / {final_stats['p99.9']:.4f}s")
             print(f"Timeout final: {final_stats['timeout']:.3f}s")
             print(f"Amostras coletadas: {final_stats['samples']}")
             print("="*80)
     except KeyboardInterrupt:
         print("\nRecepção interrompida pelo usuário")
-        data = b''
+    except OSError as e:
+        print(f'Erro ao salvar: {e}', file=sys.stderr)
+        save_failed = True
     finally:
         if hasattr(conn, 'monitoring_active'):
             conn.monitoring_active = False
@@ -142,12 +289,7 @@ def main():
 
         conn.close()
 
-    try:
-        with open(args.output, 'wb') as f:
-            f.write(data)
-        print(f'Dados salvos em {args.output} ({len(data)} bytes).')
-    except Exception as e:
-        print(f'Erro ao salvar: {e}', file=sys.stderr)
+    if save_failed:
         sys.exit(1)
 
 if __name__ == '__main__':
@@ -0,0 +1,196 @@
+import hashlib
+import hmac
+import json
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional, Tuple
+
+from crypto import TRUCrypto
+
+TICKET_LIFETIME = 3600.0  # segundos
+TICKET_TAG_SIZE = 16
+
+
+def resumption_secret(session_key: bytes) -> bytes:
+    # Segredo de retomada: os dois lados o calculam a partir da chave da sessão,
+    # então ele nunca trafega em claro
+    return hmac.digest(session_key, b"TRUDP resumption", 'sha256')
+
+
+def derive_resumed_session(secret: bytes, client_random: bytes) -> Tuple[bytes, bytes]:
+    # Chave e IV da sessão retomada: o cliente pode cifrar antes do SYN_ACK (0-RTT)
+    key, _ = TRUCrypto.derive_key(int.from_bytes(secret, 'big'), client_random)
+    iv = hmac.digest(key, b"TRUDP session IV", 'sha256')[:16]
+    return key, iv
+
+
+class TicketKeeper:
+    """Emite e valida tickets de retomada do lado do servidor."""
+
+    def __init__(self, key: bytes = None, lifetime: float = TICKET_LIFETIME,
+                 replay_entries: int = 4096):
+        self.key = key or os.urandom(32)
+        self.mac_key = TRUCrypto.derive_mac_key(self.key)
+        self.lifetime = lifetime
+        self.replay_entries = replay_entries
+        # Tickets já usados (até expirarem): 0-RTT não pode ser reexecutado
+        self.used: "OrderedDict[bytes, float]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def issue(self, secret: bytes) -> bytes:
+        # Ticket opaco: nonce(16) + cifra(expiração + segredo) + tag(16)
+        nonce = os.urandom(16)
+        payload = struct.pack('!d', time.time() + self.lifetime) + secret
+        sealed = nonce + TRUCrypto.encrypt_data(payload, self.key, nonce)[0]
+        return sealed + hmac.digest(self.mac_key, sealed, 'sha256')[:TICKET_TAG_SIZE]
+
+    def redeem(self, ticket: bytes) -> Optional[bytes]:
+        if len(ticket) < 16 + 8 + TICKET_TAG_SIZE:
+            return None
+        sealed, tag = ticket[:-TICKET_TAG_SIZE], ticket[-TICKET_TAG_SIZE:]
+        if not hmac.compare_digest(hmac.digest(self.mac_key, sealed, 'sha256')[:TICKET_TAG_SIZE], tag):
+            return None
+
+        payload = TRUCrypto.decrypt_data(sealed[16:], self.key, sealed[:16])
+        expires = struct.unpack('!d', payload[:8])[0]
+        now = time.time()
+        if now > expires:
+            return None
+
+        digest = hashlib.sha256(ticket).digest()
+        with self.lock:
+            while self.used and next(iter(self.used.values())) < now:
+                self.used.popitem(last=False)
+            if digest in self.used:
+                return None
+            if len(self.used) >= self.replay_entries:
+                # A ordem de inserção não garante a de expiração: varrer tudo.
+                # Entradas ainda válidas nunca saem (o ticket poderia ser
+                # reapresentado); sem espaço, o ticket é recusado e a conexão
+                # segue pela troca DH completa, sem dados 0-RTT
+                for expired in [d for d, until in self.used.items() if until < now]:
+                    del self.used[expired]
+                if len(self.used) >= self.replay_entries:
+                    print(f"[TICKET] Cache anti-replay cheio ({len(self.used)} tickets válidos), retomada recusada")
+                    return None
+            self.used[digest] = expires
+        return payload[8:]
+
+
+@dataclass
+class TicketEntry:
+    ticket: str  # hex
+    secret: str  # hex
+    expires: float
+
+
+class TicketStore:
+    """Tickets recebidos pelo cliente, por destino; cada ticket é usado uma vez."""
+
+    def __init__(self, max_entries: int = 256, persist_file: str = None):
+        self.max_entries = max_entries
+        self.persist_file = persist_file
+        self.entries: "OrderedDict[str, TicketEntry]" = OrderedDict()
+        self.lock = threading.Lock()
+
+        if persist_file:
+            self.load()
+
+    @staticmethod
+    def _key(addr: Tuple[str, int]) -> str:
+        return f"{addr[0]}:{addr[1]}"
+
+    def take(self, addr: Tuple[str, int]) -> Optional[Tuple[bytes, bytes]]:
+        with self.lock:
+            entry = self.entries.pop(self._key(addr), None)
+        if self.persist_file and entry is not None:
+            self.save()
+        if entry is None or time.time() > entry.expires:
+            return None
+        return bytes.fromhex(entry.ticket), bytes.fromhex(entry.secret)
+
+    def store(self, addr: Tuple[str, int], ticket: bytes, secret: bytes, lifetime: float):
+        key = self._key(addr)
+        with self.lock:
+            self.entries[key] = TicketEntry(ticket.hex(), secret.hex(), time.time() + lifetime)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        if self.persist_file:
+            self.save()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def load(self):
+        try:
+            with open(self.persist_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        now = time.time()
+        with self.lock:
+            for key, fields in data.items():
+                try:
+                    entry = TicketEntry(**fields)
+                except TypeError:
+                    continue
+                if entry.expires > now:
+                    self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def save(self):
+        with self.lock:
+            data = {key: asdict(entry) for key, entry in self.entries.items()}
+        tmp = f"{self.persist_file}.tmp"
+        try:
+            # O arquivo guarda segredos de retomada: só o dono lê
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.persist_file)
+        except OSError as e:
+            print(f"[TICKET] Erro ao salvar {self.persist_file}: {e}")
+
+
+_ticket_keeper = TicketKeeper()
+_ticket_store = TicketStore()
+
+
+def get_ticket_keeper() -> TicketKeeper:
+    return _ticket_keeper
+
+
+def get_ticket_store() -> TicketStore:
+    return _ticket_store
+
+
+def configure_ticket_keeper(key_file: str = None, lifetime: float = TICKET_LIFETIME) -> TicketKeeper:
+    # Com key_file a chave sobrevive a reinícios do servidor (criada se não existir)
+    global _ticket_keeper
+    key = None
+    if key_file:
+        try:
+            with open(key_file, 'rb') as f:
+                key = f.read(32)
+        except OSError:
+            key = os.urandom(32)
+            fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(key)
+    _ticket_keeper = TicketKeeper(key if key and len(key) == 32 else None, lifetime)
+    return _ticket_keeper
+
+
+def configure_ticket_store(max_entries: int = 256, persist_file: str = None) -> TicketStore:
+    global _ticket_store
+    _ticket_store = TicketStore(max_entries, persist_file)
+    return _ticket_store
@@ -0,0 +1,111 @@
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# Cabeçalho no início do payload de STREAM_DATA (em claro, coberto pela tag AEAD):
+# id do stream(4) + offset no stream(8) + flags(1)
+STREAM_HEADER = struct.Struct('!IQB')
+STREAM_HEADER_SIZE = STREAM_HEADER.size
+STREAM_FLAG_FIN = 0x01
+
+
+class TRUStream:
+    """Fluxo de bytes ordenado e independente dentro de uma conexão TRUDP.
+
+    Congestionamento, janela e cifra são os da conexão; só a remontagem e a
+    entrega em ordem são por stream, então uma perda atrasa apenas o stream
+    a que o segmento pertence.
+    """
+
+    def __init__(self, conn, stream_id: int):
+        self.conn = conn
+        self.stream_id = stream_id
+
+        # Envio
+        self.send_offset = 0
+        self.send_closed = False
+
+        # Recepção: segmentos fora de ordem por offset, blocos prontos na fila
+        self.recv_buffer = {}   # offset -> (tamanho, dados ou Future de decifragem)
+        self.recv_offset = 0    # próximo offset a entregar
+        self.recv_queue = deque()
+        self.fin_offset = None
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+
+    def send(self, data, wait: bool = True) -> bool:
+        if self.send_closed:
+            print(f"[STREAM] Stream {self.stream_id} já fechado para envio")
+            return False
+        return self.conn._send_on_stream(self, data, fin=False, wait=wait)
+
+    def close(self, wait: bool = True) -> bool:
+        # FIN do stream: o peer lê b'' depois do último byte
+        if self.send_closed:
+            return True
+        self.send_closed = True
+        ok = self.conn._send_on_stream(self, b'', fin=True, wait=wait)
+        self.conn._release_stream(self)
+        return ok
+
+    @property
+    def recv_finished(self) -> bool:
+        return self.fin_offset is not None and self.recv_offset >= self.fin_offset
+
+    def buffered_segments(self) -> int:
+        return len(self.recv_buffer) + len(self.recv_queue)
+
+    def _on_segment(self, offset: int, length: int, data, fin: bool):
+        # Chamado pela thread de recepção da conexão
+        with self.lock:
+            if fin:
+                self.fin_offset = offset + length
+            if offset < self.recv_offset or offset in self.recv_buffer:
+                return
+            self.recv_buffer[offset] = (length, data)
+            while self.recv_offset in self.recv_buffer:
+                length, data = self.recv_buffer.pop(self.recv_offset)
+                if length:
+                    self.recv_queue.append(data)
+                self.recv_offset += length
+        self.event.set()
+
+    def recv(self, timeout: float = None) -> bytes:
+        # Próximo bloco em ordem; b'' no FIN do stream ou se a conexão caiu
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self.lock:
+                if self.recv_queue:
+                    chunk = self.recv_queue.popleft()
+                    break
+                if self.recv_finished:
+                    self.conn._release_stream(self)
+                    return b''
+                self.event.clear()
+            if not self.conn.connected and not self.recv_buffer:
+                return b''
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"stream {self.stream_id}: nenhum dado em {timeout}s")
+            self.event.wait(timeout=0.1 if remaining is None else min(0.1, remaining))
+
+        self.conn._send_window_update()
+        return chunk.result() if isinstance(chunk, Future) else chunk
+
+    def read(self, timeout: float = None) -> bytes:
+        # Lê até o FIN do stream; timeout vale para cada bloco
+        data = bytearray()
+        while True:
+            chunk = self.recv(timeout)
+            if not chunk:
+                return bytes(data)
+            data += chunk
+
+    def __iter__(self):
+        while True:
+            chunk = self.recv()
+            if not chunk:
+                return
+            yield chunk
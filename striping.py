@@ -0,0 +1,246 @@
+import mmap
+import multiprocessing
+import os
+import queue
+import struct
+import threading
+import time
+from typing import Optional, Tuple
+
+from histogram import merge_histograms
+from tru_protocol import TRUProtocol, RECV_IDLE_TIMEOUT
+
+# Transferência listrada: um arquivo dividido em faixas enviadas por N conexões
+# TRUDP em paralelo (porta, porta+1, ...), cada uma com sua janela de
+# congestionamento e sua thread (ou processo) de envio. Cada listra começa com
+# uma faixa contígua do arquivo; quem termina primeiro rouba metade do que
+# falta à listra mais atrasada
+STRIPE_BLOCK = 256 << 10
+# Restos menores que isto não são divididos: o ganho não paga o cabeçalho e a troca
+STRIPE_MIN_STEAL = 1 << 20
+# Intervalo entre chamadas de progress_cb (s)
+STRIPE_PROGRESS_INTERVAL = 0.5
+
+# Início do fluxo de cada listra: tamanho do arquivo(8) + índice(2) + total de listras(2)
+STRIPE_HELLO = struct.Struct('!QHH')
+# Cada bloco: offset no arquivo(8) + tamanho(4) + dados; tamanho 0 encerra a listra
+RANGE_HEADER = struct.Struct('!QI')
+
+
+class StripeSchedule:
+    """Faixas pendentes de cada listra, compartilhadas entre threads ou processos.
+
+    Para a listra i, ranges[2i] é o próximo offset ainda não reservado e
+    ranges[2i+1] o fim da faixa; um bloco reservado não pode mais ser roubado.
+    """
+
+    def __init__(self, size: int, stripes: int, ctx=multiprocessing):
+        self.size = size
+        self.stripes = stripes
+        self.ranges = ctx.Array('q', 2 * stripes)
+        self.steals = ctx.Value('i', 0, lock=False)
+        share = -(-size // stripes // STRIPE_BLOCK) * STRIPE_BLOCK if size else 0
+        for i in range(stripes):
+            self.ranges[2 * i] = min(size, i * share)
+            self.ranges[2 * i + 1] = min(size, (i + 1) * share)
+
+    def claim(self, index: int) -> Optional[Tuple[int, int]]:
+        # Próximo bloco (offset, tamanho) da listra ou None quando não há mais nada
+        with self.ranges.get_lock():
+            r = self.ranges
+            if r[2 * index] >= r[2 * index + 1] and not self._steal(index):
+                return None
+            offset = r[2 * index]
+            length = min(STRIPE_BLOCK, r[2 * index + 1] - offset)
+            r[2 * index] = offset + length
+            return offset, length
+
+    def _steal(self, index: int) -> bool:
+        r = self.ranges
+        victim = max(range(self.stripes), key=lambda j: r[2 * j + 1] - r[2 * j])
+        remaining = r[2 * victim + 1] - r[2 * victim]
+        if remaining < STRIPE_MIN_STEAL:
+            return False
+        middle = r[2 * victim + 1] - remaining // 2
+        r[2 * index], r[2 * index + 1] = middle, r[2 * victim + 1]
+        r[2 * victim + 1] = middle
+        self.steals.value += 1
+        return True
+
+
+def _send_stripe(index: int, host: str, port: int, path: str, schedule: StripeSchedule,
+                 counters, results, options: dict):
+    conn = TRUProtocol(is_server=False, **options)
+    ok = False
+    try:
+        if not conn.connect(host, port + index) or not conn.do_key_exchange_as_client():
+            print(f"[STRIPE] Listra {index}: falha ao conectar em {host}:{port + index}")
+            return
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if schedule.size else b''
+            view = memoryview(mapped)
+
+            def blocks():
+                yield STRIPE_HELLO.pack(schedule.size, index, schedule.stripes)
+                while True:
+                    claim = schedule.claim(index)
+                    if claim is None:
+                        break
+                    offset, length = claim
+                    yield RANGE_HEADER.pack(offset, length)
+                    yield view[offset:offset + length]
+                    counters[index] += length
+                yield RANGE_HEADER.pack(0, 0)
+
+            try:
+                ok = conn.send_stream(blocks())
+            finally:
+                view.release()
+                if schedule.size:
+                    conn._release_mapping(mapped)
+    except OSError as e:
+        print(f"[STRIPE] Listra {index}: {e}")
+    finally:
+        conn.close()
+        results.put((index, ok, counters[index], schedule.size, conn.get_latency_histograms()))
+
+
+def _recv_stripe(index: int, host: str, port: int, path: str, counters, results,
+                 options: dict, timeout: float):
+    conn = TRUProtocol(host=host, port=port + index, is_server=True, **options)
+    ok = False
+    size = None
+    try:
+        if not conn.accept() or not conn.do_key_exchange_as_server():
+            print(f"[STRIPE] Listra {index}: falha no handshake")
+            return
+        hello = conn._recv_exact(STRIPE_HELLO.size, timeout)
+        if hello is None:
+            print(f"[STRIPE] Listra {index}: cabeçalho não recebido")
+            return
+        size, stripe, _ = STRIPE_HELLO.unpack(hello)
+        if stripe != index:
+            print(f"[STRIPE] Listra {stripe} chegou na porta da listra {index}")
+            return
+
+        fd = os.open(path, os.O_WRONLY)
+        try:
+            while True:
+                header = conn._recv_exact(RANGE_HEADER.size, timeout)
+                if header is None:
+                    print(f"[STRIPE] Listra {index}: fluxo interrompido com {counters[index]} bytes")
+                    return
+                offset, length = RANGE_HEADER.unpack(header)
+                if not length:
+                    break
+                if offset + length > size:
+                    print(f"[STRIPE] Listra {index}: bloco fora do arquivo ({offset}+{length} > {size})")
+                    return
+                if conn._recv_chunk(fd, offset, length, timeout) is None:
+                    print(f"[STRIPE] Listra {index}: bloco em {offset} incompleto")
+                    return
+                counters[index] += length
+            os.fsync(fd)
+            # Fecha só depois do FIN do remetente: fechar antes pode derrubar a
+            # conexão dele enquanto ainda espera o último ACK
+            ok = not conn.readinto(bytearray(1), timeout)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        print(f"[STRIPE] Listra {index}: {e}")
+    finally:
+        conn.close()
+        results.put((index, ok, counters[index], size, conn.get_latency_histograms()))
+
+
+def _run_stripes(target, stripes: int, args: tuple, extra: tuple, processes: bool, ctx,
+                 counters, progress_cb, total: Optional[int]) -> list:
+    # Uma thread ou processo por listra, chamado como
+    # target(i, *args, counters, results, *extra); devolve o resultado de cada
+    # uma: (índice, ok, bytes, tamanho do arquivo, histogramas de latência)
+    results = ctx.Queue() if processes else queue.Queue()
+    worker = ctx.Process if processes else threading.Thread
+    workers = [worker(target=target, args=(i,) + args + (counters, results) + extra, daemon=True)
+               for i in range(stripes)]
+    for w in workers:
+        w.start()
+
+    done = []
+    while len(done) < stripes:
+        try:
+            done.append(results.get(timeout=STRIPE_PROGRESS_INTERVAL))
+        except queue.Empty:
+            if processes and not any(w.is_alive() for w in workers):
+                break  # processo morreu sem reportar
+        if progress_cb:
+            progress_cb(sum(counters), total)
+    for w in workers:
+        w.join(timeout=5.0)
+    return sorted(done)
+
+
+def _merged_latency(done: list) -> dict:
+    # Resumo de cada histograma (rtt, delivery, completion) somado entre as listras
+    kinds = ('rtt', 'delivery', 'completion')
+    return {kind: merge_histograms(histograms[kind] for *_, histograms in done).summary() for kind in kinds}
+
+
+def send_file_striped(host: str, port: int, path: str, stripes: int, processes: bool = False,
+                      progress_cb=None, **options) -> dict:
+    # Envia path pelas portas port..port+stripes-1; options vão para cada
+    # TRUProtocol. progress_cb(bytes_enviados, tamanho)
+    size = os.path.getsize(path)
+    ctx = multiprocessing.get_context()
+    schedule = StripeSchedule(size, stripes, ctx)
+    counters = ctx.Array('q', stripes)
+    print(f"[STRIPE] {path}: {size} bytes em {stripes} listras "
+          f"({'processos' if processes else 'threads'})")
+
+    start = time.time()
+    done = _run_stripes(_send_stripe, stripes, (host, port, path, schedule), (options,),
+                        processes, ctx, counters, progress_cb, size)
+    elapsed = time.time() - start
+    stats = {
+        'ok': len(done) == stripes and all(ok for _, ok, _, _, _ in done),
+        'bytes': size,
+        'elapsed': elapsed,
+        'throughput': size / elapsed if elapsed > 0 else 0.0,
+        'stripe_bytes': [counters[i] for i in range(stripes)],
+        'steals': schedule.steals.value,
+        'latency': _merged_latency(done),
+    }
+    print(f"[STRIPE] {size} bytes em {elapsed:.2f}s ({stats['throughput'] / 1e6:.2f} MB/s), "
+          f"por listra {stats['stripe_bytes']}, {stats['steals']} roubos")
+    return stats
+
+
+def recv_file_striped(path: str, host: str, port: int, stripes: int, processes: bool = False,
+                      progress_cb=None, timeout: float = RECV_IDLE_TIMEOUT, **options) -> dict:
+    # Par de send_file_striped: escuta em port..port+stripes-1 e grava cada
+    # bloco na sua posição em path. progress_cb(bytes_recebidos, None)
+    open(path, 'wb').close()
+    ctx = multiprocessing.get_context()
+    counters = ctx.Array('q', stripes)
+
+    start = time.time()
+    done = _run_stripes(_recv_stripe, stripes, (host, port, path), (options, timeout),
+                        processes, ctx, counters, progress_cb, None)
+    elapsed = time.time() - start
+    received = sum(counters)
+    sizes = {size for _, _, _, size, _ in done}
+    size = sizes.pop() if len(sizes) == 1 else None
+    ok = len(done) == stripes and all(ok for _, ok, _, _, _ in done) and received == size
+    if ok:
+        os.truncate(path, size)
+    elif size is not None and len(done) == stripes:
+        print(f"[STRIPE] {received} de {size} bytes recebidos")
+    else:
+        print(f"[STRIPE] {len(done)}/{stripes} listras terminaram, {received} bytes recebidos")
+    return {
+        'ok': ok,
+        'bytes': received,
+        'elapsed': elapsed,
+        'throughput': received / elapsed if elapsed > 0 else 0.0,
+        'stripe_bytes': [counters[i] for i in range(stripes)],
+        'latency': _merged_latency(done),
+    }
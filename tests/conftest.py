@@ -0,0 +1,61 @@
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+# Módulos do projeto ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tru_protocol import TRUProtocol
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def connect_pair():
+    """Fábrica de conexões em loopback (servidor, cliente), fechadas no fim do teste.
+
+    server_link/client_link: utils.EmulatedLink pelo qual saem os pacotes de cada lado.
+    """
+    made = []
+
+    def connect(server_kw=None, server_link=None, client_link=None, **client_kw):
+        port = free_port()
+        kw = {'use_path_cache': False}
+        srv = TRUProtocol(port=port, is_server=True, **{**kw, **(server_kw or {})})
+        cli = TRUProtocol(is_server=False, **{**kw, **client_kw})
+        made.append((srv, cli))
+        if server_link:
+            server_link.attach(srv)
+        if client_link:
+            client_link.attach(cli)
+
+        accepted = threading.Event()
+
+        def accept():
+            if srv.accept() and srv.do_key_exchange_as_server():
+                accepted.set()
+
+        thread = threading.Thread(target=accept, daemon=True)
+        thread.start()
+        cli.start()
+        assert cli.connect('127.0.0.1', port)
+        assert cli.do_key_exchange_as_client()
+        assert accepted.wait(10)
+        return srv, cli
+
+    yield connect
+
+    for srv, cli in made:
+        for conn in (cli, srv):
+            conn.running = False
+            try:
+                conn.sock.close()
+            except OSError:
+                pass
@@ -0,0 +1,84 @@
+import os
+import threading
+
+import pytest
+
+from batch import (BATCH_END, BATCH_FAILED, BATCH_HEADER, BATCH_INLINE_LIMIT, batch_target,
+                   open_target)
+
+
+def _record(name: bytes, data: bytes, mode: int = 0o644) -> bytes:
+    return BATCH_HEADER.pack(len(name), mode, len(data)) + name + data
+
+
+def _receive(srv, directory) -> dict:
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(ok=srv.recv_files(str(directory), timeout=10)))
+    thread.start()
+    result['thread'] = thread
+    return result
+
+
+@pytest.mark.parametrize('name', [b'', b'/etc/passwd', b'../fora', b'a/../../fora', b'a//b', b'./a', b'a\0b'])
+def test_batch_target_rejects_unsafe_names(tmp_path, name):
+    with pytest.raises(ValueError):
+        batch_target(str(tmp_path), name)
+
+
+def test_batch_target_rejects_symlink_escape(tmp_path):
+    outside = tmp_path / 'fora'
+    outside.mkdir()
+    dest = tmp_path / 'destino'
+    dest.mkdir()
+    (dest / 'link').symlink_to(outside)
+    assert batch_target(str(dest), b'sub/arquivo.txt') == str(dest / 'sub' / 'arquivo.txt')
+    with pytest.raises(ValueError):
+        batch_target(str(dest), b'link/arquivo.txt')
+
+
+def test_open_target_does_not_follow_symlink(tmp_path):
+    victim = tmp_path / 'vitima'
+    victim.write_bytes(b'original')
+    (tmp_path / 'alvo').symlink_to(victim)
+    with pytest.raises(OSError):
+        open_target(str(tmp_path / 'alvo'), 0o644)
+    assert victim.read_bytes() == b'original'
+
+
+def test_batch_round_trip(connect_pair, tmp_path):
+    srv, cli = connect_pair()
+    source = tmp_path / 'origem'
+    files = {'a.txt': os.urandom(100), 'vazio': b'', 'sub/dir/b.bin': os.urandom(5000),
+             'grande.bin': os.urandom(BATCH_INLINE_LIMIT + 4321)}
+    for name, data in files.items():
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_bytes(data)
+    os.chmod(source / 'a.txt', 0o600)
+
+    result = _receive(srv, tmp_path / 'destino')
+    assert cli.send_files([str(source)], timeout=10)
+    result['thread'].join(10)
+
+    assert result['ok']
+    for name, data in files.items():
+        assert (tmp_path / 'destino' / name).read_bytes() == data
+    assert os.stat(tmp_path / 'destino' / 'a.txt').st_mode & 0o777 == 0o600
+    assert srv.batch_stats == {'files': len(files), 'bytes': sum(map(len, files.values()))}
+
+
+@pytest.mark.parametrize('records', [
+    [_record(b'../fora.txt', b'invasor')],
+    [_record(b'ok.txt', b'primeiro'), _record(b'ok.txt', b'segundo')],
+])
+def test_malicious_batch_is_rejected(connect_pair, tmp_path, records):
+    srv, cli = connect_pair()
+    dest = tmp_path / 'destino'
+    result = _receive(srv, dest)
+    assert cli.send_stream(records + [BATCH_END])
+    assert cli.recv_message(10) == BATCH_FAILED
+    result['thread'].join(10)
+
+    assert not result['ok']
+    assert not (tmp_path / 'fora.txt').exists()
+    if (dest / 'ok.txt').exists():
+        assert (dest / 'ok.txt').read_bytes() == b'primeiro'
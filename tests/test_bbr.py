@@ -0,0 +1,69 @@
+import congestion
+from congestion import BBRCongestionControl
+from packet import PacketType, TRUPacket, WINDOW_MAX
+
+MSS = 1400
+RTT = 0.02
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def _round(bbr, clock, seq, packets, interval=RTT):
+    # Envia packets segmentos e confirma todos interval segundos depois
+    sent = list(range(seq, seq + packets))
+    for s in sent:
+        bbr.on_packet_sent(s, MSS)
+    clock.now += interval
+    for s in sent:
+        bbr.on_packet_acked(s)
+        bbr.on_ack_received(rtt_sample=RTT)
+    return seq + packets
+
+
+def test_startup_cwnd_is_bounded_by_bdp(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(congestion, 'time', clock)
+    bbr = BBRCongestionControl(MSS)
+    seq = 0
+    # Gargalo lento (50 segmentos por segundo, RTT de 20 ms): o BDP é de
+    # um segmento, mas chegam 50 ACKs por rodada. Ainda em STARTUP, a janela
+    # não passa do ganho de STARTUP sobre o BDP
+    for _ in range(2):
+        seq = _round(bbr, clock, seq, 50, interval=1.0)
+    assert bbr.state == "STARTUP"
+    assert bbr.bdp_packets() > 0
+    cap = BBRCongestionControl.STARTUP_GAIN * bbr.bdp_packets()
+    assert bbr.cwnd <= max(cap, BBRCongestionControl.MIN_CWND)
+
+
+def test_timeout_cuts_cwnd_then_restores(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(congestion, 'time', clock)
+    bbr = BBRCongestionControl(MSS)
+    seq = 0
+    for _ in range(10):
+        seq = _round(bbr, clock, seq, 20)
+    before = bbr.cwnd
+    assert before > BBRCongestionControl.MIN_CWND
+
+    bbr.on_timeout()
+    assert bbr.get_window_size() == 1
+    # Uma segunda rodada de RTOs não apaga a janela salva
+    bbr.on_timeout()
+
+    for _ in range(2):
+        seq = _round(bbr, clock, seq, 1)
+    assert bbr.recovery_round is None
+    assert bbr.cwnd >= before
+
+
+def test_large_window_is_clamped_on_the_wire():
+    for aead in (False, True):
+        packet = TRUPacket(seq_num=1, packet_type=PacketType.SYN, window=200_000, aead=aead)
+        assert TRUPacket.deserialize(packet.serialize()).window == WINDOW_MAX
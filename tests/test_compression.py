@@ -0,0 +1,123 @@
+import os
+import threading
+
+import pytest
+
+from compression import (COMPRESS_LZMA, COMPRESS_ZLIB, COMPRESSION_BLOCK, COMPRESSION_MAX_BACKOFF,
+                         DECOMPRESS_CHUNK, StreamCompressor, StreamDecompressor, lzma)
+from packet import PacketType, TRUPacket
+from utils import EmulatedLink
+
+ALGORITHMS = [COMPRESS_ZLIB] + ([COMPRESS_LZMA] if lzma else [])
+
+
+def _text_block(i: int) -> bytes:
+    lines = (f"2026-10-19 12:{n % 60:02d}:00 INFO conexão {i}.{n} aceita de 10.0.0.{n % 256}\n"
+             for n in range(4000))
+    return ''.join(lines).encode()[:COMPRESSION_BLOCK]
+
+
+def _decompress_all(decompressor, data: bytes) -> bytes:
+    out = bytearray(decompressor.feed(data))
+    while decompressor.pending:
+        out += decompressor.feed()
+    return bytes(out)
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_round_trip_across_rejected_blocks(algorithm):
+    compressor = StreamCompressor(algorithm)
+    decompressor = StreamDecompressor(algorithm)
+    # Bloco aleatório recusado no meio (e o seguinte pulado pelo recuo): os
+    # crus não podem entrar no dicionário do zlib
+    blocks = [_text_block(0), os.urandom(COMPRESSION_BLOCK), _text_block(1), _text_block(2)]
+    outputs = [compressor.compress(block) for block in blocks]
+    assert outputs[1] is None and outputs[2] is None
+    compressed = [(outputs[0], blocks[0]), (outputs[3], blocks[3])]
+    assert all(len(out) < len(block) * 0.5 for out, block in compressed)
+
+    # O destinatário só vê os blocos comprimidos; os crus seguem como DATA
+    for out, block in compressed:
+        assert _decompress_all(decompressor, out) == block
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_decompressor_output_is_capped(algorithm):
+    compressor = StreamCompressor(algorithm)
+    decompressor = StreamDecompressor(algorithm)
+    block = bytes(COMPRESSION_BLOCK)
+    compressed = b''.join(compressor.compress(block) for _ in range(40))
+
+    out = decompressor.feed(compressed)
+    assert len(out) <= DECOMPRESS_CHUNK
+    assert decompressor.pending
+    assert out + _decompress_all(decompressor, b'') == block * 40
+
+
+def test_incompressible_blocks_back_off():
+    compressor = StreamCompressor(COMPRESS_ZLIB)
+    random_blocks = 300
+    for _ in range(random_blocks):
+        assert compressor.compress(os.urandom(4096)) is None
+    # Tentativas em 1, 1+2, ... até o teto de COMPRESSION_MAX_BACKOFF blocos
+    assert compressor.stats['blocks_tried'] < 15
+    assert compressor.stats['blocks_raw'] == random_blocks
+    assert compressor._backoff == COMPRESSION_MAX_BACKOFF
+
+    # Bloco comprimível depois do intervalo volta a ser comprimido e zera o recuo
+    while compressor._skip:
+        compressor.compress(os.urandom(4096))
+    assert compressor.compress(_text_block(2)) is not None
+    assert compressor._backoff == 1
+
+
+def test_slow_compression_sent_raw():
+    # Enlace "infinitamente" rápido: comprimir nunca compensa
+    compressor = StreamCompressor(COMPRESS_ZLIB)
+    assert compressor.compress(_text_block(0), link_rate=1e15) is None
+    assert compressor.compress(_text_block(0), link_rate=0) is None  # ainda no recuo
+    assert compressor.compress(_text_block(0), link_rate=0) is not None
+
+
+class _CountingSocket:
+    def __init__(self, sock):
+        self._sock = sock
+        self.compressed = 0
+        self.wire_bytes = 0
+
+    def sendto(self, data, addr):
+        if data[8] & ~TRUPacket.AEAD_FLAG == PacketType.COMPRESSED_DATA:
+            self.compressed += 1
+        self.wire_bytes += len(data)
+        return self._sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def test_compressed_transfer(connect_pair):
+    # Enlace de 5 MB/s com 10 ms: em loopback puro o RTT quase nulo estima uma
+    # taxa enorme e a regra de CPU recusaria blocos
+    srv, cli = connect_pair(compression='zlib', client_link=EmulatedLink(0.01, rate=5e6))
+    assert cli.compressor and srv.decompressor
+    cli.sock = counter = _CountingSocket(cli.sock)
+    payload = b''.join(_text_block(i) for i in range(8)) + os.urandom(3 * COMPRESSION_BLOCK)
+    received = bytearray()
+
+    def receive():
+        buf = bytearray(1 << 16)
+        while len(received) < len(payload):
+            n = srv.readinto(buf, 10)
+            if not n:
+                break
+            received.extend(buf[:n])
+
+    reader = threading.Thread(target=receive)
+    reader.start()
+    assert cli.send_data(payload)
+    reader.join(20)
+
+    assert bytes(received) == payload
+    assert counter.compressed > 0
+    assert counter.wire_bytes < len(payload) * 0.6
+    assert cli.get_compression_stats()['blocks_compressed'] >= 8
@@ -0,0 +1,49 @@
+import os
+import threading
+
+import pytest
+
+import utils
+from crypto import CryptoPipeline, TRUCrypto
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_pipeline_matches_inline_cipher(processes):
+    key, iv = os.urandom(32), os.urandom(16)
+    pipeline = CryptoPipeline(2, processes)
+    try:
+        segments = [os.urandom(size) for size in (1, 31, 32, 1400, 65000)]
+        encrypted = [pipeline.encrypt(s, key, iv) for s in segments]
+        for segment, future in zip(segments, encrypted):
+            assert future.result() == TRUCrypto.encrypt_data(segment, key, iv)[0]
+        decrypted = [pipeline.decrypt(f.result(), key, iv) for f in encrypted]
+        assert [f.result() for f in decrypted] == segments
+    finally:
+        pipeline.shutdown()
+
+
+def test_transfer_with_workers_on_both_sides(connect_pair, monkeypatch):
+    # Decifragem fora de ordem nos workers, entrega em ordem de seq mesmo com
+    # perdas e retransmissões
+    srv, cli = connect_pair(crypto_workers=2, server_kw={'crypto_workers': 2,
+                                                         'loss_callback': utils.loss_filter})
+    monkeypatch.setattr(utils, 'loss_probability', 0.05)
+    payload = os.urandom(300 * 1400)
+    out = {}
+
+    def receive():
+        buf = bytearray(len(payload))
+        view = memoryview(buf)
+        got = 0
+        while got < len(buf):
+            n = srv.readinto(view[got:], 15)
+            if not n:
+                break
+            got += n
+        out['data'] = bytes(buf[:got])
+
+    reader = threading.Thread(target=receive)
+    reader.start()
+    assert cli.send_data(payload)
+    reader.join(30)
+    assert out['data'] == payload
@@ -0,0 +1,83 @@
+import congestion
+from congestion import CongestionControl, CubicCongestionControl
+
+RTT = 0.05
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def _avoidance(cc, window):
+    cc.cwnd = float(window)
+    cc.ssthresh = float(window)
+    cc.state = "CONGESTION_AVOIDANCE"
+    cc.update_rtt(RTT)
+
+
+def _round(cc, clock, sample=RTT):
+    # Uma janela de ACKs espalhada por um RTT
+    acks = max(cc.get_window_size(), 1)
+    for _ in range(acks):
+        clock.now += RTT / acks
+        cc.on_ack_received(rtt_sample=sample)
+
+
+def test_loss_backs_off_less_than_reno(monkeypatch):
+    monkeypatch.setattr(congestion, 'time', FakeClock())
+    reno, cubic = CongestionControl(), CubicCongestionControl()
+    for cc in (reno, cubic):
+        _avoidance(cc, 100)
+        cc.on_three_duplicate_acks()
+    assert reno.cwnd == 50
+    assert cubic.cwnd == 100 * CubicCongestionControl.BETA
+    assert cubic.w_max == 100
+
+
+def test_window_regrows_to_w_max_around_k(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(congestion, 'time', clock)
+    cubic = CubicCongestionControl()
+    _avoidance(cubic, 100)
+    cubic.on_three_duplicate_acks()
+    cubic.on_ack_received(rtt_sample=RTT)  # sai da recuperação rápida
+
+    # K = (W_max (1 - beta) / C)^(1/3): ~4,2 s para W_max = 100
+    k = (100 * (1 - CubicCongestionControl.BETA) / CubicCongestionControl.C) ** (1 / 3)
+    start = clock.now
+    while cubic.cwnd < 99 and clock.now - start < 2 * k:
+        _round(cubic, clock)
+    # Crescimento em função do tempo desde a perda, não do número de RTTs
+    assert 0.5 * k < clock.now - start < 1.5 * k
+
+
+def test_fast_convergence_lowers_w_max(monkeypatch):
+    monkeypatch.setattr(congestion, 'time', FakeClock())
+    cubic = CubicCongestionControl()
+    _avoidance(cubic, 100)
+    cubic.on_three_duplicate_acks()
+    # Nova perda abaixo do máximo anterior: libera banda para outro fluxo
+    cubic.cwnd = 80.0
+    cubic.on_three_duplicate_acks()
+    assert cubic.w_max == 80 * (1 + CubicCongestionControl.BETA) / 2
+
+
+def test_hystart_leaves_slow_start_on_delay_increase(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(congestion, 'time', clock)
+    cubic = CubicCongestionControl()
+    cubic.ssthresh = 10_000.0
+    for _ in range(4):
+        _round(cubic, clock)
+    assert cubic.state == "SLOW_START"
+    # A fila começa a crescer: RTT 20 ms acima do mínimo da rodada anterior
+    for _ in range(3):
+        _round(cubic, clock, sample=RTT + 0.02)
+        if cubic.state != "SLOW_START":
+            break
+    assert cubic.state == "CONGESTION_AVOIDANCE"
+    assert cubic.ssthresh < 10_000
@@ -0,0 +1,76 @@
+import os
+import random
+import threading
+
+from delta import OP_COPY, Signatures, block_size_for, delta_instructions
+
+SIZE = 256 << 10
+
+
+def _sync(connect_pair, tmp_path, old, new):
+    srv, cli = connect_pair()
+    source, dest = tmp_path / 'new.bin', tmp_path / 'dest.bin'
+    source.write_bytes(new)
+    if old is not None:
+        dest.write_bytes(old)
+    result = {}
+    receiver = threading.Thread(target=lambda: result.update(ok=srv.recv_file_delta(str(dest), timeout=10)))
+    receiver.start()
+    assert cli.send_file_delta(str(source), timeout=10)
+    receiver.join(10)
+    assert result['ok']
+    assert dest.read_bytes() == new
+    assert not (tmp_path / 'dest.bin.delta').exists()
+    return cli.delta_stats
+
+
+def test_rolling_match_after_insertion(tmp_path):
+    # Inserção no início desloca todos os blocos: o checksum rolante acha os mesmos
+    old = os.urandom(SIZE)
+    path = tmp_path / 'old.bin'
+    path.write_bytes(old)
+    with open(path, 'rb') as f:
+        signatures = Signatures.from_file(f.fileno(), SIZE)
+    assert signatures.block_size == block_size_for(SIZE)
+
+    stats = {}
+    ops = list(delta_instructions(memoryview(b'inserido' + old), signatures, stats))
+    assert stats['copied_bytes'] == SIZE // signatures.block_size * signatures.block_size
+    assert stats['literal_bytes'] == 8 + SIZE - stats['copied_bytes']
+    assert sum(1 for op in ops if bytes(op[:1]) == OP_COPY) == stats['copy_runs'] == 1
+
+
+def test_signatures_round_trip(tmp_path):
+    path = tmp_path / 'old.bin'
+    path.write_bytes(os.urandom(SIZE + 123))
+    with open(path, 'rb') as f:
+        signatures = Signatures.from_file(f.fileno(), SIZE + 123)
+    unpacked = Signatures.unpack(signatures.pack())
+    assert unpacked.block_size == signatures.block_size
+    assert unpacked.blocks == signatures.blocks
+
+
+def test_delta_sends_only_changed_region(connect_pair, tmp_path):
+    old = os.urandom(SIZE)
+    new = bytearray(old)
+    new[SIZE // 2:SIZE // 2 + 3000] = os.urandom(3000)
+    stats = _sync(connect_pair, tmp_path, old, bytes(new))
+    assert stats['literal_bytes'] < 3000 + 2 * block_size_for(SIZE)
+    assert stats['copied_bytes'] + stats['literal_bytes'] == SIZE
+
+
+def test_scattered_edits_and_length_change(connect_pair, tmp_path):
+    rng = random.Random(7)
+    old = os.urandom(SIZE)
+    new = bytearray(old)
+    for _ in range(20):
+        at = rng.randrange(len(new))
+        new[at:at + rng.randrange(1, 50)] = os.urandom(rng.randrange(0, 80))
+    _sync(connect_pair, tmp_path, old, bytes(new) + b'cauda')
+
+
+def test_missing_destination_is_all_literal(connect_pair, tmp_path):
+    new = os.urandom(SIZE)
+    stats = _sync(connect_pair, tmp_path, None, new)
+    assert stats['copied_bytes'] == 0
+    assert stats['literal_bytes'] == SIZE
@@ -0,0 +1,118 @@
+import math
+import os
+import pickle
+import random
+import threading
+
+import pytest
+
+from histogram import HIST_BUCKETS, LatencyHistogram, _bucket, _bucket_range, merge_histograms
+
+
+def _samples(count: int, seed: int = 1) -> list:
+    # Latências log-normais em segundos, de dezenas de µs a segundos
+    rng = random.Random(seed)
+    return [rng.lognormvariate(math.log(0.005), 1.5) for _ in range(count)]
+
+
+def _exact(values: list, point: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(point / 100 * len(ordered))) - 1]
+
+
+def test_buckets_cover_their_values():
+    # Cada valor cai na faixa cujo intervalo o contém, e a largura relativa
+    # das faixas logarítmicas não passa de 1/64
+    for units in list(range(300)) + [1000, 4095, 4096, 123456789, 2 ** 39 + 7]:
+        lowest, width = _bucket_range(_bucket(units))
+        assert lowest <= units < lowest + width
+        if units >= 128:
+            assert width / lowest <= 1 / 64
+    assert _bucket(2 ** 60) == HIST_BUCKETS - 1
+
+
+def test_percentiles_within_relative_error():
+    values = _samples(50000)
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    result = histogram.percentiles()
+    assert set(result) == {'p50', 'p90', 'p99', 'p99.9'}
+    for point in (50, 90, 99, 99.9):
+        exact = _exact(values, point)
+        assert abs(result[f"p{point:g}"] - exact) <= exact / 64 + 1e-6
+    summary = histogram.summary()
+    assert summary['count'] == len(values)
+    assert summary['min'] == min(values) and summary['max'] == max(values)
+    assert summary['mean'] == pytest.approx(sum(values) / len(values))
+
+
+def test_percentiles_clamped_to_observed_range():
+    histogram = LatencyHistogram()
+    histogram.record(0.0100004)
+    assert histogram.percentile(50) == histogram.percentile(99.9) == 0.0100004
+    histogram.record(-1.0)  # relógio voltando: conta como zero
+    assert histogram.min == 0.0
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentiles() == {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'p99.9': 0.0}
+    assert histogram.summary()['min'] == 0.0
+    assert LatencyHistogram.from_dict(histogram.to_dict()).min == math.inf
+
+
+def test_merge_equals_recording_everything():
+    values = _samples(20000, seed=2)
+    whole = LatencyHistogram()
+    parts = [LatencyHistogram() for _ in range(4)]
+    for index, value in enumerate(values):
+        whole.record(value)
+        parts[index % 4].record(value)
+    merged = merge_histograms(parts)
+    assert merged.counts == whole.counts
+    assert merged.percentiles() == whole.percentiles()
+    assert (merged.count, merged.min, merged.max) == (whole.count, whole.min, whole.max)
+
+
+def test_merge_rejects_other_unit():
+    with pytest.raises(ValueError):
+        LatencyHistogram().merge(LatencyHistogram(unit=1e-3))
+
+
+def test_dict_and_pickle_round_trip():
+    histogram = LatencyHistogram()
+    for value in _samples(5000, seed=3):
+        histogram.record(value)
+    data = histogram.to_dict()
+    assert len(data['buckets']) < HIST_BUCKETS
+    for copy in (LatencyHistogram.from_dict(data), pickle.loads(pickle.dumps(histogram))):
+        assert copy.counts == histogram.counts
+        assert copy.summary() == histogram.summary()
+
+
+def test_connection_records_rtt_delivery_and_completion(connect_pair):
+    srv, cli = connect_pair()
+    payload = os.urandom(50 * 1400)
+    received = bytearray()
+
+    def receive():
+        buf = bytearray(len(payload))
+        while len(received) < len(payload):
+            n = srv.readinto(buf, 10)
+            if not n:
+                break
+            received.extend(buf[:n])
+
+    reader = threading.Thread(target=receive)
+    reader.start()
+    assert cli.send_data(payload)
+    reader.join(20)
+    assert bytes(received) == payload
+
+    stats = cli.get_rtt_stats()
+    histograms = cli.get_latency_histograms()
+    assert stats['samples'] == histograms['rtt'].count > 0
+    assert stats['min'] <= stats['p50'] <= stats['p99.9'] <= stats['max']
+    assert stats['delivery']['count'] >= 50
+    assert stats['completion']['count'] == 1
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import free_port
+from tru_protocol import TRUProtocol
+
+
+@pytest.fixture
+def handshake_only():
+    # (servidor, cliente) depois do SYN/SYN_ACK, sem troca de chaves; o teste
+    # escolhe a ordem das chamadas de cada lado
+    made = []
+
+    def connect(**client_kw):
+        port = free_port()
+        srv = TRUProtocol(port=port, is_server=True, use_path_cache=False)
+        cli = TRUProtocol(is_server=False, use_path_cache=False, **client_kw)
+        made.append((srv, cli))
+        accepted = threading.Event()
+        threading.Thread(target=lambda: srv.accept() and accepted.set(), daemon=True).start()
+        cli.start()
+        assert cli.connect('127.0.0.1', port)
+        assert accepted.wait(10)
+        return srv, cli
+
+    yield connect
+
+    for srv, cli in made:
+        for conn in (cli, srv):
+            conn.running = False
+            try:
+                conn.sock.close()
+            except OSError:
+                pass
+
+
+def test_key_exchange_before_server_waits(handshake_only):
+    # Cliente sem DH no SYN: as chaves vêm num KEY_EXCHANGE separado, que
+    # chega antes de o servidor chamar do_key_exchange_as_server
+    srv, cli = handshake_only(enable_encryption=False)
+    assert cli.do_key_exchange_as_client()
+    time.sleep(0.2)
+    start = time.time()
+    assert srv.do_key_exchange_as_server()
+    assert time.time() - start < 1.0
+
+
+def test_keys_negotiated_in_syn_before_server_waits(handshake_only):
+    srv, cli = handshake_only()
+    assert cli.do_key_exchange_as_client()
+    start = time.time()
+    assert srv.do_key_exchange_as_server()
+    assert time.time() - start < 1.0
+
+
+def test_legacy_exchange_derives_the_same_key(handshake_only):
+    # Cada lado sorteava o próprio salt do HKDF e as chaves nunca batiam; o
+    # cliente agora usa o salt que o servidor manda no KEY_RESPONSE
+    srv, cli = handshake_only(enable_encryption=False)
+    assert cli.do_key_exchange_as_client()
+    assert srv.do_key_exchange_as_server()
+    assert cli.encryption_key is not None
+    assert cli.encryption_key == srv.encryption_key
+
+    payload = os.urandom(20 * 1400)
+    received = bytearray()
+
+    def receive():
+        buf = bytearray(len(payload))
+        while len(received) < len(payload):
+            n = srv.readinto(buf, 10)
+            if not n:
+                break
+            received.extend(buf[:n])
+
+    reader = threading.Thread(target=receive)
+    reader.start()
+    assert cli.send_data(payload)
+    reader.join(20)
+    assert bytes(received) == payload
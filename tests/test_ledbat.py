@@ -0,0 +1,169 @@
+import pytest
+
+import congestion
+from congestion import CongestionControl, LedbatCongestionControl
+
+# Gargalo modelado por rodadas de um RTT, com relógio falso: 40 pacotes por
+# RTT base de 20 ms e fila de 80 pacotes (40 ms); além disso, descarte
+BASE_RTT = 0.020
+ONE_WAY_DELAY = 0.010
+CAPACITY = 40
+QUEUE = 80
+TARGET = LedbatCongestionControl.TARGET
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(congestion, 'time', clock)
+    return clock
+
+
+def _avoidance(cc, window):
+    cc.cwnd = float(window)
+    cc.ssthresh = float(window)
+    cc.state = "CONGESTION_AVOIDANCE"
+
+
+def _acks(cc, count, queuing_delay, offset=0.0):
+    # count ACKs com o mesmo atraso de fila e a janela cheia em voo (senão o
+    # limite de crescimento pelo que está em voo segura o cwnd); offset
+    # simula relógios não sincronizados
+    for _ in range(count):
+        while cc.flight_size < int(cc.cwnd):
+            cc.on_packet_sent()
+        cc.on_packet_acked(None)
+        cc.on_delay_sample(ONE_WAY_DELAY + queuing_delay + offset)
+        cc.on_ack_received(rtt_sample=BASE_RTT + queuing_delay)
+
+
+def _share(clock, flows, rounds):
+    # Fluxos com ACK-clock pelo mesmo gargalo; devolve as janelas de cada rodada
+    flights = [0] * len(flows)
+    history = []
+    for _ in range(rounds):
+        for i, cc in enumerate(flows):
+            while flights[i] < max(int(cc.cwnd), 1):
+                cc.on_packet_sent()
+                flights[i] += 1
+        windows = list(flights)
+        total = sum(windows)
+        queue = max(total - CAPACITY, 0)
+        lost, queue = max(queue - QUEUE, 0), min(queue, QUEUE)
+        queuing_delay = queue / CAPACITY * BASE_RTT
+        for i, (cc, window) in enumerate(zip(flows, windows)):
+            drop = round(lost * window / total)
+            for _ in range(drop):
+                cc.on_packet_abandoned(None)
+                flights[i] -= 1
+            if drop:
+                cc.on_three_duplicate_acks()
+            for _ in range(window - drop):
+                cc.on_packet_acked(None)
+                flights[i] -= 1
+                cc.on_delay_sample(ONE_WAY_DELAY + queuing_delay)
+                cc.on_ack_received(rtt_sample=BASE_RTT + queuing_delay)
+                if flights[i] < int(cc.cwnd):
+                    cc.on_packet_sent()
+                    flights[i] += 1
+        clock.now += BASE_RTT + queuing_delay
+        history.append((windows, queuing_delay))
+    return history
+
+
+def test_slow_start_ends_at_half_the_target(clock):
+    ledbat = LedbatCongestionControl()
+    _acks(ledbat, 1, 0.0)  # primeira amostra: atraso base
+    _acks(ledbat, 10, 0.0)
+    assert ledbat.state == "SLOW_START"
+    _acks(ledbat, LedbatCongestionControl.CURRENT_FILTER - 1, TARGET * 0.6)
+    assert ledbat.state == "SLOW_START"  # o filtro ainda tem amostras sem fila
+    _acks(ledbat, 1, TARGET * 0.6)
+    assert ledbat.state == "CONGESTION_AVOIDANCE"
+    assert ledbat.ssthresh == ledbat.cwnd
+
+
+def test_cwnd_follows_queuing_delay(clock):
+    ledbat = LedbatCongestionControl()
+    _acks(ledbat, 1, 0.0)
+    _avoidance(ledbat, 20)
+
+    # Sem fila, cerca de um segmento por janela de ACKs; na metade do alvo,
+    # cerca de meio (as primeiras amostras do filtro ainda são sem fila)
+    _acks(ledbat, 20, 0.0)
+    assert ledbat.cwnd == pytest.approx(21, abs=0.05)
+    _acks(ledbat, 21, TARGET * 0.5)
+    assert 0.4 < ledbat.cwnd - 21 < 0.7
+    # Acima do alvo, encolhe
+    before = ledbat.cwnd
+    _acks(ledbat, 21, TARGET * 2)
+    assert ledbat.queuing_delay == pytest.approx(TARGET * 2)
+    assert before - 1 < ledbat.cwnd < before - 0.5
+
+    # Fila muito acima do alvo: desce até o mínimo e para
+    _acks(ledbat, 2000, TARGET * 4)
+    assert ledbat.cwnd == LedbatCongestionControl.MIN_CWND
+
+
+def test_clock_offset_cancels_out(clock):
+    # Só a diferença para o atraso base conta: relógio do peer adiantado dá
+    # a mesma janela
+    synced, skewed = LedbatCongestionControl(), LedbatCongestionControl()
+    for delay in (0.0, 0.005, 0.010, 0.040, 0.002, 0.030):
+        _acks(synced, 15, delay)
+        _acks(skewed, 15, delay, offset=3.7)
+    assert skewed.cwnd == pytest.approx(synced.cwnd)
+    assert skewed.queuing_delay == pytest.approx(synced.queuing_delay)
+
+
+def test_base_delay_forgets_old_minutes(clock):
+    # Rota nova com atraso maior: depois de BASE_HISTORY minutos o atraso
+    # base antigo sai do histórico e a fila volta a ser medida como zero
+    ledbat = LedbatCongestionControl()
+    _acks(ledbat, 4, 0.0)
+    for minute in range(LedbatCongestionControl.BASE_HISTORY):
+        clock.now += 60
+        _acks(ledbat, 4, 0.050)
+        if minute < LedbatCongestionControl.BASE_HISTORY - 1:
+            assert ledbat.queuing_delay == pytest.approx(0.050)
+    assert ledbat.queuing_delay == pytest.approx(0.0)
+
+
+def test_loss_halves_once_per_rtt(clock):
+    ledbat = LedbatCongestionControl()
+    _acks(ledbat, 1, 0.0)
+    _avoidance(ledbat, 40)
+    ledbat.on_three_duplicate_acks()
+    ledbat.on_three_duplicate_acks()  # mesma janela de perdas
+    assert ledbat.cwnd == 20
+    clock.now += 2 * ledbat.rtt_avg
+    ledbat.on_three_duplicate_acks()
+    assert ledbat.cwnd == 10
+
+
+def test_alone_fills_the_link_and_holds_the_target(clock):
+    ledbat = LedbatCongestionControl()
+    history = _share(clock, [ledbat], 300)[-100:]
+    assert min(windows[0] for windows, _ in history) >= CAPACITY
+    assert all(abs(delay - TARGET) < 0.005 for _, delay in history)
+
+
+def test_backs_off_for_a_reno_flow(clock):
+    ledbat, reno = LedbatCongestionControl(), CongestionControl()
+    alone = _share(clock, [ledbat], 300)[-1][0][0]
+
+    history = _share(clock, [ledbat, reno], 600)[-300:]
+    ledbat_window = sum(windows[0] for windows, _ in history) / len(history)
+    reno_window = sum(windows[1] for windows, _ in history) / len(history)
+    # Com o Reno enchendo a fila além do alvo, o LEDBAT cede quase todo o enlace
+    assert ledbat_window < alone / 4
+    assert ledbat_window < reno_window / 5
+    assert reno_window >= CAPACITY
@@ -0,0 +1,122 @@
+import math
+import random
+import sys
+import threading
+
+import pytest
+
+import metrics_collector
+from metrics_collector import ColumnarMetricsCollector, MetricsCollector
+
+SUMMARY_KEYS = ('total_packets_sent', 'total_retransmissions', 'loss_rate', 'total_bytes_sent',
+                'total_bytes_acked', 'avg_rtt_seconds', 'min_rtt_seconds', 'max_rtt_seconds',
+                'std_rtt_seconds', 'rtt_percentiles_seconds')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def _replay(collector, events):
+    for event in events:
+        if event[0] == 'send':
+            collector.record_packet_sent(*event[1:])
+        else:
+            collector.record_ack_received(*event[1:])
+
+
+def _events(packets: int, lag: int, seed: int = 1):
+    # Envios (com retransmissões) e ACKs fora de ordem atrás do envio, um por seq
+    rng = random.Random(seed)
+    events, unacked = [], []
+    for seq in range(packets):
+        state = rng.choice(('slow_start', 'congestion_avoidance', 'fast_recovery'))
+        events.append(('send', seq * 1400, 1400, False, 10.0 + seq, 64.0, state))
+        if rng.random() < 0.05:
+            events.append(('send', seq * 1400, 1400, True, 5.0, 5.0, 'fast_recovery'))
+        unacked.append(seq * 1400)
+        if len(unacked) > lag:
+            events.append(('ack', unacked.pop(rng.randrange(len(unacked))), rng.uniform(0.01, 0.05)))
+    events.append(('ack', 123456789, 0.01))  # seq desconhecido: ignorado
+    return events
+
+
+def test_columnar_matches_list_collector():
+    events = _events(3000, 64)
+    reference, columnar = MetricsCollector(), ColumnarMetricsCollector(initial_rows=16)
+    _replay(reference, events)
+    _replay(columnar, events)
+
+    def rows(collector):
+        return [(m.seq_num, m.size, m.is_retransmission, m.rtt, m.congestion_window, m.ssthresh,
+                 m.congestion_state) for m in collector.packet_metrics]
+
+    assert rows(columnar) == rows(reference)
+    expected, actual = reference.get_summary_stats(), columnar.get_summary_stats()
+    assert {k: actual[k] for k in SUMMARY_KEYS} == {k: expected[k] for k in SUMMARY_KEYS}
+    assert columnar.total_bytes_acked == reference.total_bytes_acked
+
+
+def test_columns_grow_and_export():
+    collector = ColumnarMetricsCollector(initial_rows=4)
+    for seq in range(100):
+        collector.record_packet_sent(seq, 1000 + seq, False, 1.0, 2.0, 'slow_start')
+    collector.record_ack_received(50, 0.02)
+    columns = collector.columns()
+    assert list(columns['seq_num']) == list(range(100))
+    assert columns['size'][99] == 1099
+    assert columns['rtt'][50] == 0.02 and math.isnan(columns['rtt'][49])  # NaN = sem RTT
+    assert collector.state_names == ['slow_start']
+
+
+@pytest.mark.parametrize('collector_cls', [MetricsCollector, ColumnarMetricsCollector])
+def test_throughput_sampled_after_interval(monkeypatch, collector_cls):
+    clock = FakeClock()
+    monkeypatch.setattr(metrics_collector, 'time', clock)
+    collector = collector_cls()
+    collector.record_packet_sent(0, 1400, False, 1.0, 2.0, 'slow_start')
+    collector.record_ack_received(0, 0.01)
+    collector.sample_throughput(0)
+    assert not collector.throughput_samples  # menos de 100 ms
+    clock.now += 0.2
+    collector.sample_throughput(1)
+    sample, = collector.throughput_samples
+    assert sample.bytes_sent == sample.bytes_acked == 1400
+    assert sample.estimated_throughput == pytest.approx(1400 / 0.2)
+
+
+def test_concurrent_senders_lose_no_rows():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    collector = ColumnarMetricsCollector(initial_rows=8)
+    threads_n, packets = 6, 5000
+    stop = threading.Event()
+
+    def sender(base):
+        for seq in range(base, base + packets):
+            collector.record_packet_sent(seq, 100, False, 1.0, 2.0, 'slow_start')
+
+    def reader():
+        while not stop.is_set():
+            collector.get_summary_stats()
+
+    try:
+        watcher = threading.Thread(target=reader)
+        watcher.start()
+        senders = [threading.Thread(target=sender, args=(i * packets,)) for i in range(threads_n)]
+        for thread in senders:
+            thread.start()
+        for thread in senders:
+            thread.join()
+        stop.set()
+        watcher.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert sorted(collector.columns()['seq_num']) == list(range(threads_n * packets))
+    assert collector.total_packets_sent == threads_n * packets
+    assert collector.get_summary_stats()['total_bytes_sent'] == threads_n * packets * 100
@@ -0,0 +1,109 @@
+import os
+import random
+
+import pytest
+
+from metrics_collector import ColumnarMetricsCollector
+from metrics_log import MetricsLog, MetricsLogWriter, StreamingMetricsCollector, log_files
+
+SUMMARY_KEYS = ('total_packets_sent', 'total_retransmissions', 'loss_rate', 'total_bytes_sent',
+                'total_bytes_acked', 'avg_rtt_seconds', 'min_rtt_seconds', 'max_rtt_seconds',
+                'std_rtt_seconds')
+
+
+def _replay(collector, packets: int, lag: int = 32, seed: int = 1):
+    rng = random.Random(seed)
+    unacked = []
+    for seq in range(packets):
+        state = rng.choice(('slow_start', 'congestion_avoidance'))
+        collector.record_packet_sent(seq, 1400, False, 10.0 + seq, 64.0, state)
+        if rng.random() < 0.05:
+            collector.record_packet_sent(seq, 1400, True, 5.0, 5.0, 'fast_recovery')
+        unacked.append(seq)
+        if len(unacked) > lag:
+            collector.record_ack_received(unacked.pop(rng.randrange(len(unacked))), rng.uniform(0.01, 0.05))
+
+
+@pytest.mark.parametrize('existing', ['metrics.bin', 'metrics.bin.1'])
+def test_existing_log_is_not_overwritten(tmp_path, existing):
+    (tmp_path / existing).write_bytes(b'execucao anterior')
+    with pytest.raises(FileExistsError):
+        MetricsLogWriter(str(tmp_path / 'metrics.bin'), 0.0)
+    assert (tmp_path / existing).read_bytes() == b'execucao anterior'
+
+
+def test_log_matches_in_memory_collector(tmp_path):
+    path = str(tmp_path / 'metrics.bin')
+    streaming = StreamingMetricsCollector(path, ring_records=64, flush_interval=60)
+    columnar = ColumnarMetricsCollector()
+    _replay(streaming, 5000)
+    _replay(columnar, 5000)
+    live = streaming.get_summary_stats()
+    streaming.close()
+
+    expected = columnar.get_summary_stats()
+    with MetricsLog(path) as log:
+        loaded = log.summary()
+        metrics = log.packet_metrics()
+    for key in SUMMARY_KEYS:
+        assert loaded[key] == pytest.approx(expected[key])
+        assert live[key] == pytest.approx(expected[key])
+    assert [(m.seq_num, m.is_retransmission, m.rtt, m.congestion_state) for m in metrics] == \
+        [(m.seq_num, m.is_retransmission, m.rtt, m.congestion_state) for m in columnar.packet_metrics]
+    # Anel de 64 registros: cheio muitas vezes, descarregado na hora sem perder nada
+    assert streaming.log.stats['inline_flushes'] > 0
+    assert streaming.log.stats['dropped'] == 0
+
+
+def test_rotation_keeps_files_decodable(tmp_path):
+    path = str(tmp_path / 'metrics.bin')
+    collector = StreamingMetricsCollector(path, ring_records=256, flush_interval=60,
+                                          rotate_bytes=48 * 1000, keep_files=2)
+    _replay(collector, 5000)
+    collector.close()
+
+    files = log_files(path)
+    assert files == [f"{path}.2", f"{path}.1", path]
+    assert collector.log.stats['rotations'] > 2
+    for name in files:
+        assert os.path.getsize(name) <= 48 * 1000 + 256 * 48
+    # Cada arquivo repete os nomes de estado: um rotacionado decodifica sozinho
+    alone = str(tmp_path / 'sozinho.bin')
+    os.replace(f"{path}.1", alone)
+    with MetricsLog(alone) as log:
+        metrics = log.packet_metrics()
+    assert metrics and all(m.congestion_state for m in metrics)
+
+
+class _FailingFile:
+    def write(self, data):
+        raise OSError(28, 'No space left on device')
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_write_errors_stay_off_the_send_path(tmp_path):
+    path = str(tmp_path / 'metrics.bin')
+    collector = StreamingMetricsCollector(path, ring_records=16, flush_interval=60)
+    writer = collector.log
+    writer._file.close()
+    writer._file = _FailingFile()
+
+    _replay(collector, 10)
+    assert not writer.flush()
+    assert writer.error is not None
+    # Com o arquivo falhando, o anel cheio descarta os mais antigos sem E/S
+    _replay(collector, 100, seed=2)
+    assert writer.stats['dropped'] > 0
+
+    # Próxima descarga reabre o arquivo (modo acréscimo) e volta a gravar
+    writer._file = None
+    assert writer.flush()
+    assert writer.error is None
+    collector.close()
+    with MetricsLog(path) as log:
+        assert len(log) > 0
@@ -0,0 +1,128 @@
+import os
+import socket
+import threading
+
+import pytest
+
+from conftest import free_port
+from multicast import (ANNOUNCE, MCAST_MAX_FEC_GROUP, MCAST_MAX_SEGMENT_SIZE, MCAST_MAX_SEGMENTS,
+                       Member, MulticastReceiver, MulticastSender, _packet, nack_ranges, xor_blocks)
+from packet import PacketType
+
+GROUP = '239.255.42.99'
+
+
+def _receive(receiver, path, timeout: float = 1.0) -> dict:
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(ok=receiver.receive(str(path), timeout=timeout)))
+    thread.start()
+    result['thread'] = thread
+    return result
+
+
+def _announce(port: int, size: int, segment_size: int, fec_group: int):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton('127.0.0.1'))
+        sock.sendto(_packet(PacketType.MCAST_ANNOUNCE, 0, 1234,
+                            ANNOUNCE.pack(size, segment_size, fec_group, 0, 0, bytes(32))), (GROUP, port))
+
+
+@pytest.mark.parametrize('size, segment_size, fec_group', [
+    (1000, 0, 16),
+    (1000, MCAST_MAX_SEGMENT_SIZE + 1, 16),
+    (1000, 1400, MCAST_MAX_FEC_GROUP + 1),
+    (1400 * (MCAST_MAX_SEGMENTS + 1), 1400, 16),
+    (2 ** 64 - 1, 1, 0),
+])
+def test_out_of_bounds_announce_is_ignored(tmp_path, size, segment_size, fec_group):
+    port = free_port()
+    receiver = MulticastReceiver(GROUP, port, interface='127.0.0.1')
+    try:
+        result = _receive(receiver, tmp_path / 'saida')
+        _announce(port, size, segment_size, fec_group)
+        result['thread'].join(5)
+    finally:
+        receiver.close()
+    assert not result['ok']
+    assert receiver.session is None
+    assert not (tmp_path / 'saida').exists()
+
+
+def test_max_size_and_expected_sender(tmp_path):
+    port = free_port()
+    limited = MulticastReceiver(GROUP, port, interface='127.0.0.1', max_size=10000)
+    other = MulticastReceiver(GROUP, port, interface='127.0.0.1', sender='127.0.0.2')
+    # Controle: sem restrições o mesmo anúncio abre a sessão
+    open_ = MulticastReceiver(GROUP, port, interface='127.0.0.1')
+    receivers = [limited, other, open_]
+    try:
+        results = [_receive(r, tmp_path / name) for r, name in zip(receivers, ('limitado', 'outro', 'aberto'))]
+        _announce(port, 20000, 1400, 16)
+        for result in results:
+            result['thread'].join(5)
+    finally:
+        for receiver in receivers:
+            receiver.close()
+    assert limited.session is None and other.session is None
+    assert open_.session == 1234
+    assert os.listdir(tmp_path) == ['aberto']
+
+
+class _DropOnce:
+    # Perde a primeira chegada de cada seq dado (o reparo passa)
+    def __init__(self, seqs):
+        self.pending = set(seqs)
+
+    def __call__(self, seq: int) -> bool:
+        if seq in self.pending:
+            self.pending.discard(seq)
+            return True
+        return False
+
+
+def test_nack_ranges_and_parity():
+    assert nack_ranges([1, 2, 3, 7, 9, 10]) == [(1, 3), (7, 1), (9, 2)]
+    blocks = [os.urandom(100) for _ in range(4)] + [os.urandom(60)]
+    parity = xor_blocks(blocks, 100)
+    # Qualquer bloco é o XOR da paridade com os demais
+    assert xor_blocks(blocks[:2] + blocks[3:] + [parity], 100) == blocks[2]
+    assert xor_blocks(blocks[:4] + [parity], 100)[:60] == blocks[4]
+
+
+def test_repair_plan_prefers_parity():
+    sender = MulticastSender(GROUP, free_port(), interface='127.0.0.1', fec_group=16)
+    try:
+        sender.count = 200
+        a, b = Member(('a', 1), missing={70, 100, 101, 150}), Member(('b', 1), missing={71, 150})
+        plan = sender._plan_repairs([a, b])
+    finally:
+        sender.close()
+    # Grupo 4 (64-79): cada receptor perdeu um segmento diferente, uma paridade
+    # repara os dois; grupo 6: a perdeu dois segmentos; 150: o mesmo para os dois
+    assert plan == [(PacketType.MCAST_PARITY, 4), (PacketType.MCAST_DATA, 100),
+                    (PacketType.MCAST_DATA, 101), (PacketType.MCAST_DATA, 150)]
+
+
+def test_multicast_transfer_with_repairs(tmp_path):
+    port = free_port()
+    payload = os.urandom(200 * 1400 - 321)
+    source = tmp_path / 'origem'
+    source.write_bytes(payload)
+    receivers = [MulticastReceiver(GROUP, port, interface='127.0.0.1', loss_callback=_DropOnce(seqs))
+                 for seqs in ({70, 100, 101, 150}, {71, 150})]
+    sender = MulticastSender(GROUP, port, interface='127.0.0.1', rate=50e6)
+    try:
+        results = [_receive(r, tmp_path / f"copia{i}", timeout=10) for i, r in enumerate(receivers)]
+        assert sender.send_file(str(source), receivers=2, join_timeout=5)
+        for result in results:
+            result['thread'].join(10)
+    finally:
+        sender.close()
+        for receiver in receivers:
+            receiver.close()
+
+    assert all(result['ok'] for result in results)
+    assert all((tmp_path / f"copia{i}").read_bytes() == payload for i in range(2))
+    assert sender.stats['completed'] == 2
+    assert sender.stats['parity_packets'] >= 1
+    assert receivers[1].stats['recovered'] >= 1
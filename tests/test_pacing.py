@@ -0,0 +1,33 @@
+from pacing import Pacer
+
+
+def _burst(pacer, size):
+    # Envios seguidos que saem sem espera
+    sent = 0
+    while pacer._debit(size) == 0:
+        sent += 1
+    return sent
+
+
+def test_burst_follows_segment_size():
+    pacer = Pacer(burst_packets=4, mss=1400)
+    pacer.set_mss(9000)
+    pacer.tokens = pacer.burst_bytes
+    pacer.rate = 1.0  # recarga desprezível durante o teste
+    assert pacer.burst_bytes == 4 * 9000
+    assert _burst(pacer, 9000) == 4
+
+
+def test_smaller_segment_clamps_tokens():
+    pacer = Pacer(burst_packets=4, mss=9000)
+    pacer.set_mss(1400)
+    assert pacer.tokens <= 4 * 1400
+    pacer.rate = 1.0
+    assert _burst(pacer, 1400) == 4
+
+
+def test_set_segment_size_updates_pacer(connect_pair):
+    srv, cli = connect_pair()
+    cli.set_segment_size(8000)
+    assert cli.pacer.mss == cli.mss
+    assert cli.pacer.burst_bytes == 4 * cli.mss
@@ -0,0 +1,64 @@
+import json
+
+import path_cache
+from path_cache import PathCache
+
+A, B, C = ('10.0.0.1', 5000), ('10.0.0.2', 5000), ('10.0.0.3', 5000)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(path_cache, 'time', clock)
+    cache = PathCache(ttl=60)
+    cache.store(A, 0.05, 0.01, 32.0, 20.0)
+    clock.now += 59
+    assert cache.lookup(A).srtt == 0.05
+    clock.now += 2
+    assert cache.lookup(A) is None
+    assert not cache.entries
+
+
+def test_least_recently_used_is_evicted():
+    cache = PathCache(max_entries=2)
+    cache.store(A, 0.05, 0.01, 32.0, 20.0)
+    cache.store(B, 0.06, 0.01, 32.0, 20.0)
+    cache.lookup(A)  # A passa a ser o mais recente
+    cache.store(C, 0.07, 0.01, 32.0, 20.0)
+    assert cache.lookup(B) is None
+    assert cache.lookup(A) and cache.lookup(C)
+
+
+def test_persisted_entries_survive_restart(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(path_cache, 'time', clock)
+    persist = str(tmp_path / 'paths.json')
+    cache = PathCache(ttl=60, persist_file=persist)
+    cache.store(A, 0.05, 0.01, 32.0, 20.0)
+    clock.now += 30
+    cache.store(B, 0.06, 0.01, 16.0, 10.0)
+
+    restored = PathCache(ttl=60, persist_file=persist)
+    assert restored.lookup(A).cwnd == 20.0
+    assert restored.lookup(B).ssthresh == 16.0
+
+    # Entradas vencidas ficam de fora ao carregar
+    clock.now += 45
+    restored = PathCache(ttl=60, persist_file=persist)
+    assert restored.lookup(A) is None
+    assert restored.lookup(B) is not None
+
+
+def test_unreadable_file_starts_empty(tmp_path):
+    persist = tmp_path / 'paths.json'
+    persist.write_text('{not json')
+    assert not PathCache(persist_file=str(persist)).entries
+    persist.write_text(json.dumps({'10.0.0.1:5000': {'srtt': 0.05}}))
+    assert not PathCache(persist_file=str(persist)).entries
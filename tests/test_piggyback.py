@@ -0,0 +1,83 @@
+import os
+import threading
+
+import pytest
+
+import utils
+
+SIZE = 1 << 20
+
+
+def _exchange(srv, cli, size: int = SIZE) -> tuple:
+    # size bytes em cada sentido ao mesmo tempo na mesma conexão
+    payloads = {srv: os.urandom(size), cli: os.urandom(size)}
+    received = {srv: bytearray(), cli: bytearray()}
+
+    def read(conn):
+        buf = bytearray(1 << 16)
+        while len(received[conn]) < size:
+            n = conn.readinto(buf, 10)
+            if not n:
+                break
+            received[conn].extend(buf[:n])
+
+    threads = [threading.Thread(target=read, args=(conn,)) for conn in (srv, cli)]
+    threads += [threading.Thread(target=conn.send_data, args=(payloads[conn],)) for conn in (srv, cli)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert bytes(received[srv]) == payloads[cli]
+    assert bytes(received[cli]) == payloads[srv]
+    acks = srv.receive_stats['acks_sent'] + cli.receive_stats['acks_sent']
+    data = srv.receive_stats['received'] + cli.receive_stats['received']
+    return acks, data
+
+
+@pytest.mark.parametrize('server_on, client_on', [(True, False), (False, True)])
+def test_negotiation_needs_both_sides(connect_pair, server_on, client_on):
+    srv, cli = connect_pair(server_kw={'piggyback_acks': server_on}, piggyback_acks=client_on)
+    assert not srv.peer_piggyback and not cli.peer_piggyback
+
+
+def test_full_duplex_acks_ride_on_data(connect_pair):
+    srv, cli = connect_pair()
+    assert srv.peer_piggyback and cli.peer_piggyback
+    acks, data = _exchange(srv, cli)
+    assert acks < data / 3
+
+
+def test_without_piggyback_every_segment_is_acked(connect_pair):
+    srv, cli = connect_pair(server_kw={'piggyback_acks': False}, piggyback_acks=False)
+    acks, data = _exchange(srv, cli)
+    assert acks >= data * 0.9
+
+
+def test_one_way_delayed_ack(connect_pair):
+    srv, cli = connect_pair()
+    payload = os.urandom(SIZE)
+    out = bytearray()
+
+    def read():
+        buf = bytearray(1 << 16)
+        while len(out) < len(payload):
+            n = srv.readinto(buf, 10)
+            if not n:
+                break
+            out.extend(buf[:n])
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    assert cli.send_data(payload)
+    reader.join(20)
+    assert bytes(out) == payload
+    # ACK_EVERY = 2: cerca de um ACK a cada dois segmentos
+    received = srv.receive_stats['received']
+    assert srv.receive_stats['acks_sent'] < received * 0.75
+
+
+def test_full_duplex_with_loss(connect_pair, monkeypatch):
+    # O ACK cumulativo não pode liberar segmentos perdidos sem retransmissão
+    srv, cli = connect_pair(server_kw={'loss_callback': utils.loss_filter}, loss_callback=utils.loss_filter)
+    monkeypatch.setattr(utils, 'loss_probability', 0.02)
+    _exchange(srv, cli, SIZE // 2)
@@ -0,0 +1,56 @@
+import os
+import threading
+
+from packet import TRUPacket
+from utils import EmulatedLink
+
+MTU = 1500
+
+
+def _transfer(srv, cli, payload):
+    out = {}
+
+    def receive():
+        buf = bytearray(len(payload))
+        view = memoryview(buf)
+        got = 0
+        while got < len(buf):
+            n = srv.readinto(view[got:], 15)
+            if not n:
+                break
+            got += n
+        out['data'] = bytes(buf[:got])
+
+    reader = threading.Thread(target=receive)
+    reader.start()
+    assert cli.send_data(payload)
+    reader.join(30)
+    return out.get('data')
+
+
+def test_blackhole_falls_back_to_base_size(connect_pair):
+    # O caminho só passa datagramas de até MTU bytes, mas o remetente já
+    # usa segmentos de 8000: sem o recuo a transferência nunca termina
+    link = EmulatedLink(mtu=MTU)
+    srv, cli = connect_pair(client_link=link, max_segment_size=8000,
+                            server_kw={'max_segment_size': 8000})
+    cli.set_segment_size(8000)
+    payload = os.urandom(40 * 8000)
+    assert _transfer(srv, cli, payload) == payload
+    assert cli.mss == cli.base_mss
+    assert link.oversized
+
+
+def test_blackhole_after_discovery_reprobes(connect_pair):
+    srv, cli = connect_pair(enable_pmtud=True, max_segment_size=8000,
+                            server_kw={'max_segment_size': 8000})
+    cli.pmtu_thread.join(10)
+    assert cli.mss == 8000
+
+    # O caminho encolhe depois da descoberta
+    link = EmulatedLink(mtu=MTU)
+    link.attach(cli)
+    payload = os.urandom(40 * 8000)
+    assert _transfer(srv, cli, payload) == payload
+    cli.pmtu_thread.join(10)
+    assert cli.mss + TRUPacket.HEADER_SIZE <= MTU
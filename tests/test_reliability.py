@@ -0,0 +1,86 @@
+import os
+import threading
+
+import pytest
+
+import tru_protocol
+
+
+def _drop_first(times: int):
+    # Descarta as primeiras chegadas do primeiro seq visto: esse segmento
+    # só passa na retransmissão de número times
+    state = {'seq': None, 'count': 0}
+
+    def drop(seq: int) -> bool:
+        if state['seq'] is None:
+            state['seq'] = seq
+        if seq == state['seq'] and state['count'] < times:
+            state['count'] += 1
+            return True
+        return False
+
+    return drop, state
+
+
+def test_segment_survives_more_than_three_retries(connect_pair):
+    # Antes o timer descartava o segmento após 3 retransmissões e o
+    # destinatário ficava com um buraco permanente
+    srv, cli = connect_pair()
+    srv.loss_callback, state = _drop_first(5)
+    payload = os.urandom(20 * 1400)
+    out = {}
+
+    def receive():
+        buf = bytearray(len(payload))
+        view = memoryview(buf)
+        got = 0
+        while got < len(buf):
+            n = srv.readinto(view[got:], 15)
+            if not n:
+                break
+            got += n
+        out['data'] = bytes(buf[:got])
+
+    reader = threading.Thread(target=receive)
+    reader.start()
+    assert cli.send_data(payload)
+    reader.join(30)
+    assert state['count'] == 5
+    assert out['data'] == payload
+
+
+def test_connection_lost_after_max_retransmissions(connect_pair, monkeypatch):
+    monkeypatch.setattr(tru_protocol, 'MAX_RETRANSMISSIONS', 2)
+    srv, cli = connect_pair()
+    srv.loss_callback = lambda seq: True  # peer some depois do handshake
+    assert not cli.send_data(os.urandom(4 * 1400))
+    assert not cli.connected
+
+
+@pytest.mark.parametrize('client_kw', [{}, {'enable_encryption': False}])
+def test_client_keeps_first_segment_when_lost(connect_pair, client_kw):
+    # O cliente não marcava o seq do servidor como conhecido no SYN_ACK e
+    # pulava para o seq do primeiro DATA que chegasse, perdendo o primeiro
+    # segmento; no caminho legado o KEY_RESPONSE também consome um seq
+    srv, cli = connect_pair(**client_kw)
+    cli.loss_callback, state = _drop_first(1)
+    payload = os.urandom(20 * 1400)
+    out = {}
+
+    def receive():
+        buf = bytearray(len(payload))
+        view = memoryview(buf)
+        got = 0
+        while got < len(buf):
+            n = cli.readinto(view[got:], 15)
+            if not n:
+                break
+            got += n
+        out['data'] = bytes(buf[:got])
+
+    reader = threading.Thread(target=receive)
+    reader.start()
+    assert srv.send_data(payload)
+    reader.join(30)
+    assert state['count'] == 1
+    assert out['data'] == payload
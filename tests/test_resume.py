@@ -0,0 +1,123 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from conftest import free_port
+from resume import RESUME_CHUNK_SIZE, Checkpoint, Manifest
+from tru_protocol import TRUProtocol
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNKS = 8
+
+# Remetente em outro processo, para poder ser morto com SIGKILL no meio do envio
+SENDER = """
+import json, sys
+from tru_protocol import TRUProtocol
+port, path = int(sys.argv[1]), sys.argv[2]
+cli = TRUProtocol(is_server=False, use_path_cache=False)
+cli.start()
+ok = cli.connect('127.0.0.1', port) and cli.do_key_exchange_as_client() and cli.send_file_resumable(path)
+cli.close()
+print('RESULT ' + json.dumps({'ok': bool(ok), **cli.resume_stats}))
+"""
+
+
+def _sender(port, path):
+    return subprocess.Popen([sys.executable, '-c', SENDER, str(port), path], cwd=ROOT,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+
+def _receive(path, progress_cb=None):
+    port = free_port()
+    srv = TRUProtocol(port=port, is_server=True, use_path_cache=False)
+    result = {}
+
+    def serve():
+        if srv.accept() and srv.do_key_exchange_as_server():
+            result['ok'] = srv.recv_file_resumable(path, progress_cb, timeout=3.0)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    return port, srv, thread, result
+
+
+def _close(srv):
+    srv.running = False
+    if srv.receiver_thread:
+        srv.receiver_thread.join(2)
+    srv.sock.close()
+
+
+def test_resume_after_sender_killed_midway(tmp_path):
+    source = tmp_path / 'source.bin'
+    source.write_bytes(os.urandom(CHUNKS * RESUME_CHUNK_SIZE))
+    target = str(tmp_path / 'target.bin')
+    size = source.stat().st_size
+
+    # Primeira tentativa: o remetente morre com metade do arquivo verificada
+    killed = threading.Event()
+    sender = None
+
+    def progress(verified, total):
+        if verified >= total // 2 and not killed.is_set():
+            killed.set()
+            os.kill(sender.pid, signal.SIGKILL)
+
+    port, srv, thread, result = _receive(target, progress)
+    sender = _sender(port, str(source))
+    thread.join(60)
+    sender.wait(10)
+    _close(srv)
+    assert killed.is_set()
+    assert result.get('ok') is False
+
+    # Segunda tentativa: só os pedaços que não chegaram trafegam
+    port, srv, thread, result = _receive(target)
+    sender = _sender(port, str(source))
+    output, _ = sender.communicate(timeout=60)
+    thread.join(60)
+    _close(srv)
+    stats = json.loads(output.strip().splitlines()[-1].split(' ', 1)[1])
+
+    assert result['ok'] and stats['ok']
+    assert stats['reused_chunks'] >= CHUNKS // 2
+    assert stats['sent_bytes'] <= size - (CHUNKS // 2) * RESUME_CHUNK_SIZE
+    with open(target, 'rb') as f:
+        assert f.read() == source.read_bytes()
+    assert not os.path.exists(target + '.resume')
+
+
+@pytest.mark.parametrize('content', [
+    '[1, 2, 3]',
+    '"texto"',
+    '{"chunk_size": %d, "chunks": {"um": "00"}}' % RESUME_CHUNK_SIZE,
+    '{"chunk_size": %d, "chunks": ["0"]}' % RESUME_CHUNK_SIZE,
+    '{"chunk_size": %d, "chunks": {"0": null, "1.5": "00"}}' % RESUME_CHUNK_SIZE,
+    '{"chunk_size": [], "chunks": {}}',
+    '{"chunk_size": %d, "chunks": {"0"' % RESUME_CHUNK_SIZE,
+])
+def test_corrupted_checkpoint_means_full_transfer(tmp_path, content):
+    # Checkpoint corrompido ou editado à mão não aborta a retomada: nenhum
+    # pedaço é reaproveitado e o arquivo vem inteiro
+    target = str(tmp_path / 'target.bin')
+    manifest = Manifest.from_buffer(os.urandom(2 * RESUME_CHUNK_SIZE))
+    checkpoint = Checkpoint(target)
+    with open(checkpoint.path, 'w') as f:
+        f.write(content)
+    assert checkpoint.load(manifest) == set()
+    assert checkpoint.chunks == {}
+
+
+def test_checkpoint_keeps_only_matching_chunks(tmp_path):
+    target = str(tmp_path / 'target.bin')
+    manifest = Manifest.from_buffer(os.urandom(3 * RESUME_CHUNK_SIZE))
+    with open(f"{target}.resume", 'w') as f:
+        json.dump({'chunk_size': RESUME_CHUNK_SIZE,
+                   'chunks': {'0': manifest.digests[0].hex(), '1': '00' * 32,
+                              '-1': manifest.digests[2].hex(), '7': '00'}}, f)
+    assert Checkpoint(target).load(manifest) == {0}
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+import pytest
+
+from packet import PacketType, TRUPacket
+
+
+class _CountingSocket:
+    # Conta os datagramas DATA que saem pelo socket
+    def __init__(self, sock):
+        self._sock = sock
+        self.data_packets = 0
+
+    def sendto(self, data, addr):
+        if data[8] & ~TRUPacket.AEAD_FLAG == PacketType.DATA:
+            self.data_packets += 1
+        return self._sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def _reader(srv, size: int, out: bytearray) -> threading.Thread:
+    def read():
+        buf = bytearray(size)
+        while len(out) < size:
+            n = srv.readinto(buf, 10)
+            if not n:
+                break
+            out.extend(buf[:n])
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_small_sends_are_coalesced(connect_pair):
+    srv, cli = connect_pair()
+    cli.sock = counter = _CountingSocket(cli.sock)
+    messages = [os.urandom(64) for _ in range(500)]
+    received = bytearray()
+    reader = _reader(srv, 64 * len(messages), received)
+
+    for message in messages:
+        assert cli.send(message) == len(message)
+    assert cli.flush(20)
+    reader.join(20)
+
+    assert bytes(received) == b''.join(messages)
+    # Nagle: bem menos pacotes que mensagens (32 KB cabem em ~24 segmentos)
+    assert counter.data_packets < len(messages) // 4
+
+
+def test_cork_holds_partial_segment_until_flush(connect_pair):
+    srv, cli = connect_pair(nodelay=True)
+    cli.sock = counter = _CountingSocket(cli.sock)
+    received = bytearray()
+    reader = _reader(srv, 300, received)
+
+    cli.cork()
+    for _ in range(3):
+        cli.sendall(b'x' * 100)
+    time.sleep(0.3)
+    assert counter.data_packets == 0
+
+    assert cli.flush(10)
+    reader.join(10)
+    assert counter.data_packets == 1
+    assert bytes(received) == b'x' * 300
+
+
+def test_nodelay_sends_each_message(connect_pair):
+    srv, cli = connect_pair(nodelay=True)
+    cli.sock = counter = _CountingSocket(cli.sock)
+    received = bytearray()
+    reader = _reader(srv, 20 * 64, received)
+
+    for i in range(20):
+        cli.send(bytes([i]) * 64)
+        assert cli.flush(5)
+    reader.join(10)
+    assert counter.data_packets == 20
+    assert bytes(received) == b''.join(bytes([i]) * 64 for i in range(20))
+
+
+def test_full_queue_backpressure(connect_pair):
+    srv, cli = connect_pair(send_queue_size=1000)
+    cli.cork()  # menos que um mss: nada sai da fila
+    assert cli.send(b'a' * 1500) == 1000
+    with pytest.raises(BlockingIOError):
+        cli.send(b'b', block=False)
+    with pytest.raises(TimeoutError):
+        cli.send(b'b', timeout=0.2)
+
+
+def test_send_after_close_raises(connect_pair):
+    srv, cli = connect_pair()
+    cli.close()
+    with pytest.raises(BrokenPipeError):
+        cli.send(b'data')
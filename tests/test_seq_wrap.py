@@ -0,0 +1,48 @@
+import os
+import random
+import threading
+
+import pytest
+
+import tru_protocol
+
+SEGMENTS = 200
+# O cliente começa 100 segmentos antes de 2^32: a transferência cruza a volta
+NEAR_WRAP = 2**32 - (SEGMENTS // 2) * 1400
+
+
+@pytest.fixture
+def near_wrap(monkeypatch):
+    # Só o seq inicial (randint(0, 2^31 - 1)) é forçado; o resto continua aleatório
+    randint = random.randint
+    monkeypatch.setattr(tru_protocol.random, 'randint',
+                        lambda a, b: NEAR_WRAP if (a, b) == (0, 2**31 - 1) else randint(a, b))
+
+
+@pytest.mark.parametrize('aead', [True, False])
+def test_transfer_across_32bit_seq_wrap(near_wrap, connect_pair, aead):
+    srv, cli = connect_pair(enable_aead=aead, server_kw={'enable_aead': aead})
+    start = cli.next_seq
+    assert start < 2**32
+    payload = os.urandom(SEGMENTS * 1400)
+    out = {}
+
+    def receive():
+        buf = bytearray(len(payload))
+        view = memoryview(buf)
+        got = 0
+        while got < len(buf):
+            n = srv.readinto(view[got:], 15)
+            if not n:
+                break
+            got += n
+        out['data'] = bytes(buf[:got])
+
+    reader = threading.Thread(target=receive)
+    reader.start()
+    assert cli.send_data(payload)
+    reader.join(30)
+    assert out['data'] == payload
+    # Offsets internos de 64 bits: nada voltou a zero
+    assert cli.next_seq == start + len(payload) > 2**32
+    assert srv.ack_num == cli.next_seq
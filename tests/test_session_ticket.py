@@ -0,0 +1,86 @@
+import os
+import struct
+import threading
+import time
+
+from conftest import free_port
+from session_ticket import TicketKeeper
+from tru_protocol import TRUProtocol
+
+
+def test_ticket_redeems_once():
+    keeper = TicketKeeper()
+    secret = os.urandom(32)
+    ticket = keeper.issue(secret)
+    assert keeper.redeem(ticket) == secret
+    assert keeper.redeem(ticket) is None
+
+
+def test_forged_ticket_is_refused():
+    keeper = TicketKeeper()
+    ticket = bytearray(keeper.issue(os.urandom(32)))
+    ticket[20] ^= 1
+    assert keeper.redeem(bytes(ticket)) is None
+
+
+def test_full_replay_cache_refuses_instead_of_evicting():
+    keeper = TicketKeeper(replay_entries=2)
+    tickets = [keeper.issue(os.urandom(32)) for _ in range(3)]
+    assert keeper.redeem(tickets[0]) is not None
+    assert keeper.redeem(tickets[1]) is not None
+    # Cheio de tickets válidos: recusar o novo, e os antigos continuam barrados
+    assert keeper.redeem(tickets[2]) is None
+    assert keeper.redeem(tickets[0]) is None
+
+
+def test_expired_entries_make_room():
+    keeper = TicketKeeper(replay_entries=1)
+    first, second = keeper.issue(os.urandom(32)), keeper.issue(os.urandom(32))
+    assert keeper.redeem(first) is not None
+    digest = next(iter(keeper.used))
+    keeper.used[digest] = time.time() - 1  # o primeiro ticket venceu
+    assert keeper.redeem(second) is not None
+
+
+def test_early_data_round_trip_with_64_bit_tag(monkeypatch):
+    # A tag do 0-RTT cobre o offset inteiro de 64 bits do primeiro seq de
+    # dados (base_seq + 1), não só os 32 bits do cabeçalho
+    port = free_port()
+    message = os.urandom(200)
+    made = []
+    tagged = []
+
+    def shutdown():
+        while made:
+            for conn in made.pop():
+                conn.running = False
+                if conn.receiver_thread:
+                    conn.receiver_thread.join(2)
+                conn.sock.close()
+
+    def connect(early_data=None):
+        srv = TRUProtocol(port=port, is_server=True, use_path_cache=False, session_tickets=True)
+        cli = TRUProtocol(is_server=False, use_path_cache=False, session_tickets=True)
+        made.append((srv, cli))
+        compute_tag = cli.crypto.compute_tag
+        monkeypatch.setattr(cli.crypto, 'compute_tag',
+                            lambda key, data: tagged.append(bytes(data)) or compute_tag(key, data))
+        accepted = threading.Event()
+        threading.Thread(target=lambda: srv.accept() and accepted.set(), daemon=True).start()
+        cli.start()
+        assert cli.connect('127.0.0.1', port, early_data=early_data)
+        assert accepted.wait(10)
+        return srv, cli
+
+    try:
+        connect()  # primeira conexão: obtém o ticket e libera a porta
+        shutdown()
+        tagged.clear()
+        srv, cli = connect(early_data=message)
+        assert cli.early_data_accepted
+        assert tagged[0][:8] == struct.pack('!Q', cli.base_seq + 1)
+        buf = bytearray(len(message))
+        assert srv.readinto(buf, 10) == len(message)
+        assert bytes(buf) == message
+    finally:
+        shutdown()
@@ -0,0 +1,76 @@
+import os
+import threading
+
+import pytest
+
+
+def test_streams_carry_independent_data(connect_pair):
+    srv, cli = connect_pair()
+    streams = [cli.open_stream() for _ in range(3)]
+    for index, stream in enumerate(streams):
+        assert stream.send(bytes([index]) * 5000)
+        assert stream.close()
+
+    received = {}
+    for _ in streams:
+        stream = srv.accept_stream(timeout=10)
+        received[stream.stream_id] = b''.join(stream)
+    assert sorted(received) == sorted(s.stream_id for s in streams)
+    for index, stream in enumerate(streams):
+        assert received[stream.stream_id] == bytes([index]) * 5000
+
+
+def test_lost_segment_blocks_only_its_stream(connect_pair):
+    # O primeiro segmento do stream A some até o stream B ser lido por
+    # inteiro: num fluxo único B ficaria atrás da retransmissão de A
+    srv, cli = connect_pair()
+    first, second = cli.open_stream(), cli.open_stream()
+    released = threading.Event()
+    lost, drops = cli.next_seq, []
+
+    def drop(seq: int) -> bool:
+        if seq == lost and not released.is_set():
+            drops.append(seq)
+            return True
+        return False
+
+    srv.loss_callback = drop
+
+    payloads = {first: os.urandom(3000), second: os.urandom(3000)}
+    for stream in (first, second):
+        assert stream.send(payloads[stream], wait=False)
+        assert stream.close(wait=False)
+
+    accepted = {}
+    for _ in range(2):
+        stream = srv.accept_stream(timeout=10)
+        accepted[stream.stream_id] = stream
+    assert accepted[second.stream_id].read(timeout=10) == payloads[second]
+    # A tem o resto dos segmentos no buffer, mas nada em ordem para entregar
+    assert drops and accepted[first.stream_id].buffered_segments() > 0
+    with pytest.raises(TimeoutError):
+        accepted[first.stream_id].recv(timeout=0.2)
+
+    released.set()
+    assert accepted[first.stream_id].read(timeout=20) == payloads[first]
+
+
+def test_peer_stream_limit(connect_pair):
+    # Streams do peer além de max_peer_streams acima do maior id já aberto
+    # são descartados sem abrir nada; os que cabem abrem os anteriores
+    srv, cli = connect_pair(server_kw={'max_peer_streams': 2})
+    streams = [cli.open_stream() for _ in range(4)]
+    assert streams[2].send(b'fora do limite')
+    assert not srv.streams
+    assert srv.accept_stream(timeout=0.5) is None
+
+    assert streams[1].send(b'no limite')
+    opened = [srv.accept_stream(timeout=10) for _ in range(2)]
+    assert [stream.stream_id for stream in opened] == [s.stream_id for s in streams[:2]]
+    assert opened[1].recv(timeout=10) == b'no limite'
+
+    # O limite anda com o maior id aberto (o que foi descartado antes se perdeu)
+    assert streams[3].send(b'agora cabe')
+    later = [srv.accept_stream(timeout=10) for _ in range(2)]
+    assert [stream.stream_id for stream in later] == [s.stream_id for s in streams[2:]]
+    assert later[1].recv(timeout=10) == b'agora cabe'
@@ -0,0 +1,81 @@
+import os
+import socket
+import threading
+
+from striping import (STRIPE_BLOCK, STRIPE_MIN_STEAL, StripeSchedule, recv_file_striped,
+                      send_file_striped)
+
+
+def _free_ports(count: int) -> int:
+    # Primeira de count portas UDP consecutivas livres
+    while True:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.bind(('127.0.0.1', 0))
+            base = s.getsockname()[1]
+        try:
+            socks = []
+            for port in range(base, base + count):
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                socks.append(sock)
+                sock.bind(('127.0.0.1', port))
+            return base
+        except OSError:
+            continue
+        finally:
+            for sock in socks:
+                sock.close()
+
+
+def _drain(schedule, index: int) -> list:
+    claims = []
+    while (claim := schedule.claim(index)) is not None:
+        claims.append(claim)
+    return claims
+
+
+def test_schedule_covers_file_once_with_stealing():
+    size = 10 * STRIPE_MIN_STEAL + 12345
+    schedule = StripeSchedule(size, 3)
+    claims = [schedule.claim(1), schedule.claim(2)]
+    # Listra 0 termina a sua faixa e continua roubando das outras
+    claims += _drain(schedule, 0)
+    assert schedule.steals.value > 0
+    claims += _drain(schedule, 1) + _drain(schedule, 2)
+
+    covered = sorted(claims)
+    assert all(length <= STRIPE_BLOCK for _, length in covered)
+    assert covered[0][0] == 0
+    for (offset, length), (next_offset, _) in zip(covered, covered[1:]):
+        assert offset + length == next_offset
+    assert sum(length for _, length in covered) == size
+
+
+def test_small_remainder_is_not_stolen():
+    schedule = StripeSchedule(2 * STRIPE_BLOCK, 2)
+    assert len(_drain(schedule, 0)) == 1
+    assert schedule.steals.value == 0
+    assert len(_drain(schedule, 1)) == 1
+
+
+def test_empty_file():
+    schedule = StripeSchedule(0, 4)
+    assert all(schedule.claim(i) is None for i in range(4))
+
+
+def test_striped_transfer(tmp_path):
+    stripes = 3
+    port = _free_ports(stripes)
+    source, dest = tmp_path / 'origem.bin', tmp_path / 'destino.bin'
+    payload = os.urandom(3 * STRIPE_MIN_STEAL + 1000)
+    source.write_bytes(payload)
+
+    result = {}
+    receiver = threading.Thread(target=lambda: result.update(recv_file_striped(
+        str(dest), '127.0.0.1', port, stripes, timeout=10, use_path_cache=False)))
+    receiver.start()
+    stats = send_file_striped('127.0.0.1', port, str(source), stripes, use_path_cache=False)
+    receiver.join(30)
+
+    assert stats['ok'] and result['ok']
+    assert sum(stats['stripe_bytes']) == len(payload)
+    assert dest.read_bytes() == payload
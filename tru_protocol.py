@@ -1,36 +1,143 @@
+import select
 import socket
 import time
 import threading
 import struct
 import os
-from packet import TRUPacket, PacketType
+import mmap
+import hashlib
+from collections import deque
+from packet import TRUPacket, PacketType, SEQ_MASK
 from typing import Optional, Tuple, Callable, List
-from congestion import CongestionControl
-from crypto import TRUCrypto
+from congestion import create_congestion_control
+from crypto import TRUCrypto, CryptoPipeline
+from concurrent.futures import Future, ThreadPoolExecutor
 import random
 import statistics
 import sys
-from metrics_collector import MetricsCollector
+from metrics_collector import ColumnarMetricsCollector
+from histogram import LatencyHistogram
+from pacing import Pacer
+from path_cache import get_path_cache
+from streams import TRUStream, STREAM_HEADER, STREAM_HEADER_SIZE, STREAM_FLAG_FIN
+from messages import (MESSAGE_HEADER, MESSAGE_HEADER_SIZE, FORWARD_FORMAT, SKIPPED,
+                      MessageFragment, OutgoingMessage)
+from compression import (ALGORITHMS, COMPRESSION_BLOCK, CompressedChunk, StreamCompressor,
+                         StreamDecompressor, supported_algorithms)
+from delta import (DELTA_REQUEST, DELTA_OK, DELTA_FAILED, OP_COPY, OP_LITERAL, OP_END, COPY_ARGS,
+                   LITERAL_ARGS, Signatures, block_size_for, delta_instructions, file_digest)
+from batch import (BATCH_HEADER, BATCH_INLINE_LIMIT, BATCH_PENDING_LIMIT, BATCH_WRITERS, BATCH_OK,
+                   BATCH_FAILED, batch_records, batch_target, collect_files, open_target, write_file)
+from resume import RESUME_CHUNK_SIZE, CHECKPOINT_INTERVAL, Manifest, Checkpoint
+from session_ticket import (get_ticket_keeper, get_ticket_store, resumption_secret,
+                            derive_resumed_session)
 
 MSS = 1400
+# Maior payload que cabe em um datagrama UDP/IPv4 junto do cabeçalho TRUDP
+MAX_SEGMENT_SIZE = 65507 - TRUPacket.HEADER_SIZE
+# PMTUD: tentativas por tamanho e precisão da busca binária (bytes)
+PMTU_PROBE_ATTEMPTS = 2
+PMTU_SEARCH_GRANULARITY = 256
+# Buraco negro de PMTU: RTOs seguidos em que só vencem segmentos acima do
+# tamanho inicial antes de voltar a ele
+PMTU_BLACKHOLE_RTOS = 3
 # Controle de fluxo: máximo de segmentos que o destinatário aceita em buffer
 MAX_RECV_WINDOW = 256
+# Buffer de recepção do socket (o kernel limita a net.core.rmem_max): o
+# padrão de ~200 KiB só comporta 3 datagramas de 64 KiB, e uma rajada de
+# segmentos grandes seria descartada antes de ser lida
+SOCKET_RECV_BUFFER = 4 << 20
+# Capacidades anunciadas na troca de chaves e no SYN/SYN_ACK
+KEY_FLAG_AEAD = 0x01
+KEY_FLAG_DH = 0x02          # parâmetros DH no SYN/SYN_ACK (handshake 1-RTT)
+KEY_FLAG_TICKET = 0x04      # ticket de retomada (SYN) / novo ticket emitido (SYN_ACK)
+KEY_FLAG_RESUMED = 0x08     # servidor aceitou o ticket
+KEY_FLAG_EARLY_DATA = 0x10  # dados 0-RTT no SYN / aceitos pelo servidor
+KEY_FLAG_FLOW_CONTROL = 0x20  # campo window dos ACKs anuncia o buffer livre do destinatário
+KEY_FLAG_STREAMS = 0x40       # aceita STREAM_DATA (streams multiplexados)
+KEY_FLAG_MESSAGES = 0x80      # aceita MESSAGE/FORWARD (mensagens parcialmente confiáveis)
+# Byte de opções do handshake: bits 0-1 são os algoritmos de compressão que
+# descomprimimos, o nibble alto o que vamos usar (compression.py)
+OPTION_PIGGYBACK_ACKS = 0x08  # DATA leva ACK cumulativo e janela; ACKs isolados, o cumulativo no seq
+# Com piggyback, o ACK de dados em ordem espera até ACK_DELAY por um DATA no
+# sentido inverso que o carregue, ou até ACK_EVERY segmentos pendentes
+ACK_DELAY = 0.002
+ACK_EVERY = 2
+# Pacotes que ocupam o espaço de seq da conexão e são confirmados por ACK
+SEQUENCED_TYPES = (PacketType.DATA, PacketType.STREAM_DATA, PacketType.MESSAGE, PacketType.FORWARD,
+                   PacketType.COMPRESSED_DATA)
+# Tipos que, numa sessão AEAD, só valem com tag: um checksum qualquer um
+# calcula, e uma confirmação de sonda forjada inflaria o mss
+AUTHENTICATED_TYPES = SEQUENCED_TYPES + (PacketType.PMTU_PROBE, PacketType.PMTU_PROBE_ACK)
+# Retransmissões de um segmento confiável antes de considerar a conexão perdida
+MAX_RETRANSMISSIONS = 10
+# Handshake: tentativas com RTO dobrando a cada timeout
+HANDSHAKE_ATTEMPTS = 4
+# Envio em fluxo: bloco de leitura de arquivos/streams e intervalo (bytes)
+# entre devoluções ao kernel das páginas já confirmadas de um arquivo mapeado
+STREAM_CHUNK_SIZE = 1 << 20
+STREAM_RELEASE_INTERVAL = 16 << 20
+# Recepção: tempo máximo sem progresso e espera por retransmissões após o FIN (s)
+RECV_IDLE_TIMEOUT = 180.0
+FIN_LINGER = 5.0
+# send()/sendall(): bytes enfileirados antes de bloquear e espera máxima no
+# close() para esvaziar a fila (s)
+SEND_QUEUE_SIZE = 256 << 10
+# Streams que o peer pode abrir além do maior id já visto (como MAX_STREAMS
+# do QUIC): ids mais distantes são descartados sem alocar nada
+MAX_PEER_STREAMS = 256
+SEND_LINGER = 30.0
 
 class TRUProtocol:
 
     def __init__(self, host='0.0.0.0', port=5000, is_server=False, loss_callback=None, 
-                 metrics_collector=None, enable_congestion_control=True):
+                 metrics_collector=None, enable_congestion_control=True,
+                 congestion_algorithm="reno", enable_pacing=True, pacing_burst=4,
+                 use_path_cache=True, mss=MSS, max_segment_size=MAX_SEGMENT_SIZE,
+                 enable_pmtud=False, crypto_workers=0, crypto_processes=False,
+                 enable_aead=True, enable_encryption=True, session_tickets=True,
+                 nodelay=False, send_queue_size=SEND_QUEUE_SIZE, compression=None,
+                 compression_level=None, piggyback_acks=True, max_peer_streams=MAX_PEER_STREAMS,
+                 debug=False):
         self.host = host
         self.port = port
         self.is_server = is_server
         self.loss_callback = loss_callback
+        # Logs por pacote/segmento ([PROCESS], [HANDLE_DATA], [SEND_RAW]...): só
+        # com debug, pois custam mais que o próprio envio nas taxas atuais
+        self.debug = debug
         self.crypto = TRUCrypto()
         self.encryption_enabled = False
         self.encryption_key = None
         self.iv = None  # Vetor de inicialização
 
+        # AEAD: nonce por pacote (IV da sessão + seq) e MAC truncado no lugar
+        # do checksum; ativado só se os dois lados anunciarem suporte
+        self.enable_aead = enable_aead
+        self.aead_enabled = False
+        self.mac_key = None
+
+        # Handshake 1-RTT: DH no SYN/SYN_ACK; tickets permitem retomar com 0-RTT
+        self.enable_encryption = enable_encryption
+        self.session_tickets = session_tickets
+        self.early_data_accepted = False
+        self._resumption = None      # (segredo, client_random) do ticket enviado no SYN
+        self._early_data_len = 0
+        self._syn_sent_time = None   # None após retransmissão (algoritmo de Karn)
+        self._syn_ack_sent_time = None
+        self._syn_ack_cache = None   # ((addr, seq do SYN), bytes do SYN_ACK)
+        self.peer_seq_known = False  # primeiro seq de dados do peer conhecido pelo SYN
+
+        # Pipeline de criptografia: 0 workers = cifrar inline na thread de envio/recepção
+        self.crypto_pipeline = CryptoPipeline(crypto_workers, crypto_processes) if crypto_workers > 0 else None
+
         # RTT
         self.rtt_samples = []
+        # Histogramas de todas as amostras: RTT aceito, entrega de cada segmento
+        # (primeiro envio até o ACK, com retransmissões) e duração de cada envio
+        self.rtt_histogram = LatencyHistogram()
+        self.delivery_histogram = LatencyHistogram()
+        self.completion_histogram = LatencyHistogram()
         self.rtt_avg = 0.0
         self.rtt_dev = 0.1
         self.rtt_alpha = 0.125
@@ -55,6 +162,10 @@ class TRUProtocol:
 
         # Socket UDP
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RECV_BUFFER)
+        except OSError as e:
+            print(f"[SOCKET] Buffer de recepção padrão mantido: {e}")
         if is_server:
             self.sock.bind((host, port))
         
@@ -67,20 +178,82 @@ class TRUProtocol:
         # Buffers
         self.send_buffer = {}
         self.receive_buffer = {}
-        self.received_segments = set()
-        
+        self.delivered_bytes = 0  # bytes já entregues em ordem à aplicação
+        self.fin_seq = None       # offset final do fluxo do peer (seq do FIN)
+        
+        # Tamanho de segmento: mss é o atual, max_segment_size o maior aceito
+        # localmente; o máximo efetivo é negociado no handshake
+        self.max_segment_size = min(max_segment_size, MAX_SEGMENT_SIZE)
+        self.mss = min(mss, self.max_segment_size)
+        self.peer_max_segment_size = MSS
+        self.recv_buffer_size = self.max_segment_size + TRUPacket.HEADER_SIZE
+        self.enable_pmtud = enable_pmtud
+        self.pmtu_thread = None
+        self.pmtu_probe_event = threading.Event()
+        self.pmtu_probe_acked = 0
+        self.base_mss = self.mss        # tamanho seguro para o recuo do buraco negro
+        self.pmtu_blackhole_rtos = 0
+
         # Controle de janela
         self.window_size = 4
         self.recv_window = MAX_RECV_WINDOW  # janela anunciada pelo destinatário nos ACKs
+        self.peer_flow_control = False      # peer anunciou KEY_FLAG_FLOW_CONTROL no handshake
+        self._window_update_pending = False # anunciamos janela zero e devemos reabri-la
+
+        # Full duplex: ACK cumulativo e janela no cabeçalho dos DATA de volta,
+        # ACK isolado só sem dados no sentido inverso (negociado no handshake)
+        self.piggyback_acks = piggyback_acks
+        self.peer_piggyback = False
+        self._ack_pending = 0        # segmentos em ordem ainda sem ACK
+        self._ack_deadline = None    # prazo do ACK isolado atrasado
+        self._transmitting = False   # _send_segments ainda tem segmentos a enviar
+
+        # Streams multiplexados: ids ímpares abertos pelo cliente, pares pelo servidor
+        self.peer_streams = False
+        self.streams = {}
+        self._next_stream_id = 2 if is_server else 1
+        self._max_peer_stream_id = 0
+        self.max_peer_streams = max_peer_streams
+        self._stream_accept = deque()
+        self._stream_cond = threading.Condition()
+
+        # Mensagens parcialmente confiáveis (send_message/recv_message)
+        self.peer_messages = False
+        self.outgoing_messages = {}   # primeiro seq -> OutgoingMessage
+        self._message_by_seq = {}     # seq de fragmento -> primeiro seq da mensagem
+        self.message_queue = deque()  # mensagens completas (listas de partes)
+        self._message_parts = []
+        self.message_stats = {'sent': 0, 'expired': 0, 'abandoned': 0,
+                              'delivered': 0, 'skipped': 0}
+        self.resume_stats = {}  # última send_file_resumable: pedaços, reaproveitados, bytes enviados
+        self.delta_stats = {}   # último send_file_delta: bytes literais e copiados
+        self.batch_stats = {}   # último send_files/recv_files: arquivos e bytes de dados
+
+        # Compressão do fluxo de bytes ('zlib' ou 'lzma'), negociada no handshake:
+        # cada lado anuncia o que descomprime e com que algoritmo vai comprimir
+        self.compression = ALGORITHMS.get(compression, 0) & supported_algorithms()
+        if compression and not self.compression:
+            print(f"[COMPRESS] Algoritmo '{compression}' indisponível, enviando sem compressão")
+        self.compression_level = compression_level
+        self.compressor = None    # StreamCompressor, se o peer descomprime nosso algoritmo
+        self.decompressor = None  # StreamDecompressor, se o peer vai comprimir
         
         # Controle de congestionamento
         self.enable_congestion_control = enable_congestion_control
+        self.congestion_algorithm = congestion_algorithm
         if enable_congestion_control:
-            self.congestion = CongestionControl()
+            self.congestion = create_congestion_control(congestion_algorithm)
         else:
             # Modo sem controle de congestionamento: janela fixa
             self.congestion = None
             self.window_size = 64  # Janela fixa grande
+
+        # Pacing: espaça os segmentos em vez de rajadas de cwnd pacotes
+        self.enable_pacing = enable_pacing
+        self.pacer = Pacer(burst_packets=pacing_burst, mss=self.mss)
+
+        # Cache de RTT/congestionamento por destino (compartilhado no processo)
+        self.use_path_cache = use_path_cache
         
         # Controle de threads
         self.receiver_thread = None
@@ -88,12 +261,26 @@ class TRUProtocol:
         self.metrics_thread = None
         self.running = False
         
-        # Fila para aplicação
-        self.app_queue = []
+        # Fila para aplicação: blocos em ordem (ou Futures de decifragem)
+        self.app_queue = deque()
+        self.data_event = threading.Event()  # sinalizado a cada entrega e no FIN
+        self._partial_chunk = None           # resto de bloco parcialmente lido por readinto
+
+        # Fila de send()/sendall(): escritas pequenas são agrupadas em segmentos
+        # de mss bytes por uma thread de escrita (Nagle, salvo com nodelay)
+        self.nodelay = nodelay
+        self.send_queue_size = send_queue_size
+        self._send_queue = bytearray()
+        self._send_cond = threading.Condition()
+        self._send_lock = threading.RLock()  # serializa a thread de escrita e send_data
+        self._corked = False
+        self._push_pending = False           # flush/uncork: enviar também o segmento parcial
+        self.writer_thread = None
         
         # Eventos para sincronização
         self.handshake_event = threading.Event()
         self.key_exchange_event = threading.Event()
+        self.window_event = threading.Event()  # sinalizado quando ACKs abrem a janela
         
         # Flag para controle interno
         self._handshake_in_progress = False
@@ -106,8 +293,9 @@ class TRUProtocol:
         self.peer_public_key = None
 
         # Métricas
-        self.metrics_collector = metrics_collector or MetricsCollector()
+        self.metrics_collector = metrics_collector or ColumnarMetricsCollector()
         self.metrics_active = False
+        self.metrics_stop = threading.Event()  # acorda o loop de amostragem no stop
         self.experiment_name = "default_experiment"
 
     def start(self):
@@ -132,6 +320,7 @@ class TRUProtocol:
         """Iniciar coleta periódica de métricas"""
         if not self.metrics_active:
             self.metrics_active = True
+            self.metrics_stop.clear()
             self.metrics_thread = threading.Thread(target=self._metrics_loop, daemon=True)
             self.metrics_thread.start()
             print("[METRICS] Coleta de métricas iniciada")
@@ -139,6 +328,7 @@ class TRUProtocol:
     def stop_metrics_collection(self):
         """Parar coleta de métricas"""
         self.metrics_active = False
+        self.metrics_stop.set()
         if self.metrics_thread:
             self.metrics_thread.join(timeout=1.0)
         print("[METRICS] Coleta de métricas parada")
@@ -150,7 +340,9 @@ class TRUProtocol:
                 # Amostrar throughput
                 packets_in_flight = len(self.send_buffer)
                 self.metrics_collector.sample_throughput(packets_in_flight)
-                time.sleep(0.1)  # Amostrar a cada 100ms
+                # Amostrar a cada 100ms; o stop não espera o intervalo terminar
+                if self.metrics_stop.wait(0.1):
+                    break
             except Exception as e:
                 print(f"[METRICS] Erro no loop de métricas: {e}")
                 break
@@ -161,30 +353,73 @@ class TRUProtocol:
             retransmit = []
             timeout = self._calculate_timeout()
 
+            # Mensagens vencidas saem do voo antes da rodada de retransmissões
+            if self.outgoing_messages:
+                self._expire_messages(current_time, timeout)
+
             for seq, (packet, sent_time, retries) in list(self.send_buffer.items()):
                 if current_time - sent_time > timeout:
-                    if retries < 3:
+                    if retries < MAX_RETRANSMISSIONS:
                         retransmit.append(seq)
-                    else:
-                        del self.send_buffer[seq]
-                        print(f"[TIMER] Packet {seq} dropped after {retries} retries")
+                    elif self.connected:
+                        # Dados confiáveis não são descartados em silêncio: sem
+                        # ACK depois de tantas tentativas, o peer sumiu
+                        print(f"[TIMER] Packet {seq} sem ACK após {retries} retransmissões, conexão perdida")
+                        self._connection_lost()
+                        retransmit = []
+                        break
 
+            if retransmit and self._check_pmtu_blackhole(retransmit):
+                continue  # pedaços novos vencidos: saem na próxima volta, já
+
+            resent = False
             for seq in retransmit:
-                packet, sent_time, retries = self.send_buffer[seq]
+                entry = self.send_buffer.get(seq)
+                if entry is None:
+                    continue  # confirmado ou abandonado nesse meio tempo
+                packet, sent_time, retries = entry
                 print(f"[TIMER] Retransmitting packet {seq} (retry {retries + 1}, RTO={timeout:.3f}s)")
+                if self.enable_pacing:
+                    # Sem esperar: um sleep aqui atrasaria todos os RTOs e prazos
+                    self.pacer.consume(len(packet.data))
                 self._send_raw(packet.serialize(), self.peer_addr)
-                self.send_buffer[seq] = (packet, current_time, retries + 1)
-                if self.enable_congestion_control and self.congestion:
-                    self.congestion.on_timeout()
+                if seq in self.send_buffer:
+                    self.send_buffer[seq] = (packet, current_time, retries + 1)
+                resent = True
+
+            if resent and self.enable_congestion_control and self.congestion:
+                # Um evento de timeout por rodada, não um por segmento: N
+                # segmentos vencidos juntos reduziriam ssthresh N vezes
+                self.congestion.on_timeout()
+
+            # Com mensagens em voo, acordar a tempo do prazo mais próximo
+            next_deadline = min((m.deadline for m in list(self.outgoing_messages.values())
+                                 if m.deadline is not None), default=None)
+            if next_deadline is None:
+                time.sleep(0.1)
+            else:
+                time.sleep(min(0.1, max(0.005, next_deadline - time.time())))
 
-            time.sleep(0.1)
+    def _connection_lost(self):
+        self.connected = False
+        self.window_event.set()
+        self.data_event.set()
+        with self._send_cond:
+            self._send_cond.notify_all()
 
     def _receiver_loop(self):
         print(f"[RECEIVER_LOOP] Iniciado (is_server={self.is_server})")
         
         while self.running:
             try:
-                data, addr = self.sock.recvfrom(2048)
+                deadline = self._ack_deadline
+                if deadline is not None:
+                    # ACK atrasado: sai isolado se nenhum DATA o levar até o prazo
+                    wait = deadline - time.time()
+                    if wait <= 0 or not select.select([self.sock], [], [], wait)[0]:
+                        self._flush_delayed_ack()
+                        continue
+                data, addr = self.sock.recvfrom(self.recv_buffer_size)
                 if not data:
                     continue
                 
@@ -197,7 +432,8 @@ class TRUProtocol:
                 
                 try:
                     packet = TRUPacket.deserialize(data)
-                    print(f"[RECEIVER] Pacote recebido: tipo={packet.packet_type}, seq={packet.seq_num}, ack={packet.ack_num}")
+                    if self.debug:
+                        print(f"[RECEIVER] Pacote recebido: tipo={packet.packet_type}, seq={packet.seq_num}, ack={packet.ack_num}")
                     
                     # Processar pacote
                     self._process_packet(packet, addr)
@@ -215,16 +451,41 @@ class TRUProtocol:
                 continue
 
     def _process_packet(self, packet: TRUPacket, addr: Tuple[str, int]):
-        print(f"[PROCESS] Pacote de {addr}: tipo={packet.packet_type}, seq={packet.seq_num}, ack={packet.ack_num}")
+        if self.debug:
+            print(f"[PROCESS] Pacote de {addr}: tipo={packet.packet_type}, seq={packet.seq_num}, ack={packet.ack_num}")
 
         if self.loss_callback and self.loss_callback(packet.seq_num):
-            print(f"Packet {packet.seq_num} dropped (loss callback)")
+            if self.debug:
+                print(f"Packet {packet.seq_num} dropped (loss callback)")
             return
 
-        # Verificar checksum
-        if packet.checksum != packet.calculate_checksum():
-            print(f"[PROCESS] Checksum inválido, descartando")
-            return
+        if packet.aead:
+            # Tag cobre cabeçalho e payload cifrado: substitui o checksum
+            if self.mac_key is None or not self.crypto.verify_tag(
+                    self.mac_key, packet.authenticated_bytes(), packet.tag):
+                print(f"[PROCESS] Tag de autenticação inválida, descartando")
+                return
+        else:
+            # Verificar checksum
+            if packet.checksum != packet.calculate_checksum():
+                print(f"[PROCESS] Checksum inválido, descartando")
+                return
+            if self.aead_enabled and packet.packet_type in AUTHENTICATED_TYPES:
+                print(f"[PROCESS] {PacketType(packet.packet_type).name} sem autenticação em sessão AEAD, descartando")
+                return
+
+        # Reconstruir offsets de 64 bits a partir dos 32 bits do cabeçalho
+        if packet.packet_type in SEQUENCED_TYPES:
+            packet.seq_num = self._unwrap_seq(packet.seq_num, self.ack_num)
+            if self.peer_piggyback:
+                packet.ack_num = self._unwrap_seq(packet.ack_num, self.next_seq)
+                self._process_acks(packet, packet.ack_num, selective=False)
+        elif packet.packet_type == PacketType.ACK and self.connected:
+            packet.ack_num = self._unwrap_seq(packet.ack_num, self.next_seq)
+            if self.peer_piggyback:
+                packet.seq_num = self._unwrap_seq(packet.seq_num, self.next_seq)
+        elif packet.packet_type == PacketType.FIN:
+            packet.seq_num = self._unwrap_seq(packet.seq_num, self.ack_num)
 
         if packet.packet_type == PacketType.SYN:
             self._handle_syn(packet, addr)
@@ -232,8 +493,11 @@ class TRUProtocol:
             self._handle_syn_ack(packet)
         elif packet.packet_type == PacketType.ACK:
             self._handle_ack(packet)
-        elif packet.packet_type == PacketType.DATA:
+        elif packet.packet_type in (PacketType.DATA, PacketType.STREAM_DATA, PacketType.MESSAGE,
+                                    PacketType.COMPRESSED_DATA):
             self._handle_data(packet, addr)
+        elif packet.packet_type == PacketType.FORWARD:
+            self._handle_forward(packet, addr)
         elif packet.packet_type == PacketType.FIN:
             self._handle_fin(packet)
         elif packet.packet_type == PacketType.FIN_ACK:
@@ -242,6 +506,10 @@ class TRUProtocol:
             self._handle_key_exchange(packet, addr)
         elif packet.packet_type == PacketType.KEY_RESPONSE:
             self._handle_key_response(packet)
+        elif packet.packet_type == PacketType.PMTU_PROBE:
+            self._handle_pmtu_probe(packet, addr)
+        elif packet.packet_type == PacketType.PMTU_PROBE_ACK:
+            self._handle_pmtu_probe_ack(packet)
         else:
             print(f"[PROCESS] Tipo de pacote desconhecido: {packet.packet_type}")
 
@@ -251,8 +519,35 @@ class TRUProtocol:
         if self.connected:
             print(f"[HANDLE_SYN] Já conectado, ignorando")
             return
+
+        if self._syn_ack_cache and self._syn_ack_cache[0] == (addr, packet.seq_num):
+            # SYN retransmitido: repetir o mesmo SYN_ACK (mesmas chaves)
+            print(f"[HANDLE_SYN] SYN duplicado, reenviando SYN-ACK")
+            self._syn_ack_sent_time = None
+            self._send_raw(self._syn_ack_cache[1], addr)
+            return
         
         self.peer_addr = addr
+        if self.use_path_cache:
+            self._seed_from_path_cache()
+        self._read_peer_max_segment(packet.data)
+        # Dados do cliente começam logo após o SYN
+        self.ack_num = packet.seq_num + 1
+        self.peer_seq_known = True
+
+        response_data = struct.pack('!I', self.max_segment_size)
+        early_data = None
+        if len(packet.data) > 4:
+            # Clientes com extensão recebem flags de volta (e chaves, se houver DH)
+            self.peer_flow_control = bool(packet.data[4] & KEY_FLAG_FLOW_CONTROL)
+            self.peer_streams = bool(packet.data[4] & KEY_FLAG_STREAMS)
+            self.peer_messages = bool(packet.data[4] & KEY_FLAG_MESSAGES)
+            response_flags, extension = KEY_FLAG_FLOW_CONTROL | KEY_FLAG_STREAMS | KEY_FLAG_MESSAGES, b''
+            if self.enable_encryption:
+                key_flags, extension, early_data = self._accept_handshake_keys(packet)
+                response_flags |= key_flags
+            self._negotiate_options(self._read_handshake_options(packet.data, from_server=False))
+            response_data += bytes([response_flags]) + extension + self._handshake_options()
         
         # Enviar SYN-ACK
         syn_ack_packet = TRUPacket(
@@ -263,13 +558,21 @@ class TRUProtocol:
             checksum=0,
             timestamp=time.time(),
             iv=b'',
-            data=b''
+            data=response_data
         )
         syn_ack_packet.checksum = syn_ack_packet.calculate_checksum()
         self.next_seq += 1
         
         print(f"[HANDLE_SYN] Enviando SYN-ACK, seq={syn_ack_packet.seq_num}, ack={syn_ack_packet.ack_num}")
+        self._syn_ack_sent_time = time.time()
         self._send_raw(syn_ack_packet, addr)
+        self._syn_ack_cache = ((addr, packet.seq_num), syn_ack_packet.serialize())
+
+        # O SYN-ACK segue sem tag: o cliente só tem a chave de MAC depois dele
+        if self.mac_key is not None:
+            self.aead_enabled = True
+        if early_data is not None:
+            self._deliver_early_data(*early_data)
         
         # Marcar que estamos em handshake
         self._handshake_in_progress = True
@@ -285,10 +588,21 @@ class TRUProtocol:
         expected_ack = self.base_seq + 1
         if packet.ack_num == expected_ack:
             print(f"[HANDLE_SYN_ACK] ACK correto, enviando ACK final")
+            self._read_peer_max_segment(packet.data)
+            if self._syn_sent_time is not None:
+                self._handshake_rtt_sample(time.time() - self._syn_sent_time)
+            if len(packet.data) > 4:
+                self.peer_flow_control = bool(packet.data[4] & KEY_FLAG_FLOW_CONTROL)
+                self.peer_streams = bool(packet.data[4] & KEY_FLAG_STREAMS)
+                self.peer_messages = bool(packet.data[4] & KEY_FLAG_MESSAGES)
+                self._negotiate_options(self._read_handshake_options(packet.data, from_server=True))
+            if len(packet.data) > 4 and self.dh_private_key is not None:
+                self._complete_handshake_keys(packet.data)
             
-            # Enviar ACK para completar handshake
+            # Enviar ACK para completar handshake (com piggyback, o seq já é
+            # o ACK cumulativo: nada do servidor recebido ainda)
             ack_packet = TRUPacket(
-                seq_num=packet.ack_num,
+                seq_num=packet.seq_num + 1 if self.peer_piggyback else packet.ack_num,
                 ack_num=packet.seq_num + 1,
                 packet_type=PacketType.ACK,
                 window=self.window_size,
@@ -302,10 +616,11 @@ class TRUProtocol:
             print(f"[HANDLE_SYN_ACK] Enviando ACK, seq={ack_packet.seq_num}, ack={ack_packet.ack_num}")
             self._send_raw(ack_packet, self.peer_addr)
             
-            # Atualizar estado
+            # Atualizar estado (dados 0-RTT aceitos já ocupam o início da sequência)
             self.connected = True
-            self.next_seq = packet.ack_num
+            self.next_seq = packet.ack_num + (self._early_data_len if self.early_data_accepted else 0)
             self.ack_num = packet.seq_num + 1
+            self.peer_seq_known = True
             
             print(f"[HANDLE_SYN_ACK] Conexão estabelecida com {self.peer_addr}")
             
@@ -315,115 +630,270 @@ class TRUProtocol:
             print(f"[HANDLE_SYN_ACK] ACK incorreto: esperado {expected_ack}, recebido {packet.ack_num}")
 
     def _handle_ack(self, packet: TRUPacket):
-        print(f"[HANDLE_ACK] Recebido ACK para ack_num={packet.ack_num}")
+        if self.debug:
+            print(f"[HANDLE_ACK] Recebido ACK para ack_num={packet.ack_num}")
         
         # Verificar se é ACK do handshake (servidor)
         if not self.connected and self._handshake_in_progress:
             print(f"[HANDLE_ACK] ACK do handshake recebido, completando conexão")
-            self.connected = True
-            self._handshake_in_progress = False
-            self.handshake_event.set()
+            self._complete_server_handshake()
             return
         
-        # Processar ACK de dados
-        ack_num = packet.ack_num
+        # Cada ACK confirma exatamente um segmento (ack_num = seq + tamanho);
+        # tratá-lo como cumulativo liberaria segmentos perdidos sem retransmissão.
+        # Com piggyback o seq traz também o ponto cumulativo do destinatário
+        cumulative = packet.seq_num if self.peer_piggyback else None
+        if not self._process_acks(packet, cumulative, selective=True):
+            if self.debug:
+                print(f"[HANDLE_ACK] Nenhum pacote confirmado por este ACK")
+
+    def _process_acks(self, packet: TRUPacket, cumulative: Optional[int], selective: bool) -> bool:
+        # Libera os segmentos confirmados por packet: o de ack_num (ACK seletivo)
+        # e todos até cumulative; True se algum saiu do send_buffer
+        if self.peer_flow_control:
+            # Espaço livre no buffer do destinatário, em segmentos
+            self.recv_window = packet.window
+            self.window_event.set()
         current_time = time.time()
         acked_seqs = []
+        last_rtt_sample = None
+        newest = None  # amostra de RTT do segmento mais recente confirmado
 
-        for seq in list(self.send_buffer.keys()):
-            if seq < ack_num:
-                if seq in self.sent_times:
-                    rtt_sample = current_time - self.sent_times[seq]
+        for seq, (sent_packet, _, retries) in list(self.send_buffer.items()):
+            if not ((selective and self._acks_segment(seq, sent_packet, packet))
+                    or (cumulative is not None and self._segment_end(seq, sent_packet) <= cumulative)):
+                continue
+            if seq in self.sent_times:
+                rtt_sample = current_time - self.sent_times.pop(seq)
+                if self.debug:
                     print(f"[HANDLE_ACK] RTT para seq={seq}: {rtt_sample:.6f}s")
-                    
-                    # Coletar métricas de RTT
-                    if self.metrics_collector:
-                        self.metrics_collector.record_ack_received(seq, rtt_sample)
-                    
-                    if self.min_rtt <= rtt_sample <= self.max_rtt:
-                        self._update_rtt(rtt_sample)
-                    elif self.rtt_avg == 0 and rtt_sample > 0:
-                        # Aceitar primeira amostra mesmo se fora dos limites
-                        self._update_rtt(rtt_sample)
-                    
-                    del self.sent_times[seq]
-                
-                del self.send_buffer[seq]
-                acked_seqs.append(seq)
-        
-        if acked_seqs:
-            print(f"[HANDLE_ACK] ACKs confirmados: {acked_seqs}")
+                self.delivery_histogram.record(rtt_sample)
+
+                # Coletar métricas de RTT
+                if self.metrics_collector:
+                    self.metrics_collector.record_ack_received(seq, rtt_sample)
+                if newest is None or seq > newest[0]:
+                    newest = (seq, rtt_sample, current_time - rtt_sample, retries)
+
+            if self.send_buffer.pop(seq, None) is None:
+                continue  # liberado pela thread de envio nesse meio tempo
+            acked_seqs.append(seq)
+            if len(sent_packet.data) > self.base_mss:
+                self.pmtu_blackhole_rtos = 0  # segmentos grandes passam
+            if sent_packet.packet_type == PacketType.FORWARD:
+                continue
             if self.enable_congestion_control and self.congestion:
-                self.congestion.on_ack_received()
-                self.window_size = self.congestion.get_window_size()
-            self.timeout_interval = self._calculate_timeout()
-        else:
-            print(f"[HANDLE_ACK] Nenhum pacote confirmado por este ACK")
+                self.congestion.on_packet_acked(seq)
+            if seq in self._message_by_seq:
+                self._message_fragment_acked(seq)
+
+        if newest is not None and newest[3] == 0:
+            # Só o segmento mais recente: os anteriores liberados pelo ACK
+            # cumulativo esperaram o DATA de volta e inflariam o RTT. Nunca um
+            # retransmitido (algoritmo de Karn): o ACK pode ser de qualquer
+            # envio e a amostra incluiria a espera do RTO
+            _, rtt_sample, sent_time, _ = newest
+            # Atraso de ida: timestamp do ACK (relógio do destinatário) menos o envio
+            if self.enable_congestion_control and self.congestion:
+                self.congestion.on_delay_sample(packet.timestamp - sent_time)
+            if self.min_rtt <= rtt_sample <= self.max_rtt:
+                self._update_rtt(rtt_sample)
+            elif self.rtt_avg == 0 and rtt_sample > 0:
+                # Aceitar primeira amostra mesmo se fora dos limites
+                self._update_rtt(rtt_sample)
+            last_rtt_sample = rtt_sample
+
+        if not acked_seqs:
+            return False
+        if self.debug:
+            print(f"[HANDLE_ACK] ACKs confirmados: {acked_seqs}")
+        if self.enable_congestion_control and self.congestion:
+            # Um passo de crescimento por segmento, como com um ACK por segmento
+            for i in range(len(acked_seqs)):
+                self.congestion.on_ack_received(rtt_sample=last_rtt_sample if i == 0 else None)
+            self.window_size = self.congestion.get_window_size()
+        self.timeout_interval = self._calculate_timeout()
+        self.window_event.set()
+        if self.writer_thread:
+            # Nagle: sem dados pendentes o segmento parcial pode sair
+            with self._send_cond:
+                self._send_cond.notify_all()
+        return True
+
+    @staticmethod
+    def _acks_segment(seq: int, sent_packet: TRUPacket, ack: TRUPacket) -> bool:
+        # FORWARD é confirmado por um ACK que ecoa o tamanho da faixa pulada: o
+        # ACK atrasado do último fragmento abandonado tem o mesmo ack_num
+        if sent_packet.packet_type == PacketType.FORWARD:
+            skipped = FORWARD_FORMAT.unpack(sent_packet.data)[0]
+            return bool(ack.data) and seq + skipped == ack.ack_num
+        return not ack.data and seq + len(sent_packet.data) == ack.ack_num
+
+    @staticmethod
+    def _segment_end(seq: int, sent_packet: TRUPacket) -> int:
+        # Fim da faixa de seq ocupada: um FORWARD cobre a faixa que pulou
+        if sent_packet.packet_type == PacketType.FORWARD:
+            return seq + FORWARD_FORMAT.unpack(sent_packet.data)[0]
+        return seq + len(sent_packet.data)
+
+    def _send_window(self) -> int:
+        # Segmentos em voo permitidos: cwnd limitado pelo buffer livre do destinatário
+        if not self.peer_flow_control:
+            return self.window_size
+        return min(self.window_size, self.recv_window)
+
+    def _advertised_window(self) -> int:
+        buffered = len(self.receive_buffer) + len(self.app_queue) + len(self.message_queue)
+        buffered += sum(stream.buffered_segments() for stream in list(self.streams.values()))
+        window = max(0, MAX_RECV_WINDOW - buffered)
+        if window == 0:
+            self._window_update_pending = True
+        return window
+
+    def _send_window_update(self):
+        # Chamado pelo consumidor: reabre a janela do remetente quando a
+        # aplicação libera espaço suficiente depois de anunciarmos zero
+        if not self._window_update_pending or not self.connected:
+            return
+        window = self._advertised_window()
+        if window < MAX_RECV_WINDOW // 4:
+            return
+        self._window_update_pending = False
+        self._send_ack(self.ack_num, self.peer_addr)
+
+    def _send_ack(self, ack_num: int, addr: Tuple[str, int], data: bytes = b''):
+        # ACK isolado; com piggyback o seq leva o ACK cumulativo, que também
+        # cobre o ACK atrasado pendente
+        cumulative = 0
+        if self.peer_piggyback:
+            self._ack_pending = 0
+            self._ack_deadline = None
+            cumulative = self.ack_num
+        ack_packet = TRUPacket(
+            seq_num=cumulative,
+            ack_num=ack_num,
+            packet_type=PacketType.ACK,
+            window=self._advertised_window(),
+            checksum=0,
+            timestamp=time.time(),
+            iv=b'',
+            data=data
+        )
+        ack_packet.checksum = ack_packet.calculate_checksum()
+        self._send_raw(ack_packet, addr)
+        self.receive_stats['acks_sent'] += 1
+
+    def _flush_delayed_ack(self):
+        if self._ack_deadline is not None and self.connected:
+            self._send_ack(self.ack_num, self.peer_addr)
+        self._ack_pending = 0
+        self._ack_deadline = None
+
+    def _piggyback_fields(self) -> Tuple[int, int]:
+        # (ack_num, window) do cabeçalho de um segmento que sai agora; com
+        # piggyback ele confirma tudo o que chegou em ordem. Zera o pendente
+        # antes de ler ack_num: um DATA que chegue no meio ganha ACK próprio
+        if not self.peer_piggyback:
+            return 0, self.window_size
+        self._ack_pending = 0
+        self._ack_deadline = None
+        return self.ack_num, self._advertised_window()
 
     def _handle_data(self, packet: TRUPacket, addr: Tuple[str, int]):
-        print(f"[HANDLE_DATA] Recebido DATA, seq={packet.seq_num}, tamanho={len(packet.data)}")
-        
-        # Ajustar ack_num se for o primeiro pacote
-        if len(self.received_segments) == 0 and packet.seq_num != self.ack_num:
-            print(f"[HANDLE_DATA] Ajustando ack_num de {self.ack_num} para {packet.seq_num}")
+        if self.debug:
+            print(f"[HANDLE_DATA] Recebido DATA, seq={packet.seq_num}, tamanho={len(packet.data)}")
+
+        # ACK final do handshake perdido: o primeiro DATA também completa a conexão
+        if not self.connected and self._handshake_in_progress:
+            self._complete_server_handshake()
+        
+        # Ajustar ack_num se for o primeiro pacote e o SYN não o definiu; com o
+        # SYN conhecido, ajustar aqui pularia um primeiro segmento perdido
+        if (not self.peer_seq_known and self.delivered_bytes == 0 and not self.receive_buffer
+                and packet.seq_num != self.ack_num):
+            if self.debug:
+                print(f"[HANDLE_DATA] Ajustando ack_num de {self.ack_num} para {packet.seq_num}")
             self.ack_num = packet.seq_num
         
-        # Verificar duplicata
-        if packet.seq_num in self.received_segments:
-            print(f"[HANDLE_DATA] Pacote duplicado {packet.seq_num}")
+        # Verificar duplicata: abaixo do ack cumulativo ou já no buffer
+        if packet.seq_num < self.ack_num or packet.seq_num in self.receive_buffer:
+            if self.debug:
+                print(f"[HANDLE_DATA] Pacote duplicado {packet.seq_num}")
             self.receive_stats['duplicates'] += 1
             
-            # Enviar ACK mesmo para duplicata
-            ack_num = packet.seq_num + len(packet.data)
-            ack_packet = TRUPacket(
-                seq_num=0,
-                ack_num=ack_num,
-                packet_type=PacketType.ACK,
-                window=self.window_size,
-                checksum=0,
-                timestamp=time.time(),
-                iv=b'',
-                data=b''
-            )
-            ack_packet.checksum = ack_packet.calculate_checksum()
-            self._send_raw(ack_packet, addr)
-            self.receive_stats['acks_sent'] += 1
+            # Enviar ACK mesmo para duplicata (o ACK anterior se perdeu)
+            self._send_ack(packet.seq_num + len(packet.data), addr)
             return
-        
+        in_order = packet.seq_num == self.ack_num
+        
+        # STREAM_DATA: cabeçalho de stream em claro antes do conteúdo cifrado
+        payload = packet.data
+        stream_header = None
+        if packet.packet_type == PacketType.STREAM_DATA:
+            if len(payload) < STREAM_HEADER_SIZE:
+                print(f"[HANDLE_DATA] STREAM_DATA truncado, descartando")
+                return
+            stream_header = STREAM_HEADER.unpack_from(payload)
+            payload = payload[STREAM_HEADER_SIZE:]
+        elif packet.packet_type == PacketType.MESSAGE:
+            if len(payload) < MESSAGE_HEADER_SIZE:
+                print(f"[HANDLE_DATA] MESSAGE truncado, descartando")
+                return
+            message_header = MESSAGE_HEADER.unpack_from(payload)
+            payload = payload[MESSAGE_HEADER_SIZE:]
+        elif packet.packet_type == PacketType.COMPRESSED_DATA and self.decompressor is None:
+            print(f"[HANDLE_DATA] COMPRESSED_DATA sem compressão negociada, descartando")
+            return
+
         # Se criptografia estiver habilitada, descriptografar os dados
-        data_to_store = packet.data
-        if self.encryption_enabled and self.encryption_key is not None and packet.iv:
+        data_to_store = payload
+        packet_iv = self.crypto.packet_nonce(self.iv, packet.seq_num) if packet.aead else packet.iv
+        if self.encryption_enabled and self.encryption_key is not None and packet_iv and self.crypto_pipeline:
+            # Decifrar nos workers; a ordem de entrega continua sendo a do seq
+            data_to_store = self.crypto_pipeline.decrypt(payload, self.encryption_key, packet_iv)
+        elif self.encryption_enabled and self.encryption_key is not None and packet_iv:
             try:
-                decrypted_data = self.crypto.decrypt_data(packet.data, self.encryption_key, packet.iv)
+                decrypted_data = self.crypto.decrypt_data(payload, self.encryption_key, packet_iv)
                 data_to_store = decrypted_data
-                print(f"[HANDLE_DATA] Dados descriptografados: {len(decrypted_data)} bytes")
+                if self.debug:
+                    print(f"[HANDLE_DATA] Dados descriptografados: {len(decrypted_data)} bytes")
             except Exception as e:
                 print(f"[HANDLE_DATA] Erro ao descriptografar: {e}")
         
-        # Armazenar dados
-        self.receive_buffer[packet.seq_num] = data_to_store
-        self.received_segments.add(packet.seq_num)
+        if stream_header is not None:
+            # O conteúdo vai direto para o stream; na conexão fica só a marca
+            # do seq recebido (None), que avança ack_num sem entrar em app_queue
+            stream_id, offset, flags = stream_header
+            self._deliver_stream_segment(stream_id, offset, len(payload), data_to_store,
+                                         bool(flags & STREAM_FLAG_FIN))
+            data_to_store = None
+        elif packet.packet_type == PacketType.MESSAGE:
+            data_to_store = MessageFragment(message_header[0], len(payload), message_header[1], data_to_store)
+        elif packet.packet_type == PacketType.COMPRESSED_DATA:
+            # Descomprimido em ordem pelo consumidor (_next_chunk)
+            data_to_store = CompressedChunk(data_to_store)
+
+        # Armazenar dados (tamanho no fio + conteúdo ou Future de decifragem)
+        self.receive_buffer[packet.seq_num] = (len(packet.data), data_to_store)
         self.receive_stats['received'] += 1
         
         # Entregar dados em ordem
         self._deliver_data()
-        
+
+        if self.peer_piggyback and in_order and not self.receive_buffer:
+            # Sem buraco a reportar: o próximo DATA de volta leva o ACK; sem
+            # envio em curso, o ACK isolado sai a cada ACK_EVERY segmentos
+            self._ack_pending += 1
+            if self._ack_pending < ACK_EVERY or self._transmitting or self._send_queue:
+                if self._ack_deadline is None:
+                    self._ack_deadline = time.time() + ACK_DELAY
+                return
+
         # Enviar ACK
         ack_num = packet.seq_num + len(packet.data)
-        ack_packet = TRUPacket(
-            seq_num=0,
-            ack_num=ack_num,
-            packet_type=PacketType.ACK,
-            window=self.window_size,
-            checksum=0,
-            timestamp=time.time(),
-            iv=b'',
-            data=b''
-        )
-        ack_packet.checksum = ack_packet.calculate_checksum()
-        print(f"[HANDLE_DATA] Enviando ACK para ack_num={ack_num}")
-        self._send_raw(ack_packet, addr)
-        self.receive_stats['acks_sent'] += 1
+        if self.debug:
+            print(f"[HANDLE_DATA] Enviando ACK para ack_num={ack_num}")
+        self._send_ack(ack_num, addr)
 
     def _handle_key_exchange(self, packet: TRUPacket, addr: Tuple[str, int]):
         print(f"[KEY_EXCHANGE] Recebido pedido de troca de chaves do cliente")
@@ -436,6 +906,10 @@ class TRUProtocol:
                 
             # Desempacotar usando 'Q' (8 bytes cada)
             g, p, client_public = struct.unpack('!QQQ', packet.data[:24])
+            # A troca de chaves consome um número de sequência do cliente
+            if self.delivered_bytes == 0 and not self.receive_buffer:
+                self.ack_num = packet.seq_num + 1
+            client_flags = packet.data[24] if len(packet.data) > 24 else 0
             print(f"[KEY_EXCHANGE] Parâmetros recebidos: g={g}, p={p}, client_public={client_public}")
             
             # Gerar chave privada do servidor
@@ -458,13 +932,12 @@ class TRUProtocol:
             print(f"[KEY_EXCHANGE] Chave derivada com sucesso (tamanho: {len(encryption_key)} bytes)")
             print(f"[KEY_EXCHANGE] IV gerado: {self.iv.hex()[:16]}...")
             
-            # Testar criptografia
-            if not self.crypto.test_encryption(encryption_key):
-                print(f"[KEY_EXCHANGE] Teste de criptografia falhou")
-                return
-            
             # Preparar resposta: server_public (8 bytes) + iv_length (2 bytes) + iv
-            response_data = struct.pack('!Q', server_public) + struct.pack('!H', len(self.iv)) + self.iv
+            # + salt_length (2 bytes) + salt + flags (1 byte)
+            use_aead = self.enable_aead and bool(client_flags & KEY_FLAG_AEAD)
+            response_data = (struct.pack('!Q', server_public) + struct.pack('!H', len(self.iv)) + self.iv +
+                             struct.pack('!H', len(salt)) + salt +
+                             bytes([KEY_FLAG_AEAD if use_aead else 0]))
             
             # Enviar resposta
             key_response = TRUPacket(
@@ -483,6 +956,12 @@ class TRUProtocol:
             print(f"[KEY_EXCHANGE] Enviando resposta de troca de chaves ({len(response_data)} bytes)")
             self._send_raw(key_response, addr)
 
+            # A resposta segue sem tag: o cliente ainda não tem a chave de MAC
+            if use_aead:
+                self.mac_key = self.crypto.derive_mac_key(encryption_key)
+                self.aead_enabled = True
+                print(f"[KEY_EXCHANGE] Modo AEAD ativado")
+
             print(f"[KEY_EXCHANGE] Troca de chaves completada no servidor")
             self.key_exchange_event.set()
             
@@ -511,6 +990,19 @@ class TRUProtocol:
             
             # Extrair IV
             self.iv = packet.data[10:10 + iv_length]
+            # A resposta consome um número de sequência do servidor
+            if self.delivered_bytes == 0 and not self.receive_buffer:
+                self.ack_num = packet.seq_num + 1
+
+            # Campos opcionais: salt do servidor e flags (servidores antigos não enviam)
+            salt, server_flags = None, 0
+            offset = 10 + iv_length
+            if len(packet.data) >= offset + 2:
+                salt_length = struct.unpack('!H', packet.data[offset:offset + 2])[0]
+                salt = packet.data[offset + 2:offset + 2 + salt_length]
+                offset += 2 + salt_length
+                if len(packet.data) > offset:
+                    server_flags = packet.data[offset]
             
             print(f"[KEY_RESPONSE] server_public={server_public}, iv_length={iv_length}")
             print(f"[KEY_RESPONSE] IV recebido ({len(self.iv)} bytes): {self.iv.hex()[:16]}...")
@@ -522,30 +1014,411 @@ class TRUProtocol:
                 
             shared_secret = self.crypto.compute_dh_shared(server_public, self.dh_private_key, self.dh_prime)
             
-            # Derivar chave de criptografia
-            encryption_key, salt = self.crypto.derive_key(shared_secret)
+            # Derivar chave de criptografia com o mesmo salt do servidor
+            encryption_key, salt = self.crypto.derive_key(shared_secret, salt)
             self.encryption_key = encryption_key
             self.encryption_enabled = True
+            if self.enable_aead and server_flags & KEY_FLAG_AEAD:
+                self.mac_key = self.crypto.derive_mac_key(encryption_key)
+                self.aead_enabled = True
             
-            print(f"[KEY_RESPONSE] Chave derivada com sucesso (tamanho: {len(encryption_key)} bytes)")
+            print(f"[KEY_RESPONSE] Chave derivada com sucesso (tamanho: {len(encryption_key)} bytes, "
+                  f"AEAD: {self.aead_enabled})")
             
-            # Testar criptografia
-            if self.crypto.test_encryption(encryption_key):
-                print(f"[KEY_RESPONSE] Criptografia testada com sucesso!")
-                self.key_exchange_event.set()
-            else:
-                print(f"[KEY_RESPONSE] Teste de criptografia falhou")
+            self.key_exchange_event.set()
                 
         except Exception as e:
             print(f"[KEY_RESPONSE] Erro ao processar resposta: {e}")
             import traceback
             traceback.print_exc()
 
+    def _read_peer_max_segment(self, data: bytes):
+        # Peers sem a opção anunciam payload vazio: assumir o MSS padrão
+        if len(data) >= 4:
+            self.peer_max_segment_size = struct.unpack('!I', data[:4])[0]
+        limit = min(self.max_segment_size, self.peer_max_segment_size)
+        self.mss = min(self.mss, limit)
+        print(f"[HANDSHAKE] Segmento máximo negociado: {limit} bytes (mss atual: {self.mss})")
+
+    def _build_syn_data(self, early_data: Optional[bytes]) -> bytes:
+        # SYN: mss(4) [+ flags(1) + g,p,pública(24) [+ client_random(16) + ticket
+        # [+ dados 0-RTT cifrados + tag]]] + opções(1)
+        syn_data = struct.pack('!I', self.max_segment_size)
+        if not self.enable_encryption:
+            return (syn_data + bytes([KEY_FLAG_FLOW_CONTROL | KEY_FLAG_STREAMS | KEY_FLAG_MESSAGES])
+                    + self._handshake_options())
+
+        g, p, private_key = self.crypto.generate_dh_params()
+        self.dh_generator, self.dh_prime, self.dh_private_key = g, p, private_key
+        flags = (KEY_FLAG_DH | KEY_FLAG_FLOW_CONTROL | KEY_FLAG_STREAMS | KEY_FLAG_MESSAGES
+                 | (KEY_FLAG_AEAD if self.enable_aead else 0))
+        extension = struct.pack('!QQQ', g, p, self.crypto.compute_dh_public(g, p, private_key))
+
+        stored = get_ticket_store().take(self.peer_addr) if self.session_tickets else None
+        if stored:
+            ticket, secret = stored
+            client_random = os.urandom(16)
+            self._resumption = (secret, client_random)
+            flags |= KEY_FLAG_TICKET
+            extension += client_random + struct.pack('!H', len(ticket)) + ticket
+
+            if early_data and self.enable_aead:
+                # 0-RTT: primeiro segmento cifrado com a chave derivada do ticket,
+                # com o mesmo nonce que teria como DATA de seq base_seq + 1; a tag
+                # cobre o offset inteiro de 64 bits, não só o seq de 32 do fio
+                room = self.mss - len(syn_data) - 2 - len(extension) - 2 - TRUPacket.AEAD_TAG_SIZE
+                chunk = early_data[:max(room, 0)]
+                if chunk:
+                    key, iv = derive_resumed_session(secret, client_random)
+                    seq = self.base_seq + 1
+                    encrypted = self.crypto.encrypt_data(chunk, key, self.crypto.packet_nonce(iv, seq))[0]
+                    tag = self.crypto.compute_tag(self.crypto.derive_mac_key(key),
+                                                  struct.pack('!Q', seq) + encrypted)
+                    flags |= KEY_FLAG_EARLY_DATA
+                    extension += struct.pack('!H', len(encrypted)) + encrypted + tag
+                    self._early_data_len = len(chunk)
+
+        return syn_data + bytes([flags]) + extension + self._handshake_options()
+
+    def _handshake_options(self) -> bytes:
+        # Byte de opções após a extensão de chaves (o byte de flags está cheio):
+        # algoritmos que descomprimimos + algoritmo com que vamos comprimir
+        piggyback = OPTION_PIGGYBACK_ACKS if self.piggyback_acks else 0
+        return bytes([supported_algorithms() | piggyback | self.compression << 4])
+
+    @staticmethod
+    def _read_handshake_options(data: bytes, from_server: bool) -> int:
+        # Pula a extensão de chaves do SYN (ou SYN_ACK) para achar o byte de
+        # opções; peers antigos não o enviam e ignoram bytes a mais
+        flags = data[4]
+        offset = 5
+        try:
+            if from_server:
+                if flags & KEY_FLAG_RESUMED:
+                    pass
+                elif flags & KEY_FLAG_DH:
+                    offset += 8
+                    offset += 2 + struct.unpack_from('!H', data, offset)[0]
+                    offset += 2 + struct.unpack_from('!H', data, offset)[0]
+                if flags & KEY_FLAG_TICKET:
+                    offset += 6 + struct.unpack_from('!H', data, offset + 4)[0]
+            elif flags & KEY_FLAG_DH:
+                offset += 24
+                if flags & KEY_FLAG_TICKET:
+                    offset += 18 + struct.unpack_from('!H', data, offset + 16)[0]
+                    if flags & KEY_FLAG_EARLY_DATA:
+                        offset += 2 + struct.unpack_from('!H', data, offset)[0] + TRUPacket.AEAD_TAG_SIZE
+        except struct.error:
+            return 0
+        return data[offset] if offset < len(data) else 0
+
+    def _negotiate_options(self, options: int):
+        self.peer_piggyback = self.piggyback_acks and bool(options & OPTION_PIGGYBACK_ACKS)
+        if self.peer_piggyback:
+            print(f"[HANDSHAKE] ACKs no cabeçalho dos DATA (full duplex)")
+        self._negotiate_compression(options)
+
+    def _negotiate_compression(self, options: int):
+        peer_decodes, peer_compression = options & 0x03, options >> 4
+        if self.compression & peer_decodes:
+            self.compressor = StreamCompressor(self.compression, self.compression_level)
+        if peer_compression in ALGORITHMS.values() and peer_compression & supported_algorithms():
+            self.decompressor = StreamDecompressor(peer_compression)
+        if self.compressor or self.decompressor:
+            print(f"[HANDSHAKE] Compressão: envio {'ativa' if self.compressor else 'inativa'}, "
+                  f"recepção {'ativa' if self.decompressor else 'inativa'}")
+
+    def _accept_handshake_keys(self, packet: TRUPacket):
+        # Servidor: deriva as chaves a partir do SYN e devolve flags e extensão
+        # do SYN_ACK mais os dados 0-RTT aceitos (seq, cifra) ou None
+        data = packet.data
+        flags = data[4]
+        if not flags & KEY_FLAG_DH or len(data) < 29:
+            return 0, b'', None
+        g, p, client_public = struct.unpack('!QQQ', data[5:29])
+        offset = 29
+        use_aead = self.enable_aead and bool(flags & KEY_FLAG_AEAD)
+
+        secret, client_random, early = None, None, None
+        if flags & KEY_FLAG_TICKET:
+            client_random = data[offset:offset + 16]
+            ticket_length = struct.unpack('!H', data[offset + 16:offset + 18])[0]
+            ticket = data[offset + 18:offset + 18 + ticket_length]
+            offset += 18 + ticket_length
+            if flags & KEY_FLAG_EARLY_DATA:
+                early_length = struct.unpack('!H', data[offset:offset + 2])[0]
+                encrypted = data[offset + 2:offset + 2 + early_length]
+                tag = data[offset + 2 + early_length:offset + 2 + early_length + TRUPacket.AEAD_TAG_SIZE]
+                early = (encrypted, tag)
+            if self.session_tickets:
+                secret = get_ticket_keeper().redeem(ticket)
+            print(f"[HANDSHAKE] Ticket de retomada {'aceito' if secret else 'recusado'}")
+
+        response_flags = KEY_FLAG_AEAD if use_aead else 0
+        if secret:
+            # Retomada: chave do ticket, sem DH (permite 0-RTT)
+            encryption_key, self.iv = derive_resumed_session(secret, client_random)
+            response_flags |= KEY_FLAG_RESUMED
+            extension = b''
+        else:
+            server_private = random.randint(1, p - 2)
+            server_public = self.crypto.compute_dh_public(g, p, server_private)
+            shared_secret = self.crypto.compute_dh_shared(client_public, server_private, p)
+            encryption_key, salt = self.crypto.derive_key(shared_secret)
+            self.iv = os.urandom(16)
+            response_flags |= KEY_FLAG_DH
+            extension = (struct.pack('!Q', server_public) + struct.pack('!H', len(self.iv)) + self.iv +
+                         struct.pack('!H', len(salt)) + salt)
+
+        self.encryption_key = encryption_key
+        self.encryption_enabled = True
+        if use_aead:
+            self.mac_key = self.crypto.derive_mac_key(encryption_key)
+
+        accepted_early = None
+        if secret and early and use_aead:
+            seq = packet.seq_num + 1
+            if self.crypto.verify_tag(self.mac_key, struct.pack('!Q', seq) + early[0], early[1]):
+                accepted_early = (seq, early[0])
+                response_flags |= KEY_FLAG_EARLY_DATA
+
+        if self.session_tickets:
+            keeper = get_ticket_keeper()
+            ticket = keeper.issue(resumption_secret(encryption_key))
+            response_flags |= KEY_FLAG_TICKET
+            extension += struct.pack('!I', int(keeper.lifetime)) + struct.pack('!H', len(ticket)) + ticket
+
+        print(f"[HANDSHAKE] Chaves da sessão derivadas no SYN (retomada: {bool(secret)}, AEAD: {use_aead})")
+        self.key_exchange_event.set()
+        return response_flags, extension, accepted_early
+
+    def _complete_handshake_keys(self, data: bytes):
+        # Cliente: chaves a partir da extensão do SYN_ACK; servidores antigos
+        # não a enviam e a troca de chaves separada continua valendo
+        flags = data[4]
+        offset = 5
+        if flags & KEY_FLAG_RESUMED and self._resumption:
+            encryption_key, self.iv = derive_resumed_session(*self._resumption)
+            self.early_data_accepted = bool(flags & KEY_FLAG_EARLY_DATA)
+        elif flags & KEY_FLAG_DH:
+            server_public = struct.unpack('!Q', data[offset:offset + 8])[0]
+            iv_length = struct.unpack('!H', data[offset + 8:offset + 10])[0]
+            self.iv = data[offset + 10:offset + 10 + iv_length]
+            offset += 10 + iv_length
+            salt_length = struct.unpack('!H', data[offset:offset + 2])[0]
+            salt = data[offset + 2:offset + 2 + salt_length]
+            offset += 2 + salt_length
+            shared_secret = self.crypto.compute_dh_shared(server_public, self.dh_private_key, self.dh_prime)
+            encryption_key, _ = self.crypto.derive_key(shared_secret, salt)
+        else:
+            return
+
+        self.encryption_key = encryption_key
+        self.encryption_enabled = True
+        if self.enable_aead and flags & KEY_FLAG_AEAD:
+            self.mac_key = self.crypto.derive_mac_key(encryption_key)
+            self.aead_enabled = True
+
+        if flags & KEY_FLAG_TICKET and self.session_tickets:
+            lifetime = struct.unpack('!I', data[offset:offset + 4])[0]
+            ticket_length = struct.unpack('!H', data[offset + 4:offset + 6])[0]
+            ticket = data[offset + 6:offset + 6 + ticket_length]
+            get_ticket_store().store(self.peer_addr, ticket, resumption_secret(encryption_key), lifetime)
+
+        print(f"[HANDSHAKE] Chaves da sessão derivadas no SYN-ACK (retomada: {bool(flags & KEY_FLAG_RESUMED)}, "
+              f"0-RTT aceito: {self.early_data_accepted}, AEAD: {self.aead_enabled})")
+        self.key_exchange_event.set()
+
+    def _deliver_early_data(self, seq: int, encrypted: bytes):
+        data = self.crypto.decrypt_data(encrypted, self.encryption_key, self.crypto.packet_nonce(self.iv, seq))
+        print(f"[HANDSHAKE] {len(data)} bytes de dados 0-RTT aceitos")
+        self.ack_num = seq
+        self.receive_buffer[seq] = (len(encrypted), data)
+        self.receive_stats['received'] += 1
+        self._deliver_data()
+
+    def _handshake_rtt_sample(self, sample: float):
+        # Primeira amostra de RTT vem do próprio handshake
+        self._update_rtt(sample)
+        self.timeout_interval = self._calculate_timeout()
+        if self.enable_congestion_control and self.congestion:
+            self.congestion.update_rtt(sample)
+
+    def _complete_server_handshake(self):
+        if self._syn_ack_sent_time is not None:
+            self._handshake_rtt_sample(time.time() - self._syn_ack_sent_time)
+        self.connected = True
+        self._handshake_in_progress = False
+        self.handshake_event.set()
+
+    def _handle_pmtu_probe(self, packet: TRUPacket, addr: Tuple[str, int]):
+        print(f"[PMTU] Sonda de {len(packet.data)} bytes recebida")
+        probe_ack = TRUPacket(
+            seq_num=0,
+            ack_num=packet.seq_num,
+            packet_type=PacketType.PMTU_PROBE_ACK,
+            window=self.window_size,
+            checksum=0,
+            timestamp=time.time(),
+            iv=b'',
+            data=struct.pack('!I', len(packet.data))
+        )
+        self._send_raw(probe_ack, addr)
+
+    def _handle_pmtu_probe_ack(self, packet: TRUPacket):
+        # (id da sonda ecoado, tamanho recebido): só vale para a sonda pendente
+        if len(packet.data) < 4:
+            return
+        self.pmtu_probe_acked = (packet.ack_num, struct.unpack('!I', packet.data[:4])[0])
+        self.pmtu_probe_event.set()
+
+    def _send_pmtu_probe(self, size: int, probe_id: int) -> bool:
+        probe = TRUPacket(
+            seq_num=probe_id,
+            ack_num=0,
+            packet_type=PacketType.PMTU_PROBE,
+            window=self.window_size,
+            checksum=0,
+            timestamp=time.time(),
+            iv=b'',
+            data=bytes(size)
+        )
+        for attempt in range(PMTU_PROBE_ATTEMPTS):
+            self.pmtu_probe_event.clear()
+            try:
+                self.sock.sendto(self._seal(probe), self.peer_addr)
+            except OSError as e:
+                # EMSGSIZE: maior que o MTU conhecido do enlace local
+                print(f"[PMTU] Sonda de {size} bytes rejeitada localmente: {e}")
+                return False
+            if self.pmtu_probe_event.wait(timeout=self._calculate_timeout()) \
+                    and self.pmtu_probe_acked == (probe_id, size):
+                return True
+            print(f"[PMTU] Sonda de {size} bytes sem resposta (tentativa {attempt + 1})")
+        return False
+
+    def start_pmtu_discovery(self):
+        if self.pmtu_thread and self.pmtu_thread.is_alive():
+            return
+        self.pmtu_thread = threading.Thread(target=self._pmtu_discovery_loop, daemon=True)
+        self.pmtu_thread.start()
+
+    def _pmtu_discovery_loop(self):
+        # Busca binária entre o último tamanho confirmado e o máximo negociado;
+        # o primeiro palpite é o próprio máximo (caso comum em loopback/jumbo)
+        low = self.mss
+        high = min(self.max_segment_size, self.peer_max_segment_size)
+        candidate = high
+
+        previous_df = None
+        if hasattr(socket, 'IP_MTU_DISCOVER') and hasattr(socket, 'IP_PMTUDISC_DO'):
+            # DF ligado só durante a busca: sondas grandes demais falham em vez
+            # de fragmentar; depois disso os DATA voltam a poder fragmentar se
+            # o caminho encolher
+            try:
+                previous_df = self.sock.getsockopt(socket.IPPROTO_IP, socket.IP_MTU_DISCOVER)
+                self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MTU_DISCOVER, socket.IP_PMTUDISC_DO)
+            except OSError:
+                previous_df = None
+
+        print(f"[PMTU] Iniciando descoberta: {low}..{high} bytes")
+        try:
+            while self.running and self.connected and high - low > PMTU_SEARCH_GRANULARITY:
+                # Id aleatório: uma confirmação só vale ecoando o da sonda pendente
+                if self._send_pmtu_probe(candidate, random.getrandbits(32)):
+                    low = candidate
+                    self.set_segment_size(candidate)
+                else:
+                    high = candidate - 1
+                candidate = (low + high + 1) // 2
+        finally:
+            if previous_df is not None:
+                try:
+                    self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MTU_DISCOVER, previous_df)
+                except OSError:
+                    pass
+        print(f"[PMTU] Descoberta concluída: segmento de {self.mss} bytes")
+
+    def _check_pmtu_blackhole(self, expired) -> bool:
+        # Buraco negro depois da descoberta: o caminho encolheu e só os
+        # segmentos grandes somem. Após PMTU_BLACKHOLE_RTOS rodadas assim, volta
+        # ao tamanho inicial, refatia o que está em voo e sonda de novo
+        entries = [self.send_buffer.get(seq) for seq in expired]
+        if not all(entry and len(entry[0].data) > self.base_mss for entry in entries):
+            self.pmtu_blackhole_rtos = 0
+            return False
+        self.pmtu_blackhole_rtos += 1
+        if self.pmtu_blackhole_rtos < PMTU_BLACKHOLE_RTOS:
+            return False
+        self.pmtu_blackhole_rtos = 0
+        print(f"[PMTU] {PMTU_BLACKHOLE_RTOS} RTOs seguidos só em segmentos grandes, "
+              f"voltando a {self.base_mss} bytes")
+        if self.mss > self.base_mss:
+            self.set_segment_size(self.base_mss)
+        split = self._resegment_in_flight()
+        if self.enable_pmtud:
+            self.start_pmtu_discovery()
+        return split
+
+    def _resegment_in_flight(self) -> bool:
+        # DATA em voo maior que o mss vira pedaços na mesma faixa de seq. Cada
+        # pedaço é cifrado com o nonce do seu seq: o conteúdo de um offset é
+        # sempre o mesmo, então nenhum nonce cifra dois textos diferentes
+        split = False
+        for seq, (packet, _, _) in list(self.send_buffer.items()):
+            if packet.packet_type != PacketType.DATA or len(packet.data) <= self.mss:
+                continue
+            if self.send_buffer.pop(seq, None) is None:
+                continue  # confirmado nesse meio tempo
+            self.sent_times.pop(seq, None)
+            if self.enable_congestion_control and self.congestion:
+                self.congestion.on_packet_abandoned(seq)
+            plain = bytes(packet.data)
+            if self.encryption_enabled and self.encryption_key is not None:
+                iv = self.crypto.packet_nonce(self.iv, seq) if self.aead_enabled else self.iv
+                plain = self.crypto.decrypt_data(plain, self.encryption_key, iv)
+            for offset in range(0, len(plain), self.mss):
+                piece = plain[offset:offset + self.mss]
+                piece_seq = seq + offset
+                encrypted = self._encrypt_segment(piece, piece_seq)
+                if isinstance(encrypted, Future):
+                    encrypted = encrypted.result()
+                data = piece if encrypted is None else encrypted
+                piece_packet = TRUPacket(
+                    seq_num=piece_seq,
+                    ack_num=packet.ack_num,
+                    packet_type=PacketType.DATA,
+                    window=packet.window,
+                    checksum=0,
+                    data=data,
+                    timestamp=time.time(),
+                    iv=packet.iv
+                )
+                # O timer reenvia o pacote já selado; envio 0: vence já e sai
+                # na próxima rodada
+                self._seal(piece_packet)
+                self.send_buffer[piece_seq] = (piece_packet, 0.0, 0)
+                if self.enable_congestion_control and self.congestion:
+                    self.congestion.on_packet_sent(piece_seq, len(data))
+            split = True
+        return split
+
+    def set_segment_size(self, size: int):
+        size = max(1, min(size, self.max_segment_size, self.peer_max_segment_size))
+        self.mss = size
+        self.pacer.set_mss(size)
+        if self.congestion is not None and hasattr(self.congestion, 'mss'):
+            self.congestion.mss = size
+        print(f"[SEGMENT] Tamanho de segmento ajustado para {size} bytes")
+
     def _handle_fin(self, packet: TRUPacket):
         print(f"[HANDLE_FIN] Recebido FIN, seq={packet.seq_num}")
         
         if not self.connected:
             return
+
+        # O seq do FIN marca o fim do fluxo: dados abaixo dele ainda podem chegar
+        self.fin_seq = packet.seq_num
         
         # Enviar FIN-ACK
         fin_ack_packet = TRUPacket(
@@ -564,6 +1437,7 @@ class TRUProtocol:
         self._send_raw(fin_ack_packet, self.peer_addr)
         
         self.connected = False
+        self.data_event.set()
         print(f"[HANDLE_FIN] Conexão fechada por peer {self.peer_addr}")
 
     def _handle_fin_ack(self):
@@ -574,24 +1448,67 @@ class TRUProtocol:
             print(f"[HANDLE_FIN_ACK] Conexão fechada com {self.peer_addr}")
 
     def _deliver_data(self):
-        sorted_seqs = sorted(self.receive_buffer.keys())
-        
+        # Segmentos são indexados pelo offset: basta seguir ack_num no dicionário
         delivered_count = 0
-        for seq in sorted_seqs:
-            if seq == self.ack_num:
-                data = self.receive_buffer.pop(seq)
+        while self.ack_num in self.receive_buffer:
+            seq = self.ack_num
+            length, data = self.receive_buffer.pop(seq)
+            if data is SKIPPED:
+                self._skip_range(seq, length)
+            elif isinstance(data, MessageFragment):
+                self._collect_message_fragment(data)
+            elif data is not None:
                 self.app_queue.append(data)
-                print(f"[DELIVER_DATA] Entregue pacote seq={seq}, tamanho={len(data)} bytes")
-                self.ack_num += len(data)
-                delivered_count += 1
-            elif seq > self.ack_num:
-                break
+            if self.debug:
+                print(f"[DELIVER_DATA] Entregue pacote seq={seq}, tamanho={length} bytes")
+            self.ack_num += length
+            self.delivered_bytes += length
+            delivered_count += 1
         
         if delivered_count > 0:
-            print(f"[DELIVER_DATA] Total entregue: {delivered_count} pacotes")
+            self.data_event.set()
+            if self.debug:
+                print(f"[DELIVER_DATA] Total entregue: {delivered_count} pacotes")
+
+    def _collect_message_fragment(self, fragment: MessageFragment):
+        if fragment.offset == 0:
+            self._message_parts = []
+        elif not self._message_parts:
+            return  # início da mensagem foi pulado
+        self._message_parts.append(fragment.data)
+        if fragment.offset + fragment.size >= fragment.total:
+            self.message_queue.append(self._message_parts)
+            self._message_parts = []
+            self.message_stats['delivered'] += 1
+
+    def _skip_range(self, seq: int, length: int):
+        # Faixa abandonada: fragmentos dela que chegaram tarde saem do buffer e
+        # a mensagem parcialmente montada é descartada
+        for stale in [s for s in self.receive_buffer if seq <= s < seq + length]:
+            del self.receive_buffer[stale]
+        self._message_parts = []
+        self.message_stats['skipped'] += 1
+
+    def _handle_forward(self, packet: TRUPacket, addr: Tuple[str, int]):
+        if len(packet.data) < FORWARD_FORMAT.size:
+            return
+        start = packet.seq_num
+        end = start + FORWARD_FORMAT.unpack_from(packet.data)[0]
+        print(f"[FORWARD] Remetente abandonou seq {start}..{end}")
+
+        # A faixa vira uma marca no buffer: a entrega segue por ela em ordem
+        first = max(start, self.ack_num)
+        if first < end and self.receive_buffer.get(first, (0, None))[1] is not SKIPPED:
+            for stale in [s for s in self.receive_buffer if first <= s < end]:
+                del self.receive_buffer[stale]
+            self.receive_buffer[first] = (end - first, SKIPPED)
+            self._deliver_data()
+
+        self._send_ack(end, addr, packet.data[:FORWARD_FORMAT.size])
 
     def _update_rtt(self, sample: float):
-        print(f"[UPDATE_RTT] Nova amostra: {sample:.6f}s")
+        if self.debug:
+            print(f"[UPDATE_RTT] Nova amostra: {sample:.6f}s")
         
         if self.rtt_avg == 0:
             self.rtt_avg = sample
@@ -604,8 +1521,20 @@ class TRUProtocol:
         self.rtt_samples.append(sample)
         if len(self.rtt_samples) > 10:
             self.rtt_samples.pop(0)
+        self.rtt_histogram.record(sample)
         
-        print(f"[UPDATE_RTT] Média: {self.rtt_avg:.6f}s, Desvio: {self.rtt_dev:.6f}s")
+        if self.debug:
+            print(f"[UPDATE_RTT] Média: {self.rtt_avg:.6f}s, Desvio: {self.rtt_dev:.6f}s")
+
+    @staticmethod
+    def _unwrap_seq(wire_seq: int, reference: int) -> int:
+        # Valor de 64 bits com esses 32 bits baixos mais próximo da referência
+        candidate = (reference & ~SEQ_MASK) | wire_seq
+        if candidate - reference > (SEQ_MASK >> 1):
+            candidate -= SEQ_MASK + 1
+        elif reference - candidate > (SEQ_MASK >> 1):
+            candidate += SEQ_MASK + 1
+        return candidate
 
     def _calculate_timeout(self) -> float:
         if self.rtt_avg > 0:
@@ -617,54 +1546,135 @@ class TRUProtocol:
         timeout = min(timeout, 10.0)  # Máximo 10s
         return timeout
 
+    def _encrypt_segment(self, segment: bytes, seq_num: int):
+        # None = sem criptografia; Future com workers; bytes quando inline
+        if not self.encryption_enabled or self.encryption_key is None:
+            return None
+        # AEAD: nonce único por seq; modo legado reusa o IV da sessão
+        iv = self.crypto.packet_nonce(self.iv, seq_num) if self.aead_enabled else self.iv
+        if self.crypto_pipeline:
+            # bytes(): fatias de memoryview não atravessam o pool de processos
+            return self.crypto_pipeline.encrypt(bytes(segment), self.encryption_key, iv)
+        try:
+            return self.crypto.encrypt_data(segment, self.encryption_key, iv)[0]
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+
+    def _path_key(self) -> Tuple[str, int]:
+        # O servidor vê uma porta efêmera nova a cada conexão: chave só pelo host
+        return (self.peer_addr[0], 0) if self.is_server else self.peer_addr
+
+    def _seed_from_path_cache(self):
+        entry = get_path_cache().lookup(self._path_key())
+        if entry is None:
+            return
+
+        print(f"[PATH_CACHE] Estado anterior para {self.peer_addr}: srtt={entry.srtt:.6f}s, "
+              f"cwnd={entry.cwnd:.2f}, ssthresh={entry.ssthresh:.2f}")
+        # rtt_avg != 0: a primeira amostra real é suavizada com o SRTT guardado
+        # em vez de substituí-lo
+        self.rtt_avg = entry.srtt
+        self.rtt_dev = entry.rttvar
+        self.timeout_interval = self._calculate_timeout()
+
+        if self.enable_congestion_control and self.congestion:
+            self.congestion.rtt_avg = entry.srtt
+            self.congestion.rtt_var = entry.rttvar
+            # Idem no controlador, que trata a lista vazia como primeira amostra
+            self.congestion.rtt_samples = [entry.srtt]
+            self.congestion.ssthresh = entry.ssthresh
+            # Metade da última janela, no máximo ssthresh: o caminho pode ter
+            # mudado e uma janela antiga inteira sairia de uma vez
+            self.congestion.cwnd = max(min(entry.cwnd / 2, entry.ssthresh), self.congestion.cwnd)
+            if self.congestion.state == "SLOW_START" and self.congestion.cwnd >= self.congestion.ssthresh:
+                self.congestion.state = "CONGESTION_AVOIDANCE"
+            self.window_size = self.congestion.get_window_size()
+
+    def _update_path_cache(self):
+        if not self.rtt_samples or not self.peer_addr:
+            return
+        if self.enable_congestion_control and self.congestion:
+            ssthresh, cwnd = self.congestion.ssthresh, self.congestion.cwnd
+        else:
+            ssthresh, cwnd = 0.0, float(self.window_size)
+        get_path_cache().store(self._path_key(), self.rtt_avg, self.rtt_dev, ssthresh, cwnd)
+
+    def _seal(self, packet: TRUPacket) -> bytes:
+        # Pacote serializado com a tag AEAD da sessão ou, sem AEAD, o checksum
+        if self.aead_enabled:
+            # Tag sobre cabeçalho + payload já cifrado, sem campo IV
+            packet.aead = True
+            packet.iv = b''
+            packet.checksum = 0
+            packet.tag = self.crypto.compute_tag(self.mac_key, packet.authenticated_bytes())
+        else:
+            packet.checksum = packet.calculate_checksum()
+        return packet.serialize()
+
     def _send_raw(self, packet_or_bytes, addr: Tuple[str, int]):
         try:
             if isinstance(packet_or_bytes, TRUPacket):
-                packet = packet_or_bytes
-                packet.checksum = packet.calculate_checksum()
-                data = packet.serialize()
+                data = self._seal(packet_or_bytes)
             else:
                 data = packet_or_bytes
             
             self.sock.sendto(data, addr)
-            print(f"[SEND_RAW] Enviados {len(data)} bytes para {addr}")
+            if self.debug:
+                print(f"[SEND_RAW] Enviados {len(data)} bytes para {addr}")
         except Exception as e:
             print(f"[SEND_RAW] Erro: {e}")
 
-    def connect(self, host: str, port: int) -> bool:
+    def connect(self, host: str, port: int, early_data: bytes = None) -> bool:
+        # early_data: enviado cifrado já no SYN (0-RTT) quando houver ticket de
+        # retomada; o que não couber ou for recusado segue após o handshake
         self.peer_addr = (host, port)
         print(f"[CONNECT] Conectando a {host}:{port}")
+
+        if self.use_path_cache:
+            self._seed_from_path_cache()
         
         if not self.running:
             self.start()
-        
-        for attempt in range(3):
-            print(f"[CONNECT] Tentativa {attempt + 1}/3")
-            
-            # Enviar SYN
-            syn_packet = TRUPacket(
-                seq_num=self.base_seq,
-                ack_num=0,
-                packet_type=PacketType.SYN,
-                window=self.window_size,
-                checksum=0,
-                timestamp=time.time(),
-                iv=b'',
-                data=b''
-            )
-            syn_packet.checksum = syn_packet.calculate_checksum()
+
+        # Mesmo SYN (mesmas chaves e ticket) em todas as tentativas
+        syn_packet = TRUPacket(
+            seq_num=self.base_seq,
+            ack_num=0,
+            packet_type=PacketType.SYN,
+            window=self.window_size,
+            checksum=0,
+            timestamp=time.time(),
+            iv=b'',
+            data=self._build_syn_data(early_data)
+        )
+        syn_packet.checksum = syn_packet.calculate_checksum()
+
+        # RTO inicial: srtt do cache de caminho ou 1s, dobrando a cada timeout
+        rto = self._calculate_timeout()
+        for attempt in range(HANDSHAKE_ATTEMPTS):
+            print(f"[CONNECT] Tentativa {attempt + 1}/{HANDSHAKE_ATTEMPTS} (RTO={rto:.3f}s)")
             
             print(f"[CONNECT] Enviando SYN, seq={syn_packet.seq_num}")
+            self._syn_sent_time = time.time() if attempt == 0 else None
             self._send_raw(syn_packet, self.peer_addr)
             
             # Esperar pelo handshake
-            if self.handshake_event.wait(timeout=2.0):
+            if self.handshake_event.wait(timeout=rto):
                 print(f"[CONNECT] Handshake completado")
+                if self.enable_pmtud:
+                    self.start_pmtu_discovery()
+                if early_data:
+                    remaining = early_data[self._early_data_len:] if self.early_data_accepted else early_data
+                    if remaining and not self.send_data(remaining):
+                        return False
                 return True
             
             print(f"[CONNECT] Timeout na tentativa {attempt + 1}")
+            rto = min(rto * 2, 10.0)
         
-        print("[CONNECT] Falha no handshake após 3 tentativas")
+        print(f"[CONNECT] Falha no handshake após {HANDSHAKE_ATTEMPTS} tentativas")
         return False
 
     def accept(self) -> bool:
@@ -692,122 +1702,781 @@ class TRUProtocol:
             print(f"[SEND_DATA] connected={self.connected}, peer_addr={self.peer_addr}")
             return False
         
-        segment_size = MSS
-        segments = []
-        
-        # Dividir dados em segmentos
-        for i in range(0, len(data), segment_size):
-            segment = data[i:i+segment_size]
-            segments.append(segment)
-        
-        total_segments = len(segments)
-        print(f"[SEND_DATA] Enviando {total_segments} segmentos, total {len(data)} bytes")
+        total_segments = (len(data) + self.mss - 1) // self.mss
+        print(f"[SEND_DATA] Enviando ~{total_segments} segmentos de até {self.mss} bytes, total {len(data)} bytes")
         print(f"[SEND_DATA] Janela atual: {self.window_size}")
         if self.enable_congestion_control and self.congestion:
             print(f"[SEND_DATA] cwnd: {self.congestion.cwnd}, ssthresh: {self.congestion.ssthresh}")
         
-        # Iniciar coleta de métricas
-        self.start_metrics_collection()
-        
-        # Enviar cada segmento
-        for i, segment in enumerate(segments):
-            # Esperar se a janela estiver cheia
-            while len(self.send_buffer) >= self.window_size:
-                print(f"[SEND_DATA] Janela cheia ({len(self.send_buffer)}/{self.window_size}), esperando...")
-                time.sleep(0.01)
-            
-            # Se criptografia estiver habilitada, criptografar o segmento individualmente
-            data_to_send = segment
-            packet_iv = b''
-            
-            if self.encryption_enabled and self.encryption_key is not None:
+        def segment_progress(sent_segments, sent_bytes):
+            if progress_cb:
+                remaining = (len(data) - sent_bytes + self.mss - 1) // self.mss
+                progress_cb(sent_segments, sent_segments + remaining)
+
+        return self._send_segments(self._slice_segments(data), segment_progress)
+
+    def send_stream(self, source, progress_cb=None, total_bytes: int = None) -> bool:
+        # source: buffer (bytes, memoryview, mmap), objeto de arquivo binário ou
+        # iterável de blocos de qualquer tamanho. Só a janela em voo e um bloco
+        # de leitura ficam em memória; progress_cb(bytes_enviados, total_bytes)
+        print(f"[SEND_STREAM] Iniciando envio em fluxo, criptografia: {self.encryption_enabled}")
+
+        if not self.connected or not self.peer_addr:
+            print(f"[SEND_STREAM] ERRO: Não conectado ou peer_addr não definido")
+            return False
+
+        if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+            total_bytes = len(source)
+            segments = self._slice_segments(memoryview(source))
+        elif hasattr(source, 'read'):
+            segments = self._regroup_segments(iter(lambda: source.read(STREAM_CHUNK_SIZE), b''))
+        else:
+            segments = self._regroup_segments(source)
+
+        def byte_progress(sent_segments, sent_bytes):
+            if progress_cb:
+                progress_cb(sent_bytes, total_bytes)
+
+        try:
+            return self._send_segments(segments, byte_progress)
+        finally:
+            segments.close()
+
+    def send_file(self, path: str, progress_cb=None) -> bool:
+        # Arquivo mapeado em memória: segmentos são fatias sem cópia do
+        # mapeamento e as retransmissões leem da mesma região
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Arquivo vazio, pipe ou sistema de arquivos sem mmap: leitura em blocos
+                return self.send_stream(f, progress_cb, size)
+
+            print(f"[SEND_FILE] {path}: {size} bytes mapeados")
+            segments = self._mapped_segments(mapped)
+
+            def byte_progress(sent_segments, sent_bytes):
+                if progress_cb:
+                    progress_cb(sent_bytes, size)
+
+            try:
+                return self._send_segments(segments, byte_progress)
+            finally:
+                segments.close()
+                self._release_mapping(mapped)
+
+    def _release_mapping(self, mapped):
+        # Pacotes ainda não confirmados não podem apontar para o mapeamento
+        for packet, _, _ in list(self.send_buffer.values()):
+            if isinstance(packet.data, memoryview):
+                packet.data = bytes(packet.data)
+        try:
+            mapped.close()
+        except BufferError:
+            pass  # fatias ainda referenciadas: o mapeamento fecha quando forem coletadas
+
+    def send_file_resumable(self, path: str, progress_cb=None, chunk_size: int = RESUME_CHUNK_SIZE,
+                            timeout: float = RECV_IDLE_TIMEOUT) -> bool:
+        # Anuncia o manifesto (digest de cada pedaço) e envia só os pedaços que o
+        # destinatário não tem; repete enquanto ele reportar pedaços faltando e
+        # houver progresso. progress_cb(bytes_enviados, bytes_da_rodada)
+        if not self.connected or not self.peer_addr:
+            print(f"[RESUME] ERRO: Não conectado ou peer_addr não definido")
+            return False
+        if not self.peer_messages:
+            print("[RESUME] Peer não anunciou suporte a mensagens, impossível retomar")
+            return False
+
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            view = memoryview(mapped)
+            try:
+                manifest = Manifest.from_buffer(view, chunk_size)
+                self.resume_stats = {'chunks': len(manifest), 'reused_chunks': 0, 'sent_bytes': 0}
+                print(f"[RESUME] {path}: {size} bytes em {len(manifest)} pedaços")
+                if not self.send_message(manifest.pack()):
+                    return False
+
+                missing = None
+                while True:
+                    reply = self.recv_message(timeout)
+                    if reply is None:
+                        print("[RESUME] Sem resposta do destinatário")
+                        return False
+                    have = manifest.unpack_have(reply)
+                    if missing is None:
+                        self.resume_stats['reused_chunks'] = len(have)
+                    elif len(manifest) - len(have) >= len(missing):
+                        print(f"[RESUME] {len(missing)} pedaços sem progresso, desistindo")
+                        return False
+                    missing = [i for i in range(len(manifest)) if i not in have]
+                    if not missing:
+                        print("[RESUME] Destinatário confirmou todos os pedaços")
+                        return True
+
+                    total = sum(end - start for start, end in map(manifest.chunk_range, missing))
+                    print(f"[RESUME] Enviando {len(missing)}/{len(manifest)} pedaços ({total} bytes)")
+                    self.resume_stats['sent_bytes'] += total
+                    pieces = (view[slice(*manifest.chunk_range(i))] for i in missing)
+                    if not self.send_stream(pieces, progress_cb, total):
+                        return False
+            finally:
+                view.release()
+                if size:
+                    self._release_mapping(mapped)
+
+    def send_file_delta(self, path: str, progress_cb=None, timeout: float = RECV_IDLE_TIMEOUT) -> bool:
+        # Sincronização por delta: o destinatário já tem uma versão do arquivo e
+        # envia as assinaturas dos blocos dela; só os trechos sem bloco igual
+        # trafegam. progress_cb(bytes_do_arquivo_cobertos, tamanho)
+        if not self.connected or not self.peer_addr:
+            print(f"[DELTA] ERRO: Não conectado ou peer_addr não definido")
+            return False
+        if not self.peer_messages:
+            print("[DELTA] Peer não anunciou suporte a mensagens, impossível sincronizar por delta")
+            return False
+
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            view = memoryview(mapped)
+            try:
+                if not self.send_message(DELTA_REQUEST.pack(size, file_digest(view))):
+                    return False
+                reply = self.recv_message(timeout)
+                if reply is None:
+                    print("[DELTA] Assinaturas não recebidas")
+                    return False
                 try:
-                    print(f"[SEND_DATA] Criptografando segmento {i+1}/{total_segments} ({len(segment)} bytes)")
-                    start_time = time.time()
-                    
-                    # Usar o mesmo IV para todos os pacotes (simplificação)
-                    # Em produção, deveria ser um IV único por pacote
-                    encrypted_data, iv = self.crypto.encrypt_data(segment, self.encryption_key, self.iv)
-                    data_to_send = encrypted_data
-                    packet_iv = self.iv
-                    
-                    end_time = time.time()
-                    print(f"[SEND_DATA] Segmento {i+1} criptografado em {end_time-start_time:.3f}s")
-                except Exception as e:
-                    print(f"[SEND_DATA] Erro ao criptografar segmento {i+1}: {e}")
+                    signatures = Signatures.unpack(reply)
+                except (ValueError, struct.error) as e:
+                    print(f"[DELTA] {e}")
                     return False
-            
-            # Verificar se é retransmissão
-            is_retransmission = self.next_seq in self.send_buffer
-            
-            # Criar pacote
-            packet = TRUPacket(
-                seq_num=self.next_seq,
-                ack_num=0,
-                packet_type=PacketType.DATA,
-                window=self.window_size,
-                checksum=0,
-                data=data_to_send,
-                timestamp=time.time(),
-                iv=packet_iv
-            )
-            packet.checksum = packet.calculate_checksum()
-            
-            # Registrar tempo de envio
-            sent_time = time.time()
-            self.sent_times[packet.seq_num] = sent_time
-            self.send_buffer[packet.seq_num] = (packet, sent_time, 0)
-            
-            # Coletar métricas do pacote
-            cwnd = self.congestion.cwnd if self.enable_congestion_control and self.congestion else self.window_size
-            ssthresh = self.congestion.ssthresh if self.enable_congestion_control and self.congestion else 0
-            state = self.congestion.state if self.enable_congestion_control and self.congestion else "NO_CONGESTION_CTRL"
-            
-            self.metrics_collector.record_packet_sent(
-                seq_num=packet.seq_num,
-                size=len(data_to_send),
-                is_retransmission=is_retransmission,
-                congestion_window=cwnd,
-                ssthresh=ssthresh,
-                congestion_state=state
-            )
-            
-            print(f"[SEND_DATA] Enviando pacote seq={self.next_seq}, tamanho={len(data_to_send)} bytes")
-            self._send_raw(packet, self.peer_addr)
-            self.next_seq += len(data_to_send)
-            
-            if self.enable_congestion_control and self.congestion:
-                self.congestion.on_packet_sent()
-            
-            if progress_cb:
-                progress_cb(i + 1, total_segments)
-        
-        print(f"[SEND_DATA] Todos os pacotes enviados, aguardando ACKs...")
-        
-        # Esperar confirmação
-        start_time = time.time()
-        timeout = self._calculate_timeout() * 3
+                print(f"[DELTA] {path}: {size} bytes, destinatário tem {len(signatures.blocks)} "
+                      f"blocos de {signatures.block_size} bytes")
+
+                stats = self.delta_stats = {}
+
+                def covered(sent_bytes, total):
+                    if progress_cb:
+                        progress_cb(stats['copied_bytes'] + stats['literal_bytes'], size)
+
+                instructions = delta_instructions(view, signatures, stats)
+                try:
+                    if not self.send_stream(instructions, covered):
+                        return False
+                finally:
+                    instructions.close()
+                print(f"[DELTA] {stats['literal_bytes']} bytes literais, {stats['copied_bytes']} bytes "
+                      f"copiados em {stats['copy_runs']} instruções")
+
+                result = self.recv_message(timeout)
+                if result != DELTA_OK:
+                    print("[DELTA] Destinatário não confirmou a reconstrução do arquivo")
+                    return False
+                return True
+            finally:
+                view.release()
+                if size:
+                    self._release_mapping(mapped)
+
+    def send_files(self, paths, progress_cb=None, timeout: float = RECV_IDLE_TIMEOUT) -> bool:
+        # Lote de arquivos (diretórios entram recursivamente) em um único fluxo
+        # da conexão já estabelecida; termina quando o destinatário confirma
+        # que gravou todos. progress_cb(bytes_enviados, total_do_fluxo)
+        if not self.connected or not self.peer_addr:
+            print(f"[BATCH] ERRO: Não conectado ou peer_addr não definido")
+            return False
+        if not self.peer_messages:
+            print("[BATCH] Peer não anunciou suporte a mensagens, impossível confirmar o lote")
+            return False
+
+        files = collect_files(paths)
+        total = BATCH_HEADER.size * (len(files) + 1) + sum(
+            len(name.encode('utf-8')) + os.path.getsize(path) for path, name in files)
+        stats = self.batch_stats = {'files': 0, 'bytes': 0}
+        print(f"[BATCH] Enviando {len(files)} arquivos ({total} bytes no fluxo)")
+        records = batch_records(files, stats)
+        try:
+            if not self.send_stream(records, progress_cb, total):
+                return False
+        except OSError as e:
+            print(f"[BATCH] Erro ao ler arquivo: {e}")
+            return False
+        finally:
+            records.close()
+
+        if self.recv_message(timeout) != BATCH_OK:
+            print("[BATCH] Destinatário não confirmou a gravação do lote")
+            return False
+        print(f"[BATCH] {stats['files']} arquivos ({stats['bytes']} bytes) confirmados")
+        return True
+
+    def send(self, data, block: bool = True, timeout: float = None) -> int:
+        # Como socket.send: enfileira o que couber e devolve quantos bytes
+        # aceitou; com a fila cheia bloqueia, ou levanta BlockingIOError se block=False
+        view = memoryview(data).cast('B')
+        if not self.connected:
+            raise BrokenPipeError("conexão TRUDP fechada")
+        if not view:
+            return 0
+
+        deadline = None if timeout is None else time.time() + timeout
+        with self._send_cond:
+            while len(self._send_queue) >= self.send_queue_size:
+                if not self.connected:
+                    raise BrokenPipeError("conexão TRUDP fechada")
+                if not block:
+                    raise BlockingIOError("fila de envio cheia")
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("fila de envio cheia")
+                self._send_cond.wait(timeout=0.1 if remaining is None else min(0.1, remaining))
+            accepted = min(len(view), self.send_queue_size - len(self._send_queue))
+            self._send_queue += view[:accepted]
+            self._send_cond.notify_all()
+
+        self._start_writer()
+        return accepted
+
+    def sendall(self, data, timeout: float = None):
+        view = memoryview(data).cast('B')
+        deadline = None if timeout is None else time.time() + timeout
+        sent = 0
+        while sent < len(view):
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            sent += self.send(view[sent:], timeout=remaining)
+
+    def cork(self):
+        # Segura segmentos parciais até uncork()/flush(); segmentos cheios seguem saindo
+        with self._send_cond:
+            self._corked = True
+
+    def uncork(self):
+        with self._send_cond:
+            self._corked = False
+            self._push_pending = bool(self._send_queue)
+            self._send_cond.notify_all()
+
+    def set_nodelay(self, nodelay: bool = True):
+        with self._send_cond:
+            self.nodelay = nodelay
+            self._send_cond.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        # Envia o que estiver na fila (inclusive o segmento parcial) e espera os ACKs
+        with self._send_cond:
+            self._push_pending = bool(self._send_queue)
+            self._send_cond.notify_all()
+
+        deadline = None if timeout is None else time.time() + timeout
+        while self._send_queue or self.send_buffer:
+            if not self.connected or (deadline is not None and time.time() >= deadline):
+                return False
+            self.window_event.clear()
+            if self._send_queue or self.send_buffer:
+                self.window_event.wait(timeout=0.01)
+        return True
+
+    def _start_writer(self):
+        if self.writer_thread is None:
+            self.start_metrics_collection()
+            self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self.writer_thread.start()
+
+    def _writer_ready(self) -> bool:
+        queued = len(self._send_queue)
+        if queued >= self.mss or (queued and self._push_pending):
+            return True
+        if not queued or self._corked:
+            return False
+        # Nagle: segmento parcial só sai sem dados aguardando ACK
+        return self.nodelay or not self.send_buffer
+
+    def _writer_loop(self):
+        while self.running and self.connected:
+            with self._send_cond:
+                if not self._writer_ready():
+                    self._send_cond.wait(timeout=0.1)
+                    continue
+            with self._send_lock:
+                segment = self._pop_send_segment()
+                if segment:
+                    self._wait_send_window()
+                    self._transmit_segment(segment, self._encrypt_segment(segment, self.next_seq))
+
+    def _pop_send_segment(self) -> bytes:
+        with self._send_cond:
+            segment = bytes(self._send_queue[:self.mss])
+            del self._send_queue[:len(segment)]
+            if not self._send_queue:
+                self._push_pending = False
+            self._send_cond.notify_all()  # libera send() bloqueado na fila cheia
+        return segment
+
+    def _drain_send_queue(self):
+        while self._send_queue:
+            segment = self._pop_send_segment()
+            self._wait_send_window()
+            self._transmit_segment(segment, self._encrypt_segment(segment, self.next_seq))
+
+    def open_stream(self) -> Optional[TRUStream]:
+        if not self.connected:
+            print("[STREAM] Não conectado, impossível abrir stream")
+            return None
+        if not self.peer_streams:
+            print("[STREAM] Peer não anunciou suporte a streams no handshake")
+            return None
+        with self._stream_cond:
+            stream = TRUStream(self, self._next_stream_id)
+            self._next_stream_id += 2
+            self.streams[stream.stream_id] = stream
+        print(f"[STREAM] Stream {stream.stream_id} aberto")
+        return stream
+
+    def accept_stream(self, timeout: float = None) -> Optional[TRUStream]:
+        # Próximo stream aberto pelo peer, ou None no timeout/fim da conexão
+        deadline = None if timeout is None else time.time() + timeout
+        with self._stream_cond:
+            while not self._stream_accept:
+                remaining = None if deadline is None else deadline - time.time()
+                if not self.connected or (remaining is not None and remaining <= 0):
+                    return None
+                self._stream_cond.wait(timeout=0.1 if remaining is None else min(0.1, remaining))
+            return self._stream_accept.popleft()
+
+    def _deliver_stream_segment(self, stream_id: int, offset: int, length: int, data, fin: bool):
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            # Só o peer cria streams novos (paridade oposta à nossa); ids já
+            # vistos e ausentes do dicionário são streams encerrados
+            if stream_id % 2 == self._next_stream_id % 2 or stream_id <= self._max_peer_stream_id:
+                print(f"[STREAM] Segmento para stream desconhecido {stream_id}, ignorando")
+                return
+            if stream_id > self._max_peer_stream_id + 2 * self.max_peer_streams:
+                print(f"[STREAM] Stream {stream_id} além do limite de {self.max_peer_streams} streams "
+                      f"(maior id {self._max_peer_stream_id}), descartando")
+                return
+            with self._stream_cond:
+                # Como no QUIC, abrir um id abre também os anteriores do peer:
+                # segmentos de streams diferentes podem chegar fora de ordem
+                first = self._max_peer_stream_id + 2 if self._max_peer_stream_id else 2 - stream_id % 2
+                for new_id in range(first, stream_id + 1, 2):
+                    self.streams[new_id] = TRUStream(self, new_id)
+                    self._stream_accept.append(self.streams[new_id])
+                opened = f"{stream_id}" if first == stream_id else f"{first}..{stream_id}"
+                print(f"[STREAM] Stream {opened} aberto pelo peer")
+                self._max_peer_stream_id = stream_id
+                stream = self.streams[stream_id]
+                self._stream_cond.notify_all()
+        stream._on_segment(offset, length, data, fin)
+
+    def _release_stream(self, stream: TRUStream):
+        # Stream sai do dicionário quando os dois sentidos terminaram
+        if stream.send_closed and stream.recv_finished:
+            self.streams.pop(stream.stream_id, None)
+
+    def _send_on_stream(self, stream: TRUStream, data, fin: bool = False, wait: bool = True) -> bool:
+        # Segmentos de streams diferentes se intercalam: o lock é tomado por segmento
+        if not self.connected:
+            print(f"[STREAM] Conexão fechada, stream {stream.stream_id} não enviado")
+            return False
+        view = memoryview(data).cast('B')
+        self.start_metrics_collection()
+        sent_seqs = []
+        offset = 0
+        while True:
+            payload_size = max(1, self.mss - STREAM_HEADER_SIZE)
+            chunk = bytes(view[offset:offset + payload_size])
+            offset += len(chunk)
+            last = offset >= len(view)
+            if not chunk and not (fin and last):
+                break
+            with self._send_lock:
+                self._wait_send_window()
+                header = STREAM_HEADER.pack(stream.stream_id, stream.send_offset,
+                                            STREAM_FLAG_FIN if fin and last else 0)
+                seq = self.next_seq
+                if not self._transmit_segment(chunk, self._encrypt_segment(chunk, seq),
+                                              prefix=header, packet_type=PacketType.STREAM_DATA):
+                    return False
+                stream.send_offset += len(chunk)
+            sent_seqs.append(seq)
+            if last:
+                break
+
+        # Espera só pelos ACKs deste stream
+        while wait and self.connected and sent_seqs:
+            self.window_event.clear()
+            sent_seqs = [seq for seq in sent_seqs if seq in self.send_buffer]
+            if sent_seqs:
+                self.window_event.wait(timeout=0.01)
+        return self.connected
+
+    def send_message(self, data, deadline: float = None, max_retransmissions: int = None) -> bool:
+        # Mensagem parcialmente confiável, entregue inteira ou pulada pelo
+        # destinatário: deadline em segundos a partir de agora e/ou limite de
+        # retransmissões. Não espera ACK; False se venceu antes de sair
+        if not self.connected:
+            print("[MESSAGE] Não conectado, mensagem não enviada")
+            return False
+        if not self.peer_messages:
+            print("[MESSAGE] Peer não anunciou suporte a mensagens no handshake")
+            return False
+
+        view = memoryview(data).cast('B')
+        expires = None if deadline is None else time.time() + deadline
+        self.start_metrics_collection()
+        with self._send_lock:
+            # Fragmentos contíguos no seq: o lock fica com a mensagem inteira
+            if not self._wait_send_window(expires):
+                self.message_stats['expired'] += 1
+                print(f"[MESSAGE] Prazo venceu antes do envio ({len(view)} bytes)")
+                return False
+            message = OutgoingMessage(self.next_seq, self.next_seq, expires, max_retransmissions)
+            self.outgoing_messages[message.first_seq] = message
+            offset = 0
+            while True:
+                payload_size = max(1, self.mss - MESSAGE_HEADER_SIZE)
+                chunk = bytes(view[offset:offset + payload_size])
+                seq = self.next_seq
+                if offset and not self._wait_send_window(expires):
+                    break  # o timer abandona o que já saiu
+                header = MESSAGE_HEADER.pack(offset, len(view))
+                if not self._transmit_segment(chunk, self._encrypt_segment(chunk, seq),
+                                              prefix=header, packet_type=PacketType.MESSAGE):
+                    break
+                message.pending.add(seq)
+                self._message_by_seq[seq] = message.first_seq
+                offset += len(chunk)
+                if offset >= len(view):
+                    break
+            message.end_seq = self.next_seq
+            if offset < len(view):
+                # Mensagem incompleta nunca é entregue: abandonar já
+                self._abandon_message(message)
+                return False
+            if not message.pending:
+                self.outgoing_messages.pop(message.first_seq, None)
+        self.message_stats['sent'] += 1
+        return True
+
+    def recv_message(self, timeout: float = None) -> Optional[bytes]:
+        # Próxima mensagem completa, em ordem; None no timeout ou fim da conexão
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.message_queue:
+            if not self.connected and not self.receive_buffer:
+                return None
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                return None
+            self.data_event.clear()
+            if not self.message_queue:
+                self.data_event.wait(timeout=0.1 if remaining is None else min(0.1, remaining))
+        parts = self.message_queue.popleft()
+        self._send_window_update()
+        return b''.join(part.result() if isinstance(part, Future) else part for part in parts)
+
+    def _message_fragment_acked(self, seq: int):
+        first = self._message_by_seq.pop(seq, None)
+        message = self.outgoing_messages.get(first)
+        if message is not None:
+            message.pending.discard(seq)
+            if not message.pending and message.end_seq > message.first_seq:
+                del self.outgoing_messages[first]
+
+    def _expire_messages(self, now: float, timeout: float):
+        for message in list(self.outgoing_messages.values()):
+            if message.end_seq == message.first_seq:
+                continue  # ainda sendo enviada por send_message
+            if message.expired(now):
+                self._abandon_message(message)
+                continue
+            if message.max_retransmissions is None:
+                continue
+            for seq in list(message.pending):
+                entry = self.send_buffer.get(seq)
+                if entry and entry[2] >= message.max_retransmissions and now - entry[1] > timeout:
+                    self._abandon_message(message)
+                    break
+
+    def _abandon_message(self, message: OutgoingMessage):
+        # Tira os fragmentos do voo e, no lugar deles, envia um FORWARD que o
+        # destinatário confirma; ele então pula a faixa inteira da mensagem
+        if self.outgoing_messages.pop(message.first_seq, None) is None:
+            return  # já confirmada ou abandonada
+        for seq in message.pending:
+            self._message_by_seq.pop(seq, None)
+            self.sent_times.pop(seq, None)
+            if self.send_buffer.pop(seq, None) and self.enable_congestion_control and self.congestion:
+                self.congestion.on_packet_abandoned(seq)
+        message.pending.clear()
+        self.message_stats['abandoned'] += 1
+        if message.end_seq == message.first_seq:
+            return  # nada saiu
+
+        ack_num, window = self._piggyback_fields()
+        forward = TRUPacket(
+            seq_num=message.first_seq,
+            ack_num=ack_num,
+            packet_type=PacketType.FORWARD,
+            window=window,
+            checksum=0,
+            timestamp=time.time(),
+            iv=b'',
+            data=FORWARD_FORMAT.pack(message.end_seq - message.first_seq)
+        )
+        print(f"[MESSAGE] Mensagem seq {message.first_seq}..{message.end_seq} abandonada")
+        self.send_buffer[message.first_seq] = (forward, time.time(), 0)
+        self._send_raw(forward, self.peer_addr)
+        self.window_event.set()
+
+    def _slice_segments(self, buf):
+        # Fatiado sob demanda: o mss pode crescer durante o envio (PMTUD)
+        offset = 0
+        while offset < len(buf):
+            segment = buf[offset:offset + self.mss]
+            offset += len(segment)
+            yield segment
+
+    def _regroup_segments(self, chunks):
+        # Reagrupa blocos de tamanho arbitrário em segmentos de até mss bytes
+        pending = b''
+        for chunk in chunks:
+            view = memoryview(chunk)
+            if pending:
+                needed = self.mss - len(pending)
+                pending += bytes(view[:needed])
+                view = view[needed:]
+                if len(pending) < self.mss:
+                    continue
+                yield pending
+            while len(view) >= self.mss:
+                yield view[:self.mss]
+                view = view[self.mss:]
+            pending = bytes(view)
+        if pending:
+            yield pending
+
+    def _mapped_segments(self, mapped):
+        # Páginas já confirmadas voltam ao kernel: o RSS fica na ordem da janela
+        # em voo, não do tamanho do arquivo
+        view = memoryview(mapped)
+        start_seq = self.next_seq
+        released = 0
+        next_release = STREAM_RELEASE_INTERVAL
+        offset = 0
+        try:
+            for segment in self._slice_segments(view):
+                offset += len(segment)
+                yield segment
+                if offset >= next_release and hasattr(mapped, 'madvise'):
+                    next_release = offset + STREAM_RELEASE_INTERVAL
+                    acked = min(list(self.send_buffer), default=self.next_seq) - start_seq
+                    release_end = acked - acked % mmap.PAGESIZE
+                    if release_end > released:
+                        mapped.madvise(mmap.MADV_DONTNEED, released, release_end - released)
+                        released = release_end
+        finally:
+            view.release()
+
+    def _compressed_segments(self, segments):
+        # Agrupa COMPRESSION_BLOCK bytes da entrada; o bloco sai comprimido em
+        # segmentos COMPRESSED_DATA ou, se não compensar, nos segmentos originais
+        block, size = [], 0
+        for segment in segments:
+            block.append(segment)
+            size += len(segment)
+            if size >= COMPRESSION_BLOCK:
+                yield from self._compress_block(block, size)
+                block, size = [], 0
+        if block:
+            yield from self._compress_block(block, size)
+
+    def _compress_block(self, block, size: int):
+        # Taxa de envio estimada (janela/SRTT) para pesar o custo de CPU
+        link_rate = self._send_window() * self.mss / self.rtt_avg if self.rtt_avg else 0.0
+        compressed = self.compressor.compress(b''.join(block), link_rate)
+        if compressed is None:
+            for segment in block:
+                yield segment, PacketType.DATA, len(segment)
+            return
+        pieces = list(self._slice_segments(compressed))
+        for n, piece in enumerate(pieces):
+            yield piece, PacketType.COMPRESSED_DATA, size if n == len(pieces) - 1 else 0
+
+    def _wait_send_window(self, deadline: float = None) -> bool:
+        # False se deadline (tempo absoluto) passar antes de a janela abrir
+        zero_window_since = None
+        while len(self.send_buffer) >= self._send_window():
+            if deadline is not None and time.time() >= deadline:
+                return False
+            if not self.send_buffer:
+                # Janela anunciada zero: aguarda a atualização do destinatário e,
+                # se ela se perder, sonda com um segmento a cada RTO
+                zero_window_since = zero_window_since or time.time()
+                if time.time() - zero_window_since >= self.timeout_interval:
+                    break
+            if self.debug:
+                print(f"[SEND_DATA] Janela cheia ({len(self.send_buffer)}/{self._send_window()}), esperando...")
+            self.window_event.clear()
+            if len(self.send_buffer) < self._send_window():
+                break
+            self.window_event.wait(timeout=0.01)
+        return True
+
+    def _transmit_segment(self, segment, encrypted, prefix: bytes = b'',
+                          packet_type: int = PacketType.DATA) -> bool:
+        # Envia um segmento no próximo seq; encrypted é a cifra (ou Future) ou
+        # None e prefix vai em claro antes dela (cabeçalho de stream)
+        data_to_send = segment
+        packet_iv = b''
+        
+        if encrypted is not None:
+            try:
+                # Com AEAD o nonce vem do seq e o IV não vai no pacote
+                data_to_send = encrypted.result() if isinstance(encrypted, Future) else encrypted
+                packet_iv = b'' if self.aead_enabled else self.iv
+            except Exception as e:
+                print(f"[SEND_DATA] Erro ao criptografar segmento seq={self.next_seq}: {e}")
+                return False
+        if prefix:
+            data_to_send = prefix + bytes(data_to_send)
         
-        while self.send_buffer and time.time() - start_time < timeout:
-            pending = len(self.send_buffer)
-            if pending > 0 and time.time() - start_time > 1.0:
-                print(f"[SEND_DATA] Aguardando {pending} pacotes... (janela: {self.window_size})")
-                if self.enable_congestion_control and self.congestion:
-                    print(f"[SEND_DATA] Estado congestão: {self.congestion.state}, cwnd: {self.congestion.cwnd:.2f}")
-            time.sleep(0.1)
+        # Verificar se é retransmissão
+        is_retransmission = self.next_seq in self.send_buffer
         
-        success = len(self.send_buffer) == 0
+        # Criar pacote
+        ack_num, window = self._piggyback_fields()
+        packet = TRUPacket(
+            seq_num=self.next_seq,
+            ack_num=ack_num,
+            packet_type=packet_type,
+            window=window,
+            checksum=0,
+            data=data_to_send,
+            timestamp=time.time(),
+            iv=packet_iv
+        )
         
-        # Parar coleta de métricas
-        self.stop_metrics_collection()
+        if self.enable_pacing:
+            self.pacer.update_rate(self.congestion, self.window_size, self.rtt_avg)
+            self.pacer.wait(len(data_to_send))
+
+        # Registrar tempo de envio
+        sent_time = time.time()
+        self.sent_times[packet.seq_num] = sent_time
+        self.send_buffer[packet.seq_num] = (packet, sent_time, 0)
+        
+        # Coletar métricas do pacote
+        cwnd = self.congestion.cwnd if self.enable_congestion_control and self.congestion else self.window_size
+        ssthresh = self.congestion.ssthresh if self.enable_congestion_control and self.congestion else 0
+        state = self.congestion.state if self.enable_congestion_control and self.congestion else "NO_CONGESTION_CTRL"
+        
+        self.metrics_collector.record_packet_sent(
+            seq_num=packet.seq_num,
+            size=len(data_to_send),
+            is_retransmission=is_retransmission,
+            congestion_window=cwnd,
+            ssthresh=ssthresh,
+            congestion_state=state
+        )
         
-        if success:
-            self.sent_times.clear()
-            print("[SEND_DATA] Todos os pacotes confirmados")
-        else:
-            print(f"[SEND_DATA] Timeout: {len(self.send_buffer)} pacotes não confirmados")
+        # Registrar no controlador antes do envio: o ACK pode chegar antes do retorno
+        if self.enable_congestion_control and self.congestion:
+            self.congestion.on_packet_sent(packet.seq_num, len(data_to_send))
+
+        if self.debug:
+            print(f"[SEND_DATA] Enviando pacote seq={self.next_seq}, tamanho={len(data_to_send)} bytes")
+        self._send_raw(packet, self.peer_addr)
+        self.next_seq += len(data_to_send)
+        return True
+
+    def _send_segments(self, segments, on_sent=None) -> bool:
+        # Laço de envio comum: segments é um iterador consumido sob demanda,
+        # on_sent(segmentos_enviados, bytes_enviados) após cada segmento
+        with self._send_lock:
+            # Bytes ainda na fila de send() saem antes, preservando a ordem
+            self._drain_send_queue()
+            # Iniciar coleta de métricas
+            self.start_metrics_collection()
+            transfer_start = time.time()
+        
+            # (segmento, tipo, bytes crus que ele completa): com compressão os
+            # segmentos do fio não correspondem 1:1 aos da entrada
+            if self.compressor:
+                segments = self._compressed_segments(segments)
+            else:
+                segments = ((segment, PacketType.DATA, len(segment)) for segment in segments)
+
+            # Enviar cada segmento
+            sent_bytes = 0
+            i = 0
+            # Segmentos já fatiados (e, com workers, sendo cifrados) à frente da janela
+            ahead = deque()
+            ahead_seq = self.next_seq
+            exhausted = False
+            # Enquanto há segmentos saindo, os ACKs do sentido inverso vão neles
+            self._transmitting = True
+            try:
+                while True:
+                    lookahead = max(self.window_size, 2 * self.crypto_pipeline.workers) if self.crypto_pipeline else 1
+                    while not exhausted and len(ahead) < lookahead:
+                        item = next(segments, None)
+                        if item is None:
+                            exhausted = True
+                            break
+                        segment, packet_type, raw_bytes = item
+                        ahead.append((segment, self._encrypt_segment(segment, ahead_seq), packet_type, raw_bytes))
+                        ahead_seq += len(segment)
+                    if not ahead:
+                        break
+
+                    self._wait_send_window()
+
+                    segment, encrypted, packet_type, raw_bytes = ahead.popleft()
+                    sent_bytes += raw_bytes
+                    if not self._transmit_segment(segment, encrypted, packet_type=packet_type):
+                        return False
+            
+                    if on_sent:
+                        on_sent(i + 1, sent_bytes)
+                    i += 1
+            finally:
+                self._transmitting = False
+
+            print(f"[SEND_DATA] Todos os pacotes enviados, aguardando ACKs...")
+        
+            # Esperar confirmação: o timer retransmite até o ACK ou até declarar
+            # a conexão perdida (MAX_RETRANSMISSIONS)
+            start_time = time.time()
+        
+            while self.send_buffer and self.connected:
+                pending = len(self.send_buffer)
+                if pending > 0 and time.time() - start_time > 1.0:
+                    print(f"[SEND_DATA] Aguardando {pending} pacotes... (janela: {self.window_size})")
+                    if self.enable_congestion_control and self.congestion:
+                        print(f"[SEND_DATA] Estado congestão: {self.congestion.state}, cwnd: {self.congestion.cwnd:.2f}")
+                # Acordar no ACK final em vez de esperar o próximo ciclo de 100ms
+                self.window_event.clear()
+                if self.send_buffer:
+                    self.window_event.wait(timeout=0.1)
+        
+            success = self.connected and len(self.send_buffer) == 0
+        
+            # Parar coleta de métricas
+            self.stop_metrics_collection()
+        
+            if success:
+                self.sent_times.clear()
+                self.completion_histogram.record(time.time() - transfer_start)
+                print("[SEND_DATA] Todos os pacotes confirmados")
+            else:
+                print(f"[SEND_DATA] Timeout: {len(self.send_buffer)} pacotes não confirmados")
         
-        return success
+            return success
 
     def do_key_exchange_as_client(self) -> bool:
         print("[KEY_EXCHANGE] Iniciando troca de chaves (cliente)...")
@@ -815,6 +2484,10 @@ class TRUProtocol:
         if not self.connected:
             print("[KEY_EXCHANGE] Não conectado, impossível trocar chaves")
             return False
+
+        if self.encryption_enabled:
+            print("[KEY_EXCHANGE] Chaves já negociadas no handshake")
+            return True
         
         try:
             # Gerar parâmetros Diffie-Hellman
@@ -828,6 +2501,7 @@ class TRUProtocol:
             
             # Preparar dados para envio - usar 'Q' para unsigned long long (8 bytes cada)
             key_data = struct.pack('!QQQ', g, p, public_key)
+            key_data += bytes([KEY_FLAG_AEAD if self.enable_aead else 0])
             
             print(f"[KEY_EXCHANGE] Enviando parâmetros DH: g={g}, p={p}, public_key={public_key}")
             print(f"[KEY_EXCHANGE] Dados serializados: {len(key_data)} bytes")
@@ -870,8 +2544,7 @@ class TRUProtocol:
             print("[KEY_EXCHANGE] Não conectado, impossível trocar chaves")
             return False
         
-        self.key_exchange_event.clear()
-        
+        # Sem clear(): o KEY_EXCHANGE pode ter sido processado antes desta chamada
         if self.key_exchange_event.wait(timeout=30.0):
             print("[KEY_EXCHANGE] Troca de chaves completada com sucesso")
             return True
@@ -879,31 +2552,381 @@ class TRUProtocol:
             print("[KEY_EXCHANGE] Timeout aguardando troca de chaves")
             return False
 
-    def recv_data(self, expected_segments: int, progress_cb=None) -> bytes:
-        data = b''
-        received_segments = 0
-        start_time = time.time()
-        # Timeout alinhado ao cliente (180s para permitir retransmissões com perda)
-        timeout = 180.0
-        while received_segments < expected_segments and time.time() - start_time < timeout:
+    def _stream_finished(self) -> bool:
+        if self.fin_seq is not None:
+            return self.ack_num >= self.fin_seq
+        # Peer sem FIN registrado (conexão caiu): encerra quando não há mais nada
+        return not self.connected and not self.receive_buffer
+
+    def _next_chunk(self, timeout: float = RECV_IDLE_TIMEOUT):
+        # Próximo bloco em ordem ou None no fim do fluxo; timeout conta o tempo
+        # sem progresso, não a duração da transferência
+        last_progress = time.time()
+        while True:
+            if self.decompressor and self.decompressor.pending:
+                return self.decompressor.feed()
             if self.app_queue:
-                segment = self.app_queue.pop(0)
-                data += segment
-                received_segments += 1
-                
+                chunk = self.app_queue.popleft()
+                self._send_window_update()
+                if isinstance(chunk, CompressedChunk):
+                    data = chunk.data.result() if isinstance(chunk.data, Future) else chunk.data
+                    data = self.decompressor.feed(data)
+                    if not data:
+                        continue  # bloco ainda incompleto: precisa do próximo segmento
+                    return data
+                return chunk.result() if isinstance(chunk, Future) else chunk
+            if self._stream_finished():
+                return None
+
+            idle = time.time() - last_progress
+            # Depois do FIN só esperamos retransmissões por pouco tempo
+            limit = min(timeout, FIN_LINGER) if self.fin_seq is not None else timeout
+            if idle >= limit:
+                if self.receive_buffer or self.fin_seq is not None:
+                    print(f"[RECV] Fluxo incompleto: {self.delivered_bytes} bytes entregues")
+                return None
+
+            self.data_event.clear()
+            if self.app_queue or self._stream_finished():
+                continue
+            if self.data_event.wait(timeout=min(0.1, limit - idle)):
+                last_progress = time.time()
+
+    def recv_stream(self, timeout: float = RECV_IDLE_TIMEOUT):
+        # Gerador de blocos em ordem até o FIN; a memória usada fica limitada
+        # pela janela anunciada, independente do tamanho da transferência
+        if self._partial_chunk is not None:
+            chunk, self._partial_chunk = self._partial_chunk, None
+            yield chunk
+        while True:
+            chunk = self._next_chunk(timeout)
+            if chunk is None:
+                return
+            yield chunk
+
+    def readinto(self, buffer, timeout: float = RECV_IDLE_TIMEOUT) -> int:
+        # Semântica de RawIOBase.readinto: 0 indica fim do fluxo
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        while filled < len(view):
+            chunk = self._partial_chunk
+            self._partial_chunk = None
+            if chunk is None:
+                if filled and not self.app_queue:
+                    break  # não bloquear com dados já copiados
+                chunk = self._next_chunk(timeout)
+                if chunk is None:
+                    break
+            n = min(len(chunk), len(view) - filled)
+            view[filled:filled + n] = chunk[:n]
+            filled += n
+            if n < len(chunk):
+                self._partial_chunk = memoryview(chunk)[n:]
+        return filled
+
+    def recv_into_file(self, target, progress_cb=None, expected_bytes: int = None,
+                       offset: int = 0, timeout: float = RECV_IDLE_TIMEOUT,
+                       fsync: bool = True) -> int:
+        # Grava o fluxo em target (caminho ou objeto com fileno()) a partir de
+        # offset com escritas posicionais; progress_cb(bytes, expected_bytes)
+        if isinstance(target, (str, bytes, os.PathLike)):
+            flags = os.O_WRONLY | os.O_CREAT | (os.O_TRUNC if offset == 0 else 0)
+            fd = os.open(target, flags, 0o644)
+            owned = True
+        else:
+            target.flush()
+            fd = target.fileno()
+            owned = False
+
+        written = 0
+        try:
+            for chunk in self.recv_stream(timeout):
+                view = memoryview(chunk)
+                while view:
+                    n = os.pwrite(fd, view, offset + written)
+                    view = view[n:]
+                    written += n
                 if progress_cb:
-                    progress_cb(received_segments, expected_segments)
+                    progress_cb(written, expected_bytes)
+            if fsync:
+                os.fsync(fd)
+        finally:
+            if owned:
+                os.close(fd)
+        return written
+
+    def recv_file_resumable(self, path: str, progress_cb=None, timeout: float = RECV_IDLE_TIMEOUT) -> bool:
+        # Par de send_file_resumable: responde ao manifesto com os pedaços já
+        # em disco (checkpoint em path.resume) e grava os que chegarem, cada um
+        # conferido contra o digest; progress_cb(bytes_verificados, tamanho)
+        data = self.recv_message(timeout)
+        if data is None:
+            print("[RESUME] Manifesto não recebido")
+            return False
+        try:
+            manifest = Manifest.unpack(data)
+        except (ValueError, struct.error) as e:
+            print(f"[RESUME] {e}")
+            return False
+
+        checkpoint = Checkpoint(path)
+        have = checkpoint.load(manifest)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        completed = False
+        try:
+            # O arquivo pode ter mudado desde o checkpoint: conferir o que ele promete
+            for index in sorted(have):
+                start, end = manifest.chunk_range(index)
+                if hashlib.sha256(os.pread(fd, end - start, start)).digest() != manifest.digests[index]:
+                    have.discard(index)
+                    del checkpoint.chunks[index]
+            print(f"[RESUME] {path}: {len(have)}/{len(manifest)} pedaços já em disco")
+
+            while True:
+                if not self.send_message(manifest.pack_have(have)):
+                    return False
+                missing = [i for i in range(len(manifest)) if i not in have]
+                if not missing:
+                    os.ftruncate(fd, manifest.size)
+                    os.fsync(fd)
+                    completed = True
+                    checkpoint.clear()
+                    return True
+
+                last_checkpoint = time.time()
+                for index in missing:
+                    start, end = manifest.chunk_range(index)
+                    digest = self._recv_chunk(fd, start, end - start, timeout)
+                    if digest is None:
+                        print(f"[RESUME] Fluxo terminou no pedaço {index}")
+                        return False
+                    if digest == manifest.digests[index]:
+                        have.add(index)
+                        checkpoint.mark(index, digest)
+                    else:
+                        print(f"[RESUME] Digest do pedaço {index} não confere")
+                    if progress_cb:
+                        progress_cb(sum(e - s for s, e in map(manifest.chunk_range, have)), manifest.size)
+                    if time.time() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                        # Só entra no checkpoint o que o fsync garantiu em disco
+                        os.fsync(fd)
+                        checkpoint.save()
+                        last_checkpoint = time.time()
+                os.fsync(fd)
+                checkpoint.save()
+        finally:
+            if not completed:
+                os.fsync(fd)
+                checkpoint.save()
+            os.close(fd)
+
+    def recv_file_delta(self, path: str, progress_cb=None, timeout: float = RECV_IDLE_TIMEOUT) -> bool:
+        # Par de send_file_delta: a versão atual de path (se existir) é a base;
+        # o arquivo novo é montado em path.delta e só substitui path depois de
+        # conferido o SHA-256 anunciado. progress_cb(bytes_montados, tamanho)
+        data = self.recv_message(timeout)
+        if data is None:
+            print("[DELTA] Pedido de sincronização não recebido")
+            return False
+        try:
+            size, expected_digest = DELTA_REQUEST.unpack(data)
+        except struct.error as e:
+            print(f"[DELTA] Pedido inválido: {e}")
+            return False
+
+        try:
+            basis = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            basis = None
+        tmp = f"{path}.delta"
+        out = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        ok = False
+        try:
+            basis_size = os.fstat(basis).st_size if basis is not None else 0
+            if basis is not None:
+                signatures = Signatures.from_file(basis, basis_size)
             else:
-                self._deliver_data()
-                time.sleep(0.01)
-        
-        return data
+                signatures = Signatures(block_size_for(0), [])
+            print(f"[DELTA] Base {path}: {basis_size} bytes, {len(signatures.blocks)} blocos")
+            if not self.send_message(signatures.pack()):
+                return False
+
+            digest = hashlib.sha256()
+            written = 0
+            block = signatures.block_size
+            while True:
+                op = self._recv_exact(1, timeout)
+                if op is None:
+                    print("[DELTA] Fluxo de instruções interrompido")
+                    return False
+                if op == OP_END:
+                    break
+                if op == OP_COPY:
+                    args = self._recv_exact(COPY_ARGS.size, timeout)
+                    if args is None:
+                        return False
+                    first, count = COPY_ARGS.unpack(args)
+                    if first + count > len(signatures.blocks):
+                        print(f"[DELTA] Cópia fora da base: blocos {first}..{first + count}")
+                        return False
+                    for index in range(first, first + count):
+                        chunk = os.pread(basis, block, index * block)
+                        digest.update(chunk)
+                        os.pwrite(out, chunk, written)
+                        written += len(chunk)
+                elif op == OP_LITERAL:
+                    args = self._recv_exact(LITERAL_ARGS.size, timeout)
+                    if args is None:
+                        return False
+                    length = LITERAL_ARGS.unpack(args)[0]
+                    if self._recv_chunk(out, written, length, timeout, digest) is None:
+                        return False
+                    written += length
+                else:
+                    print(f"[DELTA] Instrução desconhecida: {op!r}")
+                    return False
+                if progress_cb:
+                    progress_cb(written, size)
+
+            ok = written == size and digest.digest() == expected_digest
+            if ok:
+                os.fsync(out)
+                os.replace(tmp, path)
+                print(f"[DELTA] {path} reconstruído ({size} bytes)")
+            else:
+                print(f"[DELTA] Arquivo reconstruído não confere ({written}/{size} bytes)")
+            self.send_message(DELTA_OK if ok else DELTA_FAILED)
+            return ok
+        finally:
+            os.close(out)
+            if basis is not None:
+                os.close(basis)
+            if not ok and os.path.exists(tmp):
+                os.remove(tmp)
+
+    def recv_files(self, directory: str, progress_cb=None, timeout: float = RECV_IDLE_TIMEOUT) -> bool:
+        # Par de send_files: desmonta o lote em directory enquanto ele chega.
+        # Arquivos pequenos são gravados por um pool de threads em paralelo à
+        # recepção; os grandes vão direto ao disco. progress_cb(arquivos, bytes)
+        stats = self.batch_stats = {'files': 0, 'bytes': 0}
+        os.makedirs(directory, exist_ok=True)
+        writers = ThreadPoolExecutor(max_workers=BATCH_WRITERS, thread_name_prefix="trudp-batch")
+        pending = deque()  # (Future da gravação, bytes)
+        pending_bytes = 0
+        received = set()  # destinos já gravados: um nome repetido sobrescreveria o anterior
+        ok = False
+        try:
+            while True:
+                header = self._recv_exact(BATCH_HEADER.size, timeout)
+                if header is None:
+                    print(f"[BATCH] Lote interrompido após {stats['files']} arquivos")
+                    return False
+                name_len, mode, size = BATCH_HEADER.unpack(header)
+                if not name_len:
+                    break
+                name = self._recv_exact(name_len, timeout)
+                if name is None:
+                    return False
+                target = batch_target(directory, name)
+                if target in received:
+                    raise ValueError(f"nome repetido no lote: {name.decode('utf-8')!r}")
+                received.add(target)
+
+                if size <= BATCH_INLINE_LIMIT:
+                    data = self._recv_exact(size, timeout)
+                    if data is None:
+                        return False
+                    pending.append((writers.submit(write_file, target, data, mode), size))
+                    pending_bytes += size
+                    # Memória limitada: espera as gravações mais antigas
+                    while pending_bytes > BATCH_PENDING_LIMIT or (pending and pending[0][0].done()):
+                        future, written = pending.popleft()
+                        future.result()
+                        pending_bytes -= written
+                else:
+                    fd = open_target(target, mode)
+                    try:
+                        if self._recv_chunk(fd, 0, size, timeout) is None:
+                            print(f"[BATCH] {target} incompleto")
+                            return False
+                    finally:
+                        os.close(fd)
+
+                stats['files'] += 1
+                stats['bytes'] += size
+                if progress_cb:
+                    progress_cb(stats['files'], stats['bytes'])
+
+            for future, _ in pending:
+                future.result()
+            ok = True
+            print(f"[BATCH] {stats['files']} arquivos ({stats['bytes']} bytes) gravados em {directory}")
+            return True
+        except (ValueError, OSError) as e:
+            print(f"[BATCH] {e}")
+            return False
+        finally:
+            writers.shutdown(wait=True)
+            self.send_message(BATCH_OK if ok else BATCH_FAILED)
+
+    def _recv_exact(self, length: int, timeout: float) -> Optional[bytes]:
+        buf = bytearray(length)
+        view = memoryview(buf)
+        done = 0
+        while done < length:
+            n = self.readinto(view[done:], timeout)
+            if not n:
+                return None
+            done += n
+        return bytes(buf)
+
+    def _recv_chunk(self, fd: int, offset: int, length: int, timeout: float,
+                    digest=None) -> Optional[bytes]:
+        # Lê exatamente length bytes do fluxo para fd em offset; devolve o
+        # SHA-256 do que foi gravado (ou de tudo o que já passou por digest,
+        # se dado) ou None se o fluxo acabar antes
+        digest = digest or hashlib.sha256()
+        view = memoryview(bytearray(min(length, STREAM_CHUNK_SIZE)))
+        done = 0
+        while done < length:
+            n = self.readinto(view[:min(len(view), length - done)], timeout)
+            if not n:
+                return None
+            digest.update(view[:n])
+            written = 0
+            while written < n:
+                written += os.pwrite(fd, view[written:n], offset + done + written)
+            done += n
+        return digest.digest()
+
+    def recv_data(self, expected_segments: int = None, progress_cb=None, segment_size: int = MSS) -> bytes:
+        # Conta em unidades de segment_size: o remetente pode usar segmentos maiores.
+        # Sem expected_segments lê até o FIN
+        expected_bytes = expected_segments * segment_size if expected_segments else None
+        data = bytearray()
+        for chunk in self.recv_stream():
+            data += chunk
+            if progress_cb:
+                progress_cb(len(data) // segment_size, expected_segments)
+            if expected_bytes is not None and len(data) >= expected_bytes:
+                break
+        return bytes(data)
 
     def close(self):
         print("[CLOSE] Fechando conexão...")
+
+        # Dados enfileirados por send() saem antes do FIN
+        if self.writer_thread and self.connected:
+            if not self.flush(timeout=SEND_LINGER):
+                print(f"[CLOSE] Fila de envio não esvaziada: {len(self._send_queue)} bytes")
+        # ACK atrasado pendente sai antes do FIN
+        self._flush_delayed_ack()
         
         # Parar coleta de métricas
         self.stop_metrics_collection()
+
+        if self.use_path_cache:
+            self._update_path_cache()
         
         if self.connected and self.peer_addr:
             # Enviar FIN
@@ -925,7 +2948,7 @@ class TRUProtocol:
             # Esperar FIN-ACK
             try:
                 self.sock.settimeout(2.0)
-                data, _ = self.sock.recvfrom(1024)
+                data, _ = self.sock.recvfrom(self.recv_buffer_size)
                 packet = TRUPacket.deserialize(data)
                 
                 if packet.packet_type == PacketType.FIN_ACK:
@@ -940,37 +2963,44 @@ class TRUProtocol:
             self.receiver_thread.join(timeout=1.0)
         if self.timer_thread:
             self.timer_thread.join(timeout=1.0)
+        if self.writer_thread:
+            self.writer_thread.join(timeout=1.0)
         
         self.sock.close()
+        if self.crypto_pipeline:
+            self.crypto_pipeline.shutdown()
         self.connected = False
         print("[CLOSE] Conexão fechada")
 
     def get_rtt_stats(self) -> dict:
-        if not self.rtt_samples:
-            return {
-                'avg': 0,
-                'min': 0,
-                'max': 0,
-                'dev': self.rtt_dev,
-                'timeout': self.timeout_interval,
-                'samples': 0
-            }
-        
-        min_rtt = min(self.rtt_samples)
-        max_rtt = max(self.rtt_samples)
-        
+        # min, max, samples e percentis cobrem todas as amostras (histograma);
+        # delivery e completion resumem a entrega de segmentos e os envios completos
+        rtt = self.rtt_histogram.summary()
+        sampled = rtt['count'] > 0
         return {
-            'avg': self.rtt_avg,
-            'min': min_rtt,
-            'max': max_rtt,
+            'avg': self.rtt_avg if sampled else 0,
+            'min': rtt['min'],
+            'max': rtt['max'],
             'dev': self.rtt_dev,
-            'timeout': self._calculate_timeout(),
-            'samples': len(self.rtt_samples)
+            'timeout': self._calculate_timeout() if sampled else self.timeout_interval,
+            'samples': rtt['count'],
+            **{key: value for key, value in rtt.items() if key.startswith('p')},
+            'delivery': self.delivery_histogram.summary(),
+            'completion': self.completion_histogram.summary()
+        }
+
+    def get_latency_histograms(self) -> dict:
+        # Histogramas crus, para combinar conexões (LatencyHistogram.merge)
+        return {
+            'rtt': self.rtt_histogram,
+            'delivery': self.delivery_histogram,
+            'completion': self.completion_histogram
         }
 
     def get_congestion_stats(self):
         if self.enable_congestion_control and self.congestion:
             return {
+                'algorithm': self.congestion_algorithm,
                 'cwnd': self.congestion.cwnd,
                 'ssthresh': self.congestion.ssthresh,
                 'state': self.congestion.state,
@@ -980,6 +3010,7 @@ class TRUProtocol:
                 'timeout': getattr(self.congestion, 'timeout_interval', 0)
             }
         return {
+            'algorithm': None,
             'cwnd': self.window_size,
             'ssthresh': 0,
             'state': 'NO_CONGESTION_CTRL',
@@ -989,6 +3020,14 @@ class TRUProtocol:
             'timeout': 0
         }
 
+    def get_compression_stats(self) -> dict:
+        if not self.compressor:
+            return {'algorithm': None}
+        stats = dict(self.compressor.stats)
+        stats['algorithm'] = next(name for name, flag in ALGORITHMS.items() if flag == self.compressor.algorithm)
+        stats['ratio'] = stats['compressed_bytes'] / stats['raw_bytes'] if stats['raw_bytes'] else 1.0
+        return stats
+
     def get_metrics_collector(self):
         """Retorna o coletor de métricas para análise posterior"""
         return self.metrics_collector
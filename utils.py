@@ -1,4 +1,6 @@
+import heapq
 import socket
+import threading
 import time
 from queue import Queue
 import random
@@ -53,5 +55,90 @@ def loss_filter(seq: int) -> bool:
     except:
         return False
             
+class EmulatedLink:
+    """Enlace emulado sobre loopback para testes e benchmarks.
+
+    Atraso fixo e, com rate (bytes/s), um gargalo com fila de queue_bytes e
+    descarte no estouro; jitter soma a cada datagrama um atraso aleatório de
+    até jitter segundos, reordenando-os; com mtu, datagramas maiores que mtu
+    bytes somem sem aviso (buraco negro de PMTU). Vários sockets podem
+    dividir o mesmo enlace (fluxos concorrentes no mesmo gargalo); attach
+    troca o socket de um TRUProtocol.
+    """
+
+    def __init__(self, delay: float = 0.0, rate: float = 0.0, queue_bytes: int = 64 * 1400,
+                 jitter: float = 0.0, mtu: int = 0):
+        self.delay = delay
+        self.rate = rate
+        self.queue_bytes = queue_bytes
+        self.jitter = jitter
+        self.mtu = mtu
+        self.oversized = 0
+        self.busy_until = 0.0   # fim da transmissão do último datagrama aceito
+        self.dropped = 0
+        self._heap = []
+        self._order = 0
+        self._cond = threading.Condition()
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def attach(self, proto):
+        proto.sock = _LinkSocket(proto.sock, self)
+        return proto
+
+    def queue_delay(self) -> float:
+        return max(self.busy_until - time.perf_counter(), 0.0)
+
+    def send(self, sock, data: bytes, addr):
+        now = time.perf_counter()
+        with self._cond:
+            if self.mtu and len(data) > self.mtu:
+                self.oversized += 1
+                return
+            due = now + self.delay
+            if self.rate:
+                start = max(now, self.busy_until)
+                if (start - now) * self.rate + len(data) > self.queue_bytes:
+                    self.dropped += 1
+                    return
+                self.busy_until = start + len(data) / self.rate
+                due = self.busy_until + self.delay
+            if self.jitter:
+                due += random.uniform(0, self.jitter)
+            self._order += 1
+            heapq.heappush(self._heap, (due, self._order, sock, data, addr))
+            self._cond.notify()
+
+    def _pump(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due, _, sock, data, addr = self._heap[0]
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+            try:
+                sock.sendto(data, addr)
+            except OSError:
+                pass  # socket já fechado
+
+
+class _LinkSocket:
+    # Socket UDP cujos envios passam por um EmulatedLink
+
+    def __init__(self, sock, link: EmulatedLink):
+        self._sock = sock
+        self._link = link
+
+    def sendto(self, data, addr):
+        self._link.send(self._sock, bytes(data), addr)
+        return len(data)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
 def generate_synthetic_data(size: int) -> bytes:
     return bytes([i % 256 for i in range(size)])